@@ -1,4 +1,5 @@
 from datetime import datetime
+import argparse
 import os
 import json
 import re
@@ -10,7 +11,9 @@ import matplotlib.pyplot as plt
 from itertools import groupby
 import numpy as np
 from collections import Counter
-from sklearn.cluster import KMeans
+import profiling
+import spark_event_index
+from experiment_archive import result_file_exists
 
 
 # Constants
@@ -82,18 +85,17 @@ def parse_spark_detailed_log(results_dir_path, experiment_id, experiment_setup):
     designated_driver_results_path = os.path.join(results_dir_path, experiment_setup.designated_driver_node)
     spark_log_full_path = os.path.join(designated_driver_results_path, spark_full_log_file)
 
-    if not os.path.exists(spark_log_full_path) and not try_get_spark_detailed_log(designated_driver_results_path):
+    if not result_file_exists(spark_log_full_path) and not try_get_spark_detailed_log(designated_driver_results_path):
         print("Spark full log file not found for experiment", experiment_id)
         return
 
+    # Read just the taskend events to get task info
     all_tasks = []
-    with open(spark_log_full_path, "r") as lines:
-        for line in lines:
-            # Check for taskend events to get task info
-            if 'SparkListenerTaskEnd' in line:
-                task = TaskInfo(line)
-                # print(task)
-                all_tasks.append(task)
+    event_index = spark_event_index.get_spark_event_index(spark_log_full_path)
+    for line in event_index.iterate_event_lines(spark_event_index.task_end_event):
+        task = TaskInfo(line)
+        # print(task)
+        all_tasks.append(task)
 
     return all_tasks
 
@@ -210,6 +212,7 @@ def print_or_get_exp_task_stats(results_dir_path, experiment_id, all_tasks):
             gc_impacted_tasks_per_node = [t for t in sorted_tasks if t.node == node and t.gc_time_secs > 0]
             gc_task_times = [(t.start_time - base_time).total_seconds() for t in gc_impacted_tasks_per_node]
             num_runs = int(round(gc_task_counter[node] * 1.0 / 80))
+            from sklearn.cluster import KMeans     # Slow to import, only needed here
             km = KMeans(n_clusters=num_runs).fit(np.array(gc_task_times).reshape(-1,1))
             task_clusters = {cluster_id:[] for cluster_id in range(num_runs)}
             for idx, task in enumerate(gc_impacted_tasks_per_node):
@@ -292,6 +295,13 @@ experiments = [
 
 
 def main():
+    parser = argparse.ArgumentParser("Analyzes spark task logs across experiments")
+    profiling.add_profile_arguments(parser)
+    args = parser.parse_args()
+
+    # Timing report of the stages, if asked for with --profile or the SPARK_ANALYSIS_PROFILE env var
+    profiling.enable_from_env(args.profile, args.hotspots)
+
     start_time = datetime.strptime('2019-06-10 00:00:00', "%Y-%m-%d %H:%M:%S")
     end_time = datetime.now()
 
@@ -0,0 +1,220 @@
+"""
+Times each stage of the analysis pipeline on synthetic experiments of a few sizes and reports throughput and peak memory
+"""
+
+import argparse
+import os
+import io
+import json
+import time
+import shutil
+import tempfile
+import tracemalloc
+import contextlib
+from datetime import datetime
+import plot_one_experiment
+from plot_one_experiment import ExperimentSetup
+import plot_multiple_experiments
+import analyze_spark_logs
+import synthetic_experiments
+import spark_log_index
+import spark_event_index
+
+
+# Experiment sizes to benchmark at. Tasks per node per stage should stay above ~60 or so, as the GC run clustering
+# in print_or_get_exp_task_stats needs enough GC-impacted tasks on every node.
+benchmark_scales = {
+    "small": {"num_nodes": 4, "num_cores": 8, "duration_secs": 120, "tasks_per_stage": 400},
+    "medium": {"num_nodes": 8, "num_cores": 40, "duration_secs": 600, "tasks_per_stage": 640},
+    "large": {"num_nodes": 8, "num_cores": 40, "duration_secs": 3600, "tasks_per_stage": 6400},
+}
+default_repeat = 3
+
+
+def count_lines(file_paths):
+    total = 0
+    for file_path in file_paths:
+        if os.path.exists(file_path):
+            with open(file_path, "rb") as f:
+                total += sum(1 for _ in f)
+    return total
+
+
+def get_node_files(experiment_dir_path, experiment_setup, file_names):
+    return [os.path.join(experiment_dir_path, node_name, file_name)
+            for node_name in experiment_setup.all_spark_nodes for file_name in file_names]
+
+
+def get_driver_files(experiment_dir_path, experiment_setup, file_names):
+    return [os.path.join(experiment_dir_path, experiment_setup.designated_driver_node, file_name)
+            for file_name in file_names]
+
+
+# Pipeline stages to time. Each stage is (name, unit, function to count the units of work, function to run the stage).
+# Stages that need output of an earlier stage (e.g., tasks parsed from the detailed log) take it from the context.
+def get_pipeline_stages():
+    def parse_results(ctx):
+        return plot_one_experiment.parse_results(ctx["experiment_dir_path"], ctx["experiment_setup"], None,
+                                                 output_readings_to_file=False, cpu_core_usage_dict={})
+
+    def parse_results_lines(ctx):
+        return count_lines(
+            get_node_files(ctx["experiment_dir_path"], ctx["experiment_setup"],
+                           [plot_one_experiment.cpu_readings_file_name, plot_one_experiment.net_readings_file_name,
+                            plot_one_experiment.mem_readings_file_name, plot_one_experiment.diskio_readings_file_name]) +
+            get_driver_files(ctx["experiment_dir_path"], ctx["experiment_setup"],
+                             [plot_one_experiment.power_readings_file_name, plot_one_experiment.spark_log_file_name]))
+
+    def get_metrics_summary(ctx):
+        # Reload setup as the summary fills in missing job times on it
+        experiment_setup = ExperimentSetup(os.path.join(ctx["experiment_dir_path"],
+                                                        plot_one_experiment.setup_details_file_name))
+        return plot_multiple_experiments.get_metrics_summary_for_experiment(ctx["experiment_id"], experiment_setup)
+
+    def get_metrics_summary_lines(ctx):
+        return count_lines(
+            get_node_files(ctx["experiment_dir_path"], ctx["experiment_setup"],
+                           [plot_one_experiment.net_readings_file_name, plot_one_experiment.diskio_readings_file_name]) +
+            get_driver_files(ctx["experiment_dir_path"], ctx["experiment_setup"],
+                             [plot_one_experiment.spark_log_file_name, plot_one_experiment.spark_full_log_file_name]))
+
+    def parse_spark_detailed_log(ctx):
+        ctx["all_tasks"] = analyze_spark_logs.parse_spark_detailed_log(ctx["experiment_dir_path"], ctx["experiment_id"],
+                                                                       ctx["experiment_setup"])
+        return ctx["all_tasks"]
+
+    def parse_spark_detailed_log_lines(ctx):
+        return count_lines(get_driver_files(ctx["experiment_dir_path"], ctx["experiment_setup"],
+                                            [plot_one_experiment.spark_full_log_file_name]))
+
+    def print_or_get_exp_task_stats(ctx):
+        return analyze_spark_logs.print_or_get_exp_task_stats(ctx["experiment_dir_path"], ctx["experiment_id"],
+                                                              ctx["all_tasks"])
+
+    def task_count(ctx):
+        return len(ctx["all_tasks"])
+
+    return [
+        ("parse_results", "lines", parse_results_lines, parse_results),
+        ("get_metrics_summary_for_experiment", "lines", get_metrics_summary_lines, get_metrics_summary),
+        ("parse_spark_detailed_log", "lines", parse_spark_detailed_log_lines, parse_spark_detailed_log),
+        ("print_or_get_exp_task_stats", "tasks", task_count, print_or_get_exp_task_stats),
+    ]
+
+
+# Removes the index sidecars that reading the spark logs writes next to them, so the next run reads the logs cold
+def remove_index_sidecars(experiment_dir_path):
+    index_file_suffixes = (spark_log_index.index_file_suffix, spark_event_index.index_file_suffix)
+    for dir_path, _, file_names in os.walk(experiment_dir_path):
+        for file_name in file_names:
+            if file_name.endswith(index_file_suffixes):
+                os.remove(os.path.join(dir_path, file_name))
+
+
+# Runs the stage once, discarding whatever it prints. Returns elapsed seconds.
+def time_stage(stage_func, ctx):
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        stage_func(ctx)
+        return time.perf_counter() - start
+
+
+# Runs the stage once with allocations traced and returns the peak traced memory in bytes. Kept apart from the timed
+# runs as tracing slows down allocation heavy code quite a bit.
+def trace_stage_peak_memory(stage_func, ctx):
+    tracemalloc.start()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            stage_func(ctx)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+# Generates a synthetic experiment at the given scale and benchmarks each pipeline stage on it. Each repeat is a cold
+# run, without index sidecars as on the first read of an experiment, then a warm run that finds the sidecars the cold
+# one wrote. Peak memory is that of a cold run.
+def benchmark_scale(scale_name, scale, work_dir, repeat):
+    print("Generating {0} experiment: {1}".format(scale_name, scale))
+    generate_start = time.perf_counter()
+    experiment_id = synthetic_experiments.generate_experiment(work_dir, experiment_id="Exp-benchmark-" + scale_name,
+                                                              **scale)
+    print("Generated in {0:.1f} secs".format(time.perf_counter() - generate_start))
+
+    experiment_dir_path = os.path.join(work_dir, experiment_id)
+    ctx = {
+        "experiment_id": experiment_id,
+        "experiment_dir_path": experiment_dir_path,
+        "experiment_setup": ExperimentSetup(os.path.join(experiment_dir_path, plot_one_experiment.setup_details_file_name)),
+    }
+
+    results = []
+    for stage_name, unit, count_units, stage_func in get_pipeline_stages():
+        cold_timings = []
+        warm_timings = []
+        for _ in range(repeat):
+            remove_index_sidecars(experiment_dir_path)
+            cold_timings.append(time_stage(stage_func, ctx))
+            warm_timings.append(time_stage(stage_func, ctx))
+        remove_index_sidecars(experiment_dir_path)
+        peak_bytes = trace_stage_peak_memory(stage_func, ctx)
+        units = count_units(ctx)
+        cold_best_secs = min(cold_timings)
+        warm_best_secs = min(warm_timings)
+        results.append({
+            "scale": scale_name,
+            "stage": stage_name,
+            "units": units,
+            "unit": unit,
+            "cold_best_secs": cold_best_secs,
+            "cold_mean_secs": sum(cold_timings) / len(cold_timings),
+            "warm_best_secs": warm_best_secs,
+            "warm_mean_secs": sum(warm_timings) / len(warm_timings),
+            "cold_throughput": units / cold_best_secs if cold_best_secs > 0 else float("inf"),
+            "warm_throughput": units / warm_best_secs if warm_best_secs > 0 else float("inf"),
+            "peak_mb": peak_bytes / (1024.0 * 1024),
+        })
+    return results
+
+
+def print_results(results):
+    print("{:8s} {:36s} {:>10s} {:>10s} {:>10s} {:>16s} {:>16s} {:>10s}".format(
+        "Scale", "Stage", "Units", "Cold s", "Warm s", "Cold throughput", "Warm throughput", "Peak MB"))
+    for r in results:
+        print("{:8s} {:36s} {:>10d} {:>10.3f} {:>10.3f} {:>16s} {:>16s} {:>10.1f}".format(
+            r["scale"], r["stage"], r["units"], r["cold_best_secs"], r["warm_best_secs"],
+            "{:.0f} {}/s".format(r["cold_throughput"], r["unit"]),
+            "{:.0f} {}/s".format(r["warm_throughput"], r["unit"]), r["peak_mb"]))
+
+
+def main():
+    parser = argparse.ArgumentParser("Benchmarks the analysis pipeline on synthetic experiments")
+    parser.add_argument('--scales', action='store', nargs='+', default=["small", "medium"],
+                        choices=sorted(benchmark_scales.keys()), help='experiment sizes to benchmark at')
+    parser.add_argument('--repeat', action='store', type=int, default=default_repeat,
+                        help='timed cold and warm runs per stage')
+    parser.add_argument('--workdir', action='store', help='folder for the synthetic experiments, kept after the run')
+    parser.add_argument('--output', action='store', help='json file to append the results to')
+    args = parser.parse_args()
+
+    work_dir = args.workdir or tempfile.mkdtemp(prefix="benchmark-")
+    # Pipeline functions look up experiments relative to the results folder
+    plot_one_experiment.results_base_dir = work_dir
+
+    all_results = []
+    try:
+        for scale_name in args.scales:
+            all_results.extend(benchmark_scale(scale_name, benchmark_scales[scale_name], work_dir, args.repeat))
+    finally:
+        if not args.workdir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    print_results(all_results)
+    if args.output:
+        with open(args.output, "a") as f:
+            f.write(json.dumps({"time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "results": all_results}) + "\n")
+
+
+if __name__ == '__main__':
+    main()
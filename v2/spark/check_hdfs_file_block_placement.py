@@ -2,33 +2,35 @@
 Utility script to get data block placement of a hdfs file and plot it
 """
 
+import argparse
 import os
 import random
-import paramiko
 from datetime import datetime
 import time
 import re
 from collections import Counter
-import matplotlib.pyplot as plt
 import run_experiments
 import socket
-import plot_one_experiment
 import numpy as np
+from multiprocessing.pool import ThreadPool
 
 
 # Command to run
 file_path = "/user/ayelam/sort_inputs"
-hdfs_fsck_command = "hdfs fsck {0} -files -blocks -locations".format(file_path)
+hdfs_fsck_command_format = "hdfs fsck {0} -files -blocks -locations"
 # master_node_name = "ccied21.sysnet.ucsd.edu"
 master_node_name = "b09-40.sysnet.ucsd.edu"
 file_part_prefix = "/user/ayelam/sort_inputs/part_"
 part_number_pattern = "(part_([0-9]+)).+input"
-data_line_pattern = "^([0-9]+).+len=([0-9]+).+DatanodeInfoWithStorage[[]([0-9]+[.][0-9]+[.][0-9]+[.][0-9]+)[:]50010.+$"
-power_plots_output_dir = os.path.join(plot_one_experiment.results_base_dir, "PowerPlots", datetime.now().strftime("%m-%d"))
+block_line_pattern = "^([0-9]+)[.].+len=([0-9]+)"
+replica_location_pattern = r"DatanodeInfoWithStorage\[([0-9]+[.][0-9]+[.][0-9]+[.][0-9]+):50010"
+power_plots_output_dir = os.path.join(run_experiments.local_results_folder, "PowerPlots", datetime.now().strftime("%m-%d"))
+ip_to_node_dict = {addr[1]: node for node, addr in run_experiments.fat_tree_ip_mac_map.items()}
 
 
 # Creates SSH client using paramiko lib.
 def create_ssh_client(server, port, user, password):
+    import paramiko
     client = paramiko.SSHClient()
     client.load_system_host_keys()
     client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
@@ -46,62 +48,183 @@ def get_ip_to_name_mapping(user_name, password):
     return ip_to_node_dict
 
 
-def main():
-    user_password_info = open("root-user.pass").readline()   # One line in <user>;<password> format.
-    user_name = user_password_info.split(";")[0]
-    password = user_password_info.split(";")[1]
-
-    # ip_to_node_dict = get_ip_to_name_mapping(user_name, password)
-
-    ssh_client = create_ssh_client(master_node_name, 22, user_name, password)
-    _, stdout, _ = ssh_client.exec_command(hdfs_fsck_command)
-    output = stdout.readlines()
-
+# Block placement of the files under an HDFS path, accumulated from fsck output one line at a time
+class BlockPlacement:
+    def __init__(self, path=file_path):
+        self.path = path
+        self.file_blocks_counter = {"default": Counter()}
+        self.file_size_counter = {"default": Counter()}
+        self.total_size_counter = Counter()     # GB of block replicas per node, i.e., with every copy of a block
+        self.total_blocks_counter = Counter()   # Block replicas per node
+        self.file_count = 0
+        self.block_count = 0
+        self.unique_size_gb = 0.0               # GB of the files themselves, each block counted once
+        self._parse_for_data = False
+        self._file_part_label = "default"
 
-    parse_for_data = False
-    file_blocks_counter = { "default": Counter() }
-    file_size_counter = { "default": Counter() }
-    total_size_counter = Counter()
-    file_part_label = "default"
-    for line in output:
-
-        if line.startswith(file_path):
-            parse_for_data = True
+    def add_line(self, line):
+        if line.startswith(self.path):
+            self._parse_for_data = True
+            if "block(s)" in line:
+                self.file_count += 1
             matches = re.search(part_number_pattern, line)
             if matches:
-                file_part_label = matches.group(1)
-                file_blocks_counter[file_part_label] = Counter()
-                file_size_counter[file_part_label] = Counter()
-            continue
+                self._file_part_label = matches.group(1)
+                self.file_blocks_counter[self._file_part_label] = Counter()
+                self.file_size_counter[self._file_part_label] = Counter()
+            return
 
-        if parse_for_data:
-            matches = re.match(data_line_pattern, line)
+        if self._parse_for_data:
+            matches = re.match(block_line_pattern, line)
             if matches:
-                # block_id = matches.group(1)
-                block_size_bytes = float(matches.group(2))
-                node_ip = matches.group(3)
-                # print(node_ip)
-                # node_name = ip_to_node_dict[node_ip]
-                node_name = [node_name for node_name, addr in run_experiments.fat_tree_ip_mac_map.items() if addr[1] == node_ip][0] 
-                file_blocks_counter[file_part_label][node_name] += 1
-                file_size_counter[file_part_label][node_name] += (block_size_bytes/(1024*1024*1024))
-                total_size_counter[node_name] += (block_size_bytes/(1024*1024*1024))
+                block_size_gb = float(matches.group(2)) / (1024 * 1024 * 1024)
+                self.block_count += 1
+                self.unique_size_gb += block_size_gb
+                # Every replica takes up space on its node
+                for node_ip in re.findall(replica_location_pattern, line):
+                    node_name = ip_to_node_dict.get(node_ip, node_ip)
+                    self.file_blocks_counter[self._file_part_label][node_name] += 1
+                    self.file_size_counter[self._file_part_label][node_name] += block_size_gb
+                    self.total_blocks_counter[node_name] += 1
+                    self.total_size_counter[node_name] += block_size_gb
             else:
-                parse_for_data = False
+                self._parse_for_data = False
+
+    # Adds up the placement of another (disjoint) set of files
+    def merge(self, other):
+        for label, counter in other.file_blocks_counter.items():
+            self.file_blocks_counter.setdefault(label, Counter()).update(counter)
+        for label, counter in other.file_size_counter.items():
+            self.file_size_counter.setdefault(label, Counter()).update(counter)
+        self.total_size_counter.update(other.total_size_counter)
+        self.total_blocks_counter.update(other.total_blocks_counter)
+        self.file_count += other.file_count
+        self.block_count += other.block_count
+        self.unique_size_gb += other.unique_size_gb
+
+    # How unevenly the block replicas are spread over the nodes (nodes with no data count too if given)
+    def get_imbalance_stats(self, node_names=None):
+        node_names = sorted(set(node_names or []) | set(self.total_size_counter.keys()))
+        sizes = np.array([self.total_size_counter[node_name] for node_name in node_names], dtype=np.float64)
+        if not len(sizes) or sizes.sum() == 0:
+            return None
+        mean = sizes.mean()
+        return {
+            "nodes": len(sizes),
+            "total_gb": sizes.sum(),
+            "mean_gb": mean,
+            "min_node": node_names[int(sizes.argmin())],
+            "min_gb": sizes.min(),
+            "max_node": node_names[int(sizes.argmax())],
+            "max_gb": sizes.max(),
+            "max_over_mean": sizes.max() / mean,
+            "spread_over_mean": (sizes.max() - sizes.min()) / mean,
+            "coeff_of_variation": sizes.std() / mean,
+        }
+
+
+# Parses fsck output as it comes, from an SSH channel or a saved fsck output file
+def parse_fsck_output(lines, path=file_path, placement=None):
+    placement = placement or BlockPlacement(path)
+    for line in lines:
+        placement.add_line(line)
+    return placement
+
+
+def parse_fsck_output_file(fsck_output_file_path, path=file_path):
+    with open(fsck_output_file_path, "r") as lines:
+        return parse_fsck_output(lines, path)
+
+
+# Runs fsck on a path and parses its output while it streams in
+def run_fsck(ssh_client, path):
+    _, stdout, _ = ssh_client.exec_command(hdfs_fsck_command_format.format(path))
+    return parse_fsck_output(stdout, path)
+
+
+# Lists the files and folders right under an HDFS path
+def list_sub_paths(ssh_client, path):
+    _, stdout, _ = ssh_client.exec_command("hdfs dfs -ls {0}".format(path))
+    sub_paths = []
+    for line in stdout:
+        fields = line.split()
+        if fields and fields[-1].startswith(path):
+            sub_paths.append(fields[-1])
+    return sub_paths
+
+
+# Gets block placement of the files under a path. With parallel > 1, the files right under the path get checked with
+# that many fsck commands at a time and the results add up.
+def get_block_placement(ssh_client, path, parallel=1):
+    if parallel <= 1:
+        return run_fsck(ssh_client, path)
+
+    sub_paths = list_sub_paths(ssh_client, path)
+    placement = BlockPlacement(path)
+    pool = ThreadPool(processes=parallel)
+    try:
+        for sub_path_placement in pool.imap_unordered(lambda sub_path: run_fsck(ssh_client, sub_path), sub_paths):
+            placement.merge(sub_path_placement)
+    finally:
+        pool.close()
+        pool.join()
+    return placement
+
+
+def print_imbalance_stats(placement):
+    stats = placement.get_imbalance_stats(run_experiments.spark_nodes)
+    if stats is None:
+        return
+    print("{0} files, {1} blocks, {2:.2f} GB of data, {3:.2f} GB of replicas on {4} nodes".format(
+        placement.file_count, placement.block_count, placement.unique_size_gb, stats["total_gb"], stats["nodes"]))
+    print("Replica GB per node, Min: {0} {1:.2f} GB, Max: {2} {3:.2f} GB, Mean: {4:.2f} GB".format(
+        stats["min_node"], stats["min_gb"], stats["max_node"], stats["max_gb"], stats["mean_gb"]))
+    print("Max/Mean: {0:.3f}, (Max-Min)/Mean: {1:.3f}, CoV: {2:.3f}".format(
+        stats["max_over_mean"], stats["spread_over_mean"], stats["coeff_of_variation"]))
+
+
+def main():
+    import matplotlib.pyplot as plt
+    parser = argparse.ArgumentParser("Gets data block placement of a hdfs file and plots it")
+    parser.add_argument('--path', action='store', default=file_path, help='hdfs path to check')
+    parser.add_argument('--parallel', action='store', type=int, default=1,
+                        help='number of sub-paths of the path to run fsck on at a time')
+    parser.add_argument('--fsckfiles', action='store', nargs='+',
+                        help='saved fsck output files to parse instead of running fsck')
+    args = parser.parse_args()
+
+    if args.fsckfiles:
+        placement = BlockPlacement(args.path)
+        for fsck_output_file_path in args.fsckfiles:
+            placement.merge(parse_fsck_output_file(fsck_output_file_path, args.path))
+    else:
+        user_password_info = open("root-user.pass").readline()   # One line in <user>;<password> format.
+        user_name = user_password_info.split(";")[0]
+        password = user_password_info.split(";")[1]
+
+        # ip_to_node_dict = get_ip_to_name_mapping(user_name, password)
+
+        ssh_client = create_ssh_client(master_node_name, 22, user_name, password)
+        placement = get_block_placement(ssh_client, args.path, args.parallel)
+
+    file_blocks_counter = placement.file_blocks_counter
+    total_size_counter = placement.total_size_counter
 
     if not file_blocks_counter:
         print("Something wrong!")
         exit()
 
     # fig, ax = plt.subplots(1,1)
-    plt.suptitle("300 GB HDFS File Distribution")
+    plt.suptitle("HDFS File Distribution: {0:.0f} GB of data, {1:.0f} GB of replicas".format(
+        placement.unique_size_gb, sum(total_size_counter.values())))
     # plt.ylabel("% of blocks")
-    plt.ylabel("Size GB")
+    plt.ylabel("Replica Size GB")
     plt.xlabel("Nodes")
 
     # Print file fraction on individual nodes
     for k, v in total_size_counter.items():
-        print(k, ":", round(v, 2), " GB")
+        print(k, ":", round(v, 2), " GB of replicas")
+    print_imbalance_stats(placement)
         
     plt.bar(total_size_counter.keys(), total_size_counter.values(), 0.35)
 
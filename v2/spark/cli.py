@@ -0,0 +1,111 @@
+"""
+Single entry point for the experiment scripts, with a subcommand for each, e.g., `python cli.py list` or
+`python cli.py plot --power`. Arguments after the subcommand go to the script as if it was run on its own. A script is
+imported only when its subcommand runs, so heavy libraries (matplotlib, sklearn, paramiko) are loaded only by the
+subcommands that need them. Each subcommand has a budget for its startup time, i.e., the time to import its script,
+which `python cli.py startup` checks in fresh processes.
+"""
+
+import argparse
+import importlib
+import os
+import subprocess
+import sys
+import time
+
+
+# Subcommands as (script module, folder of the script relative to this one, startup budget in secs, description)
+subcommands = {
+    "run": ("run_experiments", "", 0.5, "runs experiments on the cluster"),
+    "parse": ("plot_one_experiment", "", 2.0, "parses results of single experiments and plots them"),
+    "plot": ("plot_multiple_experiments", "", 2.0, "plots results across experiments"),
+    "analyze": ("analyze_spark_logs", "", 2.0, "analyzes spark task logs across experiments"),
+    "list": ("print_experiments", "", 0.5, "lists experiments with their duration and description"),
+    "numa": ("plot_numa", "numa", 1.5, "plots results of NUMA tests"),
+    "fsck": ("check_hdfs_file_block_placement", "", 0.5, "checks the block placement of a hdfs file"),
+}
+startup_check_subcommand = "startup"
+scripts_dir = os.path.dirname(os.path.abspath(__file__))
+
+
+# Imports the script of a subcommand. Returns the module and the secs it took, which is the subcommand's startup
+# time when the script was not imported before.
+def load_subcommand(name):
+    module_name, folder, _, _ = subcommands[name]
+    module_dir = os.path.join(scripts_dir, folder)
+    if module_dir not in sys.path:
+        sys.path.insert(0, module_dir)
+    start = time.perf_counter()
+    module = importlib.import_module(module_name)
+    return module, time.perf_counter() - start
+
+
+def print_startup_time(name, startup_secs):
+    budget_secs = subcommands[name][2]
+    print("Startup of '{0}': {1:.2f} secs, budget {2:.2f} secs{3}".format(
+        name, startup_secs, budget_secs, " - OVER BUDGET" if startup_secs > budget_secs else ""), file=sys.stderr)
+
+
+# Runs the script of a subcommand with the given arguments
+def run_subcommand(name, args, print_timing=False):
+    module, startup_secs = load_subcommand(name)
+    if print_timing or startup_secs > subcommands[name][2]:
+        print_startup_time(name, startup_secs)
+    sys.argv = ["{0} {1}".format(os.path.basename(sys.argv[0]), name)] + args
+    module.main()
+
+
+# Measures the startup time of subcommands, each in a fresh process so no imports are shared. Returns the names of
+# the ones over their budget.
+def check_startup_times(names):
+    over_budget = []
+    print("{:<10s} {:>12s} {:>12s} {:>12s}".format("Subcommand", "Startup", "Budget", "Process"))
+    for name in names:
+        code = "import sys; sys.path.insert(0, {0!r}); import cli; print(cli.load_subcommand({1!r})[1])".format(
+            scripts_dir, name)
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, "-c", code], stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                universal_newlines=True)
+        process_secs = time.perf_counter() - start
+        if result.returncode != 0:
+            print("{:<10s} failed to start:\n{}".format(name, result.stderr.strip()))
+            over_budget.append(name)
+            continue
+
+        startup_secs = float(result.stdout.strip().splitlines()[-1])
+        budget_secs = subcommands[name][2]
+        if startup_secs > budget_secs:
+            over_budget.append(name)
+        print("{:<10s} {:>11.2f}s {:>11.2f}s {:>11.2f}s{}".format(name, startup_secs, budget_secs, process_secs,
+                                                                  "  OVER BUDGET" if startup_secs > budget_secs else ""))
+    return over_budget
+
+
+def main():
+    epilog = "subcommands:\n" + "\n".join("  {:<10s} {}".format(name, description)
+                                          for name, (_, _, _, description) in subcommands.items())
+    epilog += "\n  {:<10s} {}".format(startup_check_subcommand, "checks startup times of the given subcommands (or "
+                                                                "all) against their budgets")
+    parser = argparse.ArgumentParser("Runs the experiment and analysis scripts as subcommands", epilog=epilog,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--timing', action='store_true', help='print the startup time of the subcommand')
+    parser.add_argument('subcommand', action='store', choices=list(subcommands) + [startup_check_subcommand],
+                        metavar='subcommand', help='one of the subcommands below')
+    parser.add_argument('args', nargs=argparse.REMAINDER, help='arguments of the subcommand, see <subcommand> -h')
+    args = parser.parse_args()
+
+    if args.subcommand == startup_check_subcommand:
+        unknown_names = [name for name in args.args if name not in subcommands]
+        if unknown_names:
+            parser.error("unknown subcommands {0}".format(unknown_names))
+        over_budget = check_startup_times(args.args or list(subcommands))
+        if over_budget:
+            print("Over budget: " + ", ".join(over_budget))
+            sys.exit(1)
+        return
+
+    run_subcommand(args.subcommand, args.args, args.timing)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,228 @@
+"""
+Searches spark sort configurations (sort class, final partition count, link bandwidth) for the one that does best on
+an objective like job duration, energy or energy-delay product, without running all of them at full input size. Uses
+successive halving: every configuration first runs on a small input, and only the best of each round move on to a
+larger input, until the ones left run at full size. Runs are done by an evaluator, which is run_experiments on the
+cluster, or a simulated cluster for trying out the search locally.
+"""
+
+import argparse
+import json
+import math
+import random
+
+
+# Search defaults
+default_reduction_factor = 2        # Keep the best 1/n of the configurations after each round, n times the input
+default_min_input_size_mb = 10000   # Smaller inputs are mostly startup time and say little about full size runs
+# Simulated cluster, roughly the b09 nodes
+simulated_num_nodes = 8
+simulated_num_cores = 40
+simulated_startup_secs = 20
+simulated_disk_MBps = 400           # Per node
+simulated_cpu_MBps = 10             # Per core, for sorting
+simulated_task_overhead_secs = 0.05
+simulated_idle_watts = 90           # Per node
+simulated_cpu_joules_per_MB = 1.5
+simulated_net_joules_per_MB = 0.2
+simulated_disk_joules_per_MB = 0.3
+simulated_noise = 0.05              # Relative std of run to run variation
+
+
+def get_duration(summary):
+    return summary.get("DurationSecs")
+
+
+def get_energy(summary):
+    return summary.get("EnergyJoules")
+
+
+def get_energy_delay_product(summary):
+    duration = summary.get("DurationSecs")
+    energy = summary.get("EnergyJoules")
+    return duration * energy if duration is not None and energy is not None else None
+
+
+# Objectives take a run's metrics summary (see run_experiments.summarize_experiment_results) and return the value to
+# minimize, or None if the run does not have it
+objectives = {
+    "duration": get_duration,
+    "energy": get_energy,
+    "edp": get_energy_delay_product,
+}
+
+
+# Configuration as run_experiments names its parameters
+def make_configuration(scala_class_name, final_partition_count, link_bandwidth_mbps):
+    return {"ScalaClassName": scala_class_name, "FinalPartitionCount": final_partition_count,
+            "LinkBandwidthMbps": link_bandwidth_mbps}
+
+
+def get_all_configurations(scala_class_names, final_partition_counts, link_bandwidths_mbps):
+    return [make_configuration(scala_class_name, final_partition_count, link_bandwidth_mbps)
+            for scala_class_name in scala_class_names
+            for final_partition_count in final_partition_counts
+            for link_bandwidth_mbps in link_bandwidths_mbps]
+
+
+# Input size of each round: the full size in the last round, 1/reduction_factor of the next one's before it, and no
+# smaller than min_input_size_mb. There are as many rounds as it takes to get down to one configuration.
+def get_round_input_sizes_mb(num_configurations, full_input_size_mb, reduction_factor=default_reduction_factor,
+                             min_input_size_mb=default_min_input_size_mb):
+    num_rounds = 1
+    while reduction_factor ** num_rounds < num_configurations:
+        num_rounds += 1
+    min_input_size_mb = min(min_input_size_mb, full_input_size_mb)
+    return [max(min_input_size_mb, full_input_size_mb // reduction_factor ** (num_rounds - 1 - i))
+            for i in range(num_rounds)]
+
+
+class SearchRound:
+    input_size_mb = None
+    configurations = None   # Configurations that ran in this round
+    summaries = None        # Metrics summary of each run, None if it failed
+    scores = None           # Objective value of each run, None if it failed or does not have it
+    promoted = None         # Configurations that move on to the next round, best first
+
+
+class SearchResult:
+    objective_name = None
+    rounds = None
+    best_configuration = None   # None if no run of the last round got a score, i.e., the search found nothing
+    best_score = None
+
+    # Runs that got done at each input size, as the cost of the search in full size runs
+    def get_cost_in_full_runs(self):
+        full_input_size_mb = self.rounds[-1].input_size_mb
+        return sum(len(search_round.configurations) * search_round.input_size_mb / full_input_size_mb
+                   for search_round in self.rounds)
+
+
+# Best first, runs without a score last in the order they came
+def rank_configurations(configurations, scores):
+    order = sorted(range(len(configurations)),
+                   key=lambda idx: (scores[idx] is None, scores[idx] if scores[idx] is not None else 0, idx))
+    return [configurations[idx] for idx in order]
+
+
+# Runs successive halving over the configurations. evaluate_round(configurations, input_size_mb) runs each of them on
+# an input of that size and returns their metrics summaries in the same order (None for a failed run). All runs of a
+# round go to the evaluator together, so it can overlap them, e.g., summarize a run while the next one runs. The
+# journal, if given, gets a record(event, **fields) call after each round. The result has no best configuration if
+# every run of the last round failed.
+def successive_halving(configurations, evaluate_round, objective_name, full_input_size_mb,
+                       reduction_factor=default_reduction_factor, min_input_size_mb=default_min_input_size_mb,
+                       journal=None):
+    if objective_name not in objectives:
+        raise Exception("Unknown objective {0}, pick one of {1}".format(objective_name, sorted(objectives)))
+    objective = objectives[objective_name]
+    result = SearchResult()
+    result.objective_name = objective_name
+    result.rounds = []
+
+    remaining = list(configurations)
+    input_sizes_mb = get_round_input_sizes_mb(len(remaining), full_input_size_mb, reduction_factor, min_input_size_mb)
+    for round_idx, input_size_mb in enumerate(input_sizes_mb):
+        search_round = SearchRound()
+        search_round.input_size_mb = input_size_mb
+        search_round.configurations = remaining
+        search_round.summaries = evaluate_round(remaining, input_size_mb)
+        search_round.scores = [objective(summary) if summary else None for summary in search_round.summaries]
+        ranked = rank_configurations(remaining, search_round.scores)
+        is_last_round = round_idx == len(input_sizes_mb) - 1
+        search_round.promoted = ranked[:1] if is_last_round else ranked[:max(1, len(ranked) // reduction_factor)]
+        result.rounds.append(search_round)
+
+        if journal:
+            journal.record("SearchRound", Objective=objective_name, Round=round_idx, InputSizeMb=input_size_mb,
+                           Configurations=remaining, Scores=search_round.scores, Promoted=search_round.promoted)
+        print("Round {0} at {1} MB: {2} configurations, best {3} = {4}".format(
+            round_idx, input_size_mb, len(remaining), objective_name,
+            min((score for score in search_round.scores if score is not None), default=None)))
+        remaining = search_round.promoted
+
+    last_round = result.rounds[-1]
+    best_score = last_round.scores[last_round.configurations.index(last_round.promoted[0])]
+    if best_score is not None:
+        result.best_configuration = last_round.promoted[0]
+        result.best_score = best_score
+    return result
+
+
+# A made up cluster that gives metrics summaries for a configuration and input size, to try out the search without
+# running anything. Sorting reads the input, shuffles it over the network and writes it out (SortNoDisk skips the
+# disk), partitions that do not fill the last wave of tasks leave cores idle, and idle nodes still draw power, so
+# faster links and well sized partitions save both time and energy.
+class SimulatedCluster:
+    def __init__(self, num_nodes=simulated_num_nodes, num_cores=simulated_num_cores, noise=simulated_noise, seed=0):
+        self.num_nodes = num_nodes
+        self.num_cores = num_cores
+        self.noise = noise
+        self.rng = random.Random(seed)
+        self.num_runs = 0
+
+    # Duration and energy of a run without noise
+    def get_expected_metrics(self, configuration, input_size_mb):
+        uses_disk = configuration["ScalaClassName"] != "SortNoDisk"
+        total_cores = self.num_nodes * self.num_cores
+        waves = configuration["FinalPartitionCount"] / float(total_cores)
+        wave_efficiency = waves / math.ceil(waves)
+        shuffled_mb = input_size_mb * (self.num_nodes - 1) / float(self.num_nodes)
+        net_MBps = configuration["LinkBandwidthMbps"] / 8.0 * self.num_nodes
+        disk_secs = 2 * input_size_mb / float(simulated_disk_MBps * self.num_nodes) if uses_disk else 0
+        cpu_secs = input_size_mb / float(simulated_cpu_MBps * total_cores) / wave_efficiency
+        duration_secs = simulated_startup_secs + disk_secs + cpu_secs + shuffled_mb / net_MBps + \
+            configuration["FinalPartitionCount"] * simulated_task_overhead_secs / total_cores
+        energy_joules = self.num_nodes * simulated_idle_watts * duration_secs + \
+            input_size_mb * simulated_cpu_joules_per_MB + shuffled_mb * simulated_net_joules_per_MB + \
+            (2 * input_size_mb * simulated_disk_joules_per_MB if uses_disk else 0)
+        return duration_secs, energy_joules
+
+    def run(self, configuration, input_size_mb):
+        duration_secs, energy_joules = self.get_expected_metrics(configuration, input_size_mb)
+        duration_secs *= max(0.5, self.rng.gauss(1, self.noise))
+        energy_joules *= max(0.5, self.rng.gauss(1, self.noise))
+        self.num_runs += 1
+        return {
+            "ExperimentId": "Sim-{0}".format(self.num_runs),
+            "DurationSecs": duration_secs,
+            "EnergyJoules": energy_joules,
+        }
+
+    def evaluate_round(self, configurations, input_size_mb):
+        return [self.run(configuration, input_size_mb) for configuration in configurations]
+
+
+def main():
+    parser = argparse.ArgumentParser("Searches spark sort configurations on a simulated cluster")
+    parser.add_argument('--objective', action='store', default="energy", choices=sorted(objectives),
+                        help='what to minimize')
+    parser.add_argument('--sizemb', action='store', type=int, default=300000, help='full input size in MB')
+    parser.add_argument('--minsizemb', action='store', type=int, default=default_min_input_size_mb,
+                        help='smallest input size to probe with in MB')
+    parser.add_argument('--reduction', action='store', type=int, default=default_reduction_factor,
+                        help='keep the best 1/n configurations after each round')
+    parser.add_argument('--noise', action='store', type=float, default=simulated_noise,
+                        help='relative std of run to run variation')
+    parser.add_argument('--seed', action='store', type=int, default=0, help='random seed')
+    args = parser.parse_args()
+
+    configurations = get_all_configurations(["TeraSort", "SortNoDisk"], [160, 320, 640, 1000],
+                                            [1000, 2000, 4000, 10000, 40000])
+    cluster = SimulatedCluster(noise=args.noise, seed=args.seed)
+    result = successive_halving(configurations, cluster.evaluate_round, args.objective, args.sizemb, args.reduction,
+                                args.minsizemb)
+
+    best_expected = min(configurations, key=lambda configuration: objectives[args.objective](dict(
+        zip(["DurationSecs", "EnergyJoules"], cluster.get_expected_metrics(configuration, args.sizemb)))))
+    if result.best_configuration is None:
+        print("No configuration found, every run of the last round failed")
+    else:
+        print("Best configuration: {0}, {1} = {2:.1f}".format(json.dumps(result.best_configuration, sort_keys=True),
+                                                              args.objective, result.best_score))
+    print("Actual best: {0}".format(json.dumps(best_expected, sort_keys=True)))
+    print("Cost: {0:.2f} full size runs instead of {1}".format(result.get_cost_in_full_runs(), len(configurations)))
+
+
+if __name__ == '__main__':
+    main()
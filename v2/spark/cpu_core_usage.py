@@ -0,0 +1,216 @@
+"""
+Parses per-core CPU usage from SAR (sar -P ALL) output into dense (time x core) matrices and renders them as heatmaps
+"""
+
+import os
+import re
+import math
+from datetime import datetime
+from datetime import timedelta
+import numpy as np
+import matplotlib.pyplot as plt
+from experiment_archive import open_result_file
+
+
+# First line of every SAR file to get date
+first_line_regex = r'^Linux.+\s+([0-9]+[/-][0-9]+[/-][0-9]+)\s+'
+# Max rows of the time axis actually drawn in a heatmap, longer runs are averaged down to this many rows.
+heatmap_max_time_rows = 2000
+
+
+# Per-core CPU usage of one node. Matrices are (time x core), rows follow the timestamps list and columns the
+# core_ids array. Readings missing in the SAR file are NaN.
+class CpuCoreUsage:
+    node_name = None
+    timestamps = None       # List of datetimes, one per SAR interval
+    core_ids = None         # Int array of core ids, one per column
+    user = None             # float32 (time x core) matrix of %user
+    system = None           # float32 (time x core) matrix of %system
+    total = None            # float32 (time x core) matrix of %user + %system
+    all_user = None         # float32 array of %user from the "all" rows, one per timestamp
+    all_system = None       # float32 array of %system from the "all" rows, one per timestamp
+
+    def get_matrix(self, metric):
+        return {"user": self.user, "system": self.system, "total": self.total}[metric]
+
+    def seconds_since_start(self):
+        if not self.timestamps:
+            return np.zeros(0)
+        start = self.timestamps[0]
+        return np.array([(t - start).total_seconds() for t in self.timestamps])
+
+
+# Parses date from the first line in SAR output file. SAR outputs different formats at different times for some
+# reason. Returns date string in a uniform format, no matter which format SAR outputs in.
+def parse_date_from_sar_file(first_line_in_file):
+    matches = re.match(first_line_regex, first_line_in_file)
+    date_string_match = matches.group(1)
+    # e.g., 11/08/2018 or 2018-11-08
+    try:
+        date_string = datetime.strptime(date_string_match, '%m/%d/%Y').strftime('%m/%d/%Y')
+    except ValueError:
+        # Try parsing other format
+        date_string = datetime.strptime(date_string_match, '%Y-%m-%d').strftime('%m/%d/%Y')
+    return date_string
+
+
+# Reads a "sar -P ALL" output file once and fills per-core user/system/total matrices along with the "all" rows.
+# Lines are tokenized with split() rather than a regex, and the time string is only parsed once per SAR interval
+# (all the core rows of an interval share it), which keeps this fast for 40+ cores over hours of readings.
+def parse_cpu_core_usage(cpu_file_path, node_name=None):
+    timestamps = []
+    row_indices = []
+    core_ids = []
+    user_values = []
+    system_values = []
+    all_user = []
+    all_system = []
+
+    with open_result_file(cpu_file_path) as lines:
+        first_line = True
+        date_part = None
+        previous_time_string = None
+        previous_reading_time_part = None
+        for line in lines:
+            if first_line:
+                date_string = parse_date_from_sar_file(first_line_in_file=line)
+                date_part = datetime.strptime(date_string, '%m/%d/%Y')
+                first_line = False
+                continue
+
+            # Example: <06:38:09 PM       0      3.78      0.00      2.52      0.50      0.00     93.20>
+            tokens = line.split()
+            if len(tokens) != 9 or (tokens[1] != "AM" and tokens[1] != "PM"):
+                continue
+            cpu_label = tokens[2]
+            try:
+                cpu_user_usage = float(tokens[3])
+                cpu_system_usage = float(tokens[5])
+            except ValueError:
+                # Header lines repeated by SAR
+                continue
+
+            time_string = tokens[0] + " " + tokens[1]
+            if time_string != previous_time_string:
+                # Add a day when experiment runs past midnight, when the hour of the first reading is smaller than the one before.
+                time_part = datetime.strptime(time_string, '%I:%M:%S %p')
+                if previous_reading_time_part is not None and previous_reading_time_part.hour > time_part.hour:
+                    date_part = date_part + timedelta(days=1)
+                previous_reading_time_part = time_part
+                previous_time_string = time_string
+                timestamps.append(date_part.replace(hour=time_part.hour, minute=time_part.minute, second=time_part.second))
+                all_user.append(np.nan)
+                all_system.append(np.nan)
+
+            if cpu_label == "all":
+                all_user[-1] = cpu_user_usage
+                all_system[-1] = cpu_system_usage
+            else:
+                row_indices.append(len(timestamps) - 1)
+                core_ids.append(int(cpu_label))
+                user_values.append(cpu_user_usage)
+                system_values.append(cpu_system_usage)
+
+    # Scatter the collected readings into dense matrices
+    row_indices = np.array(row_indices, dtype=np.int64)
+    core_ids = np.array(core_ids, dtype=np.int64)
+    unique_core_ids, column_indices = np.unique(core_ids, return_inverse=True)
+    shape = (len(timestamps), len(unique_core_ids))
+
+    usage = CpuCoreUsage()
+    usage.node_name = node_name
+    usage.timestamps = timestamps
+    usage.core_ids = unique_core_ids
+    usage.user = np.full(shape, np.nan, dtype=np.float32)
+    usage.system = np.full(shape, np.nan, dtype=np.float32)
+    usage.user[row_indices, column_indices] = user_values
+    usage.system[row_indices, column_indices] = system_values
+    usage.total = usage.user + usage.system
+    usage.all_user = np.array(all_user, dtype=np.float32)
+    usage.all_system = np.array(all_system, dtype=np.float32)
+    return usage
+
+
+# Default core to NUMA socket mapping on the b09 machines, where cores are interleaved across sockets
+# (even cores on socket 0, odd cores on socket 1).
+def interleaved_numa_sockets(core_ids, num_sockets=2):
+    return np.asarray(core_ids) % num_sockets
+
+
+# Groups the cores of a usage matrix by NUMA socket and returns (socket ids, (time x socket) matrix of the mean usage
+# across each socket's cores). socket_of_core can be a dict of core id to socket id or an array aligned with core_ids,
+# and defaults to the interleaved layout.
+def group_by_numa_socket(cpu_core_usage, metric="total", socket_of_core=None):
+    if socket_of_core is None:
+        sockets = interleaved_numa_sockets(cpu_core_usage.core_ids)
+    elif isinstance(socket_of_core, dict):
+        sockets = np.array([socket_of_core[core_id] for core_id in cpu_core_usage.core_ids])
+    else:
+        sockets = np.asarray(socket_of_core)
+
+    matrix = cpu_core_usage.get_matrix(metric)
+    socket_ids = np.unique(sockets)
+    grouped = np.empty((matrix.shape[0], len(socket_ids)), dtype=np.float32)
+    for idx, socket_id in enumerate(socket_ids):
+        socket_columns = matrix[:, sockets == socket_id]
+        counts = np.sum(~np.isnan(socket_columns), axis=1)
+        sums = np.nansum(socket_columns, axis=1)
+        grouped[:, idx] = np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+    return socket_ids, grouped
+
+
+# Averages consecutive rows of a (time x core) matrix so that it has at most max_rows rows, ignoring NaNs.
+# Returns the reduced matrix and the number of original rows folded into each row.
+def downsample_time_axis(matrix, max_rows):
+    rows = matrix.shape[0]
+    if rows <= max_rows:
+        return matrix, 1
+
+    factor = int(math.ceil(rows * 1.0 / max_rows))
+    padded_rows = factor * int(math.ceil(rows * 1.0 / factor))
+    padded = np.full((padded_rows, matrix.shape[1]), np.nan, dtype=np.float32)
+    padded[:rows] = matrix
+    blocks = padded.reshape(-1, factor, matrix.shape[1])
+    counts = np.sum(~np.isnan(blocks), axis=1)
+    sums = np.nansum(blocks, axis=1)
+    return np.where(counts > 0, sums / np.maximum(counts, 1), np.nan).astype(np.float32), factor
+
+
+# Renders a (time x core) usage matrix as a heatmap on the provided axes. Uses a single imshow call over a
+# time-downsampled matrix, so the cost does not grow with the number of lines/cores like per-core line plots do.
+def render_cpu_core_heatmap(ax, cpu_core_usage, metric="total", x_label="Time (Sec)", max_time_rows=heatmap_max_time_rows):
+    matrix, _ = downsample_time_axis(cpu_core_usage.get_matrix(metric), max_time_rows)
+    seconds = cpu_core_usage.seconds_since_start()
+    duration = seconds[-1] if len(seconds) else 0
+
+    image = ax.imshow(matrix.T, aspect='auto', interpolation='nearest', origin='lower', vmin=0, vmax=100,
+                      cmap='viridis', extent=(0, duration, -0.5, len(cpu_core_usage.core_ids) - 0.5))
+    ax.set_xlabel(x_label)
+    ax.set_ylabel("Core")
+    return image
+
+
+# Generates a heatmap of per-core usage and the usage per NUMA socket for one node
+def plot_cpu_cores_for_one_node(plots_dir_full_path, cpu_core_usage, experiment_id, experiment_setup, socket_of_core=None):
+    node_name = cpu_core_usage.node_name
+    fig, (ax1, ax2) = plt.subplots(2, 1, gridspec_kw={'height_ratios': [3, 1]})
+    fig.set_size_inches(w=12, h=10)
+    fig.suptitle("Experiment ID: {0}\nPer-core CPU usage % (user + system) on {1}".format(experiment_id, node_name))
+
+    image = render_cpu_core_heatmap(ax1, cpu_core_usage, metric="total", x_label='')
+    fig.colorbar(image, ax=ax1, label="CPU %")
+
+    seconds = cpu_core_usage.seconds_since_start()
+    socket_ids, socket_usage = group_by_numa_socket(cpu_core_usage, metric="total", socket_of_core=socket_of_core)
+    for idx, socket_id in enumerate(socket_ids):
+        ax2.plot(seconds, socket_usage[:, idx], label="Socket {0}".format(socket_id))
+    ax2.set_xlim(ax1.get_xlim())
+    ax2.set_xlabel("Time (Sec)")
+    ax2.set_ylabel("CPU %")
+    ax2.legend()
+
+    # Save the file, should be done before show()
+    output_plot_file_name = "plot_cpu_cores_{0}_{1}.png".format(experiment_setup.input_size_gb, node_name)
+    output_full_path = os.path.join(plots_dir_full_path, output_plot_file_name)
+    plt.savefig(output_full_path)
+    plt.close()
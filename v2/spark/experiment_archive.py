@@ -0,0 +1,305 @@
+"""
+Packs an experiment results folder (Exp-*) into a single compressed archive next to it, and reads result files out of
+archives for the analysis scripts, so archived experiments load the same way as the ones in folders.
+
+An archive is a zip file (Exp-<id>.exparch) with one LZMA compressed member per result file, e.g., b09-30/cpu.sar,
+so a single node's file is read without decompressing the rest, and a schema.json member that lists each file with
+its node, encoding, size, mtime and sha256. Text files are stored column-wise: each line is split into alternating
+runs of non-space and space characters, and the n-th run of every line goes to the n-th column, so the aligned,
+similar values of SAR tables and logs sit next to each other and compress well. Files come back byte for byte.
+Plot folders (plots_*) are left out by default, they can be made again from the data.
+"""
+
+import argparse
+import datetime
+import hashlib
+import io
+import json
+import os
+import re
+import shutil
+import zipfile
+
+
+# Archive layout
+archive_file_extension = ".exparch"
+schema_member_name = "schema.json"
+archive_format_version = 1
+raw_encoding = "raw"
+columnar_text_encoding = "columnar-text-v1"
+encoding_descriptions = {
+    raw_encoding: "file bytes as they are",
+    columnar_text_encoding: "utf-8 text as NUL separated columns: the number of runs on each line, then the n-th "
+                            "run of non-space or space characters of every line that has one, newline separated",
+}
+excluded_folder_prefixes = ["plots_"]
+token_regex = r'\s+|\S+'
+
+# Archives opened for reading, by path, along with their mtime at opening
+_open_archives = {}
+
+
+# Stores text column-wise (see the module description). Returns None for data that is not text.
+def encode_columnar_text(data):
+    try:
+        text = data.decode("utf-8")
+    except UnicodeDecodeError:
+        return None
+    if "\x00" in text:
+        return None
+
+    token_pattern = re.compile(token_regex)
+    widths = []
+    columns = []
+    for line in text.split("\n"):
+        tokens = token_pattern.findall(line)
+        widths.append(str(len(tokens)))
+        for idx, token in enumerate(tokens):
+            if idx == len(columns):
+                columns.append([])
+            columns[idx].append(token)
+    return "\x00".join(["\n".join(widths)] + ["\n".join(column) for column in columns]).encode("utf-8")
+
+
+def decode_columnar_text(data):
+    parts = data.decode("utf-8").split("\x00")
+    columns = [iter(part.split("\n")) for part in parts[1:]]
+    lines = []
+    for width in parts[0].split("\n"):
+        lines.append("".join([next(columns[idx]) for idx in range(int(width))]))
+    return "\n".join(lines).encode("utf-8")
+
+
+def get_archive_path(experiment_dir_path):
+    return os.path.normpath(experiment_dir_path) + archive_file_extension
+
+
+# Reads result files out of an archive
+class ExperimentArchive:
+    def __init__(self, archive_path):
+        self.archive_path = archive_path
+        self.zip_file = zipfile.ZipFile(archive_path, "r")
+        self.schema = json.loads(self.zip_file.read(schema_member_name).decode("utf-8"))
+        if self.schema["FormatVersion"] > archive_format_version:
+            raise Exception("Archive {0} has format version {1}, only up to {2} is supported".format(
+                archive_path, self.schema["FormatVersion"], archive_format_version))
+        self.files = {entry["Path"]: entry for entry in self.schema["Files"]}
+
+    def close(self):
+        self.zip_file.close()
+
+    def get_experiment_id(self):
+        return self.schema["ExperimentId"]
+
+    def get_node_names(self):
+        return sorted(set(entry["Node"] for entry in self.schema["Files"] if entry["Node"]))
+
+    # Paths of the files of a node, or of the files outside the node folders if node_name is None
+    def get_file_paths(self, node_name=None):
+        return [entry["Path"] for entry in self.schema["Files"] if entry["Node"] == node_name]
+
+    def has_file(self, file_path):
+        return file_path in self.files
+
+    def get_file_info(self, file_path):
+        return self.files[file_path]
+
+    # Reads one file, decompressing just that member
+    def read_bytes(self, file_path):
+        entry = self.files[file_path]
+        data = self.zip_file.read(file_path)
+        return decode_columnar_text(data) if entry["Encoding"] == columnar_text_encoding else data
+
+    def open(self, file_path, mode="r"):
+        data = io.BytesIO(self.read_bytes(file_path))
+        return data if "b" in mode else io.TextIOWrapper(data, encoding="utf-8")
+
+    # Writes the files back out into an experiment folder
+    def extract(self, experiment_dir_path):
+        for file_path, entry in self.files.items():
+            output_path = os.path.join(experiment_dir_path, *file_path.split("/"))
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+            with open(output_path, "wb") as f:
+                f.write(self.read_bytes(file_path))
+            os.utime(output_path, (entry["MTime"], entry["MTime"]))
+
+
+# Files of an experiment folder as (archive path with / separators, full path), leaving out plot folders unless
+# include_plots is set
+def get_experiment_files(experiment_dir_path, include_plots=False):
+    files = []
+    for dir_path, dir_names, file_names in os.walk(experiment_dir_path):
+        if not include_plots:
+            dir_names[:] = [name for name in dir_names
+                            if not any(name.startswith(prefix) for prefix in excluded_folder_prefixes)]
+        dir_names.sort()
+        for file_name in sorted(file_names):
+            full_path = os.path.join(dir_path, file_name)
+            files.append((os.path.relpath(full_path, experiment_dir_path).replace(os.sep, "/"), full_path))
+    return files
+
+
+# Packs an experiment folder into an archive next to it and checks that every file reads back the same. Returns the
+# archive path.
+def write_experiment_archive(experiment_dir_path, include_plots=False):
+    experiment_dir_path = os.path.normpath(experiment_dir_path)
+    archive_path = get_archive_path(experiment_dir_path)
+    temp_archive_path = archive_path + ".tmp"
+    entries = []
+    with zipfile.ZipFile(temp_archive_path, "w", zipfile.ZIP_LZMA) as zip_file:
+        for file_path, full_path in get_experiment_files(experiment_dir_path, include_plots):
+            with open(full_path, "rb") as f:
+                data = f.read()
+            encoded = encode_columnar_text(data)
+            zip_file.writestr(file_path, data if encoded is None else encoded)
+            entries.append({
+                "Path": file_path,
+                "Node": file_path.split("/")[0] if "/" in file_path else None,
+                "Encoding": raw_encoding if encoded is None else columnar_text_encoding,
+                "Size": len(data),
+                "MTime": os.stat(full_path).st_mtime,
+                "Sha256": hashlib.sha256(data).hexdigest(),
+            })
+        zip_file.writestr(schema_member_name, json.dumps({
+            "FormatVersion": archive_format_version,
+            "ExperimentId": os.path.basename(experiment_dir_path),
+            "Created": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "Encodings": encoding_descriptions,
+            "ExcludedFolderPrefixes": [] if include_plots else excluded_folder_prefixes,
+            "Files": entries,
+        }, indent=4, sort_keys=True))
+
+    mismatches = verify_experiment_archive(temp_archive_path)
+    if mismatches:
+        os.remove(temp_archive_path)
+        raise Exception("Archive of {0} does not read back the same for {1}".format(experiment_dir_path, mismatches))
+    os.replace(temp_archive_path, archive_path)
+    _open_archives.pop(archive_path, None)
+    return archive_path
+
+
+# Returns the paths of files in the archive that do not read back to what was archived
+def verify_experiment_archive(archive_path):
+    archive = ExperimentArchive(archive_path)
+    try:
+        return [file_path for file_path, entry in archive.files.items()
+                if hashlib.sha256(archive.read_bytes(file_path)).hexdigest() != entry["Sha256"]]
+    finally:
+        archive.close()
+
+
+def get_experiment_archive(archive_path):
+    mtime = os.stat(archive_path).st_mtime
+    archive, archive_mtime = _open_archives.get(archive_path, (None, None))
+    if archive is None or archive_mtime != mtime:
+        if archive is not None:
+            archive.close()
+        archive = ExperimentArchive(archive_path)
+        _open_archives[archive_path] = (archive, mtime)
+    return archive
+
+
+# Finds the archive holding a result file path like <results>/<experiment id>/<node>/cpu.sar, i.e.,
+# <results>/<experiment id>.exparch for that one. Returns (archive, path in the archive), or (None, None).
+def find_archived_file(file_path):
+    dir_path = os.path.normpath(file_path)
+    parts = []
+    while True:
+        dir_path, name = os.path.split(dir_path)
+        if not name:
+            return None, None
+        archive_path = os.path.join(dir_path, name) + archive_file_extension
+        if parts and os.path.isfile(archive_path):
+            archive = get_experiment_archive(archive_path)
+            archived_file_path = "/".join(parts)
+            return (archive, archived_file_path) if archive.has_file(archived_file_path) else (None, None)
+        parts.insert(0, name)
+
+
+# Drop-in replacements of os.path.exists, open and os.stat for reading result files, from the experiment folder if it
+# is there or else from the experiment archive
+def result_file_exists(file_path):
+    return os.path.exists(file_path) or find_archived_file(file_path)[0] is not None
+
+
+def open_result_file(file_path, mode="r"):
+    if os.path.exists(file_path):
+        return open(file_path, mode)
+    archive, archived_file_path = find_archived_file(file_path)
+    if archive is None:
+        raise FileNotFoundError(file_path)
+    return archive.open(archived_file_path, mode)
+
+
+def is_archived_result_file(file_path):
+    return not os.path.exists(file_path) and find_archived_file(file_path)[0] is not None
+
+
+# Returns (size, mtime) of a result file
+def get_result_file_stat(file_path):
+    if os.path.exists(file_path):
+        stat = os.stat(file_path)
+        return stat.st_size, stat.st_mtime
+    archive, archived_file_path = find_archived_file(file_path)
+    if archive is None:
+        raise FileNotFoundError(file_path)
+    entry = archive.get_file_info(archived_file_path)
+    return entry["Size"], entry["MTime"]
+
+
+# Ids of the experiments in a results folder, whether in folders or archives
+def list_experiment_ids(results_dir, prefix="Exp-"):
+    experiment_ids = set()
+    for item in os.listdir(results_dir):
+        if not item.startswith(prefix):
+            continue
+        if os.path.isdir(os.path.join(results_dir, item)):
+            experiment_ids.add(item)
+        elif item.endswith(archive_file_extension):
+            experiment_ids.add(item[:-len(archive_file_extension)])
+    return sorted(experiment_ids)
+
+
+# Path of the experiment folder or archive, for its creation time
+def get_experiment_path(results_dir, experiment_id):
+    experiment_dir_path = os.path.join(results_dir, experiment_id)
+    return experiment_dir_path if os.path.isdir(experiment_dir_path) else get_archive_path(experiment_dir_path)
+
+
+def main():
+    parser = argparse.ArgumentParser("Packs experiment results folders into compressed archives and back")
+    parser.add_argument('results_dir', action='store', help='results folder holding the Exp-* folders')
+    parser.add_argument('experiment_ids', action='store', nargs='*', help='experiments to archive or extract')
+    parser.add_argument('--all', action='store_true', help='archive all experiment folders that are not archived yet')
+    parser.add_argument('--remove', action='store_true', help='remove experiment folders once archived')
+    parser.add_argument('--includeplots', action='store_true', help='archive plots_* folders too')
+    parser.add_argument('--extract', action='store_true', help='extract the given experiments back into folders')
+    args = parser.parse_args()
+
+    if args.extract:
+        for experiment_id in args.experiment_ids:
+            experiment_dir_path = os.path.join(args.results_dir, experiment_id)
+            archive = ExperimentArchive(get_archive_path(experiment_dir_path))
+            archive.extract(experiment_dir_path)
+            archive.close()
+            print("Extracted " + experiment_dir_path)
+        return
+
+    experiment_ids = args.experiment_ids
+    if args.all:
+        experiment_ids = [item for item in sorted(os.listdir(args.results_dir)) if item.startswith("Exp-")
+                          and os.path.isdir(os.path.join(args.results_dir, item))
+                          and not os.path.exists(get_archive_path(os.path.join(args.results_dir, item)))]
+    for experiment_id in experiment_ids:
+        experiment_dir_path = os.path.join(args.results_dir, experiment_id)
+        archive_path = write_experiment_archive(experiment_dir_path, args.includeplots)
+        folder_size_mb = sum(os.path.getsize(full_path) for _, full_path in get_experiment_files(experiment_dir_path,
+                                                                                                 True)) / 1e6
+        print("Archived {0}: {1:.1f} MB -> {2:.1f} MB".format(experiment_id, folder_size_mb,
+                                                              os.path.getsize(archive_path) / 1e6))
+        if args.remove:
+            shutil.rmtree(experiment_dir_path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,30 @@
+"""
+Experimental setup of an experiment, as recorded in its setup details file
+"""
+
+import json
+from datetime import datetime
+from experiment_archive import open_result_file
+
+
+# Experiment setup class
+class ExperimentSetup:
+    def __init__(self, setup_file_path):
+        # Parse experimental setup from setup file
+        json_dict = json.load(open_result_file(setup_file_path))
+        self.all_spark_nodes = json_dict["AllSparkNodes"]
+        self.designated_driver_node = json_dict["SparkDriverNode"]
+        self.power_meter_nodes_in_order = json_dict["PowerMeterNodesInOrder"]
+        self.input_size_gb = json_dict["InputSizeGb"]
+        self.link_bandwidth_mbps = float(json_dict["LinkBandwidthMbps"])
+        self.experiment_start_time = datetime.strptime(json_dict["ExperimentStartTime"], "%Y-%m-%d %H:%M:%S")
+        self.spark_job_start_time = datetime.strptime(json_dict["SparkJobStartTime"], "%Y-%m-%d %H:%M:%S")
+        self.spark_job_end_time = datetime.strptime(json_dict["SparkJobEndTime"], "%Y-%m-%d %H:%M:%S")
+        
+        self.experiment_group = str(json_dict["ExperimentGroup"])
+        self.experiment_group_desc = json_dict.get("ExperimentGroupDesc", "No description")
+        self.scala_class_name = json_dict.get("ScalaClassName", None)
+        self.input_cached_in_hdfs = json_dict.get("InputHdfsCached", None)
+        self.plot_friendly_name = json_dict.get("PlotFriendlyName", None)
+        self.record_size_bytes = json_dict.get("RecordSizeByes", None)
+        self.final_partition_count = json_dict.get("FinalPartitionCount", None)
@@ -0,0 +1,249 @@
+"""
+Tails SAR and power readings of a running experiment and prints a compact summary of the cluster every few seconds
+"""
+
+import argparse
+import os
+import re
+import time
+import threading
+from collections import deque
+import plot_one_experiment
+
+
+# Monitor constants
+summary_interval_secs = 5
+rolling_window_samples = 10
+poll_interval_secs = 1
+stale_after_secs = 10
+monitored_net_interface = "enp59s0"
+
+
+# Reads bytes appended to local files, used when monitoring a local folder (e.g., results being written or replayed)
+class LocalFileReader:
+    def get_size(self, file_path):
+        try:
+            return os.path.getsize(file_path)
+        except OSError:
+            return None
+
+    def read_from(self, file_path, offset):
+        with open(file_path, "rb") as f:
+            f.seek(offset)
+            return f.read()
+
+    def close(self):
+        pass
+
+
+# Reads bytes appended to remote files over an SFTP session opened on an existing SSH connection
+class SftpFileReader:
+    def __init__(self, ssh_client):
+        self.sftp_client = ssh_client.open_sftp()
+
+    def get_size(self, file_path):
+        try:
+            return self.sftp_client.stat(file_path).st_size
+        except IOError:
+            return None
+
+    def read_from(self, file_path, offset):
+        with self.sftp_client.open(file_path, "rb") as f:
+            f.seek(offset)
+            return f.read()
+
+    def close(self):
+        self.sftp_client.close()
+
+
+# Follows a growing file by byte offset and returns only the complete lines added since the last poll
+class FileTail:
+    def __init__(self, file_reader, file_path):
+        self.file_reader = file_reader
+        self.file_path = file_path
+        self.offset = 0
+        self.partial_line = b""
+
+    def poll(self):
+        size = self.file_reader.get_size(self.file_path)
+        if size is None:
+            return []
+
+        # File got truncated or replaced, start over
+        if size < self.offset:
+            self.offset = 0
+            self.partial_line = b""
+        if size == self.offset:
+            return []
+
+        data = self.file_reader.read_from(self.file_path, self.offset)
+        self.offset += len(data)
+        data = self.partial_line + data
+        lines = data.split(b"\n")
+        self.partial_line = lines.pop()
+        return [line.decode("utf-8", errors="replace").rstrip("\r") for line in lines]
+
+
+# Keeps the last few values of one metric
+class RollingAggregate:
+    def __init__(self, window_samples):
+        self.values = deque(maxlen=window_samples)
+        self.last_update_time = None
+
+    def add(self, value):
+        self.values.append(value)
+        self.last_update_time = time.time()
+
+    def last(self):
+        return self.values[-1] if self.values else None
+
+    def mean(self):
+        return sum(self.values) / len(self.values) if self.values else None
+
+    def max(self):
+        return max(self.values) if self.values else None
+
+
+# Parses new SAR/power lines of each node as they show up and maintains rolling per-node aggregates
+class LiveMonitor:
+    def __init__(self, file_reader, experiment_folder_path, node_names, driver_node_name, power_meter_nodes_in_order=(),
+                 link_bandwidth_mbps=0, window_samples=rolling_window_samples, interval_secs=summary_interval_secs,
+                 path_join=os.path.join):
+        self.file_reader = file_reader
+        self.node_names = list(node_names)
+        self.power_meter_nodes_in_order = list(power_meter_nodes_in_order)
+        self.link_bandwidth_mbps = link_bandwidth_mbps
+        self.interval_secs = interval_secs
+        self.last_summary_time = None
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.cpu_regex = re.compile(plot_one_experiment.cpu_all_cores_regex)
+        self.network_regex = re.compile(plot_one_experiment.network_regex)
+        self.power_regex = re.compile(plot_one_experiment.power_regex)
+
+        metric_names = ["cpu_total_usage", "net_in_Mbps", "net_out_Mbps", "power_watts"]
+        self.aggregates = {node_name: {metric: RollingAggregate(window_samples) for metric in metric_names}
+                           for node_name in self.node_names}
+        self.cpu_tails = {node_name: FileTail(file_reader, path_join(experiment_folder_path, node_name,
+                                                                     plot_one_experiment.cpu_readings_file_name))
+                          for node_name in self.node_names}
+        self.net_tails = {node_name: FileTail(file_reader, path_join(experiment_folder_path, node_name,
+                                                                     plot_one_experiment.net_readings_file_name))
+                          for node_name in self.node_names}
+        self.power_tail = FileTail(file_reader, path_join(experiment_folder_path, driver_node_name,
+                                                          plot_one_experiment.power_readings_file_name))
+
+    # Reads and parses whatever got appended to the readings files since the last poll
+    def poll(self):
+        for node_name in self.node_names:
+            for line in self.cpu_tails[node_name].poll():
+                matches = self.cpu_regex.match(line)
+                if matches:
+                    cpu_total_usage = float(matches.group(3)) + float(matches.group(5))
+                    self.aggregates[node_name]["cpu_total_usage"].add(cpu_total_usage)
+
+            for line in self.net_tails[node_name].poll():
+                matches = self.network_regex.match(line)
+                if matches and matches.group(2) == monitored_net_interface:
+                    self.aggregates[node_name]["net_in_Mbps"].add(float(matches.group(5)) * 8 / 1000)
+                    self.aggregates[node_name]["net_out_Mbps"].add(float(matches.group(6)) * 8 / 1000)
+
+        for line in self.power_tail.poll():
+            matches = self.power_regex.match(line)
+            if matches:
+                for i, node_name in enumerate(self.power_meter_nodes_in_order):
+                    if node_name in self.aggregates:
+                        self.aggregates[node_name]["power_watts"].add(float(matches.group(i + 2)))
+
+    # Returns a compact table with one line per node. Nodes with no new CPU readings for a while are flagged as
+    # STALE and nodes sending faster than the configured rate limit (a tc misconfiguration) as OVER-LIMIT.
+    def format_summary(self):
+        def fmt(value, precision=1):
+            return "-" if value is None else "{:.{}f}".format(value, precision)
+
+        now = time.time()
+        lines = ["{:10s} {:>8s} {:>8s} {:>10s} {:>10s} {:>8s}  {:s}".format(
+            "Node", "CPU %", "CPU max", "Net In", "Net Out", "Power W", "Flags")]
+        for node_name in self.node_names:
+            aggregates = self.aggregates[node_name]
+            flags = []
+            cpu_update_time = aggregates["cpu_total_usage"].last_update_time
+            if cpu_update_time is None or now - cpu_update_time > stale_after_secs:
+                flags.append("STALE")
+            net_out_mbps = aggregates["net_out_Mbps"].mean()
+            if self.link_bandwidth_mbps and net_out_mbps is not None and net_out_mbps > self.link_bandwidth_mbps * 1.05:
+                flags.append("OVER-LIMIT")
+            lines.append("{:10s} {:>8s} {:>8s} {:>10s} {:>10s} {:>8s}  {:s}".format(
+                node_name,
+                fmt(aggregates["cpu_total_usage"].mean()),
+                fmt(aggregates["cpu_total_usage"].max()),
+                fmt(aggregates["net_in_Mbps"].mean()),
+                fmt(net_out_mbps),
+                fmt(aggregates["power_watts"].mean()),
+                ",".join(flags)))
+        return "\n".join(lines)
+
+    # Polls for new readings and prints the summary if it is due. Can be called periodically by the orchestrator.
+    def tick(self):
+        self.poll()
+        now = time.time()
+        if self.last_summary_time is None or now - self.last_summary_time >= self.interval_secs:
+            print(time.strftime("%H:%M:%S") + " cluster summary\n" + self.format_summary())
+            self.last_summary_time = now
+
+    # Runs tick() in a background thread until stop() is called
+    def start(self):
+        def run():
+            while not self.stop_event.is_set():
+                try:
+                    self.tick()
+                except Exception as ex:
+                    print("Live monitor poll failed: {0}".format(ex))
+                self.stop_event.wait(poll_interval_secs)
+
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=run, name="live-monitor", daemon=True)
+        self.thread.start()
+
+    # Stops the background thread and closes the file reader (e.g., its SFTP session)
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        self.file_reader.close()
+
+
+# Starts monitoring a running experiment over an existing SSH connection. Experiment results are written to the NFS
+# home folder, so the files of all nodes can be read over a single SFTP session opened on the driver's connection.
+def start_live_monitor(ssh_client, remote_experiment_folder_path, node_names, driver_node_name,
+                       power_meter_nodes_in_order=(), link_bandwidth_mbps=0):
+    file_reader = SftpFileReader(ssh_client)
+    monitor = LiveMonitor(file_reader, remote_experiment_folder_path, node_names, driver_node_name,
+                          power_meter_nodes_in_order, link_bandwidth_mbps,
+                          path_join=lambda *parts: "/".join(parts))
+    monitor.start()
+    return monitor
+
+
+def main():
+    parser = argparse.ArgumentParser("Tails readings of an experiment folder and prints a live cluster summary")
+    parser.add_argument('--local', action='store', required=True, help='local experiment folder to monitor')
+    parser.add_argument('--nodes', action='store', nargs='+', required=True, help='node folders to monitor')
+    parser.add_argument('--driver', action='store', help='node whose folder holds the power readings')
+    parser.add_argument('--powernodes', action='store', nargs='*', default=[], help='power meter nodes in order')
+    parser.add_argument('--linkmbps', action='store', type=float, default=0, help='configured link rate limit')
+    args = parser.parse_args()
+
+    monitor = LiveMonitor(LocalFileReader(), args.local, args.nodes, args.driver or args.nodes[0],
+                          args.powernodes, args.linkmbps)
+    try:
+        while True:
+            monitor.tick()
+            time.sleep(poll_interval_secs)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+"""
+Aggregates the metrics of many experiments into a dense cube of experiment group x input size x link rate x metric,
+with the mean, std and count of the runs in each cell, for the multi-experiment plots to slice
+"""
+
+import numpy as np
+
+
+# Metrics of an experiment (or of one of its nodes), each as (name, function of ExperimentMetrics and node name that
+# returns the value or None). Values are in the units the plots show.
+def get_energy_wh(exp, node_name):
+    if node_name is not None:
+        total_power_consumed = exp.per_node_metrics_dict[node_name].total_power_consumed
+        return total_power_consumed / 3600 if total_power_consumed is not None else None
+    return sum([n.total_power_consumed / 3600 for n in exp.per_node_metrics_dict.values()
+                if n.total_power_consumed is not None])
+
+
+def get_node_total(exp, node_name, attribute_name):
+    node_metrics_list = [exp.per_node_metrics_dict[node_name]] if node_name is not None \
+        else exp.per_node_metrics_dict.values()
+    values = [getattr(n, attribute_name) for n in node_metrics_list]
+    return sum(values) if None not in values else None
+
+
+def get_disk_reads_mb(exp, node_name):
+    total = get_node_total(exp, node_name, "total_disk_breads")
+    return total * 512 / (1024 * 1024) if total is not None else None
+
+
+def get_disk_writes_mb(exp, node_name):
+    total = get_node_total(exp, node_name, "total_disk_bwrites")
+    return total * 512 / (1024 * 1024) if total is not None else None
+
+
+def get_net_in_gb(exp, node_name):
+    total = get_node_total(exp, node_name, "total_net_in_kBps")
+    return total / (1024 * 1024) if total is not None else None
+
+
+def get_net_out_gb(exp, node_name):
+    total = get_node_total(exp, node_name, "total_net_out_kBps")
+    return total / (1024 * 1024) if total is not None else None
+
+
+def get_duration_secs(exp, node_name):
+    return exp.duration.total_seconds()
+
+
+metrics = [
+    ("energy_wh", get_energy_wh),
+    ("disk_reads_mb", get_disk_reads_mb),
+    ("disk_writes_mb", get_disk_writes_mb),
+    ("net_in_gb", get_net_in_gb),
+    ("net_out_gb", get_net_out_gb),
+    ("duration_secs", get_duration_secs),
+]
+metric_names = [name for name, _ in metrics]
+
+# Cubes built so far, by the experiments and node they were built for
+_cubes = {}
+
+
+class MetricsCube:
+    experiment_groups = None    # Sorted values along each axis
+    input_sizes_gb = None
+    link_rates_mbps = None
+    mean = None                 # float64 groups x input sizes x link rates x metrics, nan where there were no runs
+    std = None                  # Population std over the runs, like np.std
+    count = None                # int64 runs with a value in each cell
+
+    # One line of a plot: the link rates that had runs, with the mean and std of the metric at each, for an
+    # experiment group and input size
+    def get_series(self, metric_name, experiment_group, input_size_gb):
+        if experiment_group not in self.experiment_groups or input_size_gb not in self.input_sizes_gb:
+            return [], [], []
+        cell = (self.experiment_groups.index(experiment_group), self.input_sizes_gb.index(input_size_gb), slice(None),
+                metric_names.index(metric_name))
+        present = self.count[cell] > 0
+        return [rate for rate, has_runs in zip(self.link_rates_mbps, present.tolist()) if has_runs], \
+            self.mean[cell][present].tolist(), self.std[cell][present].tolist()
+
+    # Groups, or input sizes, that have runs of the given input size, or experiment group
+    def get_experiment_groups(self, input_size_gb):
+        if input_size_gb not in self.input_sizes_gb:
+            return []
+        has_runs = self.count[:, self.input_sizes_gb.index(input_size_gb)].sum(axis=(1, 2)) > 0
+        return [group for group, present in zip(self.experiment_groups, has_runs.tolist()) if present]
+
+    def get_input_sizes_gb(self, experiment_group):
+        if experiment_group not in self.experiment_groups:
+            return []
+        has_runs = self.count[self.experiment_groups.index(experiment_group)].sum(axis=(1, 2)) > 0
+        return [size for size, present in zip(self.input_sizes_gb, has_runs.tolist()) if present]
+
+
+def build_metrics_cube(exp_metrics_list, node_name=None):
+    cube = MetricsCube()
+    cube.experiment_groups = sorted(set(exp.experiment_setup.experiment_group for exp in exp_metrics_list))
+    cube.input_sizes_gb = sorted(set(exp.input_size_gb for exp in exp_metrics_list))
+    cube.link_rates_mbps = sorted(set(exp.link_bandwidth_mbps for exp in exp_metrics_list))
+
+    # One row of metric values per experiment, nan for missing values, and its cell along the first three axes
+    values = np.array([[np.nan if value is None else value
+                        for value in [get_metric(exp, node_name) for _, get_metric in metrics]]
+                       for exp in exp_metrics_list], dtype=np.float64).reshape(-1, len(metrics))
+    cells = (np.array([cube.experiment_groups.index(exp.experiment_setup.experiment_group) for exp in exp_metrics_list],
+                      dtype=np.int64),
+             np.array([cube.input_sizes_gb.index(exp.input_size_gb) for exp in exp_metrics_list], dtype=np.int64),
+             np.array([cube.link_rates_mbps.index(exp.link_bandwidth_mbps) for exp in exp_metrics_list],
+                      dtype=np.int64))
+
+    shape = (len(cube.experiment_groups), len(cube.input_sizes_gb), len(cube.link_rates_mbps), len(metrics))
+    present = ~np.isnan(values)
+    sums = np.zeros(shape)
+    cube.count = np.zeros(shape, dtype=np.int64)
+    np.add.at(sums, cells, np.where(present, values, 0))
+    np.add.at(cube.count, cells, present)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cube.mean = sums / cube.count
+        # Second pass over the deviations from the cell means, more accurate than the sum of squares
+        squared_deviations = np.zeros(shape)
+        np.add.at(squared_deviations, cells, np.where(present, values - cube.mean[cells], 0) ** 2)
+        cube.std = np.sqrt(squared_deviations / cube.count)
+    return cube
+
+
+# Gets the cube of the experiments (or of one node of them), building it the first time it is asked for
+def get_metrics_cube(exp_metrics_list, node_name=None):
+    key = (tuple(exp.experiment_id for exp in exp_metrics_list), node_name)
+    if key not in _cubes:
+        _cubes[key] = build_metrics_cube(exp_metrics_list, node_name)
+    return _cubes[key]
@@ -0,0 +1,218 @@
+"""
+Reads the power meter in its integration mode: the meter accumulates the energy of each channel itself, and every
+reading fetches the cumulative watt-hours, the average power of each channel and the integration time in a single
+batched SCPI exchange. Energy comes from the meter's own clock, so it is exact however late the host gets to a reading,
+and a reading is one exchange for all channels. Runs on the node connected to the meter (python3 standard library, plus
+the vxi11 package for the GPIB-LAN gateway) until it is stopped.
+
+Readings file layout (text):
+    # channels: b09-40,b09-38,b09-36,b09-34
+    <realtime epoch secs>,<integration secs>,<cumulative Wh of each channel>...,<average watts of each channel>...
+Channels are named after the node connected to them, in channel order. The integrator is reset when reading starts.
+"""
+
+import argparse
+import os
+import signal
+import socket
+import time
+
+
+# File names
+power_meter_readings_file_name = "power_meter_readings.txt"
+channels_header_prefix = "# channels: "
+default_interval_ms = 1000
+# Readings are written to the file in batches of about this many seconds
+flush_interval_secs = 1
+
+# Meter connection, the GPIB-LAN gateway by default or a raw SCPI socket (e.g., the simulator) if a port is given
+default_host = "172.19.222.92"
+default_vxi11_device = "gpib0,12"
+default_socket_timeout_secs = 10
+
+# SCPI commands. Channel 0 stands for all channels, whose values come back comma separated in channel order.
+all_channels = 0
+identify_query = "*IDN?"
+integrator_stop_command = ":INTegrate:STOP"
+integrator_reset_command = ":INTegrate:RESet"
+integrator_start_command = ":INTegrate:STARt"
+energy_query_format = ":MEASure:SCALar:ENERgy:REAL? {0}"
+average_power_query_format = ":MEASure:SCALar:POWer:REAL:AVERage? {0}"
+integration_time_query = ":INTegrate:TIME?"
+# Queries of one message get their responses back in one line, separated like the queries
+query_separator = ";"
+
+
+# Raw SCPI over TCP, newline terminated
+class SocketTransport:
+    def __init__(self, host, port, timeout_secs=default_socket_timeout_secs):
+        self.sock = socket.create_connection((host, port), timeout=timeout_secs)
+        self.reader = self.sock.makefile("r", encoding="ascii", newline="\n")
+
+    def write(self, command):
+        self.sock.sendall((command + "\n").encode("ascii"))
+
+    def ask(self, query):
+        self.write(query)
+        response = self.reader.readline()
+        if not response:
+            raise ConnectionError("Meter closed the connection on " + query)
+        return response.strip()
+
+    def close(self):
+        self.reader.close()
+        self.sock.close()
+
+
+# VXI-11, through the GPIB-LAN gateway the meter hangs off
+class Vxi11Transport:
+    def __init__(self, host, device=default_vxi11_device):
+        import vxi11
+        self.instrument = vxi11.Instrument(host, device)
+
+    def write(self, command):
+        self.instrument.write(command)
+
+    def ask(self, query):
+        return self.instrument.ask(query).strip()
+
+    def close(self):
+        self.instrument.close()
+
+
+def parse_values(response):
+    return [float(value) for value in response.split(",")]
+
+
+class PowerMeter:
+    def __init__(self, transport, num_channels):
+        self.transport = transport
+        self.num_channels = num_channels
+        self.reading_query = query_separator.join([energy_query_format.format(all_channels),
+                                                   average_power_query_format.format(all_channels),
+                                                   integration_time_query])
+        self.num_exchanges = 0
+        self.last_reading = None
+
+    def identify(self):
+        self.num_exchanges += 1
+        return self.transport.ask(identify_query)
+
+    # Starts integrating from zero
+    def start_integration(self):
+        for command in [integrator_stop_command, integrator_reset_command, integrator_start_command]:
+            self.transport.write(command)
+            self.num_exchanges += 1
+
+    def stop_integration(self):
+        self.transport.write(integrator_stop_command)
+        self.num_exchanges += 1
+
+    # Takes a reading in one exchange. Returns (realtime secs, integration secs, cumulative Wh of each channel, average
+    # watts of each channel). Realtime is the middle of the exchange, the energy is as of the integration time.
+    def read(self):
+        before_secs = time.time()
+        response = self.transport.ask(self.reading_query)
+        realtime_secs = (before_secs + time.time()) / 2
+        self.num_exchanges += 1
+
+        parts = response.split(query_separator)
+        if len(parts) != 3:
+            raise ValueError("Unexpected response to {0}: {1}".format(self.reading_query, response))
+        energies_wh = parse_values(parts[0])
+        average_watts = parse_values(parts[1])
+        if len(energies_wh) != self.num_channels or len(average_watts) != self.num_channels:
+            raise ValueError("Expected {0} channels in response: {1}".format(self.num_channels, response))
+        self.last_reading = (realtime_secs, float(parts[2]), energies_wh, average_watts)
+        return self.last_reading
+
+
+# Connects to the meter. A fresh connection can fail its first exchange, so that gets one retry.
+def connect_power_meter(num_channels, host=default_host, port=None, device=default_vxi11_device):
+    transport = SocketTransport(host, port) if port else Vxi11Transport(host, device)
+    meter = PowerMeter(transport, num_channels)
+    try:
+        meter.identify()
+    except Exception as ex:
+        print(ex)
+    print(meter.identify())
+    return meter
+
+
+def write_reading(f, reading):
+    realtime_secs, integration_secs, energies_wh, average_watts = reading
+    f.write("{0:.6f},{1},{2}\n".format(realtime_secs, integration_secs,
+                                        ",".join(str(value) for value in energies_wh + average_watts)))
+
+
+# Integrates on the meter and reads it every interval_ms until stopped (SIGTERM/SIGINT) or for duration_secs, writing
+# the readings to the file. Returns the number of readings.
+def run_power_meter(readings_file_path, meter, node_names, interval_ms=default_interval_ms, duration_secs=None):
+    stopped = []
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopped.append(signum))
+    signal.signal(signal.SIGINT, lambda signum, frame: stopped.append(signum))
+
+    readings_per_flush = max(1, int(flush_interval_secs * 1000 / interval_ms))
+    interval_ns = int(interval_ms * 1e6)
+    count = 0
+    with open(readings_file_path, "w") as f:
+        f.write(channels_header_prefix + ",".join(node_names) + "\n")
+        meter.start_integration()
+        start_ns = time.monotonic_ns()
+        end_ns = start_ns + int(duration_secs * 1e9) if duration_secs else None
+        next_ns = start_ns
+        try:
+            while not stopped:
+                # Keep to the schedule, skipping intervals that were missed. The next reading covers them anyway.
+                next_ns += interval_ns
+                now_ns = time.monotonic_ns()
+                if now_ns > next_ns:
+                    next_ns = now_ns + interval_ns - (now_ns - start_ns) % interval_ns
+                if end_ns is not None and next_ns > end_ns:
+                    next_ns = end_ns
+                time.sleep(max(next_ns - now_ns, 0) / 1e9)
+
+                write_reading(f, meter.read())
+                count += 1
+                if count % readings_per_flush == 0:
+                    f.flush()
+                if end_ns is not None and next_ns >= end_ns:
+                    break
+        finally:
+            meter.stop_integration()
+
+        # Last reading with the final totals, as of when the integrator stopped
+        write_reading(f, meter.read())
+    return count + 1
+
+
+def main():
+    parser = argparse.ArgumentParser("Reads cumulative energy and average power of each power meter channel")
+    parser.add_argument('results_dir', action='store', help='results folder to write the readings to')
+    parser.add_argument('--nodes', action='store', required=True,
+                        help='comma separated names of the nodes connected to the meter, in channel order')
+    parser.add_argument('--intervalms', action='store', type=float, default=default_interval_ms,
+                        help='reading interval in millisecs')
+    parser.add_argument('--host', action='store', default=default_host, help='meter or GPIB-LAN gateway address')
+    parser.add_argument('--device', action='store', default=default_vxi11_device, help='VXI-11 device name')
+    parser.add_argument('--port', action='store', type=int, help='raw SCPI socket port, instead of VXI-11')
+    parser.add_argument('--duration', action='store', type=float, help='secs to read for, until stopped if not set')
+    args = parser.parse_args()
+
+    node_names = args.nodes.split(",")
+    meter = connect_power_meter(len(node_names), args.host, args.port, args.device)
+    readings_file_path = os.path.join(args.results_dir, power_meter_readings_file_name)
+    try:
+        count = run_power_meter(readings_file_path, meter, node_names, args.intervalms, args.duration)
+    finally:
+        meter.transport.close()
+
+    _, integration_secs, energies_wh, _ = meter.last_reading
+    print("Wrote {0} readings to {1} in {2} exchanges".format(count, readings_file_path, meter.num_exchanges))
+    for node_name, energy_wh in zip(node_names, energies_wh):
+        print("{0}: {1:.4f} Wh, {2:.1f} W average over {3:.1f} secs".format(
+            node_name, energy_wh, energy_wh * 3600 / integration_secs if integration_secs else 0, integration_secs))
+
+
+if __name__ == '__main__':
+    main()
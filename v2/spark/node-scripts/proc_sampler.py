@@ -0,0 +1,278 @@
+"""
+Samples CPU, network, disk IO and memory usage of a node from /proc at sub-second intervals, as a finer grained
+stand-in for the SAR readings. Runs on the node (only needs python3 standard library) until it is stopped.
+
+Samples file layout:
+    b"PMSAMPLES1\\n" | header length (uint32, little-endian) | header (JSON) | records
+The header lists the value columns, each with its labels (e.g., one per core or per interface). Every record is
+<monotonic ns (int64), realtime ns (int64), values (float32)>, with the values of all columns one after another in
+header order. Rates are over the time since the previous record.
+"""
+
+import argparse
+import json
+import os
+import re
+import signal
+import struct
+import time
+from array import array
+
+
+# File names
+samples_file_name = "proc.samples"
+samples_magic = b"PMSAMPLES1\n"
+default_interval_ms = 50
+# Samples are written to the file in batches of about this many seconds
+flush_interval_secs = 1
+# Proc files are re-read in one go, these should be larger than any of them
+read_buffer_bytes = 1 << 16
+# Block devices that are not disks
+ignored_disk_prefixes = ("loop", "ram", "sr", "fd")
+kb_bytes = 1024
+
+
+# Column names and what they hold
+cpu_user_column = "cpu_user"                # % of CPU time in user mode, for "all" and per core
+cpu_system_column = "cpu_system"            # % of CPU time in system mode, for "all" and per core
+net_in_column = "net_in_kBps"               # Received kB/sec, per interface
+net_out_column = "net_out_kBps"             # Sent kB/sec, per interface
+disk_reads_column = "disk_reads_ps"         # Reads/sec, all disks
+disk_writes_column = "disk_writes_ps"       # Writes/sec, all disks
+disk_breads_column = "disk_breads_ps"       # Blocks (512 bytes) read/sec, all disks
+disk_bwrites_column = "disk_bwrites_ps"     # Blocks (512 bytes) written/sec, all disks
+mem_usage_column = "mem_usage_percent"      # % of memory in use, not counting what is available for reclaim
+
+
+def read_samples_header(f):
+    if f.read(len(samples_magic)) != samples_magic:
+        raise ValueError("Not a samples file")
+    header_length = struct.unpack("<I", f.read(4))[0]
+    header = json.loads(f.read(header_length).decode("utf-8"))
+    return header, len(samples_magic) + 4 + header_length
+
+
+# Partitions are named after their disk: sda -> sda1, nvme0n1 -> nvme0n1p1
+def is_partition(device_name, device_names):
+    for other in device_names:
+        if other != device_name and device_name.startswith(other):
+            suffix = device_name[len(other):]
+            if re.match(r'^[0-9]+$' if not other[-1].isdigit() else r'^p[0-9]+$', suffix):
+                return True
+    return False
+
+
+def get_record_struct(num_values):
+    return struct.Struct("<qq{0}f".format(num_values))
+
+
+# Keeps the proc files open and re-reads them from the start for every sample. Counters are parsed into
+# preallocated arrays, and rates come from the difference to the previous sample.
+class ProcSampler:
+    def __init__(self, proc_root="/"):
+        self.proc_root = proc_root
+        self.stat_fd = self._open("proc/stat")
+        self.net_dev_fd = self._open("proc/net/dev")
+        self.diskstats_fd = self._open("proc/diskstats")
+        self.meminfo_fd = self._open("proc/meminfo")
+
+        # What to sample is fixed by the first reading, devices showing up later are left out
+        self.cpu_names = [line.split()[0] for line in self._read_lines(self.stat_fd) if line.startswith("cpu")]
+        self.interfaces = [line.split(":")[0].strip() for line in self._read_lines(self.net_dev_fd) if ":" in line]
+        disk_names = [line.split()[2] for line in self._read_lines(self.diskstats_fd) if len(line.split()) >= 14]
+        self.disks = [name for name in disk_names
+                      if not name.startswith(ignored_disk_prefixes) and not is_partition(name, disk_names)]
+        self.cpu_rows = {name: idx for idx, name in enumerate(self.cpu_names)}
+        self.interface_rows = {name: idx for idx, name in enumerate(self.interfaces)}
+        self.disk_set = set(self.disks)
+
+        # Counters: <total, user, system> jiffies per cpu, <rx, tx> bytes per interface, <reads, sectors read,
+        # writes, sectors written> over all disks
+        self.num_counters = 3 * len(self.cpu_names) + 2 * len(self.interfaces) + 4
+        self.counters = array('d', bytes(8 * self.num_counters))
+        self.previous_counters = array('d', bytes(8 * self.num_counters))
+        self.columns = [
+            (cpu_user_column, ["all" if name == "cpu" else name[3:] for name in self.cpu_names]),
+            (cpu_system_column, ["all" if name == "cpu" else name[3:] for name in self.cpu_names]),
+            (net_in_column, self.interfaces),
+            (net_out_column, self.interfaces),
+            (disk_reads_column, ["all"]),
+            (disk_writes_column, ["all"]),
+            (disk_breads_column, ["all"]),
+            (disk_bwrites_column, ["all"]),
+            (mem_usage_column, ["all"]),
+        ]
+        self.num_values = sum(len(labels) for _, labels in self.columns)
+        self.values = array('f', bytes(4 * self.num_values))
+        self.previous_monotonic_ns = None
+
+    def _open(self, relative_path):
+        return os.open(os.path.join(self.proc_root, relative_path), os.O_RDONLY)
+
+    def _read_lines(self, fd):
+        return os.pread(fd, read_buffer_bytes, 0).decode("ascii", "replace").splitlines()
+
+    def close(self):
+        for fd in [self.stat_fd, self.net_dev_fd, self.diskstats_fd, self.meminfo_fd]:
+            os.close(fd)
+
+    def get_header(self):
+        return {"columns": [{"name": name, "labels": labels} for name, labels in self.columns],
+                "num_values": self.num_values}
+
+    def _read_counters(self):
+        counters = self.counters
+        # cpu  user nice system idle iowait irq softirq steal guest guest_nice (guest time is part of user already)
+        for line in self._read_lines(self.stat_fd):
+            if not line.startswith("cpu"):
+                break
+            fields = line.split()
+            row = self.cpu_rows.get(fields[0])
+            if row is not None:
+                ticks = [int(value) for value in fields[1:9]]
+                counters[3 * row] = sum(ticks)
+                counters[3 * row + 1] = ticks[0]
+                counters[3 * row + 2] = ticks[2]
+
+        base = 3 * len(self.cpu_names)
+        for line in self._read_lines(self.net_dev_fd):
+            name, _, stats = line.partition(":")
+            row = self.interface_rows.get(name.strip())
+            if row is not None:
+                fields = stats.split()
+                counters[base + 2 * row] = int(fields[0])
+                counters[base + 2 * row + 1] = int(fields[8])
+
+        base += 2 * len(self.interfaces)
+        reads = sectors_read = writes = sectors_written = 0
+        for line in self._read_lines(self.diskstats_fd):
+            fields = line.split()
+            if len(fields) >= 14 and fields[2] in self.disk_set:
+                reads += int(fields[3])
+                sectors_read += int(fields[5])
+                writes += int(fields[7])
+                sectors_written += int(fields[9])
+        counters[base] = reads
+        counters[base + 1] = sectors_read
+        counters[base + 2] = writes
+        counters[base + 3] = sectors_written
+
+    def _read_mem_usage_percent(self):
+        meminfo = {}
+        for line in self._read_lines(self.meminfo_fd):
+            name, _, value = line.partition(":")
+            if name in ("MemTotal", "MemAvailable", "MemFree", "Buffers", "Cached"):
+                meminfo[name] = int(value.split()[0])
+        total = meminfo.get("MemTotal", 0)
+        if not total:
+            return float("nan")
+        available = meminfo.get("MemAvailable",
+                                meminfo.get("MemFree", 0) + meminfo.get("Buffers", 0) + meminfo.get("Cached", 0))
+        return 100.0 * (total - available) / total
+
+    # Takes a sample. Returns (monotonic ns, realtime ns, values), or None for the first call as rates need a
+    # previous sample. The values array is reused across calls.
+    def sample(self):
+        monotonic_ns = time.monotonic_ns()
+        realtime_ns = time.time_ns()
+        self.previous_counters, self.counters = self.counters, self.previous_counters
+        self._read_counters()
+        previous_monotonic_ns = self.previous_monotonic_ns
+        self.previous_monotonic_ns = monotonic_ns
+        if previous_monotonic_ns is None:
+            return None
+
+        elapsed_secs = (monotonic_ns - previous_monotonic_ns) / 1e9
+        counters = self.counters
+        previous = self.previous_counters
+        values = self.values
+        num_cpus = len(self.cpu_names)
+        for row in range(num_cpus):
+            total = counters[3 * row] - previous[3 * row]
+            values[row] = 100.0 * (counters[3 * row + 1] - previous[3 * row + 1]) / total if total > 0 else 0.0
+            values[num_cpus + row] = 100.0 * (counters[3 * row + 2] - previous[3 * row + 2]) / total if total > 0 else 0.0
+
+        base = 3 * num_cpus
+        out = 2 * num_cpus
+        num_interfaces = len(self.interfaces)
+        for row in range(num_interfaces):
+            values[out + row] = (counters[base + 2 * row] - previous[base + 2 * row]) / kb_bytes / elapsed_secs
+            values[out + num_interfaces + row] = \
+                (counters[base + 2 * row + 1] - previous[base + 2 * row + 1]) / kb_bytes / elapsed_secs
+
+        base += 2 * num_interfaces
+        out += 2 * num_interfaces
+        values[out] = (counters[base] - previous[base]) / elapsed_secs
+        values[out + 1] = (counters[base + 2] - previous[base + 2]) / elapsed_secs
+        values[out + 2] = (counters[base + 1] - previous[base + 1]) / elapsed_secs
+        values[out + 3] = (counters[base + 3] - previous[base + 3]) / elapsed_secs
+        values[out + 4] = self._read_mem_usage_percent()
+        return monotonic_ns, realtime_ns, values
+
+
+# Samples every interval_ms until stopped (SIGTERM/SIGINT) or for duration_secs, appending records to the file
+def run_sampler(samples_file_path, interval_ms=default_interval_ms, proc_root="/", duration_secs=None, node_name=None):
+    sampler = ProcSampler(proc_root)
+    stopped = []
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopped.append(signum))
+    signal.signal(signal.SIGINT, lambda signum, frame: stopped.append(signum))
+
+    header = dict(sampler.get_header(), interval_ms=interval_ms, node_name=node_name)
+    header_bytes = json.dumps(header).encode("utf-8")
+    record_struct = get_record_struct(sampler.num_values)
+    record = bytearray(record_struct.size)
+    record_values = memoryview(record)[16:]
+    records_per_flush = max(1, int(flush_interval_secs * 1000 / interval_ms))
+
+    interval_ns = int(interval_ms * 1e6)
+    start_ns = time.monotonic_ns()
+    end_ns = start_ns + int(duration_secs * 1e9) if duration_secs else None
+    next_ns = start_ns
+    count = 0
+    with open(samples_file_path, "wb") as f:
+        f.write(samples_magic)
+        f.write(struct.pack("<I", len(header_bytes)))
+        f.write(header_bytes)
+        try:
+            while not stopped:
+                result = sampler.sample()
+                if result is not None:
+                    monotonic_ns, realtime_ns, values = result
+                    struct.pack_into("<qq", record, 0, monotonic_ns, realtime_ns)
+                    record_values[:] = memoryview(values).cast('B')
+                    f.write(record)
+                    count += 1
+                    if count % records_per_flush == 0:
+                        f.flush()
+
+                # Keep to the schedule, skipping intervals that were missed rather than sampling in a burst
+                next_ns += interval_ns
+                now_ns = time.monotonic_ns()
+                if now_ns > next_ns:
+                    next_ns = now_ns + interval_ns - (now_ns - start_ns) % interval_ns
+                if end_ns is not None and next_ns > end_ns:
+                    break
+                time.sleep((next_ns - now_ns) / 1e9)
+        finally:
+            sampler.close()
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser("Samples CPU, network, disk IO and memory usage from /proc")
+    parser.add_argument('results_dir', action='store', help='node results folder to write the samples to')
+    parser.add_argument('--intervalms', action='store', type=float, default=default_interval_ms,
+                        help='sampling interval in millisecs')
+    parser.add_argument('--procroot', action='store', default="/", help='root folder holding proc, for testing')
+    parser.add_argument('--duration', action='store', type=float, help='secs to sample for, until stopped if not set')
+    parser.add_argument('--node', action='store', help='node name, defaults to the folder name')
+    args = parser.parse_args()
+
+    samples_file_path = os.path.join(args.results_dir, samples_file_name)
+    count = run_sampler(samples_file_path, args.intervalms, args.procroot, args.duration,
+                        args.node or os.path.basename(os.path.normpath(args.results_dir)))
+    print("Wrote {0} samples to {1}".format(count, samples_file_path))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+"""
+Reads the RAPL energy counters of a node (/sys/class/powercap/intel-rapl:*/energy_uj, package and DRAM domains) at a
+fixed interval, as a software stand-in for the power meter. Runs on the node (only needs python3 standard library)
+until it is stopped. Reading the counters needs root on recent kernels.
+
+Readings file layout (text):
+    # zones: package-0,package-1,dram-0,dram-1
+    <realtime epoch secs>,<secs since previous reading>,<energy used in each zone since previous reading, in uJ>...
+Counters wrap around at max_energy_range_uj, deltas account for that.
+"""
+
+import argparse
+import glob
+import os
+import signal
+import time
+
+
+# File names
+rapl_readings_file_name = "rapl_readings.txt"
+zones_header_prefix = "# zones: "
+powercap_folder = "sys/class/powercap"
+default_interval_ms = 1000
+# Readings are written to the file in batches of about this many seconds
+flush_interval_secs = 1
+package_zone_prefix = "package"
+dram_zone_name = "dram"
+
+
+def read_text(file_path):
+    with open(file_path, "r") as f:
+        return f.read().strip()
+
+
+# Finds the package and DRAM zones under the powercap folder. Returns a list of (zone name, zone folder), packages
+# first. DRAM zones are sub-zones of a package (intel-rapl:0:1) and get named after it (dram-0).
+def find_rapl_zones(sys_root="/"):
+    packages = []
+    drams = []
+    for zone_path in glob.glob(os.path.join(sys_root, powercap_folder, "intel-rapl:*")):
+        if not os.path.exists(os.path.join(zone_path, "energy_uj")):
+            continue
+        zone_ids = [int(part) for part in os.path.basename(zone_path).split(":")[1:]]
+        name = read_text(os.path.join(zone_path, "name"))
+        if name.startswith(package_zone_prefix):
+            packages.append((zone_ids, name, zone_path))
+        elif name == dram_zone_name:
+            drams.append((zone_ids, "{0}-{1}".format(dram_zone_name, zone_ids[0]), zone_path))
+    return [(name, zone_path) for _, name, zone_path in sorted(packages) + sorted(drams)]
+
+
+# Keeps the energy_uj files of the zones open and re-reads them for every reading
+class RaplSampler:
+    def __init__(self, sys_root="/"):
+        zones = find_rapl_zones(sys_root)
+        if not zones:
+            raise ValueError("No RAPL package or DRAM zones under " + os.path.join(sys_root, powercap_folder))
+        self.zone_names = [name for name, _ in zones]
+        self.max_energy_ranges_uj = []
+        for _, zone_path in zones:
+            max_range_path = os.path.join(zone_path, "max_energy_range_uj")
+            self.max_energy_ranges_uj.append(int(read_text(max_range_path)) if os.path.exists(max_range_path) else 0)
+        self.energy_fds = [os.open(os.path.join(zone_path, "energy_uj"), os.O_RDONLY) for _, zone_path in zones]
+        self.previous_energies_uj = None
+        self.previous_monotonic_ns = None
+
+    def close(self):
+        for fd in self.energy_fds:
+            os.close(fd)
+
+    # Takes a reading. Returns (realtime secs, secs since the previous reading, energy deltas in uJ), or None for the
+    # first call, and for a counter that went back without a known range to wrap around at.
+    def read(self):
+        monotonic_ns = time.monotonic_ns()
+        realtime_secs = time.time()
+        energies_uj = [int(os.pread(fd, 32, 0)) for fd in self.energy_fds]
+        previous_energies_uj = self.previous_energies_uj
+        previous_monotonic_ns = self.previous_monotonic_ns
+        self.previous_energies_uj = energies_uj
+        self.previous_monotonic_ns = monotonic_ns
+        if previous_energies_uj is None:
+            return None
+
+        deltas_uj = []
+        for energy_uj, previous_energy_uj, max_range_uj in zip(energies_uj, previous_energies_uj,
+                                                               self.max_energy_ranges_uj):
+            delta_uj = energy_uj - previous_energy_uj
+            if delta_uj < 0:
+                if not max_range_uj:
+                    return None
+                delta_uj += max_range_uj
+            deltas_uj.append(delta_uj)
+        return realtime_secs, (monotonic_ns - previous_monotonic_ns) / 1e9, deltas_uj
+
+
+# Reads the counters every interval_ms until stopped (SIGTERM/SIGINT) or for duration_secs, appending to the file
+def run_sampler(readings_file_path, interval_ms=default_interval_ms, sys_root="/", duration_secs=None):
+    sampler = RaplSampler(sys_root)
+    stopped = []
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopped.append(signum))
+    signal.signal(signal.SIGINT, lambda signum, frame: stopped.append(signum))
+
+    readings_per_flush = max(1, int(flush_interval_secs * 1000 / interval_ms))
+    interval_ns = int(interval_ms * 1e6)
+    start_ns = time.monotonic_ns()
+    end_ns = start_ns + int(duration_secs * 1e9) if duration_secs else None
+    next_ns = start_ns
+    count = 0
+    with open(readings_file_path, "w") as f:
+        f.write(zones_header_prefix + ",".join(sampler.zone_names) + "\n")
+        try:
+            while not stopped:
+                reading = sampler.read()
+                if reading is not None:
+                    realtime_secs, interval_secs, deltas_uj = reading
+                    f.write("{0:.6f},{1:.6f},{2}\n".format(realtime_secs, interval_secs,
+                                                           ",".join(str(delta_uj) for delta_uj in deltas_uj)))
+                    count += 1
+                    if count % readings_per_flush == 0:
+                        f.flush()
+
+                # Keep to the schedule, skipping intervals that were missed. The next delta covers them anyway.
+                next_ns += interval_ns
+                now_ns = time.monotonic_ns()
+                if now_ns > next_ns:
+                    next_ns = now_ns + interval_ns - (now_ns - start_ns) % interval_ns
+                if end_ns is not None and next_ns > end_ns:
+                    break
+                time.sleep((next_ns - now_ns) / 1e9)
+        finally:
+            sampler.close()
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser("Reads RAPL package and DRAM energy counters")
+    parser.add_argument('results_dir', action='store', help='node results folder to write the readings to')
+    parser.add_argument('--intervalms', action='store', type=float, default=default_interval_ms,
+                        help='reading interval in millisecs')
+    parser.add_argument('--sysroot', action='store', default="/", help='root folder holding sys, for testing')
+    parser.add_argument('--duration', action='store', type=float, help='secs to read for, until stopped if not set')
+    args = parser.parse_args()
+
+    readings_file_path = os.path.join(args.results_dir, rapl_readings_file_name)
+    count = run_sampler(readings_file_path, args.intervalms, args.sysroot, args.duration)
+    print("Wrote {0} readings to {1}".format(count, readings_file_path))
+
+
+if __name__ == '__main__':
+    main()
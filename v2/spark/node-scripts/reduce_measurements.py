@@ -0,0 +1,343 @@
+"""
+Reduces the raw SAR readings of a node into a compact binary columnar summary. Runs on the node itself after the
+readings stop (only needs python3 standard library), so only the summary needs to be copied over for analysis.
+
+Summary file layout:
+    b"PMSUMMARY1\\n" | header length (uint32, little-endian) | header (JSON) | column data
+The header lists tables, and for each table its row count and columns with their array type code ('d' for float64,
+'f' for float32), shape and byte offset from the start of the column data. Timestamps are wall-clock seconds since
+1970-01-01 as printed by SAR (no timezone conversion), so they map back to the same naive datetimes SAR reports.
+"""
+
+import argparse
+import json
+import os
+import re
+import struct
+import sys
+from array import array
+from datetime import datetime
+from datetime import timedelta
+
+
+# File names
+summary_file_name = "measurements.summary"
+cpu_readings_file_name = "cpu.sar"
+mem_readings_file_name = "memory.sar"
+net_readings_file_name = "network.sar"
+diskio_readings_file_name = "diskio.sar"
+spark_log_file_name = "spark.log"
+summary_magic = b"PMSUMMARY1\n"
+epoch = datetime(1970, 1, 1)
+
+
+# Regex patterns, same as the ones used on the analysis side
+first_line_regex = r'^Linux.+\s+([0-9]+[/-][0-9]+[/-][0-9]+)\s+'
+network_regex = r'^([0-9]+:[0-9]+:[0-9]+ [AP]M)\s+([a-z0-9]+)\s+([0-9]+\.[0-9]+)\s+([0-9]+\.[0-9]+)\s+([0-9]+\.[0-9]+)\s+([0-9]+\.[0-9]+)\s+'
+memory_regex = r'^([0-9]+:[0-9]+:[0-9]+ [AP]M)\s+([0-9]+[\.]?[0-9]+)\s+([0-9]+[\.]?[0-9]+)\s+([0-9]+[\.]?[0-9]+)\s+([0-9]+[\.]?[0-9]+)\s+([0-9]+[\.]?[0-9]+)\s+([0-9]+[\.]?[0-9]+)\s+'
+io_regex = r'^([0-9]+:[0-9]+:[0-9]+ [AP]M)\s+([0-9]+[\.]?[0-9]+)\s+([0-9]+[\.]?[0-9]+)\s+([0-9]+[\.]?[0-9]+)\s+([0-9]+[\.]?[0-9]+)\s+([0-9]+[\.]?[0-9]+)$'
+spark_stage_and_task_log_regex_2 = r'^([0-9]+\/[0-9]+\/[0-9]+ [0-9]+:[0-9]+:[0-9]+).+stage ([0-9]+\.[0-9]+).+(b09-[0-9]+).+executor ([0-9]+)'
+
+
+def to_wall_clock_seconds(timestamp):
+    return (timestamp - epoch).total_seconds()
+
+
+def from_wall_clock_seconds(seconds):
+    return epoch + timedelta(seconds=seconds)
+
+
+# Parses date from the first line in SAR output file. SAR outputs different formats at different times for some
+# reason. Returns date string in a uniform format, no matter which format SAR outputs in.
+def parse_date_from_sar_file(first_line_in_file):
+    matches = re.match(first_line_regex, first_line_in_file)
+    date_string_match = matches.group(1)
+    # e.g., 11/08/2018 or 2018-11-08
+    try:
+        date_string = datetime.strptime(date_string_match, '%m/%d/%Y').strftime('%m/%d/%Y')
+    except ValueError:
+        # Try parsing other format
+        date_string = datetime.strptime(date_string_match, '%Y-%m-%d').strftime('%m/%d/%Y')
+    return date_string
+
+
+# Goes over the SAR file lines matching the regex and yields (timestamp, matches). Takes care of the date from the
+# first line and of experiments running past midnight. Time strings are only parsed once per SAR interval.
+def iterate_sar_matches(sar_file_path, line_regex):
+    compiled_regex = re.compile(line_regex)
+    with open(sar_file_path, "r") as lines:
+        first_line = True
+        date_part = None
+        previous_time_string = None
+        previous_reading_time_part = None
+        timestamp = None
+        for line in lines:
+            if first_line:
+                date_string = parse_date_from_sar_file(first_line_in_file=line)
+                date_part = datetime.strptime(date_string, '%m/%d/%Y')
+                first_line = False
+
+            matches = compiled_regex.match(line)
+            if matches:
+                time_string = matches.group(1)
+                if time_string != previous_time_string:
+                    # Add a day when experiment runs past midnight, when the hour of the first reading is smaller than the one before.
+                    time_part = datetime.strptime(time_string, '%I:%M:%S %p')
+                    if previous_reading_time_part is not None and previous_reading_time_part.hour > time_part.hour:
+                        date_part = date_part + timedelta(days=1)
+                    previous_reading_time_part = time_part
+                    previous_time_string = time_string
+                    timestamp = date_part.replace(hour=time_part.hour, minute=time_part.minute, second=time_part.second)
+                yield timestamp, matches
+
+
+# Reads "sar -P ALL" output into the "cpu" table (all cores) and the "cpu_cores" table with (time x core) matrices
+def reduce_cpu_readings(cpu_file_path):
+    cpu_table = {"timestamp": array('d'), "user": array('f'), "system": array('f')}
+    core_rows = {}
+    previous_time_string = None
+    previous_reading_time_part = None
+    date_part = None
+    timestamps = []
+
+    with open(cpu_file_path, "r") as lines:
+        first_line = True
+        for line in lines:
+            if first_line:
+                date_string = parse_date_from_sar_file(first_line_in_file=line)
+                date_part = datetime.strptime(date_string, '%m/%d/%Y')
+                first_line = False
+                continue
+
+            # Example: <06:38:09 PM       0      3.78      0.00      2.52      0.50      0.00     93.20>
+            tokens = line.split()
+            if len(tokens) != 9 or (tokens[1] != "AM" and tokens[1] != "PM"):
+                continue
+            try:
+                cpu_user_usage = float(tokens[3])
+                cpu_system_usage = float(tokens[5])
+            except ValueError:
+                continue
+
+            time_string = tokens[0] + " " + tokens[1]
+            if time_string != previous_time_string:
+                # Add a day when experiment runs past midnight, when the hour of the first reading is smaller than the one before.
+                time_part = datetime.strptime(time_string, '%I:%M:%S %p')
+                if previous_reading_time_part is not None and previous_reading_time_part.hour > time_part.hour:
+                    date_part = date_part + timedelta(days=1)
+                previous_reading_time_part = time_part
+                previous_time_string = time_string
+                timestamps.append(date_part.replace(hour=time_part.hour, minute=time_part.minute, second=time_part.second))
+
+            if tokens[2] == "all":
+                cpu_table["timestamp"].append(to_wall_clock_seconds(timestamps[-1]))
+                cpu_table["user"].append(cpu_user_usage)
+                cpu_table["system"].append(cpu_system_usage)
+            else:
+                core_rows.setdefault(int(tokens[2]), {})[len(timestamps) - 1] = (cpu_user_usage, cpu_system_usage)
+
+    # Dense (time x core) matrices, stored row-major. Missing readings are NaN.
+    core_ids = sorted(core_rows.keys())
+    user_matrix = array('f')
+    system_matrix = array('f')
+    for row in range(len(timestamps)):
+        for core_id in core_ids:
+            user, system = core_rows[core_id].get(row, (float('nan'), float('nan')))
+            user_matrix.append(user)
+            system_matrix.append(system)
+
+    cpu_cores_table = {
+        "timestamp": array('d', [to_wall_clock_seconds(t) for t in timestamps]),
+        "core_id": array('d', core_ids),
+        "user": (user_matrix, [len(timestamps), len(core_ids)]),
+        "system": (system_matrix, [len(timestamps), len(core_ids)]),
+    }
+    return cpu_table, cpu_cores_table
+
+
+def reduce_network_readings(net_file_path, net_interface):
+    table = {"timestamp": array('d'), "net_in_kBps": array('f'), "net_out_kBps": array('f')}
+    for timestamp, matches in iterate_sar_matches(net_file_path, network_regex):
+        if matches.group(2) == net_interface:
+            table["timestamp"].append(to_wall_clock_seconds(timestamp))
+            table["net_in_kBps"].append(float(matches.group(5)))
+            table["net_out_kBps"].append(float(matches.group(6)))
+    return table
+
+
+def reduce_memory_readings(mem_file_path):
+    table = {"timestamp": array('d'), "mem_usage_percent": array('f')}
+    for timestamp, matches in iterate_sar_matches(mem_file_path, memory_regex):
+        table["timestamp"].append(to_wall_clock_seconds(timestamp))
+        table["mem_usage_percent"].append(float(matches.group(5)))
+    return table
+
+
+def reduce_diskio_readings(diskio_file_path):
+    table = {"timestamp": array('d'), "disk_reads_ps": array('f'), "disk_writes_ps": array('f'),
+             "disk_breads_ps": array('f'), "disk_bwrites_ps": array('f')}
+    for timestamp, matches in iterate_sar_matches(diskio_file_path, io_regex):
+        table["timestamp"].append(to_wall_clock_seconds(timestamp))
+        table["disk_reads_ps"].append(float(matches.group(3)))
+        table["disk_writes_ps"].append(float(matches.group(4)))
+        table["disk_breads_ps"].append(float(matches.group(5)))
+        table["disk_bwrites_ps"].append(float(matches.group(6)))
+    return table
+
+
+# Gets <stage, [start, end]> from the spark driver log
+def get_stages_start_end_times(spark_log_file_path):
+    stages_start_end_times = {}
+    with open(spark_log_file_path, "r") as lines:
+        for line in lines:
+            matches = re.match(spark_stage_and_task_log_regex_2, line)
+            if matches:
+                timestamp = datetime.strptime(matches.group(1), '%y/%m/%d %H:%M:%S')
+                stage = float(matches.group(2))
+                if stage not in stages_start_end_times:
+                    stages_start_end_times[stage] = [timestamp, timestamp]
+                stages_start_end_times[stage][1] = timestamp
+    return stages_start_end_times
+
+
+# Averages the columns of a table in bins of rollup_secs within each spark stage (stage -1 for readings outside of any
+# stage). Produces one row per (stage, bin) with the bin start as timestamp.
+def rollup_table(table, stages_start_end_times, rollup_secs):
+    stage_intervals = sorted((to_wall_clock_seconds(s), to_wall_clock_seconds(e), stage)
+                             for stage, (s, e) in stages_start_end_times.items())
+    value_columns = [name for name in table if name != "timestamp"]
+    sums = {}
+    counts = {}
+    for row, timestamp in enumerate(table["timestamp"]):
+        stage = -1.0
+        stage_start = 0.0
+        for start, end, stage_id in stage_intervals:
+            if start <= timestamp <= end:
+                stage, stage_start = stage_id, start
+                break
+        key = (stage, stage_start + ((timestamp - stage_start) // rollup_secs) * rollup_secs)
+        if key not in sums:
+            sums[key] = [0.0] * len(value_columns)
+            counts[key] = 0
+        for idx, name in enumerate(value_columns):
+            sums[key][idx] += table[name][row]
+        counts[key] += 1
+
+    rolled_up = {"stage": array('d'), "timestamp": array('d')}
+    rolled_up.update({name: array('f') for name in value_columns})
+    for key in sorted(sums.keys(), key=lambda k: (k[1], k[0])):
+        rolled_up["stage"].append(key[0])
+        rolled_up["timestamp"].append(key[1])
+        for idx, name in enumerate(value_columns):
+            rolled_up[name].append(sums[key][idx] / counts[key])
+    return rolled_up
+
+
+# Writes tables ({table name: {column name: array or (array, shape)}}) in the summary file layout
+def write_summary(summary_file_path, tables, node_name=None, extra_header=None):
+    header = {"node": node_name, "tables": {}}
+    header.update(extra_header or {})
+    column_data = []
+    offset = 0
+    for table_name, columns in tables.items():
+        table_header = {"rows": 0, "columns": []}
+        for column_name, column in columns.items():
+            values, shape = column if isinstance(column, tuple) else (column, [len(column)])
+            table_header["rows"] = shape[0]
+            if sys.byteorder != "little":
+                values = array(values.typecode, values)
+                values.byteswap()
+            data = values.tobytes()
+            table_header["columns"].append({"name": column_name, "type": values.typecode, "shape": shape,
+                                            "offset": offset, "length": len(data)})
+            column_data.append(data)
+            offset += len(data)
+        header["tables"][table_name] = table_header
+
+    header_bytes = json.dumps(header).encode("utf-8")
+    with open(summary_file_path, "wb") as f:
+        f.write(summary_magic)
+        f.write(struct.pack("<I", len(header_bytes)))
+        f.write(header_bytes)
+        for data in column_data:
+            f.write(data)
+
+
+# Reads the header of a summary file, returns (header, offset of the column data)
+def read_summary_header(f):
+    if f.read(len(summary_magic)) != summary_magic:
+        raise Exception("Not a measurements summary file!")
+    header_length = struct.unpack("<I", f.read(4))[0]
+    header = json.loads(f.read(header_length).decode("utf-8"))
+    return header, len(summary_magic) + 4 + header_length
+
+
+# Reads one table of a summary file as {column name: (array, shape)}, seeking only to that table's columns
+def read_summary_table(summary_file_path, table_name):
+    with open(summary_file_path, "rb") as f:
+        return read_summary_table_from_file(f, table_name)
+
+
+# Same as read_summary_table, from a summary file that is open already (any seekable binary file object)
+def read_summary_table_from_file(f, table_name):
+    header, data_offset = read_summary_header(f)
+    if table_name not in header["tables"]:
+        return None
+    columns = {}
+    for column in header["tables"][table_name]["columns"]:
+        f.seek(data_offset + column["offset"])
+        values = array(column["type"])
+        values.frombytes(f.read(column["length"]))
+        if sys.byteorder != "little":
+            values.byteswap()
+        columns[column["name"]] = (values, column["shape"])
+    return columns
+
+
+# Reduces all the SAR files in a node's results folder into a summary file in the same folder
+def reduce_node_results(node_results_dir, node_name=None, spark_log_file_path=None, rollup_secs=0,
+                        net_interface="enp59s0"):
+    tables = {}
+    cpu_file_path = os.path.join(node_results_dir, cpu_readings_file_name)
+    if os.path.exists(cpu_file_path):
+        tables["cpu"], tables["cpu_cores"] = reduce_cpu_readings(cpu_file_path)
+    net_file_path = os.path.join(node_results_dir, net_readings_file_name)
+    if os.path.exists(net_file_path):
+        tables["network"] = reduce_network_readings(net_file_path, net_interface)
+    mem_file_path = os.path.join(node_results_dir, mem_readings_file_name)
+    if os.path.exists(mem_file_path):
+        tables["memory"] = reduce_memory_readings(mem_file_path)
+    diskio_file_path = os.path.join(node_results_dir, diskio_readings_file_name)
+    if os.path.exists(diskio_file_path):
+        tables["diskio"] = reduce_diskio_readings(diskio_file_path)
+
+    # Per-stage rollups of the single-valued tables
+    if rollup_secs:
+        stages_start_end_times = {}
+        if spark_log_file_path and os.path.exists(spark_log_file_path):
+            stages_start_end_times = get_stages_start_end_times(spark_log_file_path)
+        for table_name in ["cpu", "network", "memory", "diskio"]:
+            if table_name in tables:
+                tables[table_name + "_rollup"] = rollup_table(tables[table_name], stages_start_end_times, rollup_secs)
+
+    summary_file_path = os.path.join(node_results_dir, summary_file_name)
+    write_summary(summary_file_path, tables, node_name or os.path.basename(os.path.normpath(node_results_dir)),
+                  {"rollup_secs": rollup_secs, "net_interface": net_interface})
+    return summary_file_path
+
+
+def main():
+    parser = argparse.ArgumentParser("Reduces raw SAR readings of a node into a compact binary summary")
+    parser.add_argument('results_dir', action='store', help='node results folder with the SAR files')
+    parser.add_argument('--node', action='store', help='node name, defaults to the folder name')
+    parser.add_argument('--sparklog', action='store', help='spark driver log, to roll up readings per spark stage')
+    parser.add_argument('--rollupsecs', action='store', type=int, default=0, help='bin size of per-stage rollups')
+    parser.add_argument('--interface', action='store', default="enp59s0", help='network interface to keep')
+    args = parser.parse_args()
+
+    summary_file_path = reduce_node_results(args.results_dir, args.node, args.sparklog, args.rollupsecs, args.interface)
+    print("Wrote summary " + summary_file_path)
+
+
+if __name__ == '__main__':
+    main()
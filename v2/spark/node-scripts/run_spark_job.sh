@@ -8,11 +8,12 @@ FINAL_PARTITION_COUNT=$6
 # Needed when running from sshclient in Python
 # export JAVA_HOME=/usr/lib/jvm/java-8-oracle; 
 
-# Run spark job
+# Run spark job. Output also goes to stdout so the orchestrator can follow the job as it runs.
 spark-submit --class PowerMeasurements.${SCALA_CLASS_NAME} \
         --num-executors 16 --executor-cores 40 --executor-memory 75g --driver-cores 5 --driver-memory 5g  \
         "${SRC_DIR_FULL_PATH}/target/scala-2.11/sparksort_2.11-0.1.jar" yarn ${SIZE_IN_MB} ${RECORD_SIZE_BYTES} ${FINAL_PARTITION_COUNT}  \
-        > /mnt/ramdisk/spark.log 2>&1
+        2>&1 | tee /mnt/ramdisk/spark.log
+SPARK_EXIT_CODE=${PIPESTATUS[0]}
 
 # Get application id from spark stdout log and get the detailed log file from spark logs in hdfs
 application_id=$(grep -E -oh "(application_[0-9]+_[0-9]+)" /mnt/ramdisk/spark.log | head -1)
@@ -21,6 +22,8 @@ if [[ ! -z ${application_id} ]]; then hdfs dfs -get /spark/spark-logs/${applicat
 # Move log file to results folder
 mv /mnt/ramdisk/spark.log ${RESULTS_DIR_FULL_PATH}
 
+exit ${SPARK_EXIT_CODE}
+
 
 # Command for SortLegacy.
 # spark-submit --class PowerMeasurements.${SCALA_CLASS_NAME} \
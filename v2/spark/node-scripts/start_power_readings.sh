@@ -0,0 +1,29 @@
+# reset readings
+pkill -f power_meter.py
+
+DIR_FULL_PATH=$1
+
+if [ -z "$DIR_FULL_PATH" ]
+then
+	echo "Please provide directory of source/script files"
+	exit -1
+fi
+
+# If interval is not set, default to 1000 millisecs.
+if [ -z "$2" ]
+then
+	INTERVAL_MS=1000
+else
+	INTERVAL_MS=$2
+fi
+
+# Comma separated nodes connected to the meter, in channel order.
+NODES=$3
+if [ -z "$NODES" ]
+then
+	echo "Please provide the nodes connected to the power meter"
+	exit -1
+fi
+
+SCRIPTS_DIR=$(dirname "$0")
+nohup python3 ${SCRIPTS_DIR}/power_meter.py ${DIR_FULL_PATH} --intervalms ${INTERVAL_MS} --nodes ${NODES} > ${DIR_FULL_PATH}/power_meter.log 2>&1 &
@@ -0,0 +1,21 @@
+# reset sampler
+pkill -f proc_sampler.py
+
+DIR_FULL_PATH=$1
+
+if [ -z "$DIR_FULL_PATH" ]
+then
+	echo "Please provide directory of source/script files"
+	exit -1
+fi
+
+# If interval is not set, default to 50 millisecs.
+if [ -z "$2" ]
+then
+	INTERVAL_MS=50
+else
+	INTERVAL_MS=$2
+fi
+
+SCRIPTS_DIR=$(dirname "$0")
+nohup python3 ${SCRIPTS_DIR}/proc_sampler.py ${DIR_FULL_PATH} --intervalms ${INTERVAL_MS} > ${DIR_FULL_PATH}/proc_sampler.log 2>&1 &
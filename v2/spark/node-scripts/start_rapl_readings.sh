@@ -0,0 +1,21 @@
+# reset readings
+pkill -f rapl_sampler.py
+
+DIR_FULL_PATH=$1
+
+if [ -z "$DIR_FULL_PATH" ]
+then
+	echo "Please provide directory of source/script files"
+	exit -1
+fi
+
+# If interval is not set, default to 1000 millisecs.
+if [ -z "$2" ]
+then
+	INTERVAL_MS=1000
+else
+	INTERVAL_MS=$2
+fi
+
+SCRIPTS_DIR=$(dirname "$0")
+nohup python3 ${SCRIPTS_DIR}/rapl_sampler.py ${DIR_FULL_PATH} --intervalms ${INTERVAL_MS} > ${DIR_FULL_PATH}/rapl_sampler.log 2>&1 &
@@ -0,0 +1,7 @@
+pkill -f power_meter.py
+
+# Wait for the meter reader to stop integrating and write out the last readings
+while pgrep -f power_meter.py > /dev/null
+do
+	sleep 0.1
+done
@@ -0,0 +1,7 @@
+pkill -f proc_sampler.py
+
+# Wait for the sampler to write out the last samples
+while pgrep -f proc_sampler.py > /dev/null
+do
+	sleep 0.1
+done
@@ -0,0 +1,7 @@
+pkill -f rapl_sampler.py
+
+# Wait for the sampler to write out the last readings
+while pgrep -f rapl_sampler.py > /dev/null
+do
+	sleep 0.1
+done
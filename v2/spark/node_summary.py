@@ -0,0 +1,103 @@
+"""
+Loads the compact measurement summaries that node-scripts/reduce_measurements.py writes on each node
+"""
+
+import os
+import importlib.util
+from datetime import timedelta
+import numpy as np
+from cpu_core_usage import CpuCoreUsage
+from experiment_archive import result_file_exists, open_result_file
+
+
+# The summary format is defined by the node-side reducer, load it from the node scripts folder
+_reducer_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "node-scripts", "reduce_measurements.py")
+_reducer_spec = importlib.util.spec_from_file_location("reduce_measurements", _reducer_path)
+reduce_measurements = importlib.util.module_from_spec(_reducer_spec)
+_reducer_spec.loader.exec_module(reduce_measurements)
+
+node_summary_file_name = reduce_measurements.summary_file_name
+_numpy_types = {'d': np.float64, 'f': np.float32}
+
+
+def has_summary(node_results_dir):
+    return result_file_exists(os.path.join(node_results_dir, node_summary_file_name))
+
+
+# Converts summary timestamps (wall-clock seconds as reported by SAR) to naive datetimes
+def to_datetimes(seconds):
+    epoch = reduce_measurements.epoch
+    return [epoch + timedelta(seconds=s) for s in seconds.tolist()]
+
+
+# Loads one table from a node's summary as {column name: numpy array}, or None if the table is not in the summary
+def load_summary_table(node_results_dir, table_name):
+    with open_result_file(os.path.join(node_results_dir, node_summary_file_name), "rb") as f:
+        columns = reduce_measurements.read_summary_table_from_file(f, table_name)
+    if columns is None:
+        return None
+    return {name: np.frombuffer(values, dtype=_numpy_types[values.typecode]).reshape(shape)
+            for name, (values, shape) in columns.items()}
+
+
+# Gets per-core CPU usage matrices of a node from its summary
+def get_cpu_core_usage(node_results_dir, node_name):
+    table = load_summary_table(node_results_dir, "cpu_cores")
+    cpu_table = load_summary_table(node_results_dir, "cpu")
+    usage = CpuCoreUsage()
+    usage.node_name = node_name
+    usage.timestamps = to_datetimes(table["timestamp"])
+    usage.core_ids = table["core_id"].astype(np.int64)
+    usage.user = table["user"]
+    usage.system = table["system"]
+    usage.total = usage.user + usage.system
+
+    # Align the "all" rows with the per-core timestamps
+    all_rows = {t: (u, s) for t, u, s in zip(cpu_table["timestamp"].tolist(), cpu_table["user"].tolist(),
+                                              cpu_table["system"].tolist())}
+    usage.all_user = np.array([all_rows.get(t, (np.nan, np.nan))[0] for t in table["timestamp"].tolist()], dtype=np.float32)
+    usage.all_system = np.array([all_rows.get(t, (np.nan, np.nan))[1] for t in table["timestamp"].tolist()], dtype=np.float32)
+    return usage
+
+
+# Gets readings of a node from its summary, in the same [timestamp, node, label, value] format as parse_results
+def get_node_readings(node_results_dir, node_name):
+    all_readings = []
+
+    table = load_summary_table(node_results_dir, "cpu")
+    if table is not None:
+        for timestamp, cpu_user_usage, cpu_system_usage in zip(to_datetimes(table["timestamp"]), table["user"].tolist(),
+                                                               table["system"].tolist()):
+            all_readings.append([timestamp, node_name, "cpu_user_usage", cpu_user_usage])
+            all_readings.append([timestamp, node_name, "cpu_system_usage", cpu_system_usage])
+            all_readings.append([timestamp, node_name, "cpu_total_usage", cpu_user_usage + cpu_system_usage])
+
+    table = load_summary_table(node_results_dir, "network")
+    if table is not None:
+        for timestamp, net_in_KBps, net_out_KBps in zip(to_datetimes(table["timestamp"]), table["net_in_kBps"].tolist(),
+                                                        table["net_out_kBps"].tolist()):
+            all_readings.append([timestamp, node_name, "net_in_Mbps", net_in_KBps * 8 / 1000])
+            all_readings.append([timestamp, node_name, "net_out_Mbps", net_out_KBps * 8 / 1000])
+            all_readings.append([timestamp, node_name, "net_total_Mbps", (net_in_KBps + net_out_KBps) * 8 / 1000])
+
+    table = load_summary_table(node_results_dir, "memory")
+    if table is not None:
+        for timestamp, mem_usage_percent in zip(to_datetimes(table["timestamp"]), table["mem_usage_percent"].tolist()):
+            all_readings.append([timestamp, node_name, "mem_usage_percent", mem_usage_percent])
+
+    table = load_summary_table(node_results_dir, "diskio")
+    if table is not None:
+        for timestamp, disk_rps, disk_wps, disk_brps, disk_bwps in zip(
+                to_datetimes(table["timestamp"]), table["disk_reads_ps"].tolist(), table["disk_writes_ps"].tolist(),
+                table["disk_breads_ps"].tolist(), table["disk_bwrites_ps"].tolist()):
+            all_readings.append([timestamp, node_name, "disk_reads_ps", disk_rps])
+            all_readings.append([timestamp, node_name, "disk_writes_ps", disk_wps])
+            all_readings.append([timestamp, node_name, "disk_total_ps", disk_rps + disk_wps])
+            all_readings.append([timestamp, node_name, "disk_breads_ps", disk_brps])
+            all_readings.append([timestamp, node_name, "disk_bwrites_ps", disk_bwps])
+            all_readings.append([timestamp, node_name, "disk_btotal_ps", disk_brps + disk_bwps])
+            all_readings.append([timestamp, node_name, "disk_MBreads_ps", disk_brps * 512 / (1024 * 1024)])
+            all_readings.append([timestamp, node_name, "disk_MBwrites_ps", disk_bwps * 512 / (1024 * 1024)])
+            all_readings.append([timestamp, node_name, "disk_MBtotal_ps", (disk_brps + disk_bwps) * 512 / (1024 * 1024)])
+
+    return all_readings
@@ -5,11 +5,15 @@ Generates plots for results from NUMA tests
 
 import os
 import re
+import math
+import argparse
+import multiprocessing
 from datetime import datetime
 from datetime import timedelta
 import time
 import random
 import matplotlib.pyplot as plt
+import numpy as np
 from collections import Counter, defaultdict
 from collections.abc import Iterable
 
@@ -21,17 +25,37 @@ numa_stat_result_regexp = r'^\[([0-9]+-[0-9]+-[0-9]+ [0-9]+:[0-9]+:[0-9]+)\]\s+(
 cpu_any_core_regex = r'^([0-9]+:[0-9]+:[0-9]+ [AP]M)\s+([a-z0-9]+)\s+([0-9]+\.[0-9]+)\s+([0-9]+\.[0-9]+)\s+([0-9]+\.[0-9]+)\s+([0-9]+\.[0-9]+)\s+([0-9]+\.[0-9]+)\s+([0-9]+\.[0-9]+)$'
 numa_ctl_mem_regexp=r'^\[([0-9]+-[0-9]+-[0-9]+ [0-9]+:[0-9]+:[0-9]+)\]\s+node\s+([0-9]+)\s+free:\s+([0-9]+)\s+MB$'
     
-exp_min_time = datetime.strptime('2100-01-01 00:00:00', '%Y-%m-%d %H:%M:%S')
-exp_max_time = datetime.strptime('1900-01-01 00:00:00', '%Y-%m-%d %H:%M:%S')
-
-
-# Return list of timestamps as list of seconds since the exp min time
-def ts_to_seconds(timestamps):
-    if isinstance(timestamps, Iterable):
-        return [(key - exp_min_time).total_seconds() for key in timestamps]
-    if isinstance(timestamps, datetime):
-        return (timestamps - exp_min_time).total_seconds()
-    return None
+# Lines of memaccess.csv parsed at a time, PCM writes a row per core per second so the file gets large on long runs
+memaccess_chunk_lines = 100000
+num_numa_sockets = 2
+epoch = datetime(1970, 1, 1)
+
+
+
+# Context of one NUMA results folder. Parsers extend the experiment's time range as they read readings, and all files
+# are parsed before any panel is drawn, so that all panels of the folder share the same time axis. Keeping this per
+# folder (rather than in module globals) lets several folders be processed in the same process or in parallel.
+class NumaExperiment:
+    def __init__(self, results_folder, title=None):
+        self.results_folder = results_folder
+        self.title = title
+        self.min_time = datetime.strptime('2100-01-01 00:00:00', '%Y-%m-%d %H:%M:%S')
+        self.max_time = datetime.strptime('1900-01-01 00:00:00', '%Y-%m-%d %H:%M:%S')
+
+    def get_file_path(self, file_name):
+        return os.path.join(self.results_folder, file_name)
+
+    def update_time_range(self, timestamp):
+        if timestamp < self.min_time:    self.min_time = timestamp
+        if timestamp > self.max_time:    self.max_time = timestamp
+
+    # Return list of timestamps as list of seconds since the exp min time
+    def ts_to_seconds(self, timestamps):
+        if isinstance(timestamps, Iterable):
+            return [(key - self.min_time).total_seconds() for key in timestamps]
+        if isinstance(timestamps, datetime):
+            return (timestamps - self.min_time).total_seconds()
+        return None
 
 
 def try_parse_int(str):
@@ -55,15 +79,14 @@ def parse_date_from_sar_file(first_line_in_file):
     return date_string
 
 
-def parse_get_numa_mem_alloc(results_folder, axes, hide_xlabel=False):
+# Parses mem_alloc (numastat hits). Returns per-second (node 0 local, node 1 local, node 0 remote, node 1 remote) hits.
+def parse_numa_mem_alloc(exp):
     node0_local = defaultdict(float)
     node0_remote = defaultdict(float)
     node1_local = defaultdict(float)
     node1_remote = defaultdict(float)
-    global exp_max_time
-    global exp_min_time
 
-    mem_bw_file_path = os.path.join(results_folder, "mem_alloc")
+    mem_bw_file_path = exp.get_file_path("mem_alloc")
     with open(mem_bw_file_path, "r") as lines:
 
         node0_local_previous = None
@@ -74,8 +97,7 @@ def parse_get_numa_mem_alloc(results_folder, axes, hide_xlabel=False):
             matches = re.match(numa_stat_result_regexp, line)
             if matches:
                 timestamp = datetime.strptime(matches.group(1), '%Y-%m-%d %H:%M:%S')
-                if timestamp < exp_min_time:    exp_min_time = timestamp
-                if timestamp > exp_max_time:    exp_max_time = timestamp
+                exp.update_time_range(timestamp)
 
                 label = matches.group(2)
                 node0_accesses = int(matches.group(3))
@@ -90,125 +112,186 @@ def parse_get_numa_mem_alloc(results_folder, axes, hide_xlabel=False):
                     if node1_remote_previous:    node1_remote[timestamp] = (node1_accesses - node1_remote_previous)
                     node0_remote_previous = node0_accesses
                     node1_remote_previous = node1_accesses
+    return node0_local, node1_local, node0_remote, node1_remote
 
 
+def plot_numa_mem_alloc(exp, axes, mem_alloc, hide_xlabel=False):
+    node0_local, node1_local, node0_remote, node1_remote = mem_alloc
     axes.set_title("Memory Allocator Hits")
     if not hide_xlabel: axes.set_xlabel("Time (Secs)")
     axes.get_xaxis().set_visible(not hide_xlabel)
     axes.set_ylabel("Hits")
-    axes.set_xlim(ts_to_seconds(exp_min_time), ts_to_seconds(exp_max_time))
-    axes.plot(ts_to_seconds(node0_local.keys()), node0_local.values(), label="Mem Node 0: Local", linestyle='solid')
-    axes.plot(ts_to_seconds(node1_local.keys()), node1_local.values(), label="Mem Node 1: Local", linestyle='solid')
-    axes.plot(ts_to_seconds(node0_remote.keys()), node0_remote.values(), label="Mem Node 0: Remote", linestyle='dashed')
-    axes.plot(ts_to_seconds(node1_remote.keys()), node1_remote.values(), label="Mem Node 1: Remote", linestyle='dashed')
+    axes.set_xlim(exp.ts_to_seconds(exp.min_time), exp.ts_to_seconds(exp.max_time))
+    axes.plot(exp.ts_to_seconds(node0_local.keys()), node0_local.values(), label="Mem Node 0: Local", linestyle='solid')
+    axes.plot(exp.ts_to_seconds(node1_local.keys()), node1_local.values(), label="Mem Node 1: Local", linestyle='solid')
+    axes.plot(exp.ts_to_seconds(node0_remote.keys()), node0_remote.values(), label="Mem Node 0: Remote", linestyle='dashed')
+    axes.plot(exp.ts_to_seconds(node1_remote.keys()), node1_remote.values(), label="Mem Node 1: Remote", linestyle='dashed')
     axes.legend( prop={'size': 8})
 
 
-def parse_get_numa_mem_access(results_folder, axes, hide_xlabel=False):
-    node0_local_readings = defaultdict(float)
-    node0_remote_readings = defaultdict(float)
-    node1_local_readings = defaultdict(float)
-    node1_remote_readings = defaultdict(float)
-    global exp_max_time
-    global exp_min_time
-
-    mem_bw_file_path = os.path.join(results_folder, "memaccess.csv")
-    with open(mem_bw_file_path, "r") as lines:
-
-        node0_local = 0
-        node1_local = 0
-        node0_remote = 0
-        node1_remote = 0 
-        previous_timestamp = None
-        for line in lines:
-            cols = [x.strip() for x in line.split(",") if not x.isspace()]
-            if cols.__len__() == 7 and cols[1] == "*":
-                # total accesses
-                pass
-
-            if cols.__len__() == 7 and try_parse_int(cols[1]):
-                timestamp = datetime.strptime(cols[0], '%Y-%m-%d %H:%M:%S')
-                if timestamp < exp_min_time:    exp_min_time = timestamp
-                if timestamp > exp_max_time:    exp_max_time = timestamp
-
-                cpu_id = try_parse_int(cols[1])
-                node_id = cpu_id % 2
-                local_accesses = float(cols[5])/1000000
-                remote_accesses = float(cols[6])/1000000
-
-                # If reading moves on to the next second, save details of previous second
-                # NOTE: Does not record values for last timestamp
-                if previous_timestamp and previous_timestamp != timestamp:
-                    node0_local_readings[previous_timestamp] = node0_local
-                    node1_local_readings[previous_timestamp] = node1_local
-                    node0_remote_readings[previous_timestamp] = node0_remote
-                    node1_remote_readings[previous_timestamp] = node1_remote
-                    node0_local = 0
-                    node1_local = 0
-                    node0_remote = 0
-                    node1_remote = 0
-
-                if not node_id:
-                    node0_local += local_accesses
-                    node0_remote += remote_accesses
-                else:
-                    node1_local += local_accesses
-                    node1_remote += remote_accesses
+# Readings from an Intel PCM (pcm-numa /csv) memaccess.csv file, as typed arrays with one entry per row. Rows are
+# <time, core, IPC, instructions, cycles, local DRAM accesses, remote DRAM accesses>, and the per-second total
+# rows (core "*") are kept apart from the per-core rows.
+class MemAccessReadings:
+    timestamps = None           # int64 seconds since epoch (naive local time, as PCM writes it), per core row
+    cpu_ids = None              # int64 core id, per core row
+    ipc = None                  # float64 IPC, per core row
+    local_accesses = None       # float64 local DRAM accesses, per core row
+    remote_accesses = None      # float64 remote DRAM accesses, per core row
+    total_timestamps = None     # int64 seconds since epoch, per total row
+    total_ipc = None            # float64 IPC, per total row
+
+    # Sums local and remote accesses over the cores of each NUMA socket (cores are interleaved across sockets) for
+    # every second. Returns (list of datetimes, (time x socket) local accesses, (time x socket) remote accesses).
+    def get_accesses_per_socket_per_second(self, num_sockets=num_numa_sockets):
+        seconds, time_indices = np.unique(self.timestamps, return_inverse=True)
+        sockets = self.cpu_ids % num_sockets
+        bins = time_indices * num_sockets + sockets
+        shape = (len(seconds), num_sockets)
+        local = np.bincount(bins, weights=self.local_accesses, minlength=shape[0] * shape[1]).reshape(shape)
+        remote = np.bincount(bins, weights=self.remote_accesses, minlength=shape[0] * shape[1]).reshape(shape)
+        return to_datetimes(seconds), local, remote
+
+    # IPC from the total rows, one per second (the last one if PCM wrote more than one for a second)
+    def get_ipc_per_second(self):
+        reversed_seconds = self.total_timestamps[::-1]
+        seconds, last_indices = np.unique(reversed_seconds, return_index=True)
+        return to_datetimes(seconds), self.total_ipc[::-1][last_indices]
+
+    def get_time_range(self):
+        all_timestamps = np.concatenate([self.timestamps, self.total_timestamps])
+        if not len(all_timestamps):
+            return None, None
+        return to_datetimes([all_timestamps.min(), all_timestamps.max()])
+
+
+def to_datetimes(seconds):
+    return [epoch + timedelta(seconds=int(s)) for s in seconds]
+
+
+# Parses a chunk of memaccess.csv lines into arrays. Fields are split once per line, but all the type conversions
+# happen column-wise in numpy and each distinct time string (shared by all the cores of a second) is only parsed once.
+# PCM may end lines with a comma, so trailing empty or blank fields are dropped before counting the fields.
+def parse_memaccess_chunk(lines, time_string_cache):
+    rows = []
+    for line in lines:
+        cols = line.split(",")
+        while cols and not cols[-1].strip():
+            cols.pop()
+        if len(cols) == 7:
+            rows.append(cols)
+    if not rows:
+        return None
 
-                previous_timestamp = timestamp
+    columns = np.array(rows).T
+    time_strings = np.char.strip(columns[0])
+    cpu_labels = np.char.strip(columns[1])
+    is_total = cpu_labels == "*"
+    is_core = np.char.isdigit(cpu_labels)
+
+    # Header rows have neither a core id nor "*"
+    unique_time_strings, time_indices = np.unique(time_strings[is_total | is_core], return_inverse=True)
+    unique_seconds = np.empty(len(unique_time_strings), dtype=np.int64)
+    for idx, time_string in enumerate(unique_time_strings):
+        if time_string not in time_string_cache:
+            timestamp = datetime.strptime(time_string, '%Y-%m-%d %H:%M:%S')
+            time_string_cache[time_string] = int((timestamp - epoch).total_seconds())
+        unique_seconds[idx] = time_string_cache[time_string]
+    seconds = unique_seconds[time_indices]
+    row_is_total = is_total[is_total | is_core]
+
+    return {
+        "timestamps": seconds[~row_is_total],
+        "cpu_ids": cpu_labels[is_core].astype(np.int64),
+        "ipc": columns[2][is_core].astype(np.float64),
+        "local_accesses": columns[5][is_core].astype(np.float64),
+        "remote_accesses": columns[6][is_core].astype(np.float64),
+        "total_timestamps": seconds[row_is_total],
+        "total_ipc": columns[2][is_total].astype(np.float64),
+    }
+
+
+# Reads memaccess.csv once, a chunk of lines at a time, into a MemAccessReadings
+def parse_memaccess_csv(file_path, chunk_lines=memaccess_chunk_lines):
+    chunks = []
+    time_string_cache = {}
+    with open(file_path, "r") as f:
+        while True:
+            lines = [line for _, line in zip(range(chunk_lines), f)]
+            if not lines:
+                break
+            chunk = parse_memaccess_chunk(lines, time_string_cache)
+            if chunk:
+                chunks.append(chunk)
+
+    readings = MemAccessReadings()
+    for name, dtype in [("timestamps", np.int64), ("cpu_ids", np.int64), ("ipc", np.float64),
+                        ("local_accesses", np.float64), ("remote_accesses", np.float64),
+                        ("total_timestamps", np.int64), ("total_ipc", np.float64)]:
+        values = [chunk[name] for chunk in chunks]
+        setattr(readings, name, np.concatenate(values).astype(dtype) if values else np.zeros(0, dtype=dtype))
+    return readings
+
+
+def update_exp_time_range(exp, mem_access):
+    min_time, max_time = mem_access.get_time_range()
+    if min_time is not None:
+        exp.update_time_range(min_time)
+        exp.update_time_range(max_time)
+
+
+# Parses memaccess.csv for both the IPC and the memory access panels
+def parse_numa_mem_access(exp):
+    mem_access = parse_memaccess_csv(exp.get_file_path("memaccess.csv"))
+    update_exp_time_range(exp, mem_access)
+    return mem_access
+
+
+# Plots local and remote memory accesses per NUMA socket
+def plot_numa_mem_access(exp, axes, mem_access, hide_xlabel=False):
+    timestamps, local, remote = mem_access.get_accesses_per_socket_per_second()
+    local = local / 1000000
+    remote = remote / 1000000
 
     axes.set_title("Memory Acesses")
     if not hide_xlabel: axes.set_xlabel("Time (Secs)")
     axes.get_xaxis().set_visible(not hide_xlabel)
     axes.set_ylabel("Acesses (Millions)")
-    axes.set_xlim(ts_to_seconds(exp_min_time), ts_to_seconds(exp_max_time))
-    axes.plot(ts_to_seconds(node0_local_readings.keys()), node0_local_readings.values(), label="CPU Node 0: Local", linestyle='solid')
-    axes.plot(ts_to_seconds(node1_local_readings.keys()), node1_local_readings.values(), label="CPU Node 1: Local", linestyle='solid')
-    axes.plot(ts_to_seconds(node0_remote_readings.keys()), node0_remote_readings.values(), label="CPU Node 0: Remote", linestyle='dashed')
-    axes.plot(ts_to_seconds(node1_remote_readings.keys()), node1_remote_readings.values(), label="CPU Node 1: Remote", linestyle='dashed')
+    axes.set_xlim(exp.ts_to_seconds(exp.min_time), exp.ts_to_seconds(exp.max_time))
+    seconds = exp.ts_to_seconds(timestamps)
+    axes.plot(seconds, local[:, 0], label="CPU Node 0: Local", linestyle='solid')
+    axes.plot(seconds, local[:, 1], label="CPU Node 1: Local", linestyle='solid')
+    axes.plot(seconds, remote[:, 0], label="CPU Node 0: Remote", linestyle='dashed')
+    axes.plot(seconds, remote[:, 1], label="CPU Node 1: Remote", linestyle='dashed')
     axes.legend( prop={'size': 8})
 
 
-def parse_get_numa_ipc(results_folder, axes, hide_xlabel=False):
-    ipc_readings = defaultdict(float)
-    global exp_max_time
-    global exp_min_time
-
-    mem_bw_file_path = os.path.join(results_folder, "memaccess.csv")
-    with open(mem_bw_file_path, "r") as lines:
-        for line in lines:
-            cols = [x.strip() for x in line.split(",") if not x.isspace()]
-            if cols.__len__() == 7 and cols[1] == "*":
-                timestamp = datetime.strptime(cols[0], '%Y-%m-%d %H:%M:%S')
-                if timestamp < exp_min_time:    exp_min_time = timestamp
-                if timestamp > exp_max_time:    exp_max_time = timestamp
-                ipc = float(cols[2])
-                ipc_readings[timestamp] = ipc
+# Plots IPC across all cores
+def plot_numa_ipc(exp, axes, mem_access, hide_xlabel=False):
+    timestamps, ipc = mem_access.get_ipc_per_second()
 
     axes.set_title("IPC")
     if not hide_xlabel: axes.set_xlabel("Time (Secs)")
     axes.get_xaxis().set_visible(not hide_xlabel)
     axes.set_ylabel("IPC")
-    axes.set_xlim(ts_to_seconds(exp_min_time), ts_to_seconds(exp_max_time))
-    axes.plot(ts_to_seconds(ipc_readings.keys()), ipc_readings.values())
+    axes.set_xlim(exp.ts_to_seconds(exp.min_time), exp.ts_to_seconds(exp.max_time))
+    axes.plot(exp.ts_to_seconds(timestamps), ipc)
     # axes.legend( prop={'size': 8})
 
 
-def parse_get_numa_mem_usage(results_folder, axes, hide_xlabel=False):
+# Parses mem_usage (numactl free memory). Returns per-second (node 0 used GB, node 1 used GB).
+def parse_numa_mem_usage(exp):
     node0_used = defaultdict(float)
     node1_used = defaultdict(float)
-    global exp_max_time
-    global exp_min_time
 
-    mem_bw_file_path = os.path.join(results_folder, "mem_usage")
+    mem_bw_file_path = exp.get_file_path("mem_usage")
     with open(mem_bw_file_path, "r") as lines:
         for line in lines:        
 
             matches = re.match(numa_ctl_mem_regexp, line)
             if matches:
                 timestamp = datetime.strptime(matches.group(1), '%Y-%m-%d %H:%M:%S')
-                if timestamp < exp_min_time:    exp_min_time = timestamp
-                if timestamp > exp_max_time:    exp_max_time = timestamp
+                exp.update_time_range(timestamp)
 
                 node_id = int(matches.group(2))
                 mem_free_mb = float(matches.group(3))
@@ -216,25 +299,28 @@ def parse_get_numa_mem_usage(results_folder, axes, hide_xlabel=False):
                     node1_used[timestamp] = (129015 - mem_free_mb)/1024
                 else:
                     node0_used[timestamp] = (128492 - mem_free_mb)/1024
+    return node0_used, node1_used
 
+
+def plot_numa_mem_usage(exp, axes, mem_usage, hide_xlabel=False):
+    node0_used, node1_used = mem_usage
     axes.set_title("Memory Usage")
     if not hide_xlabel: axes.set_xlabel("Time (Secs)")
     axes.get_xaxis().set_visible(not hide_xlabel)
     axes.set_ylabel("GB")
-    axes.set_xlim(ts_to_seconds(exp_min_time), ts_to_seconds(exp_max_time))
-    axes.plot(ts_to_seconds(node0_used.keys()), node0_used.values(), label="Node 0", linestyle='solid')
-    axes.plot(ts_to_seconds(node1_used.keys()), node1_used.values(), label="Node 1", linestyle='solid')
+    axes.set_xlim(exp.ts_to_seconds(exp.min_time), exp.ts_to_seconds(exp.max_time))
+    axes.plot(exp.ts_to_seconds(node0_used.keys()), node0_used.values(), label="Node 0", linestyle='solid')
+    axes.plot(exp.ts_to_seconds(node1_used.keys()), node1_used.values(), label="Node 1", linestyle='solid')
     axes.legend(prop={'size': 8})
 
 
-def parse_get_numa_cpu_usage(results_folder, axes, hide_xlabel=False):
+# Parses cpu_usage (SAR per-core output). Returns per-second (node 0 CPU %, node 1 CPU %).
+def parse_numa_cpu_usage(exp):
     total_cpu_readings = defaultdict(float)
     node0_cpu_readings = defaultdict(float)
     node1_cpu_readings = defaultdict(float)
-    global exp_max_time
-    global exp_min_time
 
-    cpu_file_path = os.path.join(results_folder, "cpu_usage")
+    cpu_file_path = exp.get_file_path("cpu_usage")
     with open(cpu_file_path, "r") as lines:
         node0_cpu = 0
         node1_cpu = 0
@@ -253,8 +339,7 @@ def parse_get_numa_cpu_usage(results_folder, axes, hide_xlabel=False):
                 time_string = matches.group(1)
                 time_part = datetime.strptime(time_string, '%I:%M:%S %p')
                 timestamp = date_part.replace(hour=time_part.hour, minute=time_part.minute, second=time_part.second)
-                if timestamp < exp_min_time:    exp_min_time = timestamp
-                if timestamp > exp_max_time:    exp_max_time = timestamp
+                exp.update_time_range(timestamp)
 
                 # If reading moves on to the next second, save details of previous second
                 # NOTE: Does not record values for last timestamp
@@ -280,19 +365,92 @@ def parse_get_numa_cpu_usage(results_folder, axes, hide_xlabel=False):
                         node1_cpu += cpu_total_usage
 
                 previous_timestamp = timestamp
+    return node0_cpu_readings, node1_cpu_readings
 
 
+def plot_numa_cpu_usage(exp, axes, cpu_usage, hide_xlabel=False):
+    node0_cpu_readings, node1_cpu_readings = cpu_usage
     axes.set_title("CPU Usage")
     if not hide_xlabel: axes.set_xlabel("Time (Secs)")
     axes.get_xaxis().set_visible(not hide_xlabel)
-    axes.set_xlim(ts_to_seconds(exp_min_time), ts_to_seconds(exp_max_time))
+    axes.set_xlim(exp.ts_to_seconds(exp.min_time), exp.ts_to_seconds(exp.max_time))
     axes.set_ylabel("%")
     # axes.plot(total_cpu_readings.keys(), total_cpu_readings.values(), label="Total")
-    axes.plot(ts_to_seconds(node0_cpu_readings.keys()), node0_cpu_readings.values(), label="Node 0")
-    axes.plot(ts_to_seconds(node1_cpu_readings.keys()), node1_cpu_readings.values(), label="Node 1")
+    axes.plot(exp.ts_to_seconds(node0_cpu_readings.keys()), node0_cpu_readings.values(), label="Node 0")
+    axes.plot(exp.ts_to_seconds(node1_cpu_readings.keys()), node1_cpu_readings.values(), label="Node 1")
     axes.legend(prop={'size': 8})
 
 
+# Parser of each NUMA readings file
+numa_file_parsers = {
+    "cpu_usage": parse_numa_cpu_usage,
+    "mem_usage": parse_numa_mem_usage,
+    "memaccess.csv": parse_numa_mem_access,
+    "mem_alloc": parse_numa_mem_alloc,
+}
+
+# NUMA panels in the order they are laid out, with the file each one is drawn from
+numa_panels = [
+    ("cpu_usage", plot_numa_cpu_usage),
+    ("mem_usage", plot_numa_mem_usage),
+    ("memaccess.csv", plot_numa_ipc),
+    ("memaccess.csv", plot_numa_mem_access),
+    ("mem_alloc", plot_numa_mem_alloc),
+]
+
+
+# Generates the combined NUMA plot for one results folder, with a panel for each kind of readings available in it.
+# Returns full path to the plot.
+def generate_numa_report(results_folder, output_plot_file_name="numa_plot.png"):
+    exp = NumaExperiment(results_folder)
+
+    # Get description if exists
+    desc_file = exp.get_file_path("desc")
+    exp.title = open(desc_file, 'r').read() if os.path.exists(desc_file) else os.path.basename(results_folder)
+
+    panels = [(file_name, plot_func) for file_name, plot_func in numa_panels
+              if os.path.exists(exp.get_file_path(file_name))]
+
+    # Parse every file (once, even if several panels are drawn from it) before drawing, so that all panels are drawn
+    # against the time range of all the readings
+    parsed_files = {file_name: numa_file_parsers[file_name](exp) for file_name, _ in panels}
+
+    rows = max(1, int(math.ceil(len(panels) / 2.0)))
+
+    fig = plt.figure()
+    fig.set_size_inches(w=10, h=2.5 * rows)
+    fig.suptitle(exp.title)
+    grid = plt.GridSpec(rows, 2, wspace=0.4, hspace=0.3)
+
+    for idx, (file_name, plot_func) in enumerate(panels):
+        axes = fig.add_subplot(grid[idx // 2, idx % 2])
+        plot_func(exp, axes, parsed_files[file_name], hide_xlabel=idx + 2 < len(panels))
+
+    output_full_path = os.path.join(results_folder, output_plot_file_name)
+    fig.savefig(output_full_path)
+    plt.close(fig)
+    return output_full_path
+
+
+def _generate_numa_report(report):
+    return generate_numa_report(*report)
+
+
+# Generates NUMA plots for a list of <results folder, output plot file name> in a pool of processes (one per CPU by
+# default). Returns full paths to the plots in the same order.
+def generate_numa_reports(reports, processes=None):
+    reports = list(reports)
+    if processes == 1 or len(reports) <= 1:
+        return [generate_numa_report(*report) for report in reports]
+
+    pool = multiprocessing.Pool(processes=processes)
+    try:
+        return pool.map(_generate_numa_report, reports, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+
+
 def main():
     
     experiments = [
@@ -314,36 +472,19 @@ def main():
 
     experiments = ["SortTestRun9", "SortTestRun10", "SortTestRun11", "SortTestRun12"]
 
-    global exp_max_time
-    global exp_min_time
-    for idx, exp_folder in enumerate(experiments):
-        results_folder = os.path.join("results", exp_folder)
-        exp_min_time = datetime.strptime('2100-01-01 00:00:00', '%Y-%m-%d %H:%M:%S')
-        exp_max_time = datetime.strptime('1900-01-01 00:00:00', '%Y-%m-%d %H:%M:%S')
-
-        # Get description if exists
-        desc_file = os.path.join(results_folder, "desc")
-        if os.path.exists(desc_file):
-            title = open(desc_file, 'r').read()
-
-        fig = plt.figure()
-        fig.set_size_inches(w=10,h=5)
-        fig.suptitle(title)
-        grid = plt.GridSpec(4, 4, wspace=0.4, hspace=0.3)
-        
-        parse_get_numa_cpu_usage(results_folder, axes=plt.subplot(grid[0:2, 0:2]), hide_xlabel=True)
-        # parse_get_numa_mem_alloc(results_folder, axes=plt.subplot(grid[2:4, 0:2]))
-        parse_get_numa_ipc(results_folder, axes=plt.subplot(grid[2:4, 0:2]))
-        parse_get_numa_mem_usage(results_folder, axes=plt.subplot(grid[0:2, 2:4]), hide_xlabel=True)
-        parse_get_numa_mem_access(results_folder, axes=plt.subplot(grid[2:4, 2:4]))
-
-
-        output_plot_file_name = "numa_plot_{0}_v2.png".format(idx)
-        output_full_path = os.path.join(results_folder, output_plot_file_name)
-        plt.savefig(output_full_path)
-        # plt.show()
-        plt.close()
+    parser = argparse.ArgumentParser("Generates NUMA plots for one or more NUMA results folders")
+    parser.add_argument('folders', action='store', nargs='*', help='results folders, defaults to the ones listed in main()')
+    parser.add_argument('--processes', action='store', type=int, help='number of folders processed in parallel')
+    args = parser.parse_args()
+
+    if args.folders:
+        reports = [(folder, "numa_plot.png") for folder in args.folders]
+    else:
+        reports = [(os.path.join("results", exp_folder), "numa_plot_{0}_v2.png".format(idx))
+                   for idx, exp_folder in enumerate(experiments)]
 
+    for output_full_path in generate_numa_reports(reports, args.processes):
+        print("Generated " + output_full_path)
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -0,0 +1,216 @@
+"""
+Aggregates network packet traces into bytes per second per <peer, service, direction> of a node, in bounded memory
+"""
+
+import socket
+import struct
+from datetime import datetime
+import numpy as np
+
+
+# Packets are read and reduced this many at a time
+trace_chunk_packets = 1000000
+# Bit layout of the aggregation keys: <epoch second, peer code, port, direction>
+_peer_bits = 12
+_port_bits = 16
+_direction_bits = 1
+direction_outbound = 0
+direction_inbound = 1
+
+
+def ip_to_uint32(ip_string):
+    return struct.unpack("!I", socket.inet_aton(ip_string))[0]
+
+
+def uint32_to_ip(ip_value):
+    return socket.inet_ntoa(struct.pack("!I", int(ip_value)))
+
+
+# Converts an array of dotted IP strings to uint32, parsing each distinct address only once
+def ip_strings_to_uint32(ip_strings):
+    unique_ips, indices = np.unique(ip_strings, return_inverse=True)
+    return np.array([ip_to_uint32(ip) for ip in unique_ips], dtype=np.uint32)[indices]
+
+
+# Maps IPs to small categorical peer codes. Known node IPs are resolved through a sorted lookup table built once,
+# any other address gets a code of its own the first time it shows up.
+class PeerLookup:
+    def __init__(self, ip_to_node):
+        self.peer_names = sorted(set(ip_to_node.values()))
+        node_codes = {name: code for code, name in enumerate(self.peer_names)}
+        known = sorted((ip_to_uint32(ip), node_codes[name]) for ip, name in ip_to_node.items())
+        self.known_ips = np.array([ip for ip, _ in known], dtype=np.uint32)
+        self.known_codes = np.array([code for _, code in known], dtype=np.int64)
+        self.other_codes = {}
+
+    def get_codes(self, ips):
+        codes = np.full(len(ips), -1, dtype=np.int64)
+        if len(self.known_ips):
+            positions = np.minimum(np.searchsorted(self.known_ips, ips), len(self.known_ips) - 1)
+            is_known = self.known_ips[positions] == ips
+            codes[is_known] = self.known_codes[positions[is_known]]
+        else:
+            is_known = np.zeros(len(ips), dtype=bool)
+
+        # Addresses of hosts that are not cluster nodes
+        if not is_known.all():
+            unique_ips, indices = np.unique(ips[~is_known], return_inverse=True)
+            unique_codes = np.empty(len(unique_ips), dtype=np.int64)
+            for idx, ip in enumerate(unique_ips.tolist()):
+                if ip not in self.other_codes:
+                    self.other_codes[ip] = len(self.peer_names)
+                    self.peer_names.append(uint32_to_ip(ip))
+                unique_codes[idx] = self.other_codes[ip]
+            codes[~is_known] = unique_codes[indices]
+
+        if len(self.peer_names) > (1 << _peer_bits):
+            raise ValueError("Too many distinct peers in the trace ({0})".format(len(self.peer_names)))
+        return codes
+
+    def get_code(self, node_name):
+        return self.peer_names.index(node_name) if node_name in self.peer_names else None
+
+
+# Bytes per second per <peer, service port, direction> of one node. All arrays are aligned, one entry per key.
+class PacketTraceAggregate:
+    seconds = None          # int64 epoch seconds
+    peer_codes = None       # int64 peer codes, see peer_names
+    ports = None            # int64 port of the service on the peer side
+    directions = None       # int64 direction_outbound or direction_inbound
+    total_bytes = None      # float64 bytes
+    peer_names = None       # Peer name (node name or IP) by peer code
+
+    # Total bytes per second in a direction. Returns (list of datetimes, bytes array).
+    def get_total_per_second(self, direction):
+        selected = self.directions == direction
+        seconds, indices = np.unique(self.seconds[selected], return_inverse=True)
+        return to_datetimes(seconds), np.bincount(indices, weights=self.total_bytes[selected], minlength=len(seconds))
+
+    # Bytes per second of each <peer, service> in a direction. Returns {(peer name, port): (datetimes, bytes array)}
+    # for the top_n of them by total bytes (or all of them).
+    def get_per_peer_service(self, direction, top_n=None):
+        selected = self.directions == direction
+        seconds = self.seconds[selected]
+        total_bytes = self.total_bytes[selected]
+        pairs = self.peer_codes[selected] << _port_bits | self.ports[selected]
+        unique_pairs, pair_indices = np.unique(pairs, return_inverse=True)
+        pair_totals = np.bincount(pair_indices, weights=total_bytes, minlength=len(unique_pairs))
+
+        # Group readings by pair (and by time within a pair) once, then slice out the pairs asked for
+        order = np.lexsort((seconds, pair_indices))
+        boundaries = np.searchsorted(pair_indices[order], np.arange(len(unique_pairs) + 1))
+
+        result = {}
+        for pair_index in np.argsort(-pair_totals, kind="stable")[:top_n]:
+            pair = int(unique_pairs[pair_index])
+            in_pair = order[boundaries[pair_index]:boundaries[pair_index + 1]]
+            label = (self.peer_names[pair >> _port_bits], pair & ((1 << _port_bits) - 1))
+            result[label] = (to_datetimes(seconds[in_pair]), total_bytes[in_pair])
+        return result
+
+
+def to_datetimes(seconds):
+    return [datetime.fromtimestamp(s) for s in seconds.tolist()]
+
+
+# Reduces packets of a trace, chunk by chunk, into bytes per <second, peer, service port, direction> as seen from
+# source_node. Memory depends on the number of distinct keys, not on the number of packets. Packets from the node to
+# itself are an error, unless ignore_self_traffic is set.
+class PacketTraceAggregator:
+    def __init__(self, source_node, ip_to_node, ignore_self_traffic=False):
+        self.peer_lookup = PeerLookup(ip_to_node)
+        self.source_code = self.peer_lookup.get_code(source_node)
+        if self.source_code is None:
+            raise ValueError("No IP address known for node {0}".format(source_node))
+        self.ignore_self_traffic = ignore_self_traffic
+        self.keys = np.zeros(0, dtype=np.int64)
+        self.total_bytes = np.zeros(0, dtype=np.float64)
+        self.pending_keys = []
+        self.pending_bytes = []
+        self.pending_count = 0
+        self.packets = 0
+
+    # Adds a chunk of packets, given as aligned arrays
+    def add_packets(self, timestamps, src_ips, src_ports, dst_ips, dst_ports, frame_lengths):
+        src_codes = self.peer_lookup.get_codes(np.asarray(src_ips, dtype=np.uint32))
+        dst_codes = self.peer_lookup.get_codes(np.asarray(dst_ips, dtype=np.uint32))
+        is_outbound = src_codes == self.source_code
+        is_inbound = dst_codes == self.source_code
+        is_self = is_outbound & is_inbound
+        if self.ignore_self_traffic:
+            is_outbound &= ~is_self
+            is_inbound &= ~is_self
+        elif np.any(is_self):
+            raise ValueError("Packets from {0} to itself in the trace".format(self.peer_lookup.peer_names[self.source_code]))
+
+        # Only packets from or to the node count, the peer and service are on the other end
+        selected = is_outbound | is_inbound
+        is_outbound = is_outbound[selected]
+        seconds = np.floor(np.asarray(timestamps, dtype=np.float64)[selected]).astype(np.int64)
+        peers = np.where(is_outbound, dst_codes[selected], src_codes[selected])
+        ports = np.where(is_outbound, np.asarray(dst_ports)[selected], np.asarray(src_ports)[selected]).astype(np.int64)
+        directions = np.where(is_outbound, direction_outbound, direction_inbound)
+        keys = (((seconds << _peer_bits | peers) << _port_bits | ports) << _direction_bits) | directions
+
+        unique_keys, indices = np.unique(keys, return_inverse=True)
+        chunk_bytes = np.bincount(indices, weights=np.asarray(frame_lengths, dtype=np.float64)[selected],
+                                  minlength=len(unique_keys))
+        self.pending_keys.append(unique_keys)
+        self.pending_bytes.append(chunk_bytes)
+        self.pending_count += len(unique_keys)
+        self.packets += int(selected.sum())
+
+        # Fold chunk results into the running totals once they add up to about a chunk's worth
+        if self.pending_count > trace_chunk_packets:
+            self._merge_pending()
+
+    def _merge_pending(self):
+        if not self.pending_keys:
+            return
+        keys = np.concatenate([self.keys] + self.pending_keys)
+        total_bytes = np.concatenate([self.total_bytes] + self.pending_bytes)
+        self.keys, indices = np.unique(keys, return_inverse=True)
+        self.total_bytes = np.bincount(indices, weights=total_bytes, minlength=len(self.keys))
+        self.pending_keys = []
+        self.pending_bytes = []
+        self.pending_count = 0
+
+    def get_aggregate(self):
+        self._merge_pending()
+        keys = self.keys
+        aggregate = PacketTraceAggregate()
+        aggregate.directions = keys & ((1 << _direction_bits) - 1)
+        keys = keys >> _direction_bits
+        aggregate.ports = keys & ((1 << _port_bits) - 1)
+        keys = keys >> _port_bits
+        aggregate.peer_codes = keys & ((1 << _peer_bits) - 1)
+        aggregate.seconds = keys >> _peer_bits
+        aggregate.total_bytes = self.total_bytes
+        aggregate.peer_names = list(self.peer_lookup.peer_names)
+        return aggregate
+
+
+# Reads a text packet trace with one "<epoch time> <src ip> <src port> <dst ip> <dst port> <frame length>" line per
+# packet (as dumped by tshark) and yields chunks of packets as arrays. Malformed lines are skipped.
+def iterate_text_trace_chunks(trace_file_path, chunk_packets=trace_chunk_packets):
+    with open(trace_file_path, "r") as f:
+        while True:
+            lines = [line for _, line in zip(range(chunk_packets), f)]
+            if not lines:
+                break
+            rows = [fields for fields in (line.split() for line in lines) if len(fields) == 6]
+            if not rows:
+                continue
+            columns = np.array(rows).T
+            yield (columns[0].astype(np.float64),
+                   ip_strings_to_uint32(columns[1]), columns[2].astype(np.int64),
+                   ip_strings_to_uint32(columns[3]), columns[4].astype(np.int64),
+                   columns[5].astype(np.float64))
+
+
+# Aggregates packet chunks (from iterate_text_trace_chunks or a capture reader) for one node
+def aggregate_packet_chunks(packet_chunks, source_node, ip_to_node, ignore_self_traffic=False):
+    aggregator = PacketTraceAggregator(source_node, ip_to_node, ignore_self_traffic)
+    for chunk in packet_chunks:
+        aggregator.add_packets(*chunk)
+    return aggregator.get_aggregate()
@@ -0,0 +1,202 @@
+"""
+Reads packets from pcap and pcapng captures into the chunks of arrays that packet_trace aggregates, without a text
+dump of the capture in between
+"""
+
+import os
+import mmap
+import struct
+from array import array
+import numpy as np
+import packet_trace
+
+
+# Classic pcap file magics, as read little-endian: (byte order of the file, ticks per second of the timestamps)
+_pcap_magics = {
+    0xa1b2c3d4: ("<", 1000000), 0xd4c3b2a1: (">", 1000000),
+    0xa1b23c4d: ("<", 1000000000), 0x4d3cb2a1: (">", 1000000000),
+}
+_pcapng_section_header = 0x0a0d0d0a
+_pcapng_byte_order_magic = 0x1a2b3c4d
+_pcapng_interface_description = 0x00000001
+_pcapng_enhanced_packet = 0x00000006
+_pcapng_option_tsresol = 9
+
+# Link layer types handled and the offset of their ethertype field, -1 if packets start at the IP header
+linktype_ethernet = 1
+linktype_raw_ip = 101
+linktype_linux_sll = 113
+linktype_ipv4 = 228
+_ethertype_offsets = {linktype_ethernet: 12, linktype_linux_sll: 14, linktype_raw_ip: -1, linktype_ipv4: -1}
+_ethertype_ipv4 = 0x0800
+_ethertype_vlan = 0x8100
+_ip_protocols = [6, 17]  # TCP and UDP, both have the ports first in their header
+# Size of the classic pcap file header, the smallest a capture with any packets can be (pcapng starts with more)
+_min_capture_size = 24
+
+
+# Reads 8/16/32 bit big-endian fields at the given offsets of the capture in one go. Offsets past the end read as 0.
+def _read_be(data, offsets, num_bytes):
+    offsets = np.minimum(offsets, len(data) - num_bytes)
+    value = np.zeros(len(offsets), dtype=np.int64)
+    for i in range(num_bytes):
+        value = value << 8 | data[offsets + i]
+    return value
+
+
+# Pulls the IPv4 TCP/UDP fields out of a batch of records in bulk. data is the whole capture as a uint8 array and
+# records are aligned arrays of where each packet starts, how much of it was captured and its link layer type.
+# Returns the chunk of the packets that have all the fields in the capture, in the packet_trace order.
+def extract_packet_fields(data, packet_offsets, captured_lengths, link_types, timestamps, frame_lengths):
+    ethertype_offsets = np.full(len(link_types), -2, dtype=np.int64)
+    for link_type, ethertype_offset in _ethertype_offsets.items():
+        ethertype_offsets[link_types == link_type] = ethertype_offset
+
+    # Where the IP header starts, after an optional VLAN tag
+    is_ip = ethertype_offsets == -1
+    ip_offsets = np.zeros(len(link_types), dtype=np.int64)
+    has_ethertype = (ethertype_offsets >= 0) & (captured_lengths >= ethertype_offsets + 2)
+    ethertypes = _read_be(data, packet_offsets + ethertype_offsets, 2)
+    is_vlan = has_ethertype & (ethertypes == _ethertype_vlan) & (captured_lengths >= ethertype_offsets + 6)
+    ethertypes[is_vlan] = _read_be(data, packet_offsets[is_vlan] + ethertype_offsets[is_vlan] + 4, 2)
+    is_ip |= has_ethertype & (ethertypes == _ethertype_ipv4)
+    ip_offsets[has_ethertype] = ethertype_offsets[has_ethertype] + 2 + np.where(is_vlan[has_ethertype], 4, 0)
+
+    # IPv4 TCP/UDP packets captured at least up to the ports
+    first_bytes = _read_be(data, packet_offsets + ip_offsets, 1)
+    header_lengths = (first_bytes & 0x0f) * 4
+    protocols = _read_be(data, packet_offsets + ip_offsets + 9, 1)
+    selected = (is_ip & (captured_lengths >= ip_offsets + 20) & (first_bytes >> 4 == 4) & (header_lengths >= 20) &
+                np.isin(protocols, _ip_protocols) & (captured_lengths >= ip_offsets + header_lengths + 4))
+
+    ip_starts = packet_offsets[selected] + ip_offsets[selected]
+    port_starts = ip_starts + header_lengths[selected]
+    return (timestamps[selected],
+            _read_be(data, ip_starts + 12, 4).astype(np.uint32), _read_be(data, port_starts, 2),
+            _read_be(data, ip_starts + 16, 4).astype(np.uint32), _read_be(data, port_starts + 2, 2),
+            frame_lengths[selected].astype(np.float64))
+
+
+# Record batches being collected while walking the capture. Only the record headers get read one by one, packet
+# contents stay in the mapped file until the whole batch gets extracted.
+class _RecordBatch:
+    def __init__(self):
+        self.packet_offsets = array("q")
+        self.captured_lengths = array("q")
+        self.link_types = array("q")
+        self.timestamps = array("d")
+        self.frame_lengths = array("q")
+
+    def __len__(self):
+        return len(self.packet_offsets)
+
+    def add(self, packet_offset, captured_length, link_type, timestamp, frame_length):
+        self.packet_offsets.append(packet_offset)
+        self.captured_lengths.append(captured_length)
+        self.link_types.append(link_type)
+        self.timestamps.append(timestamp)
+        self.frame_lengths.append(frame_length)
+
+    def extract(self, data):
+        return extract_packet_fields(data, np.frombuffer(self.packet_offsets, dtype=np.int64),
+                                     np.frombuffer(self.captured_lengths, dtype=np.int64),
+                                     np.frombuffer(self.link_types, dtype=np.int64),
+                                     np.frombuffer(self.timestamps, dtype=np.float64),
+                                     np.frombuffer(self.frame_lengths, dtype=np.int64))
+
+
+# Walks the records of a classic pcap capture
+def _iterate_pcap_records(buffer):
+    byte_order, ticks_per_sec = _pcap_magics[struct.unpack_from("<I", buffer, 0)[0]]
+    link_type = struct.unpack_from(byte_order + "I", buffer, 20)[0] & 0x0fffffff
+    record_header = struct.Struct(byte_order + "IIII")
+    offset = 24
+    while offset + record_header.size <= len(buffer):
+        ts_secs, ts_ticks, captured_length, frame_length = record_header.unpack_from(buffer, offset)
+        offset += record_header.size
+        # A capture cut short while being written ends with a partial record
+        captured_length = min(captured_length, len(buffer) - offset)
+        yield offset, captured_length, link_type, ts_secs + ts_ticks / ticks_per_sec, frame_length
+        offset += captured_length
+
+
+def _get_tsresol(buffer, options_start, options_end, byte_order):
+    offset = options_start
+    while offset + 4 <= options_end:
+        code, length = struct.unpack_from(byte_order + "HH", buffer, offset)
+        if code == 0:
+            break
+        if code == _pcapng_option_tsresol and length >= 1:
+            value = buffer[offset + 4]
+            return 2.0 ** -(value & 0x7f) if value & 0x80 else 10.0 ** -value
+        offset += 4 + (length + 3) // 4 * 4
+    return 1e-6
+
+
+# Walks the enhanced packet blocks of a pcapng capture. Every section has its own byte order and interfaces.
+def _iterate_pcapng_records(buffer):
+    byte_order = "<"
+    interfaces = []
+    offset = 0
+    while offset + 12 <= len(buffer):
+        block_type = struct.unpack_from(byte_order + "I", buffer, offset)[0]
+        if block_type == _pcapng_section_header:
+            byte_order = "<" if struct.unpack_from("<I", buffer, offset + 8)[0] == _pcapng_byte_order_magic else ">"
+            interfaces = []
+        block_length = struct.unpack_from(byte_order + "I", buffer, offset + 4)[0]
+        if block_length < 12 or offset + block_length > len(buffer):
+            break
+
+        if block_type == _pcapng_interface_description:
+            link_type = struct.unpack_from(byte_order + "H", buffer, offset + 8)[0]
+            interfaces.append((link_type, _get_tsresol(buffer, offset + 16, offset + block_length - 4, byte_order)))
+        elif block_type == _pcapng_enhanced_packet:
+            interface_id, ts_high, ts_low, captured_length, frame_length = struct.unpack_from(
+                byte_order + "IIIII", buffer, offset + 8)
+            link_type, tsresol = interfaces[interface_id]
+            captured_length = min(captured_length, block_length - 32)
+            yield offset + 28, captured_length, link_type, ((ts_high << 32) | ts_low) * tsresol, frame_length
+        offset += block_length
+
+
+# Reads a pcap or pcapng capture and yields chunks of IPv4 TCP/UDP packets as arrays, in the same format as
+# packet_trace.iterate_text_trace_chunks. The capture is memory-mapped, so files larger than memory work too. A capture
+# shorter than a file header (e.g., empty as the capture got stopped before any packet) has no chunks.
+def iterate_capture_chunks(capture_file_path, chunk_packets=packet_trace.trace_chunk_packets):
+    if os.path.getsize(capture_file_path) < _min_capture_size:
+        return
+    with open(capture_file_path, "rb") as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    data = np.frombuffer(buffer, dtype=np.uint8)
+    try:
+        magic = struct.unpack_from("<I", buffer, 0)[0]
+        if magic in _pcap_magics:
+            records = _iterate_pcap_records(buffer)
+        elif magic == _pcapng_section_header:
+            records = _iterate_pcapng_records(buffer)
+        else:
+            raise ValueError("{0} is not a pcap or pcapng capture".format(capture_file_path))
+
+        batch = _RecordBatch()
+        for record in records:
+            batch.add(*record)
+            if len(batch) >= chunk_packets:
+                yield batch.extract(data)
+                batch = _RecordBatch()
+        if len(batch):
+            yield batch.extract(data)
+    finally:
+        # The map can only be closed once no array points into it anymore
+        del data
+        buffer.close()
+
+
+# Gets the chunks of the packet trace saved at trace_path, from a .pcapng or .pcap capture there if there is one or
+# else from the text dump at trace_path itself. Returns None if there is no trace.
+def open_trace_chunks(trace_path, chunk_packets=packet_trace.trace_chunk_packets):
+    for capture_path in [trace_path + ".pcapng", trace_path + ".pcap"]:
+        if os.path.exists(capture_path):
+            return iterate_capture_chunks(capture_path, chunk_packets)
+    if os.path.exists(trace_path):
+        return packet_trace.iterate_text_trace_chunks(trace_path, chunk_packets)
+    return None
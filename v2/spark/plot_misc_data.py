@@ -12,16 +12,17 @@ import random
 import matplotlib.pyplot as plt
 from collections import Counter, defaultdict
 import plot_one_experiment
+from cpu_core_usage import parse_cpu_core_usage, group_by_numa_socket
 import socket
 import run_experiments
+import packet_trace
+import pcap_reader
 
 
 # A simplified way to get IP Addr to Node name mapping
+ip_to_node_dict = {addr[1]: node for node, addr in run_experiments.fat_tree_ip_mac_map.items()}
 def ip_to_name(node_name):
-    ip_to_node_dict = {}
-    for node, addr in run_experiments.fat_tree_ip_mac_map.items():
-        ip_to_node_dict[addr[1]] = node
-    return ip_to_node_dict[node_name] if node_name in ip_to_node_dict.keys() else node_name
+    return ip_to_node_dict.get(node_name, node_name)
 
 
 # A simplified way to get port to svc name mapping
@@ -80,46 +81,15 @@ def plot_network_pkt_trace():
     # Others (b09-38): "Exp-2019-04-16-15-40-02"
     experiment_dir_path = os.path.join(plot_one_experiment.results_base_dir, experiment_id)
     net_pkt_trace_path = os.path.join(experiment_dir_path, "net_usage_breakdown")
-    line_regex = r'^([0-9]+.[0-9]+)\s+([0-9]+.[0-9]+.[0-9]+.[0-9]+)\s+([0-9]+)\s+([0-9]+.[0-9]+.[0-9]+.[0-9]+)\s+([0-9]+)\s+([0-9]+)$'
-    # line_regex = r'^([0-9]+.[0-9]+)\s+(.+)\s+([0-9]+)$'
 
-    thrpt_out_by_label = {}
-    thrpt_in_by_label = {}
-    total_thrpt_in = Counter()
-    total_thrpt_out = Counter()
-    with open(net_pkt_trace_path, "r") as lines:
-        for line in lines:
-            matches = re.match(line_regex, line)
-            ts = datetime.fromtimestamp(int(float(matches.group(1))))
-            # protocol = matches.group(2)
-            src_ip = matches.group(2)
-            src_name = ip_to_name(src_ip)
-            src_port = int(matches.group(3))
-            dst_ip = matches.group(4)
-            dst_name = ip_to_name(dst_ip)
-            dst_port = int(matches.group(5))
-            frame_size = float(matches.group(3))
-
-            if src_name == source_node:
-                label = dst_name + ":" + port_to_svc(dst_port)
-                if label not in thrpt_out_by_label.keys():
-                    thrpt_out_by_label[label] = Counter()
-                thrpt_out_by_label[label][ts] += frame_size
-                total_thrpt_out[ts] += frame_size           
-            
-            if dst_name == source_node:
-                label = src_name + ":" + port_to_svc(src_port)
-                if label not in thrpt_in_by_label.keys():
-                    thrpt_in_by_label[label] = Counter()
-                thrpt_in_by_label[label][ts] += frame_size
-                total_thrpt_in[ts] += frame_size
-            
-            if src_name == source_node and dst_name == source_node:
-                raise Exception("Boom!! Not what I expect")
+    # Bytes per second per <peer, service, direction>, reduced chunk by chunk from the capture itself if it is there,
+    # or else from the one line per packet text dump of it
+    aggregate = packet_trace.aggregate_packet_chunks(pcap_reader.open_trace_chunks(net_pkt_trace_path), source_node,
+                                                     ip_to_node_dict)
 
     for type_ in ["outbound", "inbound"]:
-        total_thrpt = total_thrpt_in if type_ == "inbound" else total_thrpt_out
-        thrpt_by_label = thrpt_in_by_label if type_ == "inbound" else thrpt_out_by_label
+        direction = packet_trace.direction_inbound if type_ == "inbound" else packet_trace.direction_outbound
+        total_timestamps, total_bytes = aggregate.get_total_per_second(direction)
 
         # Plot total throughput
         fig, ax = plt.subplots(1, 1)
@@ -127,7 +97,7 @@ def plot_network_pkt_trace():
         fig.suptitle("Net {0} xput on b09-32: tshark - with capture drops".format(type_))
         ax.set_xlabel("Time secs")
         ax.set_ylabel("Network throughput Mbps")
-        ax.plot(total_thrpt.keys(), [v*8.0/1000000 for v in total_thrpt.values()])
+        ax.plot(total_timestamps, total_bytes*8.0/1000000)
         output_full_path = os.path.join(experiment_dir_path, "net_{0}_tshark_total_thrpt.png".format(type_))
         plt.savefig(output_full_path)
         # plt.show()
@@ -139,9 +109,9 @@ def plot_network_pkt_trace():
         fig.suptitle("Net {0} xput by <dst host, port> on b09-32: tshark - with capture drops".format(type_))
         ax.set_xlabel("Time secs")
         ax.set_ylabel("Network throughput Mbps")
-        top_10_flows_by_total_usage = sorted(thrpt_by_label.keys(), key=lambda k: sum(thrpt_by_label[k].values()), reverse=True)[:30]
-        for label in top_10_flows_by_total_usage:
-            ax.plot(thrpt_by_label[label].keys(), [v*8.0/1000000 for v in thrpt_by_label[label].values()], label=label)
+        top_30_flows_by_total_usage = aggregate.get_per_peer_service(direction, top_n=30)
+        for (peer_name, port), (timestamps, values) in top_30_flows_by_total_usage.items():
+            ax.plot(timestamps, values*8.0/1000000, label=peer_name + ":" + port_to_svc(port))
         plt.legend()
         output_full_path = os.path.join(experiment_dir_path, "net_{0}_tshark_thrpt_30.png".format(type_))
         plt.savefig(output_full_path)
@@ -182,63 +152,16 @@ def plot_numa_mem_access():
         # plt.show()
 
 
-# Collects all results from SAR and Powermeter, parses for required info and merges results onto single timeline.
-cpu_any_core_regex = r'^([0-9]+:[0-9]+:[0-9]+ [AP]M)\s+([a-z0-9]+)\s+([0-9]+\.[0-9]+)\s+([0-9]+\.[0-9]+)\s+([0-9]+\.[0-9]+)\s+([0-9]+\.[0-9]+)\s+([0-9]+\.[0-9]+)\s+([0-9]+\.[0-9]+)$'
-
+# Plots CPU usage per NUMA socket from the per-core SAR readings of a node
 def plot_numa_cpu_usage():
     experiment_id = "Exp-2019-07-02-18-05-51"
     experiment_folder_path = os.path.join(plot_one_experiment.results_base_dir, experiment_id)
-    
-    total_cpu_readings = defaultdict(float)
-    node0_cpu_readings = defaultdict(float)
-    node1_cpu_readings = defaultdict(float)
-    node0_cpu = 0
-    node1_cpu = 0
     cpu_file_path = os.path.join(experiment_folder_path, "b09-40", "cpu.sar")
-    with open(cpu_file_path, "r") as lines:
-        first_line = True
-        date_part = None
-        previous_timestamp = None
-        for line in lines:
-            if first_line:
-                date_string = plot_one_experiment.parse_date_from_sar_file(first_line_in_file=line)
-                date_part = datetime.strptime(date_string, '%m/%d/%Y')
-                first_line = False
-
-            matches = re.match(cpu_any_core_regex, line)
-            if matches:
-                # Extract timesamp. NOTE: Does not deal with experiment running into the next day
-                time_string = matches.group(1)
-                time_part = datetime.strptime(time_string, '%I:%M:%S %p')
-                timestamp = date_part.replace(hour=time_part.hour, minute=time_part.minute, second=time_part.second)
-
-                # If reading moves on to the next second, save details of previous second
-                # NOTE: Does not record values for last timestamp
-                if previous_timestamp and previous_timestamp != timestamp:
-                    node0_cpu_readings[previous_timestamp] = node0_cpu/80
-                    node1_cpu_readings[previous_timestamp] = node1_cpu/80
-                    node0_cpu = 0
-                    node1_cpu = 0
-                
-                cpu_label = matches.group(2)
-                cpu_user_usage = float(matches.group(3))
-                cpu_system_usage = float(matches.group(5))
-                cpu_total_usage = cpu_user_usage + cpu_system_usage
-
-                if cpu_label == "all":
-                    total_cpu_readings[timestamp] = cpu_total_usage
-                else:
-                    cpu_id = int(cpu_label)
-                    numa_node = cpu_id % 2
-                    if not numa_node:
-                        node0_cpu += cpu_total_usage
-                    else:
-                        node1_cpu += cpu_total_usage
-
-                previous_timestamp = timestamp                
+    cpu_core_usage = parse_cpu_core_usage(cpu_file_path, "b09-40")
+    socket_ids, socket_usage = group_by_numa_socket(cpu_core_usage, metric="total")
 
-    for key,val in node0_cpu_readings.items():
-        print(key, val, node1_cpu_readings[key])
+    for idx, timestamp in enumerate(cpu_core_usage.timestamps):
+        print(timestamp, *socket_usage[idx])
 
     fig, ax = plt.subplots(1, 1)
     # fig.set_size_inches(w=15,h=7)
@@ -246,9 +169,8 @@ def plot_numa_cpu_usage():
     ax.set_xlabel("Time")
     ax.set_ylabel("CPU %")
 
-    # ax.plot(total_cpu_readings.keys(), total_cpu_readings.values(), label="Total")
-    ax.plot(node0_cpu_readings.keys(), node0_cpu_readings.values(), label="Node 0")
-    ax.plot(node1_cpu_readings.keys(), node1_cpu_readings.values(), label="Node 1")
+    for idx, socket_id in enumerate(socket_ids):
+        ax.plot(cpu_core_usage.timestamps, socket_usage[:, idx], label="Node {0}".format(socket_id))
 
     # Save the file, should be done before show()
     plt.legend()
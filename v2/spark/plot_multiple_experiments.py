@@ -11,7 +11,16 @@ from datetime import datetime
 from datetime import timedelta
 import matplotlib.pyplot as plt
 import plot_one_experiment
+import run_experiments
 from plot_one_experiment import ExperimentSetup
+import node_summary
+import proc_samples
+from spark_log_index import get_spark_log_index
+import spark_event_index
+from quantile_sketch import QuantileSketch, merge_sketches
+from metrics_cube import get_metrics_cube
+import profiling
+from experiment_archive import result_file_exists, open_result_file, list_experiment_ids, get_experiment_path
 import numpy as np
 from pprint import pprint
 import json
@@ -54,7 +63,7 @@ class ExperimentPerNodeMetrics:
     total_disk_bwrites = None
     total_net_in_kBps = None
     total_net_out_kBps = None
-    net_out_kBps_time_series = None     # <timestamp, net tx per sec> dict, for network cdf plots
+    per_stage_net_out_kBps_sketches = {}    # <stage, quantile sketch of net tx per sec readings>, for network cdf plots
     per_stage_net_in_kBps = {}          # <stage, total net rx per node>
     per_stage_net_out_kBps = {}         # <stage, total net rx per node>
 
@@ -67,6 +76,102 @@ def find_spark_stage(stages_start_end_times, timestamp):
     return "None"
 
 
+# Yields <timestamp, disk blocks read/sec, disk blocks written/sec> readings of a node, from the raw SAR file,
+# from /proc samples if the node was sampled instead, or from the node-side summary if the raw file was not fetched.
+def iterate_diskio_readings(experiment_dir_path, node_name):
+    node_results_dir = os.path.join(experiment_dir_path, node_name)
+    diskio_full_path = os.path.join(node_results_dir, plot_one_experiment.diskio_readings_file_name)
+    if not result_file_exists(diskio_full_path) and proc_samples.has_proc_samples(node_results_dir):
+        # Per second, as the totals here add up one reading per second
+        timestamps, (disk_brps, disk_bwps) = proc_samples.load_proc_samples(node_results_dir).get_per_second_means(
+            (proc_samples.proc_sampler.disk_breads_column, "all"), (proc_samples.proc_sampler.disk_bwrites_column, "all"))
+        for reading in zip(timestamps, disk_brps.tolist(), disk_bwps.tolist()):
+            yield reading
+        return
+    if not result_file_exists(diskio_full_path) and node_summary.has_summary(node_results_dir):
+        table = node_summary.load_summary_table(node_results_dir, "diskio")
+        for reading in zip(node_summary.to_datetimes(table["timestamp"]), table["disk_breads_ps"].tolist(),
+                           table["disk_bwrites_ps"].tolist()):
+            yield reading
+        return
+
+    with open_result_file(diskio_full_path) as lines:
+        first_line = True
+        date_part = None
+        previous_reading_time_part = None
+        for line in lines:
+            if first_line:
+                date_string = plot_one_experiment.parse_date_from_sar_file(first_line_in_file=line)
+                date_part = datetime.strptime(date_string, '%m/%d/%Y')
+                first_line = False
+
+            matches = re.match(plot_one_experiment.io_regex, line)
+            if matches:
+                time_string = matches.group(1)
+
+                # Add a day when experiment runs past midnight, when the hour of the first reading is smaller than the one before.
+                time_part = datetime.strptime(time_string, '%I:%M:%S %p')
+                if previous_reading_time_part is not None and previous_reading_time_part.hour > time_part.hour:
+                    date_part = date_part + timedelta(days=1)
+                previous_reading_time_part = time_part
+                timestamp = date_part.replace(hour=time_part.hour, minute=time_part.minute, second=time_part.second)
+
+                disk_brps = float(matches.group(5))
+                disk_bwps = float(matches.group(6))
+                yield timestamp, disk_brps, disk_bwps
+
+
+# Yields <timestamp, net rx kB/sec, net tx kB/sec> readings of the enp59s0 interface of a node, from the raw SAR file,
+# from /proc samples if the node was sampled instead, or from the node-side summary if the raw file was not fetched.
+def iterate_network_readings(experiment_dir_path, node_name):
+    node_results_dir = os.path.join(experiment_dir_path, node_name)
+    net_full_path = os.path.join(node_results_dir, plot_one_experiment.net_readings_file_name)
+    if not result_file_exists(net_full_path) and proc_samples.has_proc_samples(node_results_dir):
+        # Per second, as the totals here add up one reading per second
+        per_second_means = proc_samples.load_proc_samples(node_results_dir).get_per_second_means(
+            (proc_samples.proc_sampler.net_in_column, "enp59s0"), (proc_samples.proc_sampler.net_out_column, "enp59s0"))
+        if per_second_means is not None:
+            timestamps, (net_in_KBps, net_out_KBps) = per_second_means
+            for reading in zip(timestamps, net_in_KBps.tolist(), net_out_KBps.tolist()):
+                yield reading
+        return
+    if not result_file_exists(net_full_path) and node_summary.has_summary(node_results_dir):
+        table = node_summary.load_summary_table(node_results_dir, "network")
+        for reading in zip(node_summary.to_datetimes(table["timestamp"]), table["net_in_kBps"].tolist(),
+                           table["net_out_kBps"].tolist()):
+            yield reading
+        return
+
+    with open_result_file(net_full_path) as lines:
+        first_line = True
+        date_part = None
+        previous_reading_time_part = None
+        for line in lines:
+            if first_line:
+                date_string = plot_one_experiment.parse_date_from_sar_file(first_line_in_file=line)
+                date_part = datetime.strptime(date_string, '%m/%d/%Y')
+                first_line = False
+
+            matches = re.match(plot_one_experiment.network_regex, line)
+            if matches:
+                time_string = matches.group(1)
+
+                # Timestamp could be in a different format, normalize it.
+                # Add a day when experiment runs past midnight, when the hour of the first reading is smaller than the one before.
+                time_part = datetime.strptime(time_string, '%I:%M:%S %p')
+                if previous_reading_time_part is not None and previous_reading_time_part.hour > time_part.hour:
+                    date_part = date_part + timedelta(days=1)
+                previous_reading_time_part = time_part
+                timestamp = date_part.replace(hour=time_part.hour, minute=time_part.minute, second=time_part.second)
+                net_interface = matches.group(2)
+
+                # Taking enp59s0 or lo interface for now.
+                if net_interface == "enp59s0":
+                    net_in_KBps = float(matches.group(5))
+                    net_out_KBps = float(matches.group(6))
+                    yield timestamp, net_in_KBps, net_out_KBps
+
+
 def get_metrics_summary_for_experiment(experiment_id, experiment_setup):
     experiment_dir_path = os.path.join(plot_one_experiment.results_base_dir, experiment_id)
     print("Parsing experiment {0}".format(experiment_id))
@@ -75,36 +180,17 @@ def get_metrics_summary_for_experiment(experiment_id, experiment_setup):
     # setup_file_path = os.path.join(experiment_dir_path, "setup_details.txt")
     # experiment_setup = ExperimentSetup(setup_file_path)
 
-    # Read stages and other timestamps from spark log file
-    all_timestamp_list = []
-    stages_start_end_times = {}
+    # Read stages and other timestamps from the spark log file index
     spark_log_full_path = os.path.join(experiment_dir_path, experiment_setup.designated_driver_node,
                                        plot_one_experiment.spark_log_file_name)
-    with open(spark_log_full_path, "r") as lines:
-        for line in lines:
-            matches = re.match(plot_one_experiment.spark_log_generic_log_regex, line)
-            if matches:
-                time_string = matches.group(1)
-                timestamp = datetime.strptime(time_string, '%y/%m/%d %H:%M:%S')
-                # timestamp = datetime.strptime(time_string, '%Y-%m-%d %H:%M:%S')
-                all_timestamp_list.append(timestamp)
-
-            matches = re.match(plot_one_experiment.spark_stage_and_task_log_regex_2, line)
-            if matches:
-                time_string = matches.group(1)
-                timestamp = datetime.strptime(time_string, '%y/%m/%d %H:%M:%S')
-                # timestamp = datetime.strptime(time_string, '%Y-%m-%d %H:%M:%S')
-
-                # Keep track of start and end times of each stage
-                stage = float(matches.group(2))
-                if stage not in stages_start_end_times.keys():
-                    stages_start_end_times[stage] = [timestamp, timestamp]
-                stages_start_end_times[stage][1] = timestamp
+    spark_log_index = get_spark_log_index(spark_log_full_path, plot_one_experiment.spark_stage_and_task_log_regex_2)
+    stages_start_end_times = spark_log_index.get_stages_start_end_times()
+    spark_log_start_time, spark_log_end_time = spark_log_index.get_first_last_times()
 
     # If spark job start time and end time is not available, use the values from spark log file
     if experiment_setup.spark_job_start_time is None or experiment_setup.spark_job_end_time is None:
-        experiment_setup.spark_job_start_time = min(all_timestamp_list)
-        experiment_setup.spark_job_end_time = max(all_timestamp_list)
+        experiment_setup.spark_job_start_time = spark_log_start_time
+        experiment_setup.spark_job_end_time = spark_log_end_time
 
     # print(stages_start_end_times)
     per_node_metrics_dict = { node_name: ExperimentPerNodeMetrics() for node_name in experiment_setup.all_spark_nodes}
@@ -159,113 +245,61 @@ def get_metrics_summary_for_experiment(experiment_id, experiment_setup):
 
     # Get disk usage on each node
     for node_name in experiment_setup.all_spark_nodes:
-        diskio_full_path = os.path.join(experiment_dir_path, node_name, plot_one_experiment.diskio_readings_file_name)
         sum_disk_breads = 0
         sum_disk_bwrites = 0
-        with open(diskio_full_path, "r") as lines:
-            first_line = True
-            date_part = None
-            previous_reading_time_part = None
-            for line in lines:
-                if first_line:
-                    date_string = plot_one_experiment.parse_date_from_sar_file(first_line_in_file=line)
-                    date_part = datetime.strptime(date_string, '%m/%d/%Y')
-                    first_line = False
-
-                matches = re.match(plot_one_experiment.io_regex, line)
-                if matches:
-                    time_string = matches.group(1)
-
-                    # Add a day when experiment runs past midnight, when the hour of the first reading is smaller than the one before.
-                    time_part = datetime.strptime(time_string, '%I:%M:%S %p')
-                    if previous_reading_time_part is not None and previous_reading_time_part.hour > time_part.hour:
-                        date_part = date_part + timedelta(days=1)
-                    previous_reading_time_part = time_part
-                    timestamp = date_part.replace(hour=time_part.hour, minute=time_part.minute, second=time_part.second)
-                    
-                    disk_rps = float(matches.group(3))
-                    disk_wps = float(matches.group(4))
-                    disk_brps = float(matches.group(5))
-                    disk_bwps = float(matches.group(6))
-                    
-                    if experiment_setup.spark_job_start_time < timestamp < experiment_setup.spark_job_end_time:
-                        sum_disk_breads += disk_brps
-                        sum_disk_bwrites += disk_bwps
+        for timestamp, disk_brps, disk_bwps in iterate_diskio_readings(experiment_dir_path, node_name):
+            if experiment_setup.spark_job_start_time < timestamp < experiment_setup.spark_job_end_time:
+                sum_disk_breads += disk_brps
+                sum_disk_bwrites += disk_bwps
 
         per_node_metrics_dict[node_name].total_disk_breads = sum_disk_breads
         per_node_metrics_dict[node_name].total_disk_bwrites = sum_disk_bwrites
 
     # Parse network usage on each node
     for node_name in experiment_setup.all_spark_nodes:
-        net_full_path = os.path.join(experiment_dir_path, node_name, plot_one_experiment.net_readings_file_name)
         sum_net_in_kBps = 0
         sum_net_out_kBps = 0
         per_stage_net_in_kBps = {}
         per_stage_net_out_kBps = {}
-        net_out_kBps_time_series = {}
-
-        with open(net_full_path, "r") as lines:
-            first_line = True
-            date_part = None
-            previous_reading_time_part = None
-            current_spark_stage = None
-            for line in lines:
-                if first_line:
-                    date_string = plot_one_experiment.parse_date_from_sar_file(first_line_in_file=line)
-                    date_part = datetime.strptime(date_string, '%m/%d/%Y')
-                    first_line = False
-
-                matches = re.match(plot_one_experiment.network_regex, line)
-                if matches:
-                    time_string = matches.group(1)
-
-                    # Timestamp could be in a different format, normalize it.
-                    # Add a day when experiment runs past midnight, when the hour of the first reading is smaller than the one before.
-                    time_part = datetime.strptime(time_string, '%I:%M:%S %p')
-                    if previous_reading_time_part is not None and previous_reading_time_part.hour > time_part.hour:
-                        date_part = date_part + timedelta(days=1)
-                    previous_reading_time_part = time_part
-                    timestamp = date_part.replace(hour=time_part.hour, minute=time_part.minute, second=time_part.second)
-                    net_interface = matches.group(2)
-
-                    # Taking enp59s0 or lo interface for now.
-                    if net_interface == "enp59s0" and (experiment_setup.spark_job_start_time < timestamp < experiment_setup.spark_job_end_time):
-                        net_in_KBps = float(matches.group(5))
-                        net_out_KBps = float(matches.group(6))
-                        sum_net_in_kBps += net_in_KBps
-                        sum_net_out_kBps += net_out_KBps
-
-                        # Record net tx individual measurements for network cdf plot
-                        net_out_kBps_time_series[timestamp] = net_out_KBps
-
-                        # Aggregate network usage in each spark stage
-                        current_spark_stage = find_spark_stage(stages_start_end_times, timestamp)
-                        # print(timestamp, current_spark_stage, net_in_KBps, net_out_KBps)
-                        if current_spark_stage not in per_stage_net_in_kBps:    per_stage_net_in_kBps[current_spark_stage] = net_in_KBps
-                        else: per_stage_net_in_kBps[current_spark_stage] += net_in_KBps
-                        if current_spark_stage not in per_stage_net_out_kBps:   per_stage_net_out_kBps[current_spark_stage] = net_out_KBps
-                        else: per_stage_net_out_kBps[current_spark_stage] += net_out_KBps            
+        per_stage_net_out_kBps_sketches = {}
+
+        for timestamp, net_in_KBps, net_out_KBps in iterate_network_readings(experiment_dir_path, node_name):
+            if experiment_setup.spark_job_start_time < timestamp < experiment_setup.spark_job_end_time:
+                sum_net_in_kBps += net_in_KBps
+                sum_net_out_kBps += net_out_KBps
+
+                # Aggregate network usage in each spark stage
+                current_spark_stage = find_spark_stage(stages_start_end_times, timestamp)
+
+                # Sketch the distribution of net tx readings in each stage for network cdf plots
+                if current_spark_stage not in per_stage_net_out_kBps_sketches:
+                    per_stage_net_out_kBps_sketches[current_spark_stage] = QuantileSketch()
+                per_stage_net_out_kBps_sketches[current_spark_stage].update(net_out_KBps)
+                # print(timestamp, current_spark_stage, net_in_KBps, net_out_KBps)
+                if current_spark_stage not in per_stage_net_in_kBps:    per_stage_net_in_kBps[current_spark_stage] = net_in_KBps
+                else: per_stage_net_in_kBps[current_spark_stage] += net_in_KBps
+                if current_spark_stage not in per_stage_net_out_kBps:   per_stage_net_out_kBps[current_spark_stage] = net_out_KBps
+                else: per_stage_net_out_kBps[current_spark_stage] += net_out_KBps
 
         per_node_metrics_dict[node_name].total_net_in_kBps = sum_net_in_kBps
         per_node_metrics_dict[node_name].total_net_out_kBps = sum_net_out_kBps
         per_node_metrics_dict[node_name].per_stage_net_in_kBps = per_stage_net_in_kBps
         per_node_metrics_dict[node_name].per_stage_net_out_kBps = per_stage_net_out_kBps
-        per_node_metrics_dict[node_name].net_out_kBps_time_series = net_out_kBps_time_series
+        per_node_metrics_dict[node_name].per_stage_net_out_kBps_sketches = per_stage_net_out_kBps_sketches
 
     # Get accurate spark job times from detailed spark log if available
     spark_full_log_full_path = os.path.join(experiment_dir_path, experiment_setup.designated_driver_node, plot_one_experiment.spark_full_log_file_name)
 
     precise_start_time = None
     precise_end_time = None
-    if os.path.exists(spark_log_full_path):
-        with open(spark_full_log_full_path, "r") as lines:
-            for line in lines:
-                if 'SparkListenerJobStart' in line:
-                    json_dict = json.loads(line)
-                    precise_start_time = float(json_dict['Submission Time'])
-                if 'SparkListenerJobEnd' in line:
-                    json_dict = json.loads(line)
-                    precise_end_time = float(json_dict['Completion Time'])
+    if result_file_exists(spark_full_log_full_path):
+        # Only the job events get read, through the event index of the log
+        event_index = spark_event_index.get_spark_event_index(spark_full_log_full_path)
+        for json_dict in event_index.iterate_events(spark_event_index.job_start_event, spark_event_index.job_end_event):
+            if json_dict['Event'] == spark_event_index.job_start_event:
+                precise_start_time = float(json_dict['Submission Time'])
+            else:
+                precise_end_time = float(json_dict['Completion Time'])
 
 
     exp_metrics = ExperimentMetrics(experiment_id, experiment_setup, per_node_metrics_dict)
@@ -274,10 +308,39 @@ def get_metrics_summary_for_experiment(experiment_id, experiment_setup):
     return exp_metrics
 
 
+# Net tx sketches of an experiment as {node: {stage: sketch}}, from the metrics summary run_experiments writes, so
+# CDFs over many experiments do not need to parse them again. Returns None if the experiment has no such summary.
+def load_net_out_kBps_sketches(experiment_id):
+    summary_file_path = os.path.join(plot_one_experiment.results_base_dir, experiment_id,
+                                     run_experiments.metrics_summary_file_name)
+    if not result_file_exists(summary_file_path):
+        return None
+    with open_result_file(summary_file_path) as summary_file:
+        summary = json.load(summary_file)
+    if "NetOutKBpsSketches" not in summary:
+        return None
+    return {node_name: {stage: QuantileSketch.from_dict(sketch_dict) for stage, sketch_dict in stage_sketches.items()}
+            for node_name, stage_sketches in summary["NetOutKBpsSketches"].items()}
+
+
+
+# Draws one errorbar line per input size of the experiment group, over link rates, from the metrics cube
+def plot_metric_by_input_size(ax, cube, metric_name, experiment_group, marker):
+    for size in cube.get_input_sizes_gb(experiment_group):
+        link_rates, means, stds = cube.get_series(metric_name, experiment_group, size)
+        ax.errorbar(link_rates, means, stds, label='{0} GB'.format(size), marker=marker)
+
+
+# Draws one errorbar line per experiment group with runs of the input size, over link rates, from the metrics cube
+def plot_metric_by_experiment_group(ax, cube, metric_name, input_size_gb, marker, label_format='{0}'):
+    for experiment_group in cube.get_experiment_groups(input_size_gb):
+        link_rates, means, stds = cube.get_series(metric_name, experiment_group, input_size_gb)
+        ax.errorbar(link_rates, means, stds, label=label_format.format(experiment_group), marker=marker)
+
 
 def plot_total_power_usage_per_run_type(run_id, exp_metrics_list, output_dir, experiment_type, node_name=None):
     """
-    Plots total power usage for different input sizes from experiments of same type (same experimental setup).
+    Plots total power usage for different input sizes from experiments of same type (same experiment group).
     If node_name is not None, filters for power usage of a single (specified) node.
     """
 
@@ -287,33 +350,9 @@ def plot_total_power_usage_per_run_type(run_id, exp_metrics_list, output_dir, ex
     ax.set_xlabel("Link bandwidth Mbps")
     ax.set_ylabel("Energy (watt-hours)")
 
-    exp_metrics_list = [exp for exp in exp_metrics_list if exp.experiment_setup.setup_type == experiment_type]
-    all_sizes = sorted(set(map(lambda r: r.input_size_gb, exp_metrics_list)))
-    for size in all_sizes:
-        size_filtered = list(filter(lambda r: r.input_size_gb == size, exp_metrics_list))
-        # There may be multiple runs for the same setup, calculate average over those runs.
-        all_link_rates = sorted(set(map(lambda r: r.link_bandwidth_mbps, size_filtered)))
-        avg_power_readings = []
-        std_power_readings = []
-        for link_rate in all_link_rates:
-            link_filtered = list(filter(lambda f: f.link_bandwidth_mbps == link_rate, size_filtered))
-
-            power_values = []
-            for experiment in link_filtered:
-                if node_name is not None:
-                    power_values.append(experiment.per_node_metrics_dict[node_name].total_power_consumed/3600)
-                else:
-                    power_all_nodes = sum([n.total_power_consumed/3600
-                                           for n in experiment.per_node_metrics_dict.values()
-                                           if n.total_power_consumed is not None])
-                    power_values.append(power_all_nodes)
-
-            # avg_power_readings.append(math.log(np.mean(power_values)))
-            avg_power_readings.append(np.mean(power_values))
-            std_power_readings.append(np.std(power_values))
-            # print(size, link_rate, ':'.join(power_values), np.mean(power_values), np.std(power_values), sep=", ")
-
-        ax.errorbar(all_link_rates, avg_power_readings, std_power_readings, label='{0} GB'.format(size), marker="x")
+    # There may be multiple runs for the same setup, the cube has the average over those runs.
+    cube = get_metrics_cube(exp_metrics_list, node_name)
+    plot_metric_by_input_size(ax, cube, "energy_wh", experiment_type, "x")
 
     plt.legend()
     # plt.show()
@@ -325,7 +364,7 @@ def plot_total_power_usage_per_run_type(run_id, exp_metrics_list, output_dir, ex
 
 def plot_total_power_usage_per_input_size(run_id, exp_metrics_list, output_dir, input_size_gb, node_name=None):
     """
-    Plots total power usage for one input size across different experimental setups.
+    Plots total power usage for one input size across different experiment groups.
     If node_name is not None, filters for power usage of a single (specified) node.
     """
 
@@ -335,33 +374,9 @@ def plot_total_power_usage_per_input_size(run_id, exp_metrics_list, output_dir,
     ax.set_xlabel("Link bandwidth Mbps")
     ax.set_ylabel("Energy (watt-hours)")
 
-    exp_metrics_list = [exp for exp in exp_metrics_list if exp.input_size_gb == input_size_gb]
-    all_exp_types = sorted(set(map(lambda r: r.experiment_setup.setup_type, exp_metrics_list)))
-    for exp_type in all_exp_types:
-        exp_type_filtered = list(filter(lambda r: r.experiment_setup.setup_type == exp_type, exp_metrics_list))
-        # There may be multiple runs for the same setup, calculate average over those runs.
-        all_link_rates = sorted(set(map(lambda r: r.link_bandwidth_mbps, exp_type_filtered)))
-        avg_power_readings = []
-        std_power_readings = []
-        for link_rate in all_link_rates:
-            link_filtered = list(filter(lambda f: f.link_bandwidth_mbps == link_rate, exp_type_filtered))
-
-            power_values = []
-            for experiment in link_filtered:
-                if node_name is not None:
-                    power_values.append(experiment.per_node_metrics_dict[node_name].total_power_consumed/3600)
-                else:
-                    power_all_nodes = round(sum([n.total_power_consumed/3600
-                                           for n in experiment.per_node_metrics_dict.values()
-                                           if n.total_power_consumed is not None]), 2)
-                    power_values.append(power_all_nodes)
-
-            # avg_power_readings.append(math.log(np.mean(power_values)))
-            avg_power_readings.append(np.mean(power_values))
-            std_power_readings.append(np.std(power_values))
-            # print(input_size_gb, link_rate, power_values, round(np.mean(power_values), 2), round(np.std(power_values), 2), sep=", ")
-
-        ax.errorbar(all_link_rates, avg_power_readings, std_power_readings, label='{0}'.format(exp_type), marker="x")
+    # There may be multiple runs for the same setup, the cube has the average over those runs.
+    cube = get_metrics_cube(exp_metrics_list, node_name)
+    plot_metric_by_experiment_group(ax, cube, "energy_wh", input_size_gb, "x")
 
     plt.legend()
     # plt.show()
@@ -373,7 +388,7 @@ def plot_total_power_usage_per_input_size(run_id, exp_metrics_list, output_dir,
 
 def plot_total_disk_usage_by_run_type(run_id, exp_metrics_list, output_dir, experiment_type, node_name=None):
     """
-    Plots total disk usage for different input sizes from experiments of same type (same experimental setup).
+    Plots total disk usage for different input sizes from experiments of same type (same experiment group).
     If node_name is not None, filters for power usage of a single (specified) node.
     """
 
@@ -381,43 +396,13 @@ def plot_total_disk_usage_by_run_type(run_id, exp_metrics_list, output_dir, expe
     fig.suptitle("Disk usage for {0} ".format(experiment_type) +
                  ("on node {0}".format(node_name) if node_name else " - all nodes"))
 
-    exp_metrics_list = [exp for exp in exp_metrics_list if exp.experiment_setup.setup_type == experiment_type]
-    all_sizes = sorted(set(map(lambda r: r.input_size_gb, exp_metrics_list)))
-    for size in all_sizes:
-        size_filtered = list(filter(lambda r: r.input_size_gb == size, exp_metrics_list))
-        # There may be multiple runs for the same setup, calculate average over those runs.
-        all_link_rates = sorted(set(map(lambda r: r.link_bandwidth_mbps, size_filtered)))
-        avg_disk_reads = []
-        std_disk_reads = []
-        avg_disk_writes = []
-        std_disk_writes = []
-        for link_rate in all_link_rates:
-            link_filtered = list(filter(lambda f: f.link_bandwidth_mbps == link_rate, size_filtered))
-
-            disk_reads = []
-            disk_writes = []
-            for experiment in link_filtered:
-                if node_name is not None:
-                    disk_reads.append(experiment.per_node_metrics_dict[node_name].total_disk_breads)
-                    disk_writes.append(experiment.per_node_metrics_dict[node_name].total_disk_bwrites)
-                else:
-                    reads_all_nodes = sum([n.total_disk_breads for n in experiment.per_node_metrics_dict.values()])
-                    writes_all_nodes = sum([n.total_disk_bwrites for n in experiment.per_node_metrics_dict.values()])
-                    disk_reads.append(reads_all_nodes)
-                    disk_writes.append(writes_all_nodes)
-
-            avg_disk_reads.append(np.mean(disk_reads) * 512/(1024*1024))
-            std_disk_reads.append(np.std(disk_reads) * 512/(1024*1024))
-            avg_disk_writes.append(np.mean(disk_writes) * 512/(1024*1024))
-            std_disk_writes.append(np.std(disk_writes) * 512/(1024*1024))
-
-
-        ax1.set_xlabel("Link bandwidth Mbps")
-        ax1.set_ylabel("Total Disk Reads MB")
-        ax1.errorbar(all_link_rates, avg_disk_reads, std_disk_reads, label='{0} GB'.format(size), marker="x")
-        ax2.set_xlabel("Link bandwidth Mbps")
-        ax2.set_ylabel("Total Disk Writes MB")
-        ax2.errorbar(all_link_rates, avg_disk_writes, std_disk_writes, label='{0} GB'.format(size), marker=".")
+    cube = get_metrics_cube(exp_metrics_list, node_name)
+    ax1.set_xlabel("Link bandwidth Mbps")
+    ax1.set_ylabel("Total Disk Reads MB")
+    plot_metric_by_input_size(ax1, cube, "disk_reads_mb", experiment_type, "x")
+    ax2.set_xlabel("Link bandwidth Mbps")
+    ax2.set_ylabel("Total Disk Writes MB")
+    plot_metric_by_input_size(ax2, cube, "disk_writes_mb", experiment_type, ".")
 
     plt.legend()
     # plt.show()
@@ -429,7 +414,7 @@ def plot_total_disk_usage_by_run_type(run_id, exp_metrics_list, output_dir, expe
 
 def plot_total_disk_usage_by_input_size(run_id, exp_metrics_list, output_dir, input_size_gb, node_name=None):
     """
-    Plots total disk usage for one input size across different experimental setups.
+    Plots total disk usage for one input size across different experiment groups.
     If node_name is not None, filters for power usage of a single (specified) node.
     """
 
@@ -437,43 +422,18 @@ def plot_total_disk_usage_by_input_size(run_id, exp_metrics_list, output_dir, in
     fig.suptitle("Disk usage for {0} GB input".format(input_size_gb) +
                  ("on node {0}".format(node_name) if node_name else " - all nodes"))
 
-    exp_metrics_list = [exp for exp in exp_metrics_list if exp.input_size_gb == input_size_gb]
-    all_exp_types = sorted(set(map(lambda r: r.experiment_setup.setup_type, exp_metrics_list)))
-    for exp_type in all_exp_types:
-        exp_type_filtered = list(filter(lambda r: r.experiment_setup.setup_type == exp_type, exp_metrics_list))
-        # There may be multiple runs for the same setup, calculate average over those runs.
-        all_link_rates = sorted(set(map(lambda r: r.link_bandwidth_mbps, exp_type_filtered)))
-        avg_disk_reads = []
-        std_disk_reads = []
-        avg_disk_writes = []
-        std_disk_writes = []
-        for link_rate in all_link_rates:
-            link_filtered = list(filter(lambda f: f.link_bandwidth_mbps == link_rate, exp_type_filtered))
-
-            disk_reads = []
-            disk_writes = []
-            for experiment in link_filtered:
-                if node_name is not None:
-                    disk_reads.append(experiment.per_node_metrics_dict[node_name].total_disk_breads)
-                    disk_writes.append(experiment.per_node_metrics_dict[node_name].total_disk_bwrites)
-                else:
-                    reads_all_nodes = round(sum([n.total_disk_breads for n in experiment.per_node_metrics_dict.values()])* 512/(1024*1024), 2)
-                    writes_all_nodes = round(sum([n.total_disk_bwrites for n in experiment.per_node_metrics_dict.values()])* 512/(1024*1024), 2)
-                    disk_reads.append(reads_all_nodes)
-                    disk_writes.append(writes_all_nodes)
-
-            print(input_size_gb, link_rate, disk_reads, round(np.mean(disk_reads), 2), round(np.std(disk_reads), 2), sep=", ")
-            avg_disk_reads.append(np.mean(disk_reads))
-            std_disk_reads.append(np.std(disk_reads))
-            avg_disk_writes.append(np.mean(disk_writes))
-            std_disk_writes.append(np.std(disk_writes))
-
-        ax1.set_xlabel("Link bandwidth Mbps")
-        ax1.set_ylabel("Total Disk Reads MB")
-        ax1.errorbar(all_link_rates, avg_disk_reads, std_disk_reads, label='{0}'.format(exp_type), marker="x")
-        ax2.set_xlabel("Link bandwidth Mbps")
-        ax2.set_ylabel("Total Disk Writes MB")
-        ax2.errorbar(all_link_rates, avg_disk_writes, std_disk_writes, label='{0}'.format(exp_type), marker=".")
+    cube = get_metrics_cube(exp_metrics_list, node_name)
+    for exp_type in cube.get_experiment_groups(input_size_gb):
+        link_rates, means, stds = cube.get_series("disk_reads_mb", exp_type, input_size_gb)
+        for link_rate, mean, std in zip(link_rates, means, stds):
+            print(input_size_gb, link_rate, round(mean, 2), round(std, 2), sep=", ")
+
+    ax1.set_xlabel("Link bandwidth Mbps")
+    ax1.set_ylabel("Total Disk Reads MB")
+    plot_metric_by_experiment_group(ax1, cube, "disk_reads_mb", input_size_gb, "x")
+    ax2.set_xlabel("Link bandwidth Mbps")
+    ax2.set_ylabel("Total Disk Writes MB")
+    plot_metric_by_experiment_group(ax2, cube, "disk_writes_mb", input_size_gb, ".")
 
     plt.legend()
     # plt.show()
@@ -485,7 +445,7 @@ def plot_total_disk_usage_by_input_size(run_id, exp_metrics_list, output_dir, in
 
 def plot_total_network_usage_by_run_type(run_id, exp_metrics_list, output_dir, experiment_type, node_name=None):
     """
-    Plots total network usage for different input sizes from experiments of same type (same experimental setup).
+    Plots total network usage for different input sizes from experiments of same type (same experiment group).
     If node_name is not None, filters for network usage of a single (specified) node.
     """
 
@@ -493,43 +453,13 @@ def plot_total_network_usage_by_run_type(run_id, exp_metrics_list, output_dir, e
     fig.suptitle("Network usage for {0} ".format(experiment_type) +
                  ("on node {0}".format(node_name) if node_name else " - all nodes"))
 
-    exp_metrics_list = [exp for exp in exp_metrics_list if exp.experiment_setup.setup_type == experiment_type]
-    all_sizes = sorted(set(map(lambda r: r.input_size_gb, exp_metrics_list)))
-    for size in all_sizes:
-        size_filtered = list(filter(lambda r: r.input_size_gb == size, exp_metrics_list))
-        # There may be multiple runs for the same setup, calculate average over those runs.
-        all_link_rates = sorted(set(map(lambda r: r.link_bandwidth_mbps, size_filtered)))
-        avg_net_inKbps = []
-        std_net_inKbps = []
-        avg_net_outKbps = []
-        std_net_outKbps = []
-        for link_rate in all_link_rates:
-            link_filtered = list(filter(lambda f: f.link_bandwidth_mbps == link_rate, size_filtered))
-
-            net_inKbps = []
-            net_outKbps = []
-            for experiment in link_filtered:
-                if node_name is not None:
-                    net_inKbps.append(experiment.per_node_metrics_dict[node_name].total_net_in_kBps)
-                    net_outKbps.append(experiment.per_node_metrics_dict[node_name].total_net_out_kBps)
-                else:
-                    net_inKbps_all_nodes = sum([n.total_net_in_kBps for n in experiment.per_node_metrics_dict.values()])
-                    net_outKbps_all_nodes = sum([n.total_net_out_kBps for n in experiment.per_node_metrics_dict.values()])
-                    net_inKbps.append(net_inKbps_all_nodes)
-                    net_outKbps.append(net_outKbps_all_nodes)
-
-            avg_net_inKbps.append(np.mean(net_inKbps) / (1024*1024))
-            std_net_inKbps.append(np.std(net_inKbps) / (1024*1024))
-            avg_net_outKbps.append(np.mean(net_outKbps) / (1024*1024))
-            std_net_outKbps.append(np.std(net_outKbps) / (1024*1024))
-
-
-        ax1.set_xlabel("Link bandwidth Mbps")
-        ax1.set_ylabel("Total Network In GB")
-        ax1.errorbar(all_link_rates, avg_net_inKbps, std_net_inKbps, label='{0} GB'.format(size), marker="x")
-        ax2.set_xlabel("Link bandwidth Mbps")
-        ax2.set_ylabel("Total Network Out GB")
-        ax2.errorbar(all_link_rates, avg_net_outKbps, std_net_outKbps, label='{0} GB'.format(size), marker=".")
+    cube = get_metrics_cube(exp_metrics_list, node_name)
+    ax1.set_xlabel("Link bandwidth Mbps")
+    ax1.set_ylabel("Total Network In GB")
+    plot_metric_by_input_size(ax1, cube, "net_in_gb", experiment_type, "x")
+    ax2.set_xlabel("Link bandwidth Mbps")
+    ax2.set_ylabel("Total Network Out GB")
+    plot_metric_by_input_size(ax2, cube, "net_out_gb", experiment_type, ".")
 
     plt.legend()
     # plt.show()
@@ -541,7 +471,7 @@ def plot_total_network_usage_by_run_type(run_id, exp_metrics_list, output_dir, e
 
 def plot_total_network_usage_by_input_size(run_id, exp_metrics_list, output_dir, input_size_gb, node_name=None):
     """
-    Plots total network usage for one input size across different experimental setups.
+    Plots total network usage for one input size across different experiment groups.
     If node_name is not None, filters for network usage of a single (specified) node.
     """
 
@@ -549,42 +479,13 @@ def plot_total_network_usage_by_input_size(run_id, exp_metrics_list, output_dir,
     fig.suptitle("Network usage for {0} GB input".format(input_size_gb) +
                  ("on node {0}".format(node_name) if node_name else " - all nodes"))
 
-    exp_metrics_list = [exp for exp in exp_metrics_list if exp.input_size_gb == input_size_gb]
-    all_exp_types = sorted(set(map(lambda r: r.experiment_setup.setup_type, exp_metrics_list)))
-    for exp_type in all_exp_types:
-        exp_type_filtered = list(filter(lambda r: r.experiment_setup.setup_type == exp_type, exp_metrics_list))
-        # There may be multiple runs for the same setup, calculate average over those runs.
-        all_link_rates = sorted(set(map(lambda r: r.link_bandwidth_mbps, exp_type_filtered)))
-        avg_net_inKbps = []
-        std_net_inKbps = []
-        avg_net_outKbps = []
-        std_net_outKbps = []
-        for link_rate in all_link_rates:
-            link_filtered = list(filter(lambda f: f.link_bandwidth_mbps == link_rate, exp_type_filtered))
-
-            net_inKbps = []
-            net_outKbps = []
-            for experiment in link_filtered:
-                if node_name is not None:
-                    net_inKbps.append(experiment.per_node_metrics_dict[node_name].total_net_in_kBps)
-                    net_outKbps.append(experiment.per_node_metrics_dict[node_name].total_net_out_kBps)
-                else:
-                    net_inKbps_all_nodes = sum([n.total_net_in_kBps for n in experiment.per_node_metrics_dict.values()])
-                    net_outKbps_all_nodes = sum([n.total_net_out_kBps for n in experiment.per_node_metrics_dict.values()])
-                    net_inKbps.append(net_inKbps_all_nodes)
-                    net_outKbps.append(net_outKbps_all_nodes)
-
-            avg_net_inKbps.append(np.mean(net_inKbps) / (1024*1024))
-            std_net_inKbps.append(np.std(net_inKbps) / (1024*1024))
-            avg_net_outKbps.append(np.mean(net_outKbps) / (1024*1024))
-            std_net_outKbps.append(np.std(net_outKbps) / (1024*1024))
-
-        ax1.set_xlabel("Link bandwidth Mbps")
-        ax1.set_ylabel("Total Network In GB")
-        ax1.errorbar(all_link_rates, avg_net_inKbps, std_net_inKbps, label='{0}'.format(exp_type), marker="x")
-        ax2.set_xlabel("Link bandwidth Mbps")
-        ax2.set_ylabel("Total Network Out GB")
-        ax2.errorbar(all_link_rates, avg_net_outKbps, std_net_outKbps, label='{0}'.format(exp_type), marker=".")
+    cube = get_metrics_cube(exp_metrics_list, node_name)
+    ax1.set_xlabel("Link bandwidth Mbps")
+    ax1.set_ylabel("Total Network In GB")
+    plot_metric_by_experiment_group(ax1, cube, "net_in_gb", input_size_gb, "x")
+    ax2.set_xlabel("Link bandwidth Mbps")
+    ax2.set_ylabel("Total Network Out GB")
+    plot_metric_by_experiment_group(ax2, cube, "net_out_gb", input_size_gb, ".")
 
     plt.legend()
     # plt.show()
@@ -594,9 +495,22 @@ def plot_total_network_usage_by_input_size(run_id, exp_metrics_list, output_dir,
     plt.savefig(output_full_path)
 
 
-def plot_cdf_network_throughput(run_id, exp_metrics_list, output_dir, node_name=None):
+# Net tx sketches of an experiment as {node: {stage: sketch}}, from its metrics summary if it has them, or else from
+# its parsed results (parsing it now if exp_metrics is not given)
+def get_net_out_kBps_sketches(experiment_setup, exp_metrics=None):
+    sketches = load_net_out_kBps_sketches(experiment_setup.experiment_id)
+    if sketches is None:
+        if exp_metrics is None:
+            exp_metrics = get_metrics_summary_for_experiment(experiment_setup.experiment_id, experiment_setup)
+        sketches = {node_name: node_metrics.per_stage_net_out_kBps_sketches
+                    for node_name, node_metrics in exp_metrics.per_node_metrics_dict.items()}
+    return sketches
+
+
+def plot_cdf_network_throughput(run_id, experiments, output_dir, node_name=None, exp_metrics_list=()):
     """
-    Plots cdf lines for network throughput rates for given experiments.
+    Plots cdf lines for network throughput rates for given experiments (their setups, as from load_all_experiments).
+    Experiments with a metrics summary only need its sketches, the others get parsed unless already in exp_metrics_list.
     If node_name is not None, filters for network throughput observed on a single (specified) node.
     """
 
@@ -605,24 +519,25 @@ def plot_cdf_network_throughput(run_id, exp_metrics_list, output_dir, node_name=
     fig.suptitle("CDF of network readings (reduce phase) " +
                  ("on node {0}".format(node_name) if node_name else "on all nodes"))
 
-    for exp in exp_metrics_list:
-        if exp.experiment_setup.scala_class_name == "SortNoDisk":
+    parsed_metrics = {exp_metrics.experiment_id: exp_metrics for exp_metrics in exp_metrics_list}
+    for exp in experiments:
+        if exp.scala_class_name == "SortNoDisk":
             continue
         
-        # Just plot the reduce phase, as no network happens in map phase
-        reduce_phase = exp.stages_start_end_times[1]
-        net_out_readings_kBps = exp.per_node_metrics_dict[node_name].net_out_kBps_time_series.items() if node_name \
-            else [reading for p in exp.per_node_metrics_dict.values() for reading in p.net_out_kBps_time_series.items()]
-        net_out_readings_kBps_reduce_phase = [v for k,v in net_out_readings_kBps if reduce_phase[0] < k < reduce_phase[1]]
-
-        # print("Total net tx kB: " + str(sum(net_out_readings_kBps_reduce_phase)))
-        net_out_readings_mbps = [r*8/1024 for r in net_out_readings_kBps_reduce_phase]
-        cdf_x, cdf_y = plot_one_experiment.gen_cdf_curve(net_out_readings_mbps, 1000)
+        # Just plot the reduce phase, as no network happens in map phase. Sketches of the nodes merge into one.
+        reduce_stage = str(float(1))
+        sketches = get_net_out_kBps_sketches(exp, parsed_metrics.get(exp.experiment_id))
+        node_sketches_list = [sketches.get(node_name, {})] if node_name else sketches.values()
+        net_out_kBps_sketch = merge_sketches(stage_sketches[reduce_stage] for stage_sketches in node_sketches_list
+                                             if reduce_stage in stage_sketches)
+
+        cdf_x, cdf_y = net_out_kBps_sketch.get_cdf_curve(1000, scale=8/1024)
         # cdf_x, cdf_y = plot_one_experiment.gen_cumsum_curve(net_out_readings_mbps, 1000)
 
         ax.set_xlabel("Network throughput mbps")
         ax.set_ylabel("Cumulative Count")
-        ax.plot(cdf_x, cdf_y, label='{0}'.format(exp.get_plot_friendly_name()))
+        ax.plot(cdf_x, cdf_y, label='{0}'.format(exp.plot_friendly_name or (exp.scala_class_name + ":" +
+                                                                             exp.experiment_id)))
 
         # if exp.experiment_setup.scala_class_name == "SortNoDisk":
         #     reduce_phase = exp.stages_start_end_times[2]
@@ -654,23 +569,10 @@ def plot_exp_duration_per_run_type(run_id, exp_metrics_list, output_dir, experim
     ax.set_xlabel("Link bandwidth Mbps")
     ax.set_ylabel("Duration (secs)")
 
-    exp_metrics_list = [exp for exp in exp_metrics_list if exp.experiment_setup.experiment_group == experiment_group]
-    all_sizes = sorted(set(map(lambda r: r.input_size_gb, exp_metrics_list)))
-    avg_durations = []
-    std_durations = []
-    for size in all_sizes:
-        size_filtered = list(filter(lambda r: r.input_size_gb == size, exp_metrics_list))
-        all_link_rates = sorted(set(map(lambda r: r.link_bandwidth_mbps, size_filtered)))
-        avg_durations = []
-        std_durations = []
-        for link_rate in all_link_rates:
-            link_filtered = list(filter(lambda f: f.link_bandwidth_mbps == link_rate, size_filtered))
-            all_exp_durations = [e.duration.total_seconds() for e in link_filtered]
-            # avg_power_readings.append(math.log(np.mean(power_values)))
-            avg_durations.append(np.mean(all_exp_durations))
-            std_durations.append(np.std(all_exp_durations))
-        
-        ax.errorbar(all_link_rates, avg_durations, std_durations, label='Size: {0} GB'.format(size), marker="x")
+    cube = get_metrics_cube(exp_metrics_list)
+    for size in cube.get_input_sizes_gb(experiment_group):
+        link_rates, avg_durations, std_durations = cube.get_series("duration_secs", experiment_group, size)
+        ax.errorbar(link_rates, avg_durations, std_durations, label='Size: {0} GB'.format(size), marker="x")
 
     plt.legend()
     # plt.show()
@@ -690,24 +592,9 @@ def plot_exp_duration_per_input_size(run_id, exp_metrics_list, output_dir, input
     ax.set_xlabel("Link bandwidth Mbps")
     ax.set_ylabel("Duration (secs)")
 
-    exp_metrics_list = [exp for exp in exp_metrics_list if exp.input_size_gb == input_size_gb]
-    all_exp_types = sorted(set(map(lambda r: r.experiment_setup.experiment_group, exp_metrics_list)))
-    for exp_type_id in all_exp_types:
-        exp_type_filtered = list(filter(lambda r: r.experiment_setup.experiment_group == exp_type_id, exp_metrics_list))
-        # There may be multiple runs for the same setup, calculate average over those runs.
-        all_link_rates = sorted(set(map(lambda r: r.link_bandwidth_mbps, exp_type_filtered)))
-        avg_durations = []
-        std_durations = []
-        for link_rate in all_link_rates:
-            link_filtered = list(filter(lambda f: f.link_bandwidth_mbps == link_rate, exp_type_filtered))
-            all_exp_durations = [e.duration.total_seconds() for e in link_filtered]
-            # avg_durations.append(math.log(np.mean(all_exp_durations)))
-            avg_durations.append(np.mean(all_exp_durations))
-            std_durations.append(np.std(all_exp_durations))
-            # print(round(math.log(link_rate), 2), round(math.log(np.mean(all_exp_durations)), 2), sep=", ")
-
-        log_link_rates = [math.log(l) for l in all_link_rates]
-        ax.errorbar(all_link_rates, avg_durations, std_durations, label='Exp group: {0}'.format(exp_type_id), marker="x")
+    # There may be multiple runs for the same setup, the cube has the average over those runs.
+    cube = get_metrics_cube(exp_metrics_list)
+    plot_metric_by_experiment_group(ax, cube, "duration_secs", input_size_gb, "x", label_format='Exp group: {0}')
     
     plt.legend()
     # plt.show()
@@ -721,15 +608,14 @@ def plot_exp_duration_per_input_size(run_id, exp_metrics_list, output_dir, input
 def load_all_experiments(start_time, end_time):
     experiments = []
 
-    all_experiment_folders = [os.path.join(plot_one_experiment.results_base_dir, item)
-                       for item in os.listdir(plot_one_experiment.results_base_dir)
-                       if item.startswith("Exp-")
-                       and os.path.isdir(os.path.join(plot_one_experiment.results_base_dir, item))]
+    # Experiments in folders or archives
+    all_experiment_ids = list_experiment_ids(plot_one_experiment.results_base_dir)
 
-    for experiment_dir_path in all_experiment_folders:
-        experiment_time = datetime.fromtimestamp(os.path.getctime(experiment_dir_path))
+    for experiment_id in all_experiment_ids:
+        experiment_dir_path = os.path.join(plot_one_experiment.results_base_dir, experiment_id)
+        experiment_time = datetime.fromtimestamp(os.path.getctime(
+            get_experiment_path(plot_one_experiment.results_base_dir, experiment_id)))
         if start_time < experiment_time < end_time:
-            experiment_id = os.path.basename(experiment_dir_path)
             # print("Loading " + experiment_id)
             setup_file_path = os.path.join(experiment_dir_path, "setup_details.txt")
             experiment_setup = ExperimentSetup(setup_file_path)
@@ -833,17 +719,6 @@ def print_stats(all_results, power_plots_output_dir):
 
 
 def main():
-
-    # Parse results
-    all_experiments = load_all_experiments(global_start_time, global_end_time)
-    relevant_experiments = filter_experiments_to_consider(all_experiments)
-    all_results = [get_metrics_summary_for_experiment(exp.experiment_id, exp) for exp in relevant_experiments]
-    # print(all_results)
-
-    print("Output plots at path: " + power_plots_output_dir)
-    if not os.path.exists(power_plots_output_dir):
-        os.mkdir(power_plots_output_dir)
-
     # Parse args and call relevant action
     parser = argparse.ArgumentParser("Generates different kinds of plots from results across different experiments")
     parser.add_argument('--printstats', action='store_true', help='Prints some experiment aggregate statistics like duration, total network usage, etc.')
@@ -853,8 +728,25 @@ def main():
     parser.add_argument('--diskio', action='store_true', help='Generates plots for total disk usage for specified runs')
     parser.add_argument('--runtime', action='store_true', help='Generates plots for job execution times for specified runs')
     parser.add_argument('--netcdf', action='store_true', help='Generates a cdf plot for network tx throughput for specified runs')
+    profiling.add_profile_arguments(parser)
     args = parser.parse_args()
 
+    # Timing report of the stages, if asked for with --profile or the env var
+    profiling.enable_from_env(args.profile, args.hotspots)
+
+    # Parse results
+    all_experiments = load_all_experiments(global_start_time, global_end_time)
+    relevant_experiments = filter_experiments_to_consider(all_experiments)
+    # The network cdf needs only the sketches in the metrics summaries, the other plots need the experiments parsed
+    needs_parsing = args.printstats or args.all or args.runtime or args.power or args.diskio or args.network
+    all_results = [get_metrics_summary_for_experiment(exp.experiment_id, exp) for exp in relevant_experiments] \
+        if needs_parsing else []
+    # print(all_results)
+
+    print("Output plots at path: " + power_plots_output_dir)
+    if not os.path.exists(power_plots_output_dir):
+        os.mkdir(power_plots_output_dir)
+
     # Print any stats we might want to look at
     if args.printstats:
         print_stats(all_results, power_plots_output_dir)
@@ -913,7 +805,8 @@ def main():
 
     if args.all or args.netcdf:
             run_id = datetime.now().strftime("%Y-%m-%d-%H-%M-%S-%f")
-            plot_cdf_network_throughput(run_id, all_results, power_plots_output_dir, node_name=None)
+            plot_cdf_network_throughput(run_id, relevant_experiments, power_plots_output_dir, node_name=None,
+                                        exp_metrics_list=all_results)
             pass
 
 
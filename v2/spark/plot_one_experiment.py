@@ -2,8 +2,10 @@
 Parses Power, CPU, Memory and other resource usage results and plots them for a single experiment
 """
 
+import argparse
 import os
 import re
+import math
 from datetime import datetime
 from datetime import timedelta
 import random
@@ -12,29 +14,15 @@ import json
 import traceback as tc
 import numpy as np
 import run_experiments
-
-
-# Experiment setup class
-class ExperimentSetup:
-    def __init__(self, setup_file_path):
-        # Parse experimental setup from setup file
-        json_dict = json.load(open(setup_file_path, "r"))
-        self.all_spark_nodes = json_dict["AllSparkNodes"]
-        self.designated_driver_node = json_dict["SparkDriverNode"]
-        self.power_meter_nodes_in_order = json_dict["PowerMeterNodesInOrder"]
-        self.input_size_gb = json_dict["InputSizeGb"]
-        self.link_bandwidth_mbps = float(json_dict["LinkBandwidthMbps"])
-        self.experiment_start_time = datetime.strptime(json_dict["ExperimentStartTime"], "%Y-%m-%d %H:%M:%S")
-        self.spark_job_start_time = datetime.strptime(json_dict["SparkJobStartTime"], "%Y-%m-%d %H:%M:%S")
-        self.spark_job_end_time = datetime.strptime(json_dict["SparkJobEndTime"], "%Y-%m-%d %H:%M:%S")
-        
-        self.experiment_group = str(json_dict["ExperimentGroup"])
-        self.experiment_group_desc = json_dict.get("ExperimentGroupDesc", "No description")
-        self.scala_class_name = json_dict.get("ScalaClassName", None)
-        self.input_cached_in_hdfs = json_dict.get("InputHdfsCached", None)
-        self.plot_friendly_name = json_dict.get("PlotFriendlyName", None)
-        self.record_size_bytes = json_dict.get("RecordSizeByes", None)
-        self.final_partition_count = json_dict.get("FinalPartitionCount", None)
+from cpu_core_usage import parse_cpu_core_usage, plot_cpu_cores_for_one_node
+import node_summary
+import proc_samples
+import rapl_readings
+import power_meter_readings
+from spark_log_index import get_spark_log_index, to_datetime as spark_log_time
+import profiling
+from experiment_setup import ExperimentSetup
+from experiment_archive import result_file_exists, open_result_file, list_experiment_ids, get_experiment_path
 
 
 # Results base folder
@@ -85,7 +73,9 @@ def parse_date_from_sar_file(first_line_in_file):
 
 
 # Collects all results from SAR and Powermeter, parses for required info and merges results onto single timeline.
-def parse_results(results_dir_path, experiment_setup, output_readings_file_name, output_readings_to_file=False):
+# If cpu_core_usage_dict is provided, per-core CPU usage matrices of each node are also added to it (by node name).
+def parse_results(results_dir_path, experiment_setup, output_readings_file_name, output_readings_to_file=False,
+                  cpu_core_usage_dict=None):
     # Final results
     all_readings = []
 
@@ -93,41 +83,41 @@ def parse_results(results_dir_path, experiment_setup, output_readings_file_name,
     for node_name in experiment_setup.all_spark_nodes:
         node_results_dir = os.path.join(results_dir_path, node_name)
 
-        # Parse CPU results
+        # If the node was sampled from /proc instead of by SAR, take readings from the samples
+        if not result_file_exists(os.path.join(node_results_dir, cpu_readings_file_name)) \
+                and proc_samples.has_proc_samples(node_results_dir):
+            all_readings.extend(proc_samples.get_node_readings(node_results_dir, node_name))
+            if cpu_core_usage_dict is not None:
+                cpu_core_usage_dict[node_name] = proc_samples.get_cpu_core_usage(node_results_dir, node_name)
+            continue
+
+        # If only the node-side summary was fetched (raw SAR files are fetched on demand), take readings from it
+        if not result_file_exists(os.path.join(node_results_dir, cpu_readings_file_name)) \
+                and node_summary.has_summary(node_results_dir):
+            all_readings.extend(node_summary.get_node_readings(node_results_dir, node_name))
+            if cpu_core_usage_dict is not None:
+                cpu_core_usage_dict[node_name] = node_summary.get_cpu_core_usage(node_results_dir, node_name)
+            continue
+
+        # Parse CPU results. The per-core rows are kept as (time x core) matrices, the "all" rows go into readings.
         cpu_full_path = os.path.join(node_results_dir, cpu_readings_file_name)
-
-        with open(cpu_full_path, "r") as lines:
-            first_line = True
-            date_part = None
-            previous_reading_time_part = None
-            for line in lines:
-                if first_line:
-                    date_string = parse_date_from_sar_file(first_line_in_file=line)
-                    date_part = datetime.strptime(date_string, '%m/%d/%Y')
-                    first_line = False
-
-                matches = re.match(cpu_all_cores_regex, line)
-                if matches:
-                    time_string = matches.group(1)
-
-                    # Add a day when experiment runs past midnight, when the hour of the first reading is smaller than the one before.
-                    time_part = datetime.strptime(time_string, '%I:%M:%S %p')
-                    if previous_reading_time_part is not None and previous_reading_time_part.hour > time_part.hour:
-                        date_part = date_part + timedelta(days=1)
-                    previous_reading_time_part = time_part
-
-                    timestamp = date_part.replace(hour=time_part.hour, minute=time_part.minute, second=time_part.second)
-                    cpu_user_usage = float(matches.group(3))
-                    cpu_system_usage = float(matches.group(5))
-
-                    all_readings.append([timestamp, node_name, "cpu_user_usage", cpu_user_usage])
-                    all_readings.append([timestamp, node_name, "cpu_system_usage", cpu_system_usage])
-                    all_readings.append([timestamp, node_name, "cpu_total_usage", cpu_user_usage + cpu_system_usage])
+        cpu_core_usage = parse_cpu_core_usage(cpu_full_path, node_name)
+        if cpu_core_usage_dict is not None:
+            cpu_core_usage_dict[node_name] = cpu_core_usage
+
+        for timestamp, cpu_user_usage, cpu_system_usage in zip(cpu_core_usage.timestamps,
+                                                               cpu_core_usage.all_user.tolist(),
+                                                               cpu_core_usage.all_system.tolist()):
+            if math.isnan(cpu_user_usage):
+                continue
+            all_readings.append([timestamp, node_name, "cpu_user_usage", cpu_user_usage])
+            all_readings.append([timestamp, node_name, "cpu_system_usage", cpu_system_usage])
+            all_readings.append([timestamp, node_name, "cpu_total_usage", cpu_user_usage + cpu_system_usage])
 
         # Parse network usage
         net_full_path = os.path.join(node_results_dir, net_readings_file_name)
 
-        with open(net_full_path, "r") as lines:
+        with open_result_file(net_full_path) as lines:
             first_line = True
             date_part = None
             previous_reading_time_part = None
@@ -166,7 +156,7 @@ def parse_results(results_dir_path, experiment_setup, output_readings_file_name,
         # Parse memory usage
         mem_full_path = os.path.join(node_results_dir, mem_readings_file_name)
 
-        with open(mem_full_path, "r") as lines:
+        with open_result_file(mem_full_path) as lines:
             first_line = True
             date_part = None
             previous_reading_time_part = None
@@ -193,8 +183,8 @@ def parse_results(results_dir_path, experiment_setup, output_readings_file_name,
 
         # Parse disk IO usage (Disk IO may not exist for some experiments, so skip it if it does not exist)
         diskio_full_path = os.path.join(node_results_dir, diskio_readings_file_name)
-        if os.path.exists(diskio_full_path):
-            with open(diskio_full_path, "r") as lines:
+        if result_file_exists(diskio_full_path):
+            with open_result_file(diskio_full_path) as lines:
                 first_line = True
                 date_part = None
                 previous_reading_time_part = None
@@ -234,8 +224,16 @@ def parse_results(results_dir_path, experiment_setup, output_readings_file_name,
     designated_driver_results_path = os.path.join(results_dir_path, experiment_setup.designated_driver_node)
     power_full_path = os.path.join(designated_driver_results_path, power_readings_file_name)
 
-    if os.path.exists(power_full_path):
-        with open(power_full_path, "r") as lines:
+    # Readings of the integrating meter reader (node-scripts/power_meter.py) name their nodes, the older per-second
+    # readings have a column per node in power_meter_nodes_in_order.
+    metered_nodes = set()
+    if power_meter_readings.has_power_meter_readings(designated_driver_results_path):
+        meter_readings, meter_node_names = power_meter_readings.get_node_readings(designated_driver_results_path)
+        all_readings.extend(meter_readings)
+        metered_nodes = set(meter_node_names)
+    elif result_file_exists(power_full_path):
+        metered_nodes = set(experiment_setup.power_meter_nodes_in_order)
+        with open_result_file(power_full_path) as lines:
             for line in lines:
                 matches = re.match(power_regex, line)
                 if matches:
@@ -247,32 +245,34 @@ def parse_results(results_dir_path, experiment_setup, output_readings_file_name,
                         all_readings.append([timestamp.replace(microsecond=0), node_name, "power_watts", power_watts])
                         i += 1
 
+    # Take power readings of nodes that are not on the power meter from their RAPL energy counters, if those were read
+    for node_name in experiment_setup.all_spark_nodes:
+        node_results_dir = os.path.join(results_dir_path, node_name)
+        if rapl_readings.has_rapl_readings(node_results_dir):
+            all_readings.extend(rapl_readings.get_node_readings(node_results_dir, node_name,
+                                                                include_power_watts=node_name not in metered_nodes))
+
     # Parse spark log
     spark_log_full_path = os.path.join(designated_driver_results_path, spark_log_file_name)
     task_counter = dict.fromkeys(experiment_setup.all_spark_nodes, 0)
 
-    if os.path.exists(spark_log_full_path):
-        with open(spark_log_full_path, "r") as lines:
-            for line in lines:
-                matches = re.match(spark_stage_and_task_log_regex_2, line)
-                if matches:
-                    time_string = matches.group(1)
-                    timestamp = datetime.strptime(time_string, '%y/%m/%d %H:%M:%S')
-                    # timestamp = datetime.strptime(time_string, '%Y-%m-%d %H:%M:%S')
-                    stage = float(matches.group(2))
-                    node_name = matches.group(3)
+    if result_file_exists(spark_log_full_path):
+        spark_log_index = get_spark_log_index(spark_log_full_path, spark_stage_and_task_log_regex_2)
+        for seconds, node_code, delta, stage in zip(spark_log_index.task_times.tolist(),
+                                                    spark_log_index.task_node_codes.tolist(),
+                                                    spark_log_index.task_deltas.tolist(),
+                                                    spark_log_index.task_stages.tolist()):
+            timestamp = spark_log_time(seconds)
+            node_name = spark_log_index.node_names[node_code]
 
-                    # If only results from subset of the nodes are available (rare case)
-                    if node_name not in experiment_setup.all_spark_nodes:
-                        continue
+            # If only results from subset of the nodes are available (rare case)
+            if node_name not in experiment_setup.all_spark_nodes:
+                continue
 
-                    if "Starting task" in line:
-                        task_counter[node_name] += 1
-                    else:
-                        task_counter[node_name] -= 1
+            task_counter[node_name] += delta
 
-                    all_readings.append([timestamp, node_name, "spark_stage", stage])
-                    all_readings.append([timestamp, node_name, "spark_tasks", task_counter[node_name]])
+            all_readings.append([timestamp, node_name, "spark_stage", stage])
+            all_readings.append([timestamp, node_name, "spark_tasks", task_counter[node_name]])
 
         # Add max and min timestamps for spark tasks with 0 to get the same time range in plots.
         time_stamps = list(map(lambda r: r[0], all_readings))
@@ -548,8 +548,9 @@ def parse_and_plot_results(experiment_id):
     output_readings_file_name = "all_readings_{0}.txt".format(random_parse_run_id)
 
     # Collect readings from all results files
+    cpu_core_usage_dict = {}
     all_readings = parse_results(results_dir_path, experiment_setup, output_readings_file_name,
-                                 output_readings_to_file=False)
+                                 output_readings_to_file=False, cpu_core_usage_dict=cpu_core_usage_dict)
 
     # Generate plots for each node
     plots_dir_full_path = os.path.join(results_dir_path, plots_dir_name)
@@ -564,6 +565,10 @@ def parse_and_plot_results(experiment_id):
         plot_custom_for_one_node(plots_dir_full_path, all_readings, experiment_id, experiment_setup, node_name)
         pass
 
+    for node_name in experiment_setup.all_spark_nodes:
+        plot_cpu_cores_for_one_node(plots_dir_full_path, cpu_core_usage_dict[node_name], experiment_id, experiment_setup)
+        pass
+
     for label_name in ['power_watts', 'cpu_total_usage', 'mem_usage_percent', 'net_in_Mbps', 'net_out_Mbps',
                        'disk_MBreads_ps', 'disk_MBwrites_ps', 'spark_tasks']:
         plot_all_for_one_label(plots_dir_full_path, all_readings, experiment_id, experiment_setup, label_name)
@@ -582,14 +587,12 @@ def filter_experiments_to_consider():
 
     # All experiments after start_time that doesn't already have plots_ folder.
     experiments_to_consider = []
-    all_experiments = [os.path.join(results_base_dir, item) for item in os.listdir(results_base_dir)
-               if item.startswith("Exp-")
-                   and os.path.isdir(os.path.join(results_base_dir, item))
-                   and not [subdir for subdir in os.listdir(os.path.join(results_base_dir, item)) if subdir.startswith("plots_")]]
-
-    for experiment_dir_path in all_experiments:
-        experiment_id = os.path.basename(experiment_dir_path)
-        experiment_time = datetime.fromtimestamp(os.path.getctime(experiment_dir_path))
+    all_experiments = [item for item in list_experiment_ids(results_base_dir)
+                   if not os.path.isdir(os.path.join(results_base_dir, item))
+                   or not [subdir for subdir in os.listdir(os.path.join(results_base_dir, item)) if subdir.startswith("plots_")]]
+
+    for experiment_id in all_experiments:
+        experiment_time = datetime.fromtimestamp(os.path.getctime(get_experiment_path(results_base_dir, experiment_id)))
         if start_time < experiment_time < end_time:
             experiments_to_consider.append(experiment_id)
             pass
@@ -599,9 +602,18 @@ def filter_experiments_to_consider():
     return experiments_to_consider
 
 
-if __name__ == "__main__":
+def main():
+    parser = argparse.ArgumentParser("Parses results of single experiments and plots them")
+    parser.add_argument('experiment_ids', action='store', nargs='*',
+                        help='experiments to parse, defaults to the recent ones without plots')
+    profiling.add_profile_arguments(parser)
+    args = parser.parse_args()
+
+    # Timing report of the stages, if asked for with --profile or the SPARK_ANALYSIS_PROFILE env var
+    profiling.enable_from_env(args.profile, args.hotspots)
+
     # all_experiments = ["Sting-Exp-2018-12-19-23-43-24"]
-    all_experiments = filter_experiments_to_consider()
+    all_experiments = args.experiment_ids or filter_experiments_to_consider()
     for experiment_id in all_experiments:
         try:
             print("Parsing experiment " + experiment_id)
@@ -609,3 +621,7 @@ if __name__ == "__main__":
         except Exception as e:
             tc.print_exc(e)
             pass
+
+
+if __name__ == "__main__":
+    main()
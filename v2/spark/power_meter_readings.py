@@ -0,0 +1,96 @@
+"""
+Loads the power meter readings that node-scripts/power_meter.py writes on the node connected to the meter, and turns
+their cumulative energy into per-second power readings of each metered node
+"""
+
+import os
+import importlib.util
+from datetime import datetime
+import numpy as np
+from experiment_archive import result_file_exists, open_result_file
+
+
+# The readings format is defined by the node-side reader, load it from the node scripts folder
+_reader_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "node-scripts", "power_meter.py")
+_reader_spec = importlib.util.spec_from_file_location("power_meter", _reader_path)
+power_meter = importlib.util.module_from_spec(_reader_spec)
+_reader_spec.loader.exec_module(power_meter)
+
+power_meter_readings_file_name = power_meter.power_meter_readings_file_name
+
+
+class PowerMeterReadings:
+    node_names = None       # Node on each channel
+    realtime_secs = None    # float64 epoch secs of each reading
+    integration_secs = None # float64 meter secs since integration started, as of each reading
+    energies_wh = None      # float64 readings x channels, cumulative since integration started
+    average_watts = None    # float64 readings x channels, as averaged by the meter
+
+    # Energy of each channel over the whole run, exact as the meter integrated it
+    def get_total_energies_wh(self):
+        return self.energies_wh[-1] if len(self.energies_wh) else np.zeros(len(self.node_names))
+
+    # Energy of each channel used between two epoch secs, from the cumulative readings. Exact at readings, and
+    # interpolated in between. Integration starts at zero, integration_secs before the first reading.
+    def get_energies_wh_between(self, start_secs, end_secs):
+        if not len(self.realtime_secs):
+            return np.zeros(len(self.node_names))
+        realtime_secs = np.concatenate([[self.realtime_secs[0] - self.integration_secs[0]], self.realtime_secs])
+        energies_wh = np.concatenate([np.zeros((1, len(self.node_names))), self.energies_wh])
+        return np.array([np.interp(end_secs, realtime_secs, energies_wh[:, idx]) -
+                         np.interp(start_secs, realtime_secs, energies_wh[:, idx])
+                         for idx in range(len(self.node_names))])
+
+    # Average watts over each wall-clock second, the energy used in the readings ending in that second over the meter
+    # time they cover. Readings that cover no meter time (e.g., one after the integrator stopped) add no energy either
+    # and are left out. Returns (list of datetimes, readings x channels array).
+    def get_per_second_watts(self):
+        energies_joules = np.diff(self.energies_wh, axis=0, prepend=0) * 3600
+        covered_secs = np.diff(self.integration_secs, prepend=0)
+        covering = covered_secs > 0
+        energies_joules = energies_joules[covering]
+        covered_secs = covered_secs[covering]
+        seconds, indices = np.unique(np.floor(self.realtime_secs[covering]).astype(np.int64), return_inverse=True)
+        watts = np.stack([np.bincount(indices, weights=energies_joules[:, idx], minlength=len(seconds))
+                          for idx in range(len(self.node_names))], axis=1)
+        watts /= np.bincount(indices, weights=covered_secs, minlength=len(seconds))[:, None]
+        return [datetime.fromtimestamp(s) for s in seconds.tolist()], watts
+
+
+def has_power_meter_readings(results_dir):
+    return result_file_exists(os.path.join(results_dir, power_meter_readings_file_name))
+
+
+# Loads a readings file. A reader that got killed may leave a partial line at the end, that is dropped.
+def load_power_meter_readings(results_dir):
+    readings = PowerMeterReadings()
+    rows = []
+    with open_result_file(os.path.join(results_dir, power_meter_readings_file_name)) as lines:
+        readings.node_names = lines.readline()[len(power_meter.channels_header_prefix):].strip().split(",")
+        num_fields = 2 + 2 * len(readings.node_names)
+        for line in lines:
+            fields = line.split(",")
+            if len(fields) == num_fields and line.endswith("\n"):
+                rows.append([float(field) for field in fields])
+
+    num_channels = len(readings.node_names)
+    table = np.array(rows, dtype=np.float64).reshape(-1, num_fields)
+    readings.realtime_secs = table[:, 0]
+    readings.integration_secs = table[:, 1]
+    readings.energies_wh = table[:, 2:2 + num_channels]
+    readings.average_watts = table[:, 2 + num_channels:]
+    return readings
+
+
+# Gets per-second power of the metered nodes in the same [timestamp, node, label, value] format as parse_results.
+# Returns (readings, names of the metered nodes).
+def get_node_readings(results_dir):
+    readings = load_power_meter_readings(results_dir)
+    if not len(readings.realtime_secs):
+        return [], readings.node_names
+    timestamps, watts = readings.get_per_second_watts()
+    all_readings = []
+    for timestamp, node_watts in zip(timestamps, watts.tolist()):
+        for node_name, power_watts in zip(readings.node_names, node_watts):
+            all_readings.append([timestamp, node_name, "power_watts", power_watts])
+    return all_readings, readings.node_names
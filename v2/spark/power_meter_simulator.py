@@ -0,0 +1,257 @@
+"""
+A made up power meter that speaks the meter's SCPI over a local TCP socket, to try out node-scripts/power_meter.py
+without the instrument. Each channel draws a base load with a slow swing and short bursts, like tasks coming and going,
+and the simulated integrator keeps the exact energy of it. Responses can be held back at random, like on a busy GPIB
+bus. The check (--check) runs the reader against it and compares the energy the reader recorded with the energy the
+channels used, and with the estimate from summing once-a-second power readings, as the older reader did.
+"""
+
+import argparse
+import math
+import os
+import random
+import socketserver
+import tempfile
+import threading
+import time
+from power_meter_readings import power_meter, load_power_meter_readings
+
+
+# Simulator defaults
+default_port = 5025                 # Usual port of raw SCPI sockets
+default_num_channels = 4
+default_latency_ms = 50             # Responses are held back for up to this long
+legacy_power_query = "measure:scalar:power:real? 0"
+undefined_header_error = '-113,"Undefined header"'
+identity = "Simulated,PowerMeter,0,1.0"
+
+
+# Power of a channel: base load, a sine swing and bursts of extra load at the start of every burst period
+class SimulatedChannel:
+    def __init__(self, base_watts, swing_watts, swing_period_secs, burst_watts, burst_secs, burst_period_secs):
+        self.base_watts = base_watts
+        self.swing_watts = swing_watts
+        self.swing_period_secs = swing_period_secs
+        self.burst_watts = burst_watts
+        self.burst_secs = burst_secs
+        self.burst_period_secs = burst_period_secs
+
+    def get_watts(self, t):
+        in_burst = t % self.burst_period_secs < self.burst_secs
+        return self.base_watts + self.swing_watts * math.sin(2 * math.pi * t / self.swing_period_secs) + \
+            (self.burst_watts if in_burst else 0)
+
+    # Secs spent in bursts from time 0 to t
+    def get_burst_secs(self, t):
+        return math.floor(t / self.burst_period_secs) * self.burst_secs + min(t % self.burst_period_secs,
+                                                                              self.burst_secs)
+
+    # Energy used between two times, the integral of get_watts
+    def get_joules(self, start_secs, end_secs):
+        omega = 2 * math.pi / self.swing_period_secs
+        return self.base_watts * (end_secs - start_secs) + \
+            self.swing_watts / omega * (math.cos(omega * start_secs) - math.cos(omega * end_secs)) + \
+            self.burst_watts * (self.get_burst_secs(end_secs) - self.get_burst_secs(start_secs))
+
+
+def normalize_command(command):
+    return " ".join(command.strip().lstrip(":").upper().split())
+
+
+class SimulatedPowerMeter:
+    def __init__(self, num_channels=default_num_channels, latency_ms=0, seed=0):
+        rng = random.Random(seed)
+        self.channels = [SimulatedChannel(base_watts=rng.uniform(90, 150), swing_watts=rng.uniform(10, 40),
+                                          swing_period_secs=rng.uniform(5, 20), burst_watts=rng.uniform(50, 150),
+                                          burst_secs=rng.uniform(0.1, 0.5), burst_period_secs=rng.uniform(0.7, 1.6))
+                         for _ in range(num_channels)]
+        self.latency_ms = latency_ms
+        self.rng = random.Random(seed + 1)
+        self.lock = threading.Lock()
+        self.start_monotonic = time.monotonic()
+        self.integrating_since = None       # Channel time the integrator was started at, None when stopped
+        self.integrated_secs = 0.0          # Up to integrating_since, or in total when stopped
+        self.integrated_joules = [0.0] * num_channels
+        self.averaged_since = 0.0           # Average power is over the time since the previous query of it
+        self.num_exchanges = 0
+        self.handlers = {
+            normalize_command(power_meter.identify_query): lambda now: identity,
+            normalize_command(power_meter.integrator_stop_command): self.stop_integration,
+            normalize_command(power_meter.integrator_reset_command): self.reset_integration,
+            normalize_command(power_meter.integrator_start_command): self.start_integration,
+            normalize_command(power_meter.energy_query_format.format(power_meter.all_channels)): self.get_energies,
+            normalize_command(power_meter.average_power_query_format.format(power_meter.all_channels)):
+                self.get_average_powers,
+            normalize_command(power_meter.integration_time_query): self.get_integration_time,
+            normalize_command(legacy_power_query): self.get_powers,
+        }
+
+    # Channel time, secs since the simulator started
+    def get_time(self):
+        return time.monotonic() - self.start_monotonic
+
+    # Integration secs and joules of each channel as of channel time now
+    def get_integration(self, now):
+        if self.integrating_since is None:
+            return self.integrated_secs, list(self.integrated_joules)
+        return self.integrated_secs + now - self.integrating_since, \
+            [joules + channel.get_joules(self.integrating_since, now)
+             for joules, channel in zip(self.integrated_joules, self.channels)]
+
+    def stop_integration(self, now):
+        self.integrated_secs, self.integrated_joules = self.get_integration(now)
+        self.integrating_since = None
+
+    def reset_integration(self, now):
+        self.integrated_secs = 0.0
+        self.integrated_joules = [0.0] * len(self.channels)
+        if self.integrating_since is not None:
+            self.integrating_since = now
+
+    def start_integration(self, now):
+        if self.integrating_since is None:
+            self.integrating_since = now
+
+    def get_energies(self, now):
+        return ",".join(str(joules / 3600) for joules in self.get_integration(now)[1])
+
+    def get_average_powers(self, now):
+        start, self.averaged_since = self.averaged_since, now
+        if now <= start:
+            return self.get_powers(now)
+        return ",".join(str(channel.get_joules(start, now) / (now - start)) for channel in self.channels)
+
+    def get_integration_time(self, now):
+        return str(self.get_integration(now)[0])
+
+    def get_powers(self, now):
+        return ",".join(str(channel.get_watts(now)) for channel in self.channels)
+
+    # Handles a message of one or more commands, all as of the same instant. Returns the responses of its queries, or
+    # None if it had none.
+    def handle(self, message):
+        responses = []
+        with self.lock:
+            now = self.get_time()
+            self.num_exchanges += 1
+            for command in message.split(power_meter.query_separator):
+                handler = self.handlers.get(normalize_command(command))
+                response = handler(now) if handler else (undefined_header_error if "?" in command else None)
+                if response is not None:
+                    responses.append(response)
+            delay_secs = self.rng.uniform(0, self.latency_ms / 1000.0)
+        if responses:
+            time.sleep(delay_secs)
+            return power_meter.query_separator.join(responses)
+        return None
+
+
+class ScpiRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            response = self.server.meter.handle(line.decode("ascii"))
+            if response is not None:
+                self.wfile.write((response + "\n").encode("ascii"))
+
+
+class ScpiServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, meter, port):
+        super().__init__(("127.0.0.1", port), ScpiRequestHandler)
+        self.meter = meter
+
+
+# Serves the meter in the background. Port 0 picks a free one, see server.server_address.
+def start_simulator(meter, port=0):
+    server = ScpiServer(meter, port)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# Reads instantaneous power once every interval and adds it up as if it held for the whole interval, as the older
+# reader and its plots did. Returns the joules of each channel and the channel time the readings covered.
+def run_legacy_reader(meter, port, interval_secs, stopped, result):
+    transport = power_meter.SocketTransport("127.0.0.1", port)
+    joules = [0.0] * len(meter.channels)
+    start = meter.get_time()
+    next_secs = time.monotonic()
+    while not stopped.is_set():
+        next_secs += interval_secs
+        time.sleep(max(next_secs - time.monotonic(), 0))
+        for idx, watts in enumerate(power_meter.parse_values(transport.ask(legacy_power_query))):
+            joules[idx] += watts * interval_secs
+    result.extend([joules, start, meter.get_time()])
+    transport.close()
+
+
+# Runs the reader against a simulated meter next to the older once-a-second reader, and compares the energy of each to
+# what the channels used. Returns whether the reader recorded the meter's energy exactly.
+def check_power_meter_reader(duration_secs=10, interval_ms=power_meter.default_interval_ms,
+                             latency_ms=default_latency_ms, num_channels=default_num_channels, seed=0):
+    meter = SimulatedPowerMeter(num_channels, latency_ms, seed)
+    server = start_simulator(meter)
+    port = server.server_address[1]
+    node_names = ["node-{0}".format(idx) for idx in range(num_channels)]
+    results_dir = tempfile.mkdtemp()
+
+    legacy_stopped = threading.Event()
+    legacy_result = []
+    legacy_reader = threading.Thread(target=run_legacy_reader, args=(meter, port, interval_ms / 1000.0,
+                                                                     legacy_stopped, legacy_result))
+    legacy_reader.start()
+    reader = power_meter.connect_power_meter(num_channels, "127.0.0.1", port)
+    count = power_meter.run_power_meter(os.path.join(results_dir, power_meter.power_meter_readings_file_name), reader,
+                                        node_names, interval_ms, duration_secs)
+    reader.transport.close()
+    legacy_stopped.set()
+    legacy_reader.join()
+    server.shutdown()
+    server.server_close()
+
+    readings = load_power_meter_readings(results_dir)
+    recorded_wh = readings.get_total_energies_wh().tolist()
+    integrated_wh = [joules / 3600 for joules in meter.integrated_joules]
+    legacy_joules, legacy_start, legacy_end = legacy_result
+    print("Reader: {0} readings, {1} exchanges with the meter over {2:.2f} integration secs".format(
+        count, reader.num_exchanges, meter.integrated_secs))
+    print("Older reader: {0:.2f} secs of once-a-second power readings, summed and compared to the energy used".format(
+        legacy_end - legacy_start))
+    print("{:<8s} {:>12s} {:>12s} | {:>14s} {:>12s} {:>8s}".format("Channel", "Meter Wh", "Recorded Wh",
+                                                                   "Per-sec sum Wh", "Used Wh", "Error"))
+    exact = count > 0
+    for idx, node_name in enumerate(node_names):
+        used_wh = meter.channels[idx].get_joules(legacy_start, legacy_end) / 3600
+        legacy_wh = legacy_joules[idx] / 3600
+        exact = exact and recorded_wh[idx] == integrated_wh[idx]
+        print("{:<8s} {:>12.6f} {:>12.6f} | {:>14.6f} {:>12.6f} {:>7.2f}%".format(
+            node_name, integrated_wh[idx], recorded_wh[idx], legacy_wh, used_wh, (legacy_wh - used_wh) / used_wh * 100))
+    print("Recorded energy is {0}".format("exact" if exact else "NOT exact"))
+    return exact
+
+
+def main():
+    parser = argparse.ArgumentParser("Simulates the power meter on a local SCPI socket")
+    parser.add_argument('--port', action='store', type=int, default=default_port, help='port to serve on')
+    parser.add_argument('--channels', action='store', type=int, default=default_num_channels, help='number of channels')
+    parser.add_argument('--latencyms', action='store', type=float, default=default_latency_ms,
+                        help='responses are held back for up to this many millisecs')
+    parser.add_argument('--seed', action='store', type=int, default=0, help='random seed for the channel loads')
+    parser.add_argument('--check', action='store_true', help='check the reader against the simulator and exit')
+    parser.add_argument('--duration', action='store', type=float, default=10, help='secs to read for, for --check')
+    parser.add_argument('--intervalms', action='store', type=float, default=power_meter.default_interval_ms,
+                        help='reading interval in millisecs, for --check')
+    args = parser.parse_args()
+
+    if args.check:
+        exact = check_power_meter_reader(args.duration, args.intervalms, args.latencyms, args.channels, args.seed)
+        exit(0 if exact else 1)
+
+    server = ScpiServer(SimulatedPowerMeter(args.channels, args.latencyms, args.seed), args.port)
+    print("Serving a simulated power meter on {0}:{1}".format(*server.server_address))
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -6,8 +6,9 @@ Filters experiments from the results folder based on some setup parameters
 import os
 from sys import stdin
 from datetime import datetime
-import plot_one_experiment
-from plot_one_experiment import ExperimentSetup
+import run_experiments
+from experiment_archive import list_experiment_ids, get_experiment_path
+from experiment_setup import ExperimentSetup
 
 
 # Filter experiments to generate plots
@@ -17,13 +18,10 @@ def filter_experiments_to_consider(results_dir):
 
     # All experiments after start_time that doesn't already have plots_ folder.
     experiments_to_consider = []
-    all_experiments = [os.path.join(results_dir, item) for item in os.listdir(results_dir)
-               if item.startswith("Exp-")
-                   and os.path.isdir(os.path.join(results_dir, item))]
+    all_experiments = list_experiment_ids(results_dir)
 
-    for experiment_dir_path in all_experiments:
-        experiment_id = os.path.basename(experiment_dir_path)
-        experiment_time = datetime.fromtimestamp(os.path.getctime(experiment_dir_path))
+    for experiment_id in all_experiments:
+        experiment_time = datetime.fromtimestamp(os.path.getctime(get_experiment_path(results_dir, experiment_id)))
         if start_time < experiment_time < end_time:
             experiments_to_consider.append(experiment_id)
             pass
@@ -34,7 +32,7 @@ def filter_experiments_to_consider(results_dir):
 
 
 def main():
-    results_dir = plot_one_experiment.results_base_dir
+    results_dir = run_experiments.local_results_folder
     all_experiments = filter_experiments_to_consider(results_dir)
 
     filter_results = False
@@ -0,0 +1,132 @@
+"""
+Loads the sub-second /proc samples that node-scripts/proc_sampler.py writes on each node, in the same shapes as the
+readings parsed from SAR
+"""
+
+import os
+import importlib.util
+from datetime import datetime
+import numpy as np
+from cpu_core_usage import CpuCoreUsage
+from experiment_archive import result_file_exists, open_result_file
+
+
+# The samples format is defined by the node-side sampler, load it from the node scripts folder
+_sampler_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "node-scripts", "proc_sampler.py")
+_sampler_spec = importlib.util.spec_from_file_location("proc_sampler", _sampler_path)
+proc_sampler = importlib.util.module_from_spec(_sampler_spec)
+_sampler_spec.loader.exec_module(proc_sampler)
+
+proc_samples_file_name = proc_sampler.samples_file_name
+default_net_interface = "enp59s0"
+
+
+class ProcSamples:
+    monotonic_secs = None   # float64 per sample
+    realtime_secs = None    # float64 epoch secs per sample
+    columns = None          # {column name: (labels, float32 array of samples x labels)}
+
+    def get_timestamps(self):
+        return [datetime.fromtimestamp(s) for s in self.realtime_secs.tolist()]
+
+    def get_column(self, name, label="all"):
+        labels, values = self.columns[name]
+        return values[:, labels.index(label)] if label in labels else None
+
+    # Averages columns over each wall-clock second, for code that expects one reading per second like SAR gives.
+    # Takes (name, label) pairs and returns (list of datetimes, list of arrays), or None if a column is missing.
+    def get_per_second_means(self, *name_labels):
+        columns = [self.get_column(name, label) for name, label in name_labels]
+        if any(column is None for column in columns):
+            return None
+        seconds, indices = np.unique(np.floor(self.realtime_secs).astype(np.int64), return_inverse=True)
+        counts = np.bincount(indices, minlength=len(seconds))
+        means = [np.bincount(indices, weights=column, minlength=len(seconds)) / counts for column in columns]
+        return [datetime.fromtimestamp(s) for s in seconds.tolist()], means
+
+
+def has_proc_samples(node_results_dir):
+    return result_file_exists(os.path.join(node_results_dir, proc_samples_file_name))
+
+
+# Loads a samples file. A sampler that got killed may leave a partial record at the end, that is dropped.
+def load_proc_samples(node_results_dir):
+    with open_result_file(os.path.join(node_results_dir, proc_samples_file_name), "rb") as f:
+        header, _ = proc_sampler.read_samples_header(f)
+        data = f.read()
+
+    num_values = header["num_values"]
+    record_dtype = np.dtype([("monotonic_ns", "<i8"), ("realtime_ns", "<i8"), ("values", "<f4", (num_values,))])
+    records = np.frombuffer(data, dtype=record_dtype, count=len(data) // record_dtype.itemsize)
+
+    samples = ProcSamples()
+    samples.monotonic_secs = records["monotonic_ns"] / 1e9
+    samples.realtime_secs = records["realtime_ns"] / 1e9
+    samples.columns = {}
+    offset = 0
+    for column in header["columns"]:
+        labels = column["labels"]
+        samples.columns[column["name"]] = (labels, records["values"][:, offset:offset + len(labels)])
+        offset += len(labels)
+    return samples
+
+
+# Gets per-core CPU usage matrices of a node from its samples
+def get_cpu_core_usage(node_results_dir, node_name):
+    samples = load_proc_samples(node_results_dir)
+    labels, user = samples.columns[proc_sampler.cpu_user_column]
+    _, system = samples.columns[proc_sampler.cpu_system_column]
+    core_columns = [idx for idx, label in enumerate(labels) if label != "all"]
+
+    usage = CpuCoreUsage()
+    usage.node_name = node_name
+    usage.timestamps = samples.get_timestamps()
+    usage.core_ids = np.array([int(labels[idx]) for idx in core_columns], dtype=np.int64)
+    usage.user = user[:, core_columns]
+    usage.system = system[:, core_columns]
+    usage.total = usage.user + usage.system
+    usage.all_user = samples.get_column(proc_sampler.cpu_user_column)
+    usage.all_system = samples.get_column(proc_sampler.cpu_system_column)
+    return usage
+
+
+# Gets readings of a node from its samples, in the same [timestamp, node, label, value] format as parse_results
+def get_node_readings(node_results_dir, node_name, net_interface=default_net_interface):
+    samples = load_proc_samples(node_results_dir)
+    timestamps = samples.get_timestamps()
+    all_readings = []
+
+    for timestamp, cpu_user_usage, cpu_system_usage in zip(
+            timestamps, samples.get_column(proc_sampler.cpu_user_column).tolist(),
+            samples.get_column(proc_sampler.cpu_system_column).tolist()):
+        all_readings.append([timestamp, node_name, "cpu_user_usage", cpu_user_usage])
+        all_readings.append([timestamp, node_name, "cpu_system_usage", cpu_system_usage])
+        all_readings.append([timestamp, node_name, "cpu_total_usage", cpu_user_usage + cpu_system_usage])
+
+    net_in = samples.get_column(proc_sampler.net_in_column, net_interface)
+    net_out = samples.get_column(proc_sampler.net_out_column, net_interface)
+    if net_in is not None:
+        for timestamp, net_in_KBps, net_out_KBps in zip(timestamps, net_in.tolist(), net_out.tolist()):
+            all_readings.append([timestamp, node_name, "net_in_Mbps", net_in_KBps * 8 / 1000])
+            all_readings.append([timestamp, node_name, "net_out_Mbps", net_out_KBps * 8 / 1000])
+            all_readings.append([timestamp, node_name, "net_total_Mbps", (net_in_KBps + net_out_KBps) * 8 / 1000])
+
+    for timestamp, mem_usage_percent in zip(timestamps, samples.get_column(proc_sampler.mem_usage_column).tolist()):
+        all_readings.append([timestamp, node_name, "mem_usage_percent", mem_usage_percent])
+
+    for timestamp, disk_rps, disk_wps, disk_brps, disk_bwps in zip(
+            timestamps, samples.get_column(proc_sampler.disk_reads_column).tolist(),
+            samples.get_column(proc_sampler.disk_writes_column).tolist(),
+            samples.get_column(proc_sampler.disk_breads_column).tolist(),
+            samples.get_column(proc_sampler.disk_bwrites_column).tolist()):
+        all_readings.append([timestamp, node_name, "disk_reads_ps", disk_rps])
+        all_readings.append([timestamp, node_name, "disk_writes_ps", disk_wps])
+        all_readings.append([timestamp, node_name, "disk_total_ps", disk_rps + disk_wps])
+        all_readings.append([timestamp, node_name, "disk_breads_ps", disk_brps])
+        all_readings.append([timestamp, node_name, "disk_bwrites_ps", disk_bwps])
+        all_readings.append([timestamp, node_name, "disk_btotal_ps", disk_brps + disk_bwps])
+        all_readings.append([timestamp, node_name, "disk_MBreads_ps", disk_brps * 512 / (1024 * 1024)])
+        all_readings.append([timestamp, node_name, "disk_MBwrites_ps", disk_bwps * 512 / (1024 * 1024)])
+        all_readings.append([timestamp, node_name, "disk_MBtotal_ps", (disk_brps + disk_bwps) * 512 / (1024 * 1024)])
+
+    return all_readings
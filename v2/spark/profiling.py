@@ -0,0 +1,311 @@
+"""
+Opt-in timing of the parsing, aggregation and rendering stages of the analysis scripts. Enabled with the
+SPARK_ANALYSIS_PROFILE env var or the --profile option of the scripts, it reports wall/CPU time, call counts and
+peak RSS per stage per experiment. Peak RSS of a stage is the highest RSS sampled while it ran (on Linux), the peak of
+the whole process is reported apart. A breakdown of where the time inside each stage goes (SPARK_ANALYSIS_HOTSPOTS
+env var or the --hotspots option) runs the stages under cProfile, which slows them down, so it is a separate opt-in
+and its stage times are not comparable to those of plain runs.
+"""
+
+import os
+import sys
+import json
+import time
+import atexit
+import threading
+import cProfile
+import pstats
+import functools
+import inspect
+from collections import OrderedDict
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows, process peak RSS is not reported there
+    resource = None
+
+
+# Env var to turn profiling on. Set to 1 to print the report on exit or to a file path to also write the JSON trace.
+profile_env_var = "SPARK_ANALYSIS_PROFILE"
+# Env var to also break down the time inside each stage by library, set to 1
+hotspots_env_var = "SPARK_ANALYSIS_HOTSPOTS"
+# Libraries the time inside a stage is attributed to, by the file (or builtin function name) it is spent in
+hotspot_categories = [
+    ("kmeans", ["sklearn"]),
+    ("matplotlib", ["matplotlib"]),
+    ("numpy", ["numpy"]),
+    ("json", [os.sep + "json" + os.sep, "/json/"]),
+    ("strptime", ["_strptime", "strptime"]),
+    ("regex", [os.sep + "re.py", "/re.py", os.sep + "re" + os.sep, "/re/", "sre_", "method 'match'",
+               "method 'search'", "method 'findall'"]),
+    ("file io", ["method 'readline'", "method 'read'", "io.open", "codecs"]),
+]
+# RSS of running stages is sampled this often, besides at their start and end
+rss_sample_interval_secs = 0.01
+statm_file_path = "/proc/self/statm"
+
+enabled = False
+hotspots_enabled = False
+trace_output_path = None
+_events = []
+_stage_stack = []
+_wrapped = set()
+_process_start = time.perf_counter()
+
+
+# Peak RSS over the life of the process so far
+def get_process_peak_rss_kb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, KB on Linux
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+# Current RSS, None where it cannot be read cheaply (only Linux has statm)
+def get_rss_kb():
+    try:
+        with open(statm_file_path, "r") as statm_file:
+            return int(statm_file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+# Raises the peak RSS of the running stages to the current RSS
+def sample_stages_rss(stage_stack):
+    rss_kb = get_rss_kb()
+    if rss_kb is None:
+        return
+    for event in stage_stack:
+        if event["peak_rss_kb"] is None or rss_kb > event["peak_rss_kb"]:
+            event["peak_rss_kb"] = rss_kb
+
+
+# Samples RSS in the background while any stage runs, to catch peaks in between a stage's start and end
+def run_rss_sampler():
+    while True:
+        time.sleep(rss_sample_interval_secs)
+        if _stage_stack:
+            sample_stages_rss(list(_stage_stack))
+
+
+def get_hotspot_category(func_key):
+    file_name, _, func_name = func_key
+    location = "{0} {1}".format(file_name, func_name)
+    for category, patterns in hotspot_categories:
+        if any(pattern in location for pattern in patterns):
+            return category
+    return None
+
+
+# Sums the own (exclusive) time of profiled functions per library category
+def get_hotspots(profiler):
+    stats = pstats.Stats(profiler)
+    hotspots = {}
+    for func_key, (_, _, own_time, _, _) in stats.stats.items():
+        category = get_hotspot_category(func_key) or "other"
+        hotspots[category] = hotspots.get(category, 0.0) + own_time
+    return hotspots
+
+
+# Finds the experiment a stage call works on, from an experiment_id argument or the setup passed to it. Nested
+# stages without either are attributed to the enclosing stage's experiment.
+def get_experiment_id(signature, args, kwargs):
+    try:
+        bound = signature.bind_partial(*args, **kwargs).arguments
+    except TypeError:
+        bound = {}
+    if bound.get("experiment_id"):
+        return str(bound["experiment_id"])
+    for value in bound.values():
+        experiment_id = getattr(value, "experiment_id", None)
+        if isinstance(experiment_id, str):
+            return experiment_id
+    for name in ["results_dir_path", "experiment_dir_path"]:
+        if isinstance(bound.get(name), str):
+            return os.path.basename(os.path.normpath(bound[name]))
+    return _stage_stack[-1]["experiment"] if _stage_stack else None
+
+
+def profile_stage(func, stage_name, category):
+    signature = inspect.signature(func)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        event = {
+            "stage": stage_name,
+            "category": category,
+            "experiment": get_experiment_id(signature, args, kwargs),
+            "depth": len(_stage_stack),
+            "peak_rss_kb": None,
+        }
+        # Only the outermost stage runs under cProfile, as profilers do not nest
+        profiler = cProfile.Profile() if hotspots_enabled and not _stage_stack else None
+        _stage_stack.append(event)
+        sample_stages_rss([event])
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        if profiler:
+            profiler.enable()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            if profiler:
+                profiler.disable()
+            event["wall_secs"] = time.perf_counter() - wall_start
+            event["cpu_secs"] = time.process_time() - cpu_start
+            event["start_secs"] = wall_start - _process_start
+            sample_stages_rss([event])
+            if profiler:
+                event["hotspots"] = get_hotspots(profiler)
+            _stage_stack.pop()
+            _events.append(event)
+
+    wrapper.profiled_stage = stage_name
+    return wrapper
+
+
+# Replaces functions of a module with timed wrappers. Done only when profiling is enabled, so disabled runs call the
+# original functions directly and pay nothing. Callers that imported a function by name before it got wrapped keep
+# calling the original, so this should run before the entry points get called, right at the start of main().
+def instrument(module, function_names, category):
+    for function_name in function_names:
+        func = getattr(module, function_name, None)
+        if func is None or (module.__name__, function_name) in _wrapped:
+            continue
+        setattr(module, function_name, profile_stage(func, function_name, category))
+        _wrapped.add((module.__name__, function_name))
+
+
+# Parsing, aggregation and rendering entry points of the analysis scripts, by module
+analysis_entry_points = {
+    "plot_one_experiment": {
+        "parsing": ["parse_results", "parse_cpu_core_usage"],
+        "rendering": ["plot_all_for_one_node", "plot_custom_for_one_node", "plot_all_for_one_label",
+                      "plot_cdf_for_one_label", "plot_cpu_cores_for_one_node"],
+    },
+    "plot_multiple_experiments": {
+        "parsing": ["load_all_experiments", "get_metrics_summary_for_experiment"],
+        "aggregation": ["print_stats"],
+        "rendering": ["plot_total_power_usage_per_run_type", "plot_total_power_usage_per_input_size",
+                      "plot_total_disk_usage_by_run_type", "plot_total_disk_usage_by_input_size",
+                      "plot_total_network_usage_by_run_type", "plot_total_network_usage_by_input_size",
+                      "plot_cdf_network_throughput", "plot_exp_duration_per_run_type",
+                      "plot_exp_duration_per_input_size"],
+    },
+    "analyze_spark_logs": {
+        "parsing": ["parse_spark_detailed_log"],
+        "aggregation": ["print_or_get_exp_task_stats"],
+        "rendering": ["plot_spark_task_time", "plot_multiple_exp_stats"],
+    },
+}
+
+
+# Wraps the entry points in the analysis script modules that are loaded, including the one running as __main__
+def instrument_analysis_scripts():
+    main_module = sys.modules.get("__main__")
+    main_module_name = os.path.splitext(os.path.basename(getattr(main_module, "__file__", None) or ""))[0]
+    for module_name, stages in analysis_entry_points.items():
+        modules = [sys.modules.get(module_name)]
+        if main_module_name == module_name:
+            modules.append(main_module)
+        for module in modules:
+            if module is None:
+                continue
+            for category, function_names in stages.items():
+                instrument(module, function_names, category)
+
+
+# Turns on profiling and registers the report to be printed (and the trace written) when the script exits.
+# output_path may be a path for the JSON trace, or None to only print the report. hotspots also breaks down the time
+# inside each stage, at the cost of slowing the stages down.
+def enable(output_path=None, hotspots=False):
+    global enabled, hotspots_enabled, trace_output_path
+    if enabled:
+        return
+    enabled = True
+    hotspots_enabled = hotspots
+    trace_output_path = output_path
+    instrument_analysis_scripts()
+    threading.Thread(target=run_rss_sampler, daemon=True).start()
+    atexit.register(report)
+
+
+# Enables profiling if the env var is set or the script's --profile option was given, with hotspots if their env var
+# is set or the --hotspots option was given (which implies --profile). Returns whether it is enabled.
+def enable_from_env(profile_option=None, hotspots_option=False):
+    value = profile_option if profile_option is not None else os.environ.get(profile_env_var)
+    hotspots = hotspots_option or os.environ.get(hotspots_env_var, "0") not in ["", "0"]
+    if hotspots and not value:
+        value = "1"
+    if value and value != "0":
+        enable(None if value in ["1", "true", "True"] else value, hotspots)
+    return enabled
+
+
+# Adds the --profile and --hotspots options to a script's argument parser, for enable_from_env
+def add_profile_arguments(parser):
+    parser.add_argument('--profile', action='store', nargs='?', const='1',
+                        help='prints a timing report of the parsing and plotting stages on exit, optionally writing '
+                             'a JSON trace to the given path')
+    parser.add_argument('--hotspots', action='store_true',
+                        help='also breaks down the time inside each stage by library (slows the stages down)')
+
+
+# Aggregates recorded stage calls by (stage, experiment)
+def get_stage_summary():
+    summary = OrderedDict()
+    for event in _events:
+        key = (event["stage"], event["experiment"])
+        entry = summary.setdefault(key, {
+            "stage": event["stage"], "category": event["category"], "experiment": event["experiment"],
+            "calls": 0, "wall_secs": 0.0, "cpu_secs": 0.0, "peak_rss_kb": None, "hotspots": {}})
+        entry["calls"] += 1
+        entry["wall_secs"] += event["wall_secs"]
+        entry["cpu_secs"] += event["cpu_secs"]
+        if event["peak_rss_kb"] is not None:
+            entry["peak_rss_kb"] = max(entry["peak_rss_kb"] or 0, event["peak_rss_kb"])
+        for hotspot, secs in event.get("hotspots", {}).items():
+            entry["hotspots"][hotspot] = entry["hotspots"].get(hotspot, 0.0) + secs
+    return sorted(summary.values(), key=lambda e: e["wall_secs"], reverse=True)
+
+
+def format_report():
+    lines = ["Stage timings (ranked by wall time, nested stages are included in their callers, peak RSS is the highest "
+             "while the stage ran)" + (", under cProfile for the hotspots" if hotspots_enabled else ""),
+             "{:36s} {:26s} {:>6s} {:>9s} {:>9s} {:>10s}  {:s}".format(
+                 "Stage", "Experiment", "Calls", "Wall s", "CPU s", "Peak RSS", "Time inside (self)")]
+    for entry in get_stage_summary():
+        top_hotspots = sorted(entry["hotspots"].items(), key=lambda h: h[1], reverse=True)[:4]
+        lines.append("{:36s} {:26s} {:>6d} {:>9.3f} {:>9.3f} {:>10s}  {:s}".format(
+            entry["stage"], str(entry["experiment"] or "-"), entry["calls"], entry["wall_secs"], entry["cpu_secs"],
+            "-" if entry["peak_rss_kb"] is None else "{:.0f} MB".format(entry["peak_rss_kb"] / 1024.0),
+            ", ".join("{0} {1:.2f}s".format(name, secs) for name, secs in top_hotspots)))
+    process_peak_rss_kb = get_process_peak_rss_kb()
+    if process_peak_rss_kb is not None:
+        lines.append("Process peak RSS: {0:.0f} MB".format(process_peak_rss_kb / 1024.0))
+    return "\n".join(lines)
+
+
+# JSON trace in the chrome://tracing format, with the per-stage summary alongside
+def write_trace(output_path):
+    trace_events = []
+    for event in _events:
+        trace_events.append({
+            "name": event["stage"], "cat": event["category"], "ph": "X", "pid": os.getpid(), "tid": event["depth"],
+            "ts": int(event["start_secs"] * 1e6), "dur": int(event["wall_secs"] * 1e6),
+            "args": {"experiment": event["experiment"], "cpu_secs": event["cpu_secs"],
+                     "peak_rss_kb": event["peak_rss_kb"], "hotspots": event.get("hotspots", {})}})
+    with open(output_path, "w") as f:
+        json.dump({"traceEvents": trace_events, "stages": get_stage_summary(),
+                   "processPeakRssKb": get_process_peak_rss_kb()}, f, indent=1)
+
+
+def report():
+    if not _events:
+        return
+    print(format_report())
+    if trace_output_path:
+        write_trace(trace_output_path)
+        print("Profile trace written to " + trace_output_path)
@@ -0,0 +1,138 @@
+"""
+KLL quantile sketch (Karnin, Lang, Liberty 2016): keeps a few hundred of the values it is given, however many there
+are, and answers rank and quantile queries with an error of about 1% of the count. Sketches of the same kind of
+readings merge into one, e.g., across nodes and runs, and serialize to a small dict for the metrics summaries.
+"""
+
+import math
+import random
+import numpy as np
+
+
+# Sketch defaults. Larger k keeps more values and has smaller errors (~1.7/k of the count at k=200).
+default_k = 200
+capacity_decay = 2.0 / 3.0
+min_capacity = 2
+
+
+class QuantileSketch:
+    def __init__(self, k=default_k, seed=0):
+        self.k = k
+        self.count = 0
+        self.min_value = None
+        self.max_value = None
+        self.levels = [[]]      # Values at level h stand for 2^h values each
+        self.rng = random.Random(seed)
+
+    # Values kept at a level before it gets compacted, smaller for lower levels
+    def get_level_capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(min_capacity, int(math.ceil(self.k * capacity_decay ** depth)))
+
+    def get_max_size(self):
+        return sum(self.get_level_capacity(level) for level in range(len(self.levels)))
+
+    def get_size(self):
+        return sum(len(values) for values in self.levels)
+
+    def update(self, value):
+        value = float(value)
+        self.levels[0].append(value)
+        self.count += 1
+        self.min_value = value if self.min_value is None else min(self.min_value, value)
+        self.max_value = value if self.max_value is None else max(self.max_value, value)
+        if len(self.levels[0]) >= self.get_level_capacity(0):
+            self.compress()
+
+    def update_many(self, values):
+        for value in values:
+            self.update(value)
+
+    # Halves full levels into the level above, keeping every other value from a random start, until the sketch is
+    # within its size. A level with an odd number of values keeps its largest value back.
+    def compress(self):
+        for level in range(len(self.levels)):
+            if len(self.levels[level]) < self.get_level_capacity(level):
+                continue
+            if level + 1 == len(self.levels):
+                self.levels.append([])
+            values = sorted(self.levels[level])
+            held_back = [values.pop()] if len(values) % 2 else []
+            self.levels[level + 1].extend(values[self.rng.randint(0, 1)::2])
+            self.levels[level] = held_back
+            if self.get_size() < self.get_max_size():
+                break
+
+    # Adds the values of another sketch into this one
+    def merge(self, other):
+        if other.count == 0:
+            return self
+        while len(self.levels) < len(other.levels):
+            self.levels.append([])
+        for level, values in enumerate(other.levels):
+            self.levels[level].extend(values)
+        self.count += other.count
+        self.min_value = other.min_value if self.min_value is None else min(self.min_value, other.min_value)
+        self.max_value = other.max_value if self.max_value is None else max(self.max_value, other.max_value)
+        while self.get_size() >= self.get_max_size():
+            self.compress()
+        return self
+
+    # Kept values in order along with their cumulative weights
+    def get_sorted_values_and_weights(self):
+        values = np.array([value for values in self.levels for value in values], dtype=np.float64)
+        weights = np.array([2 ** level for level, values in enumerate(self.levels) for _ in values], dtype=np.float64)
+        order = np.argsort(values, kind="stable")
+        return values[order], np.cumsum(weights[order])
+
+    # Fraction of the values that are at most each of the given values
+    def get_ranks(self, values):
+        sorted_values, cumulative_weights = self.get_sorted_values_and_weights()
+        if not len(sorted_values):
+            return np.full(len(values), np.nan)
+        indices = np.searchsorted(sorted_values, np.asarray(values, dtype=np.float64), side="right")
+        ranks = np.where(indices > 0, cumulative_weights[np.maximum(indices - 1, 0)], 0)
+        return ranks / cumulative_weights[-1]
+
+    def get_quantiles(self, fractions):
+        sorted_values, cumulative_weights = self.get_sorted_values_and_weights()
+        if not len(sorted_values):
+            return np.full(len(fractions), np.nan)
+        targets = np.asarray(fractions, dtype=np.float64) * cumulative_weights[-1]
+        indices = np.minimum(np.searchsorted(cumulative_weights, targets, side="left"), len(sorted_values) - 1)
+        return sorted_values[indices]
+
+    def get_quantile(self, fraction):
+        return float(self.get_quantiles([fraction])[0])
+
+    # CDF as a step curve over num_bin equal bins between the min and max values, in the same shape as
+    # plot_one_experiment.gen_cdf_curve gives for the raw values. scale multiplies the values, e.g., for units.
+    def get_cdf_curve(self, num_bin, scale=1.0):
+        if self.count == 0:
+            return np.array([]), np.array([])
+        edges = np.linspace(self.min_value, self.max_value, num_bin + 1)
+        cdf = self.get_ranks(edges[1:])
+        x = edges.repeat(2)[:-1] * scale
+        y = np.zeros_like(x)
+        y[1:] = cdf.repeat(2)
+        return x, y
+
+    def to_dict(self):
+        return {"K": self.k, "Count": self.count, "Min": self.min_value, "Max": self.max_value, "Levels": self.levels}
+
+    @staticmethod
+    def from_dict(sketch_dict):
+        sketch = QuantileSketch(sketch_dict["K"])
+        sketch.count = sketch_dict["Count"]
+        sketch.min_value = sketch_dict["Min"]
+        sketch.max_value = sketch_dict["Max"]
+        sketch.levels = [list(values) for values in sketch_dict["Levels"]] or [[]]
+        return sketch
+
+
+# Merges sketches into a new one, leaving them as they are
+def merge_sketches(sketches, k=default_k):
+    merged = QuantileSketch(k)
+    for sketch in sketches:
+        merged.merge(sketch)
+    return merged
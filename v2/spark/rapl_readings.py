@@ -0,0 +1,81 @@
+"""
+Loads the RAPL energy readings that node-scripts/rapl_sampler.py writes on each node, and turns them into per-second
+power readings like the ones from the power meter
+"""
+
+import os
+import importlib.util
+from datetime import datetime
+import numpy as np
+from experiment_archive import result_file_exists, open_result_file
+
+
+# The readings format is defined by the node-side sampler, load it from the node scripts folder
+_sampler_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "node-scripts", "rapl_sampler.py")
+_sampler_spec = importlib.util.spec_from_file_location("rapl_sampler", _sampler_path)
+rapl_sampler = importlib.util.module_from_spec(_sampler_spec)
+_sampler_spec.loader.exec_module(rapl_sampler)
+
+rapl_readings_file_name = rapl_sampler.rapl_readings_file_name
+
+
+class RaplReadings:
+    zone_names = None       # e.g., package-0, dram-0
+    realtime_secs = None    # float64 epoch secs at the end of each reading
+    interval_secs = None    # float64 secs covered by each reading
+    energies_uj = None      # float64 readings x zones
+
+    # Sums the energy of zones whose name starts with the given prefix, per reading
+    def get_energies_uj(self, zone_prefix=""):
+        columns = [idx for idx, name in enumerate(self.zone_names) if name.startswith(zone_prefix)]
+        return self.energies_uj[:, columns].sum(axis=1)
+
+    # Average watts over each wall-clock second, the energy used in the readings ending in that second over the time
+    # they cover. Takes zone name prefixes and returns (list of datetimes, list of arrays).
+    def get_per_second_watts(self, *zone_prefixes):
+        seconds, indices = np.unique(np.floor(self.realtime_secs).astype(np.int64), return_inverse=True)
+        covered_secs = np.bincount(indices, weights=self.interval_secs, minlength=len(seconds))
+        watts = [np.bincount(indices, weights=self.get_energies_uj(zone_prefix), minlength=len(seconds)) / 1e6 /
+                 covered_secs for zone_prefix in zone_prefixes]
+        return [datetime.fromtimestamp(s) for s in seconds.tolist()], watts
+
+
+def has_rapl_readings(node_results_dir):
+    return result_file_exists(os.path.join(node_results_dir, rapl_readings_file_name))
+
+
+# Loads a readings file. A sampler that got killed may leave a partial line at the end, that is dropped.
+def load_rapl_readings(node_results_dir):
+    readings = RaplReadings()
+    rows = []
+    with open_result_file(os.path.join(node_results_dir, rapl_readings_file_name)) as lines:
+        readings.zone_names = lines.readline()[len(rapl_sampler.zones_header_prefix):].strip().split(",")
+        num_fields = 2 + len(readings.zone_names)
+        for line in lines:
+            fields = line.split(",")
+            if len(fields) == num_fields and line.endswith("\n"):
+                rows.append([float(field) for field in fields])
+
+    table = np.array(rows, dtype=np.float64).reshape(-1, num_fields)
+    readings.realtime_secs = table[:, 0]
+    readings.interval_secs = table[:, 1]
+    readings.energies_uj = table[:, 2:]
+    return readings
+
+
+# Gets per-second readings of a node, in the same [timestamp, node, label, value] format as parse_results: package and
+# DRAM power of all sockets, and their sum as power_watts if include_power_watts (i.e., the node is not on the power
+# meter). RAPL does not see the rest of the node (disks, NICs, fans, PSU losses), so this is below wall power.
+def get_node_readings(node_results_dir, node_name, include_power_watts=True):
+    readings = load_rapl_readings(node_results_dir)
+    if not len(readings.realtime_secs):
+        return []
+    timestamps, (package_watts, dram_watts) = readings.get_per_second_watts(rapl_sampler.package_zone_prefix,
+                                                                             rapl_sampler.dram_zone_name)
+    all_readings = []
+    for timestamp, package_power, dram_power in zip(timestamps, package_watts.tolist(), dram_watts.tolist()):
+        all_readings.append([timestamp, node_name, "rapl_package_watts", package_power])
+        all_readings.append([timestamp, node_name, "rapl_dram_watts", dram_power])
+        if include_power_watts:
+            all_readings.append([timestamp, node_name, "power_watts", package_power + dram_power])
+    return all_readings
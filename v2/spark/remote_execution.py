@@ -0,0 +1,268 @@
+"""
+Runs commands on the cluster nodes over SSH. A command batch compiles the commands of one phase (e.g., setting up a
+node) into a single remote script that runs under one sudo session, so the phase takes one round trip instead of one
+per command, and gives back the exit code and output of each command. A remote process runs a long command (e.g., the
+spark job) without blocking, streaming its output lines as they arrive, and kills it on the node past a deadline.
+"""
+
+import re
+import shlex
+import time
+import uuid
+import threading
+from collections import deque
+
+
+# Prefix that runs a command as root, with the password given on stdin
+sudo_prefix_format = 'echo "{0}" | sudo -S '
+# Remote processes: how long a killed process gets to exit on SIGTERM before SIGKILL, how often the channel is checked
+# for output when there was none, and how many of the last output lines are kept
+default_kill_grace_secs = 10
+channel_poll_interval_secs = 0.05
+channel_read_bytes = 1 << 16
+output_tail_lines = 100
+
+
+def add_sudo_prefix(command, sudo_password):
+    return sudo_prefix_format.format(sudo_password) + command if sudo_password else command
+
+
+class CommandResult:
+    command = None
+    exit_code = None        # None if the command did not run, i.e., an earlier one failed and the batch stopped
+    output = ""             # stdout and stderr of the command together
+
+    def __init__(self, command):
+        self.command = command
+
+    def succeeded(self):
+        return self.exit_code == 0
+
+    def __repr__(self):
+        return "CommandResult({0!r}, exit_code={1}, output={2!r})".format(self.command, self.exit_code, self.output)
+
+
+class BatchResult:
+    results = None          # CommandResult of each command, in the order they were added
+    exit_code = None        # Exit code of the remote script
+    session_output = ""     # Anything printed outside of the commands, e.g., the sudo prompt or shell errors
+
+    def get_failures(self):
+        return [result for result in self.results if result.exit_code is not None and result.exit_code != 0]
+
+    def get_skipped(self):
+        return [result for result in self.results if result.exit_code is None]
+
+    def succeeded(self):
+        return all(result.succeeded() for result in self.results)
+
+    def __getitem__(self, idx):
+        return self.results[idx]
+
+    def __len__(self):
+        return len(self.results)
+
+
+# Commands to run one after another on a node. Each one runs in its own subshell with no stdin, and its output is
+# framed by marker lines with a token that is unique to the batch, so the outputs can be told apart afterwards.
+class CommandBatch:
+    def __init__(self, stop_on_failure=False):
+        self.stop_on_failure = stop_on_failure
+        self.commands = []
+        self.token = "__batch_{0}__".format(uuid.uuid4().hex)
+
+    # Adds a command and returns its index in the results
+    def add(self, command):
+        self.commands.append(command)
+        return len(self.commands) - 1
+
+    def extend(self, commands):
+        for command in commands:
+            self.add(command)
+
+    def __len__(self):
+        return len(self.commands)
+
+    def compile(self):
+        lines = []
+        for idx, command in enumerate(self.commands):
+            lines.append("printf '%s\\n' '{0} begin {1}'".format(self.token, idx))
+            # Newline before the closing parenthesis, so a trailing comment in the command does not swallow it
+            lines.append("( {0}\n) < /dev/null 2>&1".format(command))
+            lines.append("rc=$?")
+            lines.append("printf '\\n%s %d\\n' '{0} end {1}' $rc".format(self.token, idx))
+            if self.stop_on_failure:
+                lines.append("[ $rc -eq 0 ] || exit $rc")
+        return "\n".join(lines) + "\n"
+
+    # The remote command that runs the compiled script, as root if a sudo password is given
+    def get_remote_command(self, sudo_password=None):
+        return add_sudo_prefix("bash -c " + shlex.quote(self.compile()), sudo_password)
+
+    # Splits the output of the compiled script into the results of each command
+    def parse_output(self, output, exit_code=None, session_output=""):
+        batch_result = BatchResult()
+        batch_result.results = [CommandResult(command) for command in self.commands]
+        batch_result.exit_code = exit_code
+        marker_pattern = re.compile(r'^{0} (begin|end) ([0-9]+)(?: (-?[0-9]+))?$'.format(re.escape(self.token)))
+        outside_lines = [session_output] if session_output else []
+        current_idx = None
+        current_lines = []
+        for line in output.splitlines(True):
+            matches = marker_pattern.match(line.rstrip("\n"))
+            if matches and matches.group(1) == "begin":
+                current_idx = int(matches.group(2))
+                current_lines = []
+            elif matches and current_idx == int(matches.group(2)):
+                # Drop the newline that was printed before the end marker
+                text = "".join(current_lines)
+                result = batch_result.results[current_idx]
+                result.output = text[:-1] if text.endswith("\n") else text
+                result.exit_code = int(matches.group(3))
+                current_idx = None
+            elif current_idx is not None:
+                current_lines.append(line)
+            else:
+                outside_lines.append(line)
+        batch_result.session_output = "".join(outside_lines)
+        return batch_result
+
+    # Runs the batch on a node in one round trip and waits for it to finish
+    def execute(self, ssh_client, sudo_password=None):
+        if not self.commands:
+            return self.parse_output("")
+        _, stdout, stderr = ssh_client.exec_command(self.get_remote_command(sudo_password))
+        output = stdout.read().decode("utf-8", "replace")
+        session_output = stderr.read().decode("utf-8", "replace")
+        exit_code = stdout.channel.recv_exit_status()
+        return self.parse_output(output, exit_code, session_output)
+
+
+# Splits a stream of bytes into lines, holding back a partial line until the rest of it arrives
+class LineSplitter:
+    def __init__(self):
+        self.pending = b""
+
+    def feed(self, data):
+        lines = (self.pending + data).split(b"\n")
+        self.pending = lines.pop()
+        return [line.decode("utf-8", "replace") for line in lines]
+
+    def flush(self):
+        lines = [self.pending.decode("utf-8", "replace")] if self.pending else []
+        self.pending = b""
+        return lines
+
+
+# A command running on a node. Its stdout and stderr lines go to the callbacks and to the log file (both streams
+# together) as they arrive, from a background thread, so the callbacks must not block. The command runs in a session
+# of its own on the node, so kill() or a missed deadline takes down everything it started, not just the SSH channel.
+class RemoteProcess:
+    def __init__(self, ssh_client, command, sudo_password=None, timeout_secs=None, on_stdout_line=None,
+                 on_stderr_line=None, log_file_path=None, kill_grace_secs=default_kill_grace_secs):
+        self.ssh_client = ssh_client
+        self.command = command
+        self.sudo_password = sudo_password
+        self.on_stdout_line = on_stdout_line
+        self.on_stderr_line = on_stderr_line
+        self.kill_grace_secs = kill_grace_secs
+        self.token = "__pid_{0}__".format(uuid.uuid4().hex)
+        self.pid = None                 # Of the process on the node, which leads its own process group
+        self.exit_code = None           # -1 if the channel closed without an exit status
+        self.timed_out = False
+        self.killed = False
+        self.output_tail = deque(maxlen=output_tail_lines)
+        self.done_event = threading.Event()
+        self.log_file = open(log_file_path, "w") if log_file_path else None
+
+        self.start_time = time.time()
+        self.deadline = self.start_time + timeout_secs if timeout_secs else None
+        self.channel = ssh_client.get_transport().open_session()
+        self.channel.exec_command(self.get_remote_command())
+        self.thread = threading.Thread(target=self._read_channel, name="remote-process", daemon=True)
+        self.thread.start()
+
+    # Runs the command in a new session (setsid -w waits for it even if setsid has to fork), after printing the pid of
+    # the session so it can be killed as a group
+    def get_remote_command(self):
+        inner_command = "echo '{0}' $$; exec bash -c {1}".format(self.token, shlex.quote(self.command))
+        return add_sudo_prefix("setsid -w bash -c " + shlex.quote(inner_command), self.sudo_password)
+
+    def _handle_line(self, line, from_stderr):
+        if self.pid is None and not from_stderr and line.startswith(self.token):
+            self.pid = int(line.split()[1])
+            return
+        self.output_tail.append(line)
+        if self.log_file:
+            self.log_file.write(line + "\n")
+        callback = self.on_stderr_line if from_stderr else self.on_stdout_line
+        if callback:
+            callback(line)
+
+    def _read_channel(self):
+        stdout_splitter = LineSplitter()
+        stderr_splitter = LineSplitter()
+        try:
+            while True:
+                got_data = False
+                if self.channel.recv_ready():
+                    got_data = True
+                    for line in stdout_splitter.feed(self.channel.recv(channel_read_bytes)):
+                        self._handle_line(line, False)
+                if self.channel.recv_stderr_ready():
+                    got_data = True
+                    for line in stderr_splitter.feed(self.channel.recv_stderr(channel_read_bytes)):
+                        self._handle_line(line, True)
+                if not got_data:
+                    if self.channel.closed or (self.channel.exit_status_ready() and not self.channel.recv_ready()
+                                               and not self.channel.recv_stderr_ready()):
+                        break
+                    if self.deadline is not None and time.time() > self.deadline and not self.timed_out:
+                        self.timed_out = True
+                        self.kill()
+                    time.sleep(channel_poll_interval_secs)
+
+            for line in stdout_splitter.flush():
+                self._handle_line(line, False)
+            for line in stderr_splitter.flush():
+                self._handle_line(line, True)
+            self.exit_code = self.channel.recv_exit_status() if self.channel.exit_status_ready() else -1
+        finally:
+            self.channel.close()
+            if self.log_file:
+                self.log_file.close()
+            self.done_event.set()
+
+    # Stops the command on the node: SIGTERM to its process group, then SIGKILL if it is still around after the grace
+    # period. Falls back to closing the channel if the pid did not show up yet.
+    def kill(self):
+        self.killed = True
+        if self.pid is None:
+            self.channel.close()
+            return
+        kill_script = "kill -TERM -- -{0} 2>/dev/null; for i in $(seq {1}); do kill -0 -- -{0} 2>/dev/null || exit 0; " \
+                      "sleep 1; done; kill -KILL -- -{0} 2>/dev/null; exit 0".format(self.pid, int(self.kill_grace_secs))
+        _, stdout, stderr = self.ssh_client.exec_command(
+            add_sudo_prefix("bash -c " + shlex.quote(kill_script), self.sudo_password))
+        stdout.read()
+        stderr.read()
+
+    def is_running(self):
+        return not self.done_event.is_set()
+
+    # Waits for the command to finish, for at most timeout_secs if given. Returns whether it finished.
+    def wait(self, timeout_secs=None):
+        return self.done_event.wait(timeout_secs)
+
+    def get_elapsed_secs(self):
+        return time.time() - self.start_time
+
+    def succeeded(self):
+        return self.exit_code == 0 and not self.timed_out and not self.killed
+
+
+# Starts a command on a node and returns its RemoteProcess handle right away
+def start_remote_process(ssh_client, command, sudo_password=None, timeout_secs=None, on_stdout_line=None,
+                         on_stderr_line=None, log_file_path=None):
+    return RemoteProcess(ssh_client, command, sudo_password, timeout_secs, on_stdout_line, on_stderr_line,
+                         log_file_path)
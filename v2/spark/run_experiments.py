@@ -4,14 +4,18 @@ Runs power measurement experiments on the spark test cluster
 
 import argparse
 import datetime
-import paramiko
 import os
 import time
 import json
 import sys
 import shutil
 import traceback
-from scp import SCPClient
+import re
+import stat
+import queue
+import threading
+import multiprocessing
+from remote_execution import CommandBatch, add_sudo_prefix, start_remote_process
 
 
 # Experimental Setup constants
@@ -50,6 +54,15 @@ hosts_cleanup_file = 'etc_hosts_file_cleanup.sh'
 fat_tree_hosts_file_name = "hosts_fattree"
 
 
+# Remote commands
+cache_clear_command = "bash -c 'echo 3 > /proc/sys/vm/drop_caches'"
+tc_qdisc_set_tbf_rate_limit_format = 'tc qdisc add dev enp59s0 root tbf rate {0}mbit burst 1mbit latency 10ms'
+tc_qdisc_show_command = 'tc qdisc show  dev enp59s0'
+tc_qdisc_reset_command = 'tc qdisc del dev enp59s0 root'
+set_if_down_command = 'ip link set enp59s0 down'
+set_if_up_command = 'ip link set enp59s0 up'
+
+
 # Local constants
 source_folder = os.path.dirname(os.path.abspath(__file__))
 local_node_scripts_folder = os.path.join(source_folder, "node-scripts")
@@ -58,15 +71,49 @@ local_spark_src_folder = os.path.join(source_folder, "spark-sort")
 prepare_for_experiment_file = 'prepare_for_experiment.sh'
 start_sar_readings_file = 'start_sar_readings.sh'
 stop_sar_readings_file = 'stop_sar_readings.sh'
+start_proc_sampler_file = 'start_proc_sampler.sh'
+stop_proc_sampler_file = 'stop_proc_sampler.sh'
+start_rapl_readings_file = 'start_rapl_readings.sh'
+stop_rapl_readings_file = 'stop_rapl_readings.sh'
 start_power_readings_file = 'start_power_readings.sh'
 stop_power_readings_file = 'stop_power_readings.sh'
 cleanup_after_experiment_file = 'cleanup_after_experiment.sh'
 run_spark_job_file = 'run_spark_job.sh'
+reduce_measurements_file = 'reduce_measurements.py'
+raw_readings_file_extension = '.sar'
+summary_rollup_secs = 10
 log_verbose = True
-
-
-# Creates SSH client using paramiko lib.
+live_monitor_enabled = False
+fetch_raw_readings = False
+proc_sampler_interval_ms = None     # If set, /proc gets sampled at this interval on the nodes instead of running SAR
+rapl_interval_ms = None             # If set, RAPL energy counters get read at this interval on the nodes
+power_meter_interval_ms = None      # If set, the power meter gets read at this interval from the driver node
+spark_job_timeout_secs = None       # If set, spark jobs running longer get killed on the driver node
+spark_job_progress_interval_secs = 30
+spark_job_log_file_name = "spark_job.log"
+pipelined_sweep_enabled = False     # If set, results get fetched and summarized in the background during the next runs
+results_transfer_max_kBps = 10240   # Cap on background result transfers, which are also held while a run is measured
+background_niceness = 10            # Of the worker process that summarizes results in the background
+metrics_summary_file_name = "metrics_summary.json"
+adaptive_repetition_enabled = False # If set, each configuration gets repeated until its results are precise enough
+adaptive_target_relative_precision = 0.05   # Half width of the 95% confidence interval over the mean
+adaptive_min_repetitions = 3
+adaptive_max_repetitions = 10
+sweep_journal_file_name_format = "{0}-journal.jsonl"
+search_objective_name = None        # If set, configurations get searched by successive halving on this objective
+search_min_input_size_mb = 10000    # Input size of the first, cheapest search round
+# Two-sided 95% critical values of Student's t distribution by degrees of freedom, normal beyond the table
+t_critical_values_95 = [12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228, 2.201, 2.179, 2.160,
+                        2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086, 2.080, 2.074, 2.069, 2.064, 2.060, 2.056,
+                        2.052, 2.048, 2.045, 2.042]
+# Spark logs a line like "Finished task 12.0 in stage 1.0 (TID 652) in 2345 ms on b09-30 (executor 3) (13/640)"
+spark_task_finished_regex = r'Finished task [0-9.]+ in stage ([0-9.]+) .*\(([0-9]+)/([0-9]+)\)\s*$'
+
+
+# Creates SSH client using paramiko lib. Imported here, as the analysis scripts import this module for its settings
+# and should not pay for loading paramiko.
 def create_ssh_client(server, port, user, password):
+    import paramiko
     client = paramiko.SSHClient() 
     client.load_system_host_keys()
     client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
@@ -77,9 +124,7 @@ def create_ssh_client(server, port, user, password):
 # Executes command with ssh client and reads from out and err buffers so it does not block.
 def ssh_execute_command(ssh_client, command, sudo_password = None):
     
-    if sudo_password:
-        run_as_sudo_prefix = 'echo "{0}" | sudo -S '.format(sudo_password)
-        command = run_as_sudo_prefix + command
+    command = add_sudo_prefix(command, sudo_password)
 
     _, stdout, stderr = ssh_client.exec_command(command)
     output = str(stdout.read() + stderr.read())
@@ -87,6 +132,17 @@ def ssh_execute_command(ssh_client, command, sudo_password = None):
     return output
 
 
+# Executes a batch of commands in one round trip (as one script under one sudo session if a password is given) and
+# returns the result of each command.
+def ssh_execute_batch(ssh_client, batch, sudo_password = None):
+    batch_result = batch.execute(ssh_client, sudo_password)
+    if log_verbose:
+        for result in batch_result.results:
+            print("[{0}] {1}\n{2}".format("skipped" if result.exit_code is None else result.exit_code,
+                                          result.command, result.output))
+    return batch_result
+
+
 # Create remote folder if it does not exist
 def create_folder_if_not_exists(ssh_client, remote_folder_path):
     with ssh_client.open_sftp() as ftp_client:
@@ -103,17 +159,16 @@ def set_up_on_each_node(root_user_name, password, current_toplogy_hosts_file_nam
         node_full_name = "{0}.{1}".format(node_name, spark_nodes_dns_suffx)
 
         with create_ssh_client(node_full_name, 22, root_user_name, password) as ssh_client:    
-            print("Setting up hosts file on " + node_full_name)
+            print("Setting up hosts file, IP address and ARP entries on " + node_full_name)
+            batch = CommandBatch()
             script_file = path_to_linux_style(os.path.join(remote_scripts_folder, hosts_setup_file))
-            ssh_execute_command(ssh_client, 'sh {0} {1} {2}'.format(script_file, remote_scripts_folder, current_toplogy_hosts_file_name),
-                                    sudo_password=password)
-
-            print("Setting IP address and adding ARP entries on " + node_name)
-            set_ip_address = ["ifconfig enp59s0 '{0}' netmask 255.0.0.0".format(fat_tree_ip_mac_map[node_name][1])]
-            set_arp_table_entries = ["arp -s {0} {1}".format(fat_tree_ip_mac_map[node][1], fat_tree_ip_mac_map[node][0]) 
-                                            for node in fat_tree_ip_mac_map.keys() if node != node_name]
-            for cmd in (set_ip_address + set_arp_table_entries):
-                ssh_execute_command(ssh_client, cmd, sudo_password=password)
+            batch.add('sh {0} {1} {2}'.format(script_file, remote_scripts_folder, current_toplogy_hosts_file_name))
+            batch.add("ifconfig enp59s0 '{0}' netmask 255.0.0.0".format(fat_tree_ip_mac_map[node_name][1]))
+            batch.extend(["arp -s {0} {1}".format(fat_tree_ip_mac_map[node][1], fat_tree_ip_mac_map[node][0])
+                          for node in fat_tree_ip_mac_map.keys() if node != node_name])
+            batch_result = ssh_execute_batch(ssh_client, batch, sudo_password=password)
+            for result in batch_result.get_failures():
+                print("Failed on {0}: {1}\n{2}".format(node_name, result.command, result.output))
 
 
 # Reverts changes on each node - cleanup to hosts file on all nodes, resets TC, refreshes link interface, etc.
@@ -122,13 +177,13 @@ def clean_up_on_each_node(root_user_name, password):
         node_full_name = "{0}.{1}".format(node_name, spark_nodes_dns_suffx)
         with create_ssh_client(node_full_name, 22, root_user_name, password) as ssh_client:
             
-            print("Cleaning up hosts file on " + node_full_name)
+            print("Cleaning up hosts file, resetting TC and network interface on " + node_full_name)
+            batch = CommandBatch()
             script_file = path_to_linux_style(os.path.join(remote_scripts_folder, hosts_cleanup_file))
-            ssh_execute_command(ssh_client, 'sh {0}'.format(script_file), sudo_password=password)
-             
-            print("Resetting TC and network interface on " + node_full_name)
-            reset_network_rate_limit(ssh_client, password)
-            refresh_link_interface(ssh_client, password)
+            batch.add('sh {0}'.format(script_file))
+            batch.add(tc_qdisc_reset_command)
+            batch.extend(get_refresh_link_interface_commands())
+            ssh_execute_batch(ssh_client, batch, sudo_password=password)
 
 
 # Starts HDFS + YARN cluster for spark runs
@@ -175,13 +230,87 @@ def start_sar_readings(ssh_client, node_exp_folder_path, password_for_sudo, gran
     ssh_execute_command(ssh_client, 'bash {0} {1} {2}'.format(script_file, node_exp_folder_path, granularity_in_secs))
 
 
-# Starts spark job with specified algorithm (scala class name) and input size.
-def run_spark_job(ssh_client, node_exp_folder_path, input_size_mb, scala_class_name, record_size_bytes, final_partition_count):
+# Starts sampling /proc at sub-second intervals, in place of the SAR readings
+def start_proc_sampler(ssh_client, node_exp_folder_path, interval_ms):
+    print("Starting /proc sampler")
+    script_file = path_to_linux_style(os.path.join(remote_scripts_folder, start_proc_sampler_file))
+    ssh_execute_command(ssh_client, 'bash {0} {1} {2}'.format(script_file, node_exp_folder_path, interval_ms))
+
+
+# Starts reading RAPL energy counters (package and DRAM), as a power source for nodes without a power meter. Reading
+# the counters needs root on recent kernels.
+def start_rapl_readings(ssh_client, node_exp_folder_path, interval_ms, password_for_sudo):
+    print("Starting RAPL readings")
+    script_file = path_to_linux_style(os.path.join(remote_scripts_folder, start_rapl_readings_file))
+    ssh_execute_command(ssh_client, 'bash {0} {1} {2}'.format(script_file, node_exp_folder_path, interval_ms),
+                        sudo_password=password_for_sudo)
+
+
+# Starts reading the power meter connected to the driver node, in its integration mode, for the nodes on its channels
+def start_power_readings(ssh_client, node_exp_folder_path, interval_ms):
+    print("Starting power meter readings")
+    script_file = path_to_linux_style(os.path.join(remote_scripts_folder, start_power_readings_file))
+    ssh_execute_command(ssh_client, 'bash {0} {1} {2} {3}'.format(script_file, node_exp_folder_path, interval_ms,
+                                                                  ",".join(power_meter_nodes_in_order)))
+
+
+# Starts spark job with specified algorithm (scala class name) and input size, and returns its RemoteProcess handle
+# right away. The job output streams into the local log file, and the job gets killed past timeout_secs if given.
+def start_spark_job(ssh_client, node_exp_folder_path, input_size_mb, scala_class_name, record_size_bytes,
+                    final_partition_count, timeout_secs=None, log_file_path=None, on_output_line=None):
     print("Starting spark job")
     script_file = path_to_linux_style(os.path.join(remote_scripts_folder, run_spark_job_file))
-    ssh_execute_command(ssh_client, 'bash {0} {1} {2} {3} {4} {5} {6}'.format(script_file, remote_scripts_folder, node_exp_folder_path, 
-                                                                                input_size_mb, scala_class_name, record_size_bytes, 
-                                                                                final_partition_count))
+    command = 'bash {0} {1} {2} {3} {4} {5} {6}'.format(script_file, remote_scripts_folder, node_exp_folder_path,
+                                                        input_size_mb, scala_class_name, record_size_bytes,
+                                                        final_partition_count)
+    return start_remote_process(ssh_client, command, timeout_secs=timeout_secs, on_stdout_line=on_output_line,
+                                on_stderr_line=on_output_line, log_file_path=log_file_path)
+
+
+# Keeps the latest task progress of a running spark job, from its output lines
+class SparkJobProgress:
+    def __init__(self):
+        self.task_finished_pattern = re.compile(spark_task_finished_regex)
+        self.stage = None
+        self.finished_tasks = 0
+        self.total_tasks = 0
+
+    def on_output_line(self, line):
+        matches = self.task_finished_pattern.search(line)
+        if matches:
+            self.stage = matches.group(1)
+            self.finished_tasks = int(matches.group(2))
+            self.total_tasks = int(matches.group(3))
+
+    def format(self):
+        if self.stage is None:
+            return "no tasks finished yet"
+        return "stage {0}: {1}/{2} tasks".format(self.stage, self.finished_tasks, self.total_tasks)
+
+
+# Runs spark job and waits for it to finish, printing its progress now and then. Returns the finished handle.
+def run_spark_job(ssh_client, node_exp_folder_path, input_size_mb, scala_class_name, record_size_bytes,
+                  final_partition_count, timeout_secs=None, log_file_path=None):
+    progress = SparkJobProgress()
+    spark_job = start_spark_job(ssh_client, node_exp_folder_path, input_size_mb, scala_class_name, record_size_bytes,
+                                final_partition_count, timeout_secs, log_file_path, progress.on_output_line)
+    while not spark_job.wait(spark_job_progress_interval_secs):
+        print("Spark job running for {0} secs, {1}".format(int(spark_job.get_elapsed_secs()), progress.format()))
+
+    if spark_job.timed_out:
+        print("Spark job timed out after {0} secs and was killed".format(int(spark_job.get_elapsed_secs())))
+    elif spark_job.exit_code != 0:
+        print("Spark job exited with code {0}:\n{1}".format(spark_job.exit_code, "\n".join(spark_job.output_tail)))
+    return spark_job
+
+
+# Why a finished spark job failed, for the comments of its setup details, or "" if it succeeded
+def get_spark_job_failure(spark_job, timeout_secs):
+    if spark_job.timed_out:
+        return "Spark job timed out after {0} secs".format(timeout_secs)
+    if not spark_job.succeeded():
+        return "Spark job exited with code {0}".format(spark_job.exit_code)
+    return ""
 
 
 # Stops SAR readings
@@ -191,6 +320,236 @@ def stop_sar_readings(ssh_client, password_for_sudo):
     ssh_execute_command(ssh_client, 'bash {0}'.format(script_file))
 
 
+# Stops the /proc sampler
+def stop_proc_sampler(ssh_client):
+    print("Stopping /proc sampler")
+    script_file = path_to_linux_style(os.path.join(remote_scripts_folder, stop_proc_sampler_file))
+    ssh_execute_command(ssh_client, 'bash {0}'.format(script_file))
+
+
+# Stops RAPL readings
+def stop_rapl_readings(ssh_client, password_for_sudo):
+    print("Stopping RAPL readings")
+    script_file = path_to_linux_style(os.path.join(remote_scripts_folder, stop_rapl_readings_file))
+    ssh_execute_command(ssh_client, 'bash {0}'.format(script_file), sudo_password=password_for_sudo)
+
+
+# Stops power meter readings, once the last reading with the final energy totals is written
+def stop_power_readings(ssh_client):
+    print("Stopping power meter readings")
+    script_file = path_to_linux_style(os.path.join(remote_scripts_folder, stop_power_readings_file))
+    ssh_execute_command(ssh_client, 'bash {0}'.format(script_file))
+
+
+# Reduces the SAR readings of a node into a compact summary file next to them, with per-stage rollups computed
+# from the driver's spark log. Runs on the node so only the summary needs to be copied back.
+def reduce_node_measurements(ssh_client, node_exp_folder_path, driver_spark_log_path):
+    print("Reducing SAR readings")
+    script_file = path_to_linux_style(os.path.join(remote_scripts_folder, reduce_measurements_file))
+    ssh_execute_command(ssh_client, 'python3 {0} {1} --sparklog {2} --rollupsecs {3}'.format(
+        script_file, node_exp_folder_path, driver_spark_log_path, summary_rollup_secs))
+
+
+# Copies an experiment's results folder to the local results folder over SFTP. Raw SAR readings are left on the
+# NFS share unless fetch_raw is set, the summaries written by reduce_node_measurements are fetched instead.
+# With a throttle, files are read without prefetching so that holding the progress callback holds the transfer.
+def fetch_experiment_results(ssh_client, remote_exp_folder_path, local_results_folder_path, fetch_raw=False,
+                             throttle=None):
+    sftp_client = ssh_client.open_sftp()
+    try:
+        def fetch_folder(remote_folder_path, local_folder_path):
+            if not os.path.exists(local_folder_path):
+                os.makedirs(local_folder_path)
+            for entry in sftp_client.listdir_attr(remote_folder_path):
+                remote_path = path_to_linux_style(os.path.join(remote_folder_path, entry.filename))
+                local_path = os.path.join(local_folder_path, entry.filename)
+                if stat.S_ISDIR(entry.st_mode):
+                    fetch_folder(remote_path, local_path)
+                elif fetch_raw or not entry.filename.endswith(raw_readings_file_extension):
+                    if throttle:
+                        sftp_client.get(remote_path, local_path, callback=throttle.get_file_callback(), prefetch=False)
+                    else:
+                        sftp_client.get(remote_path, local_path)
+
+        exp_folder_name = os.path.basename(remote_exp_folder_path.rstrip('/'))
+        fetch_folder(remote_exp_folder_path, os.path.join(local_results_folder_path, exp_folder_name))
+    finally:
+        sftp_client.close()
+
+
+# Paces background result transfers. They are held while a run is being measured, so they never add load on the nodes
+# or the network during a measurement, and kept under a rate cap otherwise.
+class TransferThrottle:
+    def __init__(self, max_kBps=None):
+        self.max_kBps = max_kBps
+        self.measurement_idle = threading.Event()
+        self.measurement_idle.set()
+        self.window_start_time = None
+        self.window_bytes = 0
+
+    def begin_measurement(self):
+        self.measurement_idle.clear()
+
+    def end_measurement(self):
+        self.measurement_idle.set()
+
+    def on_transferred(self, num_bytes):
+        if not self.measurement_idle.is_set():
+            self.measurement_idle.wait()
+            self.window_start_time = None
+
+        if not self.max_kBps:
+            return
+        now = time.time()
+        if self.window_start_time is None:
+            self.window_start_time = now
+            self.window_bytes = 0
+        self.window_bytes += num_bytes
+        ahead_secs = self.window_bytes / (self.max_kBps * 1024.0) - (now - self.window_start_time)
+        if ahead_secs > 0:
+            time.sleep(ahead_secs)
+
+    # Progress callback for one file transfer, which gets the bytes of the file transferred so far
+    def get_file_callback(self):
+        transferred = [0]
+
+        def callback(transferred_bytes, total_bytes):
+            self.on_transferred(transferred_bytes - transferred[0])
+            transferred[0] = transferred_bytes
+        return callback
+
+
+def lower_process_priority():
+    if hasattr(os, "nice"):
+        os.nice(background_niceness)
+
+
+# Parses a fetched experiment into the analysis caches (the spark log and event index sidecars) and writes a summary
+# of its metrics next to it, with the energy used by the nodes during the job if there are power readings. Returns
+# the summary.
+def summarize_experiment_results(experiment_id):
+    # Imported here, the analysis scripts import this module
+    import plot_one_experiment
+    import plot_multiple_experiments
+    import power_meter_readings
+
+    experiment_dir_path = os.path.join(local_results_folder, experiment_id)
+    experiment_setup = plot_one_experiment.ExperimentSetup(
+        os.path.join(experiment_dir_path, plot_one_experiment.setup_details_file_name))
+    exp_metrics = plot_multiple_experiments.get_metrics_summary_for_experiment(experiment_id, experiment_setup)
+
+    # Nodes on the integrating power meter get the exact energy of the job window from its cumulative readings
+    energy_by_node = {}
+    driver_results_path = os.path.join(experiment_dir_path, experiment_setup.designated_driver_node)
+    if power_meter_readings.has_power_meter_readings(driver_results_path):
+        meter_readings = power_meter_readings.load_power_meter_readings(driver_results_path)
+        energies_wh = meter_readings.get_energies_wh_between(experiment_setup.spark_job_start_time.timestamp(),
+                                                             experiment_setup.spark_job_end_time.timestamp())
+        energy_by_node = {node_name: energy_wh * 3600
+                          for node_name, energy_wh in zip(meter_readings.node_names, energies_wh.tolist())}
+
+    # Other power readings are one per second, so their sum over the job is the energy in joules
+    metered_nodes = set(energy_by_node)
+    all_readings = plot_one_experiment.parse_results(experiment_dir_path, experiment_setup, None)
+    for timestamp, node_name, label, value in all_readings:
+        if label == "power_watts" and node_name not in metered_nodes and \
+                experiment_setup.spark_job_start_time <= timestamp <= experiment_setup.spark_job_end_time:
+            energy_by_node[node_name] = energy_by_node.get(node_name, 0) + value
+
+    summary = {
+        "ExperimentId": experiment_id,
+        "DurationSecs": exp_metrics.duration.total_seconds(),
+        "PreciseTotalTimeSecs": exp_metrics.precise_total_time,
+        "EnergyJoules": sum(energy_by_node.values()) if energy_by_node else None,
+        "EnergyJoulesPerNode": energy_by_node,
+        "TotalNetInKB": exp_metrics.total_net_in_KB_all_nodes,
+        "TotalNetOutKB": exp_metrics.total_net_out_KB_all_nodes,
+        "StageTimesSecs": {str(stage): (end_time - start_time).total_seconds()
+                           for stage, (start_time, end_time) in exp_metrics.stages_start_end_times.items()},
+        # Sketches of net tx readings by node and stage, they merge across nodes and runs for CDFs (see quantile_sketch)
+        "NetOutKBpsSketches": {node_name: {stage: sketch.to_dict()
+                                           for stage, sketch in node_metrics.per_stage_net_out_kBps_sketches.items()}
+                               for node_name, node_metrics in exp_metrics.per_node_metrics_dict.items()},
+    }
+    with open(os.path.join(experiment_dir_path, metrics_summary_file_name), "w") as summary_file:
+        json.dump(summary, summary_file, indent=4, sort_keys=True)
+    return summary
+
+
+# Fetches the results of finished experiments and summarizes them in the background, while the next experiments run.
+# Transfers run on a thread of their own and go through the throttle, summaries run in a low priority worker process.
+class ResultsPipeline:
+    def __init__(self, user_name, user_password, max_transfer_kBps=results_transfer_max_kBps):
+        self.user_name = user_name
+        self.user_password = user_password
+        self.throttle = TransferThrottle(max_transfer_kBps)
+        self.pending = queue.Queue()
+        self.pool = multiprocessing.Pool(1, initializer=lower_process_priority)
+        self.fetched_events = {}        # Experiment id -> event set once its fetch is done, whether it worked or not
+        self.summary_results = {}       # Experiment id -> async result of summarize_experiment_results, once fetched
+        self.thread = threading.Thread(target=self._fetch_pending, name="results-pipeline", daemon=True)
+        self.thread.start()
+
+    def submit(self, experiment_id, remote_experiment_folder_path):
+        self.fetched_events[experiment_id] = threading.Event()
+        self.pending.put((experiment_id, remote_experiment_folder_path))
+
+    def _fetch_pending(self):
+        while True:
+            item = self.pending.get()
+            if item is None:
+                return
+            experiment_id, remote_experiment_folder_path = item
+            try:
+                driver_node_full_name = "{0}.{1}".format(designated_spark_driver_node, spark_nodes_dns_suffx)
+                with create_ssh_client(driver_node_full_name, 22, self.user_name, self.user_password) as ssh_client:
+                    fetch_experiment_results(ssh_client, remote_experiment_folder_path, local_results_folder,
+                                             fetch_raw_readings, self.throttle)
+                print("Results of experiment {0} fetched".format(experiment_id))
+                self.summary_results[experiment_id] = self.pool.apply_async(summarize_experiment_results,
+                                                                            (experiment_id,))
+            except Exception:
+                print("Fetching results of experiment {0} failed!!".format(experiment_id))
+                print(traceback.format_exc())
+            finally:
+                self.fetched_events[experiment_id].set()
+
+    # Waits for a submitted experiment to be fetched and then summarized. Returns None if fetching or summarizing
+    # failed, or they did not get done in timeout_secs.
+    def get_summary(self, experiment_id, timeout_secs=None):
+        deadline = time.time() + timeout_secs if timeout_secs is not None else None
+        if not self.fetched_events[experiment_id].wait(timeout_secs):
+            print("Fetching results of experiment {0} timed out!!".format(experiment_id))
+            return None
+        if experiment_id not in self.summary_results:
+            # Fetching failed, and said so already
+            return None
+        try:
+            return self.summary_results[experiment_id].get(max(deadline - time.time(), 0) if deadline else None)
+        except Exception:
+            print("Summarizing results of experiment {0} failed!!".format(experiment_id))
+            print(traceback.format_exc())
+            return None
+
+    # Waits for all submitted experiments to be fetched and summarized. Returns {experiment id: summary}.
+    def close(self):
+        self.pending.put(None)
+        self.thread.join()
+        self.pool.close()
+        self.pool.join()
+        return {experiment_id: self.get_summary(experiment_id) for experiment_id in self.fetched_events}
+
+
+# Fetches raw readings of an experiment that was copied back with summaries only, e.g., to look at a single
+# node in detail. Files that are already there locally are overwritten.
+def fetch_raw_results(user_name, user_password, experiment_id):
+    driver_node_full_name = "{0}.{1}".format(designated_spark_driver_node, spark_nodes_dns_suffx)
+    with create_ssh_client(driver_node_full_name, 22, user_name, user_password) as driver_ssh_client:
+        experiment_folder_path = path_to_linux_style(os.path.join(remote_results_folder, experiment_id))
+        fetch_experiment_results(driver_ssh_client, experiment_folder_path, local_results_folder, fetch_raw=True)
+    print("Raw readings of experiment {0} copied".format(experiment_id))
+
+
 # Cleans up each node after experiment
 def cleanup_env_post_experiment(ssh_client):
     print("Cleaning up post environment")
@@ -201,10 +560,26 @@ def cleanup_env_post_experiment(ssh_client):
 # Clears all the data from page cache, dentries and inodes. This is to not let one experiment affect the next one due to caching.
 def clear_page_inode_dentries_cache(ssh_client, password_for_sudo):
     print("Clearing all file data caches")
-    cache_clear_command = "bash -c 'echo 3 > /proc/sys/vm/drop_caches'"
     ssh_execute_command(ssh_client, cache_clear_command, sudo_password=password_for_sudo)
 
 
+# Adds commands that set the rate limit for egress network traffic with TBF qdisc, and show the qdisc after to check
+# it. Returns the index of the show command in the batch, or None if there is no rate limit to set.
+def add_network_rate_limit_commands(batch, rate_limit_mbps):
+    if rate_limit_mbps == 0:
+        return None
+    batch.add(tc_qdisc_set_tbf_rate_limit_format.format(rate_limit_mbps))
+    return batch.add(tc_qdisc_show_command)
+
+
+# Check if rate limiting is properly set, from the output of the tc qdisc show command.
+def check_network_rate_limit(tc_qdisc_show_output, rate_limit_mbps):
+    token_rate_text = "rate {0}Mbit".format(rate_limit_mbps) if rate_limit_mbps % 1000 != 0 \
+        else "rate {0}Gbit".format(int(rate_limit_mbps/1000))
+    if "tbf" not in tc_qdisc_show_output or token_rate_text not in tc_qdisc_show_output:
+        raise Exception("Setting link bandwidth failed!")
+
+
 # Set rate limit for egress network traffic on each node
 def set_network_rate_limit(ssh_client, rate_limit_mbps, password_for_sudo):
 
@@ -212,43 +587,55 @@ def set_network_rate_limit(ssh_client, rate_limit_mbps, password_for_sudo):
         print("Not setting any network rate limit")
         return
 
-    # Set the rate limit with TBF qdisc
     print("Setting network rate limit to {0} mbps".format(rate_limit_mbps))
-    tc_qdisc_set_tbf_rate_limit = 'tc qdisc add dev enp59s0 root tbf rate {0}mbit burst 1mbit latency 10ms'
-    ssh_execute_command(ssh_client, tc_qdisc_set_tbf_rate_limit.format(rate_limit_mbps), sudo_password=password_for_sudo)
-
-    # Check if rate limiting is properly set.
-    tc_qdisc_show_command = 'tc qdisc show  dev enp59s0'
-    output = ssh_execute_command(ssh_client, tc_qdisc_show_command)
-    token_rate_text = "rate {0}Mbit".format(rate_limit_mbps) if rate_limit_mbps % 1000 != 0 \
-        else "rate {0}Gbit".format(int(rate_limit_mbps/1000))
-    if "tbf" not in output or token_rate_text not in output:
-        raise Exception("Setting link bandwidth failed!")
+    batch = CommandBatch()
+    show_command_idx = add_network_rate_limit_commands(batch, rate_limit_mbps)
+    batch_result = ssh_execute_batch(ssh_client, batch, sudo_password=password_for_sudo)
+    check_network_rate_limit(batch_result[show_command_idx].output, rate_limit_mbps)
 
 
 # Resets any traffic control qdisc set for a node, which then defaults to pfifo.
 def reset_network_rate_limit(ssh_client, password_for_sudo):
     print("Resetting network rate limit, deleting any custom qdisc")
-    tc_qdist_reset_command = 'tc qdisc del dev enp59s0 root'
-    ssh_execute_command(ssh_client, tc_qdist_reset_command, sudo_password=password_for_sudo)
+    ssh_execute_command(ssh_client, tc_qdisc_reset_command, sudo_password=password_for_sudo)
+
+
+# Commands that refresh the link interface, for adding to a batch
+def get_refresh_link_interface_commands():
+    return [set_if_down_command, set_if_up_command]
 
 
 # Refreshes interface (Reloads the NIC driver?), clears up any mess that TC makes  
 def refresh_link_interface(ssh_client, password_for_sudo):
     print("Refreshing the link interface")
-    set_if_down_command = 'ip link set enp59s0 down'
-    set_if_up_command = 'ip link set enp59s0 up'
+    batch = CommandBatch()
+    batch.extend(get_refresh_link_interface_commands())
+    ssh_execute_batch(ssh_client, batch, sudo_password=password_for_sudo)
+
 
-    ssh_execute_command(ssh_client, set_if_down_command, sudo_password=password_for_sudo)
-    ssh_execute_command(ssh_client, set_if_up_command, sudo_password=password_for_sudo)
+# Clears all file data caches and sets the required network rate on a node, in one round trip. Deleting the qdisc
+# fails when there is no custom one, that is expected.
+def prepare_node_for_experiment(ssh_client, rate_limit_mbps, password_for_sudo):
+    print("Clearing all file data caches, setting network rate limit to {0} mbps".format(rate_limit_mbps))
+    batch = CommandBatch()
+    batch.add(cache_clear_command)
+    batch.add(tc_qdisc_reset_command)
+    show_command_idx = add_network_rate_limit_commands(batch, rate_limit_mbps)
+    batch_result = ssh_execute_batch(ssh_client, batch, sudo_password=password_for_sudo)
+    if show_command_idx is not None:
+        check_network_rate_limit(batch_result[show_command_idx].output, rate_limit_mbps)
 
 
 # Runs a single experiment with specific configurations like input size, network rate, etc.
 # Prepares necessary setup to collect readings and runs spaenp59s0rk jobs.
+# With a results pipeline, the results get fetched and summarized in the background and this returns once the nodes are
+# cleaned up.
 def run_experiment(exp_run_id, exp_run_desc, exp_plot_desc, scala_class_name, user_name, user_password, input_size_mb, 
-                    link_bandwidth_mbps, record_size_bytes, final_partition_count, cache_hdfs_file):
+                    link_bandwidth_mbps, record_size_bytes, final_partition_count, cache_hdfs_file,
+                    results_pipeline=None):
     experiment_start_time = datetime.datetime.now()
     experiment_id = "Exp-" + experiment_start_time.strftime("%Y-%m-%d-%H-%M-%S")
+    monitor = None
 
     try:
         experiment_folder_name = experiment_id
@@ -264,6 +651,10 @@ def run_experiment(exp_run_id, exp_run_desc, exp_plot_desc, scala_class_name, us
         # Prepare for experiment. Create input spark files if they do not exist.
         prepare_env_for_experiment(driver_ssh_client, user_password, input_size_mb, cache_hdfs_file)
 
+        # Hold background result transfers of earlier runs while this one is measured
+        if results_pipeline:
+            results_pipeline.throttle.begin_measurement()
+
         # Prepare environment and start collecting readings on each node
         for node_name in spark_nodes:
             node_full_name = "{0}.{1}".format(node_name, spark_nodes_dns_suffx)
@@ -272,18 +663,28 @@ def run_experiment(exp_run_id, exp_run_desc, exp_plot_desc, scala_class_name, us
                 node_exp_folder_path = path_to_linux_style(os.path.join(experiment_folder_path, node_name))
                 create_folder_if_not_exists(ssh_client, node_exp_folder_path)
 
-                # Clear all kinds of file data from caches
-                clear_page_inode_dentries_cache(ssh_client, user_password)
-
-                # Delete any non-default qdisc and set required network rate.
-                reset_network_rate_limit(ssh_client, user_password)
-                set_network_rate_limit(ssh_client, link_bandwidth_mbps, user_password)
-
-                start_sar_readings(ssh_client, node_exp_folder_path, user_password)
-
-        # Start collecting power readings from the driver node. TODO: No powermeter connected for now.
-        # driver_exp_folder_path = path_to_linux_style(os.path.join(experiment_folder_path, designated_driver_node))
-        # start_power_readings(driver_ssh_client, driver_exp_folder_path)
+                # Clear all kinds of file data from caches, delete any non-default qdisc and set required network rate.
+                prepare_node_for_experiment(ssh_client, link_bandwidth_mbps, user_password)
+
+                if proc_sampler_interval_ms:
+                    start_proc_sampler(ssh_client, node_exp_folder_path, proc_sampler_interval_ms)
+                else:
+                    start_sar_readings(ssh_client, node_exp_folder_path, user_password)
+                if rapl_interval_ms:
+                    start_rapl_readings(ssh_client, node_exp_folder_path, rapl_interval_ms, user_password)
+
+        # Start tailing the readings to get a live summary of the cluster while the job runs
+        if live_monitor_enabled:
+            import live_monitor
+            monitor = live_monitor.start_live_monitor(driver_ssh_client, experiment_folder_path, spark_nodes,
+                                                      designated_spark_driver_node, power_meter_nodes_in_order,
+                                                      link_bandwidth_mbps)
+
+        # Start collecting power readings from the driver node, if the power meter is connected. Otherwise, use
+        # --raplms for RAPL based readings instead.
+        if power_meter_interval_ms:
+            start_power_readings(driver_ssh_client, path_to_linux_style(
+                os.path.join(experiment_folder_path, designated_spark_driver_node)), power_meter_interval_ms)
 
         # Wait a bit before the run
         # time.sleep(padding_in_secs)
@@ -291,27 +692,45 @@ def run_experiment(exp_run_id, exp_run_desc, exp_plot_desc, scala_class_name, us
         # Kick off the run
         spark_job_start_time = datetime.datetime.now()
         driver_exp_folder_path = path_to_linux_style(os.path.join(experiment_folder_path, designated_spark_driver_node))
-        run_spark_job(driver_ssh_client, driver_exp_folder_path, input_size_mb, scala_class_name, record_size_bytes, final_partition_count)
+        local_experiment_folder = os.path.join(local_results_folder, experiment_folder_name)
+        os.makedirs(local_experiment_folder, exist_ok=True)
+        spark_job = run_spark_job(driver_ssh_client, driver_exp_folder_path, input_size_mb, scala_class_name,
+                                  record_size_bytes, final_partition_count, spark_job_timeout_secs,
+                                  os.path.join(local_experiment_folder, spark_job_log_file_name))
         spark_job_end_time = datetime.datetime.now()
 
         # Wait a bit after the run
         # time.sleep(padding_in_secs)
 
-        # Stop power readings TODO: No powermeter connected for now.
-        # stop_power_readings(driver_ssh_client, driver_exp_folder_path)
+        # Stop power readings
+        if power_meter_interval_ms:
+            stop_power_readings(driver_ssh_client)
 
-        # Stop collecting SAR readings on each node
+        # Stop collecting readings on each node and reduce the SAR readings to a summary there. /proc samples and
+        # RAPL readings are compact already and get fetched as they are.
+        driver_spark_log_path = path_to_linux_style(os.path.join(driver_exp_folder_path, "spark.log"))
         for node_name in spark_nodes:
             node_full_name = "{0}.{1}".format(node_name, spark_nodes_dns_suffx)
             with create_ssh_client(node_full_name, 22, user_name, user_password) as ssh_client:
+                if rapl_interval_ms:
+                    stop_rapl_readings(ssh_client, user_password)
+                if proc_sampler_interval_ms:
+                    stop_proc_sampler(ssh_client)
+                    continue
                 stop_sar_readings(ssh_client, user_password)
+                node_exp_folder_path = path_to_linux_style(os.path.join(experiment_folder_path, node_name))
+                reduce_node_measurements(ssh_client, node_exp_folder_path, driver_spark_log_path)
+
+        if monitor:
+            monitor.stop()
+        if results_pipeline:
+            results_pipeline.throttle.end_measurement()
 
-        # Copy results to local machine
-        with SCPClient(driver_ssh_client.get_transport()) as scp:
-            scp.get(experiment_folder_path, local_results_folder, recursive=True)
+        # Copy results to local machine, in the background if pipelined
+        if not results_pipeline:
+            fetch_experiment_results(driver_ssh_client, experiment_folder_path, local_results_folder, fetch_raw_readings)
 
         # Record experiment setup details for later use
-        local_experiment_folder = os.path.join(local_results_folder, experiment_folder_name)
         setup_file = open(os.path.join(local_experiment_folder, "setup_details.txt"), "w")
         json.dump(
             {
@@ -324,6 +743,7 @@ def run_experiment(exp_run_id, exp_run_desc, exp_plot_desc, scala_class_name, us
                 "ExperimentStartTime": experiment_start_time.strftime("%Y-%m-%d %H:%M:%S"),
                 "SparkJobStartTime": spark_job_start_time.strftime("%Y-%m-%d %H:%M:%S"),
                 "SparkJobEndTime": spark_job_end_time.strftime("%Y-%m-%d %H:%M:%S"),
+                "SparkJobDurationSecs": (spark_job_end_time - spark_job_start_time).total_seconds(),
                 "AllSparkNodes": spark_nodes,
                 "PowerMeterNodesInOrder": power_meter_nodes_in_order,
                 "HdfsMasterNode": designated_hdfs_master_node,
@@ -334,22 +754,201 @@ def run_experiment(exp_run_id, exp_run_desc, exp_plot_desc, scala_class_name, us
                 "PlotFriendlyName": exp_plot_desc,
                 "RecordSizeByes": record_size_bytes,
                 "FinalPartitionCount" : final_partition_count,
-                "Comments": "",
+                "SparkJobSucceeded": spark_job.succeeded(),
+                "SparkJobExitCode": spark_job.exit_code,
+                "Comments": get_spark_job_failure(spark_job, spark_job_timeout_secs),
             }, setup_file, indent=4, sort_keys=True)
+        setup_file.close()
+
+        if results_pipeline:
+            results_pipeline.submit(experiment_id, experiment_folder_path)
 
         # Cleanup on each node
         cleanup_env_post_experiment(driver_ssh_client)
         driver_ssh_client.close()
 
-        print("Experiment: {0} done!!".format(experiment_id))
+        print("Experiment: {0} done!!{1}".format(experiment_id, "" if spark_job.succeeded() else " Its spark job failed."))
         return experiment_id
     except:
         print("Experiment: {0} failed!!".format(experiment_id))
+        print(traceback.format_exc())
+        if monitor:
+            monitor.stop()
+        if results_pipeline:
+            results_pipeline.throttle.end_measurement()
+        return None
+
+
+# Appends the runs and decisions of a sweep to a JSON lines file in the local results folder
+class SweepJournal:
+    def __init__(self, exp_run_id):
+        self.exp_run_id = exp_run_id
+        self.file_path = os.path.join(local_results_folder, sweep_journal_file_name_format.format(exp_run_id))
+
+    def record(self, event, **fields):
+        entry = dict(fields, Time=datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"), Event=event,
+                     ExperimentGroup=self.exp_run_id)
+        if not os.path.exists(local_results_folder):
+            os.makedirs(local_results_folder)
+        with open(self.file_path, "a") as journal_file:
+            journal_file.write(json.dumps(entry, sort_keys=True) + "\n")
+
+
+# Returns the mean and the half width of its 95% confidence interval, or None for less than two values
+def get_confidence_interval(values):
+    if len(values) < 2:
+        return None
+    mean = sum(values) / len(values)
+    std = (sum((value - mean) ** 2 for value in values) / (len(values) - 1)) ** 0.5
+    degrees_of_freedom = len(values) - 1
+    t_value = t_critical_values_95[degrees_of_freedom - 1] if degrees_of_freedom <= len(t_critical_values_95) else 1.96
+    return mean, t_value * std / len(values) ** 0.5
+
+
+def get_relative_precision(values):
+    interval = get_confidence_interval(values)
+    if interval is None or interval[0] == 0:
+        return None
+    mean, half_width = interval
+    return half_width / abs(mean)
+
+
+# Metrics summary of an experiment, waiting for it if it is still in the pipeline, or summarizing it right away if
+# there is no pipeline. Returns None if summarizing failed.
+def get_experiment_summary(experiment_id, results_pipeline=None):
+    if results_pipeline:
+        return results_pipeline.get_summary(experiment_id)
+    try:
+        return summarize_experiment_results(experiment_id)
+    except Exception:
         print(traceback.format_exc())
         return None
 
 
+# Job duration of an experiment as the orchestrator timed it, from its local setup details
+def get_job_duration_secs(experiment_id):
+    with open(os.path.join(local_results_folder, experiment_id, "setup_details.txt"), "r") as setup_file:
+        return json.load(setup_file)["SparkJobDurationSecs"]
+
+
+# Whether the spark job of an experiment finished in time with exit code 0, from its local setup details. Experiments
+# recorded before this was (only timeouts were, in the comments) count as succeeded unless they timed out.
+def get_spark_job_succeeded(experiment_id):
+    with open(os.path.join(local_results_folder, experiment_id, "setup_details.txt"), "r") as setup_file:
+        setup = json.load(setup_file)
+    return setup.get("SparkJobSucceeded", not setup.get("Comments", "").startswith("Spark job timed out"))
+
+
+# Runs one configuration until the 95% confidence interval of the job duration, and of the energy if there are power
+# readings, is within the target precision, or the max repetitions are done. Durations are known right after each run.
+# Energies need the results summarized, so they are only looked at once the durations are precise enough, waiting
+# for the summaries still in the pipeline then. Returns the ids of the experiments that ran.
+def run_configuration_adaptively(journal, exp_run_id, exp_run_desc, exp_plot_desc, scala_class_name, user_name,
+                                 user_password, input_size_mb, link_bandwidth_mbps, record_size_bytes,
+                                 final_partition_count, cache_hdfs_file, results_pipeline=None):
+    configuration = {"ScalaClassName": scala_class_name, "InputSizeMb": input_size_mb,
+                     "LinkBandwidthMbps": link_bandwidth_mbps, "FinalPartitionCount": final_partition_count}
+    experiment_ids = []
+    durations = []
+    summaries = {}
+    attempts = 0
+
+    # Summaries get waited for in the pipeline, and only the ones that worked are kept, a failed one is tried again
+    def get_summary(experiment_id):
+        if experiment_id not in summaries:
+            summary = get_experiment_summary(experiment_id, results_pipeline)
+            if summary is None:
+                return None
+            summaries[experiment_id] = summary
+        return summaries[experiment_id]
+
+    while True:
+        attempts += 1
+        experiment_id = run_experiment(exp_run_id, exp_run_desc, exp_plot_desc, scala_class_name, user_name,
+                                       user_password, input_size_mb, link_bandwidth_mbps, record_size_bytes,
+                                       final_partition_count, cache_hdfs_file, results_pipeline)
+        if experiment_id is None:
+            journal.record("RunFailed", Configuration=configuration, Attempt=attempts)
+        elif not get_spark_job_succeeded(experiment_id):
+            # Results of a failed job are kept to look into, but do not count as a repetition
+            journal.record("RunFailed", Configuration=configuration, Attempt=attempts, ExperimentId=experiment_id)
+        else:
+            experiment_ids.append(experiment_id)
+            durations.append(get_job_duration_secs(experiment_id))
+            journal.record("Run", Configuration=configuration, Attempt=attempts, ExperimentId=experiment_id,
+                           DurationSecs=durations[-1])
+
+        duration_precision = get_relative_precision(durations)
+        energy_precision = None
+        energies = None
+        if attempts >= adaptive_max_repetitions:
+            reason = "MaxRepetitions"
+        elif len(durations) < adaptive_min_repetitions or duration_precision is None \
+                or duration_precision > adaptive_target_relative_precision:
+            continue
+        else:
+            reason = "PrecisionReached"
+
+        # Energy counts only if every run has it
+        energies = [(get_summary(experiment_id) or {}).get("EnergyJoules") for experiment_id in experiment_ids]
+        energies = energies if energies and None not in energies else None
+        energy_precision = get_relative_precision(energies) if energies else None
+        if reason == "PrecisionReached" and energy_precision is not None \
+                and energy_precision > adaptive_target_relative_precision:
+            continue
+
+        duration_interval = get_confidence_interval(durations)
+        energy_interval = get_confidence_interval(energies) if energies else None
+        journal.record("Stop", Configuration=configuration, Reason=reason, Attempts=attempts,
+                       ExperimentIds=experiment_ids, TargetRelativePrecision=adaptive_target_relative_precision,
+                       DurationSecsMean=duration_interval[0] if duration_interval else None,
+                       DurationSecsHalfWidth=duration_interval[1] if duration_interval else None,
+                       DurationRelativePrecision=duration_precision,
+                       EnergyJoulesMean=energy_interval[0] if energy_interval else None,
+                       EnergyJoulesHalfWidth=energy_interval[1] if energy_interval else None,
+                       EnergyRelativePrecision=energy_precision)
+        print("Configuration {0} done after {1} runs: {2}".format(configuration, attempts, reason))
+        return experiment_ids
+
+
+# Searches the configurations for the best one on the objective with successive halving (see config_search), each
+# round running the configurations left one after another on a larger input. Returns the search result.
+def search_configurations(journal, exp_run_id, exp_run_desc, exp_plot_desc, user_name, user_password,
+                          configurations, full_input_size_mb, record_size_bytes, cache_hdfs_file,
+                          results_pipeline=None):
+    import config_search
+
+    def evaluate_round(round_configurations, input_size_mb):
+        experiment_ids = []
+        for configuration in round_configurations:
+            print("Running search experiment: {0}, {1}".format(input_size_mb, configuration))
+            experiment_ids.append(run_experiment(exp_run_id, exp_run_desc, exp_plot_desc,
+                                                 configuration["ScalaClassName"], user_name, user_password,
+                                                 int(input_size_mb), configuration["LinkBandwidthMbps"],
+                                                 record_size_bytes, configuration["FinalPartitionCount"],
+                                                 cache_hdfs_file, results_pipeline))
+        # Summaries of the round's runs are needed to pick the next round's configurations. With the pipeline this
+        # waits for each run to be fetched and summarized, so only runs that really failed score as failed.
+        return [get_experiment_summary(experiment_id, results_pipeline)
+                if experiment_id and get_spark_job_succeeded(experiment_id) else None
+                for experiment_id in experiment_ids]
+
+    result = config_search.successive_halving(configurations, evaluate_round, search_objective_name,
+                                              full_input_size_mb, min_input_size_mb=search_min_input_size_mb,
+                                              journal=journal)
+    if result.best_configuration is None:
+        journal.record("SearchFailed", Objective=search_objective_name, CostInFullRuns=result.get_cost_in_full_runs())
+        print("No configuration found on {0}, every run of the last round failed".format(search_objective_name))
+        return result
+    journal.record("SearchDone", Objective=search_objective_name, BestConfiguration=result.best_configuration,
+                   BestScore=result.best_score, CostInFullRuns=result.get_cost_in_full_runs())
+    print("Best configuration on {0}: {1} ({2})".format(search_objective_name, result.best_configuration,
+                                                       result.best_score))
+    return result
+
+
 def copy_src_files(root_user_name, root_password):
+    from scp import SCPClient
     print("Copying source files to NFS")
     master_node_full_name = "{0}.{1}".format(designated_spark_driver_node, spark_nodes_dns_suffx)
     with create_ssh_client(master_node_full_name, 22, root_user_name, root_password) as master_node_ssh_client:
@@ -380,7 +979,34 @@ def run(root_user_name, root_password, hadoop_user_name, hadoop_password, exp_ru
 
     # Command line arguments
     exp_run_id = "Run-" + datetime.datetime.now().strftime("%Y-%m-%d-%H-%M-%S")
+
+    # Results of each run get fetched and summarized while the next one runs, if pipelined
+    results_pipeline = ResultsPipeline(root_user_name, root_password) if pipelined_sweep_enabled else None
     
+    # Search for the best configuration at the largest input size, in place of the fixed iterations, if searching
+    if search_objective_name:
+        import config_search
+        configurations = config_search.get_all_configurations(scala_class_names, final_partition_counts,
+                                                              link_bandwidth_mbps)
+        search_configurations(SweepJournal(exp_run_id), exp_run_id, exp_run_desc, exp_plot_desc, root_user_name,
+                              root_password, configurations, int(max(input_sizes_mb)), record_size_bytes,
+                              cache_hdfs_input, results_pipeline)
+        iterations = []
+
+    # Repeat each configuration until its results are precise enough, in place of the fixed iterations, if adaptive
+    elif adaptive_repetition_enabled:
+        journal = SweepJournal(exp_run_id)
+        for sort_type in scala_class_names:
+            for partition_count in final_partition_counts:
+                for link_bandwidth in link_bandwidth_mbps:
+                    for input_size_mb in input_sizes_mb:
+                        print("Running configuration adaptively: {0}, {1}".format(input_size_mb, link_bandwidth))
+                        run_configuration_adaptively(journal, exp_run_id, exp_run_desc, exp_plot_desc, sort_type,
+                                                     root_user_name, root_password, int(input_size_mb), link_bandwidth,
+                                                     record_size_bytes, partition_count, cache_hdfs_input,
+                                                     results_pipeline)
+        iterations = []
+
     # Run all experiments
     for sort_type in scala_class_names:
         for iter_ in iterations:
@@ -389,9 +1015,15 @@ def run(root_user_name, root_password, hadoop_user_name, hadoop_password, exp_ru
                     for input_size_mb in input_sizes_mb:
                         print("Running experiment: {0}, {1}, {2}".format(iter_, input_size_mb, link_bandwidth))
                         run_experiment(exp_run_id, exp_run_desc, exp_plot_desc, sort_type, root_user_name, root_password, 
-                            int(input_size_mb), link_bandwidth, record_size_bytes, partition_count, cache_hdfs_file=cache_hdfs_input)
+                            int(input_size_mb), link_bandwidth, record_size_bytes, partition_count, cache_hdfs_file=cache_hdfs_input,
+                            results_pipeline=results_pipeline)
                         # time.sleep(1*60)
 
+    if results_pipeline:
+        print("Waiting for results of the last experiments to be fetched and summarized")
+        for experiment_id, summary in sorted(results_pipeline.close().items()):
+            print(experiment_id, json.dumps(summary, sort_keys=True) if summary else "no summary")
+
     print("Experimental run", exp_run_id, "complete.")
 
 def teardown_env(root_user_name, root_password, hadoop_user_name, hadoop_password):  
@@ -417,9 +1049,53 @@ def main():
     parser.add_argument('--run', action='store_true', help='runs experiments')
     parser.add_argument('--desc', action='store', help='description for the current runs')
     parser.add_argument('--plotname', action='store', help='plot friendly name for the experiment - used in plot legends')   
+    parser.add_argument('--monitor', action='store_true', help='print a live summary of node readings during runs')
+    parser.add_argument('--fetchraw', action='store_true', help='copy raw SAR readings along with the node summaries')
+    parser.add_argument('--fetchrawfor', action='store', help='copy raw SAR readings of an earlier experiment id')
+    parser.add_argument('--samplems', action='store', type=float,
+                        help='sample /proc at this interval in millisecs on the nodes instead of running SAR')
+    parser.add_argument('--raplms', action='store', type=float,
+                        help='read RAPL energy counters at this interval in millisecs on the nodes')
+    parser.add_argument('--powerms', action='store', type=float,
+                        help='read the power meter in its integration mode at this interval in millisecs')
+    parser.add_argument('--pipelined', action='store_true',
+                        help='fetch and summarize results of each run in the background while the next one runs')
+    parser.add_argument('--adaptive', action='store_true',
+                        help='repeat each configuration until its duration and energy are precise enough')
+    parser.add_argument('--precision', action='store', type=float,
+                        help='target half width of the 95%% confidence interval relative to the mean, for --adaptive')
+    parser.add_argument('--maxreps', action='store', type=int, help='max repetitions of a configuration, for --adaptive')
+    parser.add_argument('--search', action='store', choices=["duration", "energy", "edp"],
+                        help='search the configurations for the best one on this objective with successive halving')
+    parser.add_argument('--searchminmb', action='store', type=int,
+                        help='input size in MB of the first search round')
+    parser.add_argument('--jobtimeout', action='store', type=float,
+                        help='kill spark jobs that run longer than this many secs')
     parser.add_argument('-v', '--verbose', action='store_true', help='print verbose logs for debugging')
     args = parser.parse_args()
 
+    global live_monitor_enabled, fetch_raw_readings, proc_sampler_interval_ms, rapl_interval_ms, spark_job_timeout_secs
+    global power_meter_interval_ms
+    global pipelined_sweep_enabled, adaptive_repetition_enabled, adaptive_target_relative_precision
+    global adaptive_max_repetitions, search_objective_name, search_min_input_size_mb
+    live_monitor_enabled = args.monitor
+    fetch_raw_readings = args.fetchraw
+    proc_sampler_interval_ms = args.samplems
+    rapl_interval_ms = args.raplms
+    power_meter_interval_ms = args.powerms
+    assert not power_meter_interval_ms or power_meter_nodes_in_order, \
+        'Set power_meter_nodes_in_order to the nodes on the power meter channels to use --powerms!'
+    spark_job_timeout_secs = args.jobtimeout
+    pipelined_sweep_enabled = args.pipelined
+    adaptive_repetition_enabled = args.adaptive
+    if args.precision is not None:
+        adaptive_target_relative_precision = args.precision
+    if args.maxreps is not None:
+        adaptive_max_repetitions = args.maxreps
+    search_objective_name = args.search
+    if args.searchminmb is not None:
+        search_min_input_size_mb = args.searchminmb
+
     if args.verbose:
         log_verbose = True
 
@@ -437,6 +1113,9 @@ def main():
         assert args.desc is not None, 'Provide description with --desc parameter for this run!'
         run(root_user_name, root_password, hadoop_user_name, hadoop_password, args.desc, args.plotname)
 
+    if args.fetchrawfor:
+        fetch_raw_results(root_user_name, root_password, args.fetchrawfor)
+
     if args.teardown:
         teardown_env(root_user_name, root_password, hadoop_user_name, hadoop_password)
 
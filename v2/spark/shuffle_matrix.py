@@ -0,0 +1,184 @@
+"""
+Builds the node to node traffic matrix of an experiment, over time and per Spark stage, from the packet traces
+captured on each of its nodes
+"""
+
+import argparse
+import os
+import multiprocessing
+from datetime import datetime
+import numpy as np
+import matplotlib.pyplot as plt
+import plot_one_experiment
+from plot_one_experiment import ExperimentSetup
+import analyze_spark_logs
+import run_experiments
+import packet_trace
+import pcap_reader
+
+
+# Per-node packet trace, saved in each node's results folder (as a capture or its text dump, see pcap_reader)
+node_trace_file_name = "net_usage_breakdown"
+default_bin_secs = 1
+ip_to_node_dict = {addr[1]: node for node, addr in run_experiments.fat_tree_ip_mac_map.items()}
+
+
+# Bytes between the nodes of an experiment, per time bin. bytes[bin, src, dst] is what node_names[src] sent to
+# node_names[dst] in the bin starting start_seconds + bin * bin_secs (epoch seconds).
+class ShuffleMatrix:
+    node_names = None
+    bin_secs = None
+    start_seconds = None
+    bytes = None
+
+    def get_bin_times(self):
+        return [datetime.fromtimestamp(self.start_seconds + b * self.bin_secs) for b in range(self.bytes.shape[0])]
+
+    # Node x node bytes over the bins overlapping [start_time, end_time), or over all of them
+    def get_matrix(self, start_time=None, end_time=None):
+        bin_starts = self.start_seconds + np.arange(self.bytes.shape[0]) * self.bin_secs
+        selected = np.ones(len(bin_starts), dtype=bool)
+        if start_time is not None:
+            selected &= bin_starts >= start_time.timestamp() - self.bin_secs + 1
+        if end_time is not None:
+            selected &= bin_starts < end_time.timestamp()
+        return self.bytes[selected].sum(axis=0)
+
+
+# Reduces the trace of one node to bytes per <second, peer node, direction>, leaving out services and hosts that are
+# not experiment nodes. Returns None if the node has no trace. Runs in a worker process.
+def aggregate_node_trace(experiment_dir_path, node_name, node_names):
+    packet_chunks = pcap_reader.open_trace_chunks(os.path.join(experiment_dir_path, node_name, node_trace_file_name))
+    if packet_chunks is None:
+        return None
+    aggregate = packet_trace.aggregate_packet_chunks(packet_chunks, node_name, ip_to_node_dict, ignore_self_traffic=True)
+
+    peer_indices = np.array([node_names.index(name) if name in node_names else -1 for name in aggregate.peer_names],
+                            dtype=np.int64)[aggregate.peer_codes]
+    selected = peer_indices >= 0
+    keys = (aggregate.seconds[selected] * len(node_names) + peer_indices[selected]) * 2 + aggregate.directions[selected]
+    unique_keys, indices = np.unique(keys, return_inverse=True)
+    total_bytes = np.bincount(indices, weights=aggregate.total_bytes[selected], minlength=len(unique_keys))
+    return unique_keys // 2 // len(node_names), unique_keys // 2 % len(node_names), unique_keys % 2, total_bytes
+
+
+def _aggregate_node_trace(args):
+    return aggregate_node_trace(*args)
+
+
+# Merges the traces of all the nodes into a ShuffleMatrix, reading the traces in parallel. Packets between two nodes
+# show up in the traces of both. Each <bin, src, dst> takes the larger of what the sender saw going out and what the
+# receiver saw coming in, so that every packet counts once and drops on one end of the capture are made up for by
+# the other end. Pairs where only one of the nodes has a trace take that node's view.
+def build_shuffle_matrix(experiment_dir_path, node_names, bin_secs=default_bin_secs, processes=None):
+    node_names = [node_name for node_name in node_names if node_name in run_experiments.fat_tree_ip_mac_map]
+    jobs = [(experiment_dir_path, node_name, node_names) for node_name in node_names]
+    if processes == 1 or len(jobs) <= 1:
+        node_traffic = [aggregate_node_trace(*job) for job in jobs]
+    else:
+        pool = multiprocessing.Pool(processes=processes)
+        try:
+            node_traffic = pool.map(_aggregate_node_trace, jobs, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+
+    all_seconds = [traffic[0] for traffic in node_traffic if traffic is not None and len(traffic[0])]
+    if not all_seconds:
+        return None
+    start_seconds = min(int(seconds.min()) for seconds in all_seconds)
+    end_seconds = max(int(seconds.max()) for seconds in all_seconds)
+    num_bins = (end_seconds - start_seconds) // bin_secs + 1
+
+    sent = np.zeros((num_bins, len(node_names), len(node_names)), dtype=np.float64)
+    received = np.zeros((num_bins, len(node_names), len(node_names)), dtype=np.float64)
+    for node_index, traffic in enumerate(node_traffic):
+        if traffic is None:
+            continue
+        seconds, peer_indices, directions, total_bytes = traffic
+        bins = (seconds - start_seconds) // bin_secs
+        is_outbound = directions == packet_trace.direction_outbound
+        np.add.at(sent, (bins[is_outbound], node_index, peer_indices[is_outbound]), total_bytes[is_outbound])
+        np.add.at(received, (bins[~is_outbound], peer_indices[~is_outbound], node_index), total_bytes[~is_outbound])
+
+    matrix = ShuffleMatrix()
+    matrix.node_names = node_names
+    matrix.bin_secs = bin_secs
+    matrix.start_seconds = start_seconds
+    matrix.bytes = np.maximum(sent, received)
+    return matrix
+
+
+# Time range of each stage, from the first task launch to the last task end: {stage id: (start, end)}
+def get_stage_time_ranges(all_tasks):
+    stage_time_ranges = {}
+    for task in all_tasks:
+        start_time, end_time = stage_time_ranges.get(task.stage_id, (task.start_time, task.end_time))
+        stage_time_ranges[task.stage_id] = (min(start_time, task.start_time), max(end_time, task.end_time))
+    return stage_time_ranges
+
+
+def plot_shuffle_matrix(matrix_bytes, node_names, title, output_full_path):
+    fig, ax = plt.subplots(1, 1)
+    fig.set_size_inches(w=8, h=7)
+    fig.suptitle(title)
+    matrix_gb = matrix_bytes / (1024.0 ** 3)
+    image = ax.imshow(matrix_gb, cmap="viridis")
+    fig.colorbar(image, ax=ax, label="GB")
+    ax.set_xticks(range(len(node_names)))
+    ax.set_xticklabels(node_names, rotation=45)
+    ax.set_yticks(range(len(node_names)))
+    ax.set_yticklabels(node_names)
+    ax.set_xlabel("Destination node")
+    ax.set_ylabel("Source node")
+    for src in range(len(node_names)):
+        for dst in range(len(node_names)):
+            ax.text(dst, src, "{0:.1f}".format(matrix_gb[src, dst]), ha="center", va="center", color="w", fontsize=7)
+    plt.savefig(output_full_path)
+    plt.close()
+
+
+# Plots the whole experiment's matrix and one per stage, along with each node's send rate over time
+def plot_shuffle_matrices(experiment_id, bin_secs=default_bin_secs, processes=None):
+    experiment_dir_path = os.path.join(plot_one_experiment.results_base_dir, experiment_id)
+    experiment_setup = ExperimentSetup(os.path.join(experiment_dir_path, plot_one_experiment.setup_details_file_name))
+    matrix = build_shuffle_matrix(experiment_dir_path, experiment_setup.all_spark_nodes, bin_secs, processes)
+    if matrix is None:
+        print("No packet traces found for experiment", experiment_id)
+        return
+
+    plot_shuffle_matrix(matrix.get_matrix(), matrix.node_names, "{0}: bytes sent between nodes".format(experiment_id),
+                        os.path.join(experiment_dir_path, "shuffle_matrix.png"))
+
+    all_tasks = analyze_spark_logs.parse_spark_detailed_log(experiment_dir_path, experiment_id, experiment_setup)
+    for stage_id, (start_time, end_time) in sorted(get_stage_time_ranges(all_tasks or []).items()):
+        plot_shuffle_matrix(matrix.get_matrix(start_time, end_time), matrix.node_names,
+                            "{0}: bytes sent between nodes in stage {1}".format(experiment_id, stage_id),
+                            os.path.join(experiment_dir_path, "shuffle_matrix_stage_{0}.png".format(stage_id)))
+
+    fig, ax = plt.subplots(1, 1)
+    fig.set_size_inches(w=10, h=6)
+    fig.suptitle("{0}: send rate per node".format(experiment_id))
+    ax.set_xlabel("Time")
+    ax.set_ylabel("Network throughput Mbps")
+    bin_times = matrix.get_bin_times()
+    for src, node_name in enumerate(matrix.node_names):
+        ax.plot(bin_times, matrix.bytes[:, src, :].sum(axis=1) * 8.0 / 1000000 / bin_secs, label=node_name)
+    plt.legend()
+    plt.savefig(os.path.join(experiment_dir_path, "shuffle_send_rate.png"))
+    plt.close()
+
+
+def main():
+    parser = argparse.ArgumentParser("Plots node to node traffic matrices from the packet traces of experiments")
+    parser.add_argument('experiments', action='store', nargs='+', help='ids of the experiments')
+    parser.add_argument('--binsecs', action='store', type=int, default=default_bin_secs, help='time bin size in secs')
+    parser.add_argument('--processes', action='store', type=int, help='number of node traces read in parallel')
+    args = parser.parse_args()
+
+    for experiment_id in args.experiments:
+        plot_shuffle_matrices(experiment_id, args.binsecs, args.processes)
+
+
+if __name__ == '__main__':
+    main()
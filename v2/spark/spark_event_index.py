@@ -0,0 +1,150 @@
+"""
+Indexes the events in the detailed spark log (spark-detailed.log, one JSON event per line) by their type, with the
+byte offset and length of each line, so that readers decode only the events they need. The index is kept in a sidecar
+file next to the log.
+"""
+
+import os
+import re
+import json
+import mmap
+import numpy as np
+from experiment_archive import result_file_exists, open_result_file, get_result_file_stat, is_archived_result_file
+
+
+index_file_suffix = ".index.npz"
+index_version = 1
+# Spark writes the event type first on each line, so it is looked for at the start of the line before anywhere else
+event_type_regex = rb'"Event":\s*"([^"]+)"'
+event_type_search_bytes = 128
+
+job_start_event = "SparkListenerJobStart"
+job_end_event = "SparkListenerJobEnd"
+stage_submitted_event = "SparkListenerStageSubmitted"
+stage_completed_event = "SparkListenerStageCompleted"
+task_end_event = "SparkListenerTaskEnd"
+executor_added_event = "SparkListenerExecutorAdded"
+
+
+class SparkEventIndex:
+    spark_full_log_path = None
+    event_types = None      # Event type by event code
+    offsets = None          # Line offset, length and event code of each event, in log order
+    lengths = None
+    event_codes = None
+
+    def get_event_count(self, event_type):
+        if event_type not in self.event_types:
+            return 0
+        return int(np.count_nonzero(self.event_codes == self.event_types.index(event_type)))
+
+    # Yields the lines of events of the given types, in log order, reading just those lines
+    def iterate_event_lines(self, *event_types):
+        codes = [self.event_types.index(event_type) for event_type in event_types if event_type in self.event_types]
+        selected = np.flatnonzero(np.isin(self.event_codes, codes))
+        if not len(selected):
+            return
+        if is_archived_result_file(self.spark_full_log_path):
+            # Archived logs get read into memory, decompressing just the log's member of the archive
+            with open_result_file(self.spark_full_log_path, "rb") as f:
+                buffer = f.read()
+        else:
+            with open(self.spark_full_log_path, "rb") as f:
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            for offset, length in zip(self.offsets[selected].tolist(), self.lengths[selected].tolist()):
+                yield buffer[offset:offset + length].decode("utf-8")
+        finally:
+            if isinstance(buffer, mmap.mmap):
+                buffer.close()
+
+    def iterate_events(self, *event_types):
+        for line in self.iterate_event_lines(*event_types):
+            yield json.loads(line)
+
+    # Returns {job id: [submission time, completion time]} in epoch millis, completion time None for unfinished jobs
+    def get_jobs_start_end_times(self):
+        jobs = {}
+        for event in self.iterate_events(job_start_event, job_end_event):
+            if event["Event"] == job_start_event:
+                jobs[event["Job ID"]] = [float(event["Submission Time"]), None]
+            elif event["Job ID"] in jobs:
+                jobs[event["Job ID"]][1] = float(event["Completion Time"])
+        return jobs
+
+
+def build_spark_event_index(spark_full_log_path):
+    event_type_pattern = re.compile(event_type_regex)
+    event_codes_by_type = {}
+    offsets, lengths, event_codes = [], [], []
+    offset = 0
+    with open_result_file(spark_full_log_path, "rb") as lines:
+        for line in lines:
+            matches = event_type_pattern.search(line, 0, event_type_search_bytes) or event_type_pattern.search(line)
+            if matches:
+                event_type = matches.group(1).decode("utf-8")
+                offsets.append(offset)
+                lengths.append(len(line))
+                event_codes.append(event_codes_by_type.setdefault(event_type, len(event_codes_by_type)))
+            offset += len(line)
+
+    index = SparkEventIndex()
+    index.spark_full_log_path = spark_full_log_path
+    index.event_types = sorted(event_codes_by_type, key=event_codes_by_type.get)
+    index.offsets = np.array(offsets, dtype=np.int64)
+    index.lengths = np.array(lengths, dtype=np.int32)
+    index.event_codes = np.array(event_codes, dtype=np.int16)
+    return index
+
+
+_array_fields = ["offsets", "lengths", "event_codes"]
+
+
+# What the sidecar was built from. A sidecar for a log that changed since is stale.
+def _get_source_info(spark_full_log_path):
+    size, mtime = get_result_file_stat(spark_full_log_path)
+    return {"version": index_version, "size": size, "mtime": mtime}
+
+
+def save_spark_event_index(index, index_file_path, source_info):
+    header = dict(source_info, event_types=index.event_types)
+    temp_file_path = index_file_path + ".tmp"
+    with open(temp_file_path, "wb") as f:
+        np.savez(f, header=np.array(json.dumps(header)), **{name: getattr(index, name) for name in _array_fields})
+    os.replace(temp_file_path, index_file_path)
+
+
+# Loads the sidecar index, or returns None if it is missing or does not match source_info. The sidecar of an
+# archived experiment is read from the archive.
+def load_spark_event_index(index_file_path, spark_full_log_path, source_info):
+    if not result_file_exists(index_file_path):
+        return None
+    try:
+        with open_result_file(index_file_path, "rb") as f, np.load(f) as data:
+            header = json.loads(str(data["header"]))
+            if any(header.get(key) != value for key, value in source_info.items()):
+                return None
+            index = SparkEventIndex()
+            for name in _array_fields:
+                setattr(index, name, data[name])
+    except (OSError, ValueError, KeyError):
+        return None
+    index.spark_full_log_path = spark_full_log_path
+    index.event_types = header["event_types"]
+    return index
+
+
+# Gets the event index of a detailed spark log, from its sidecar file if that is up to date, or else by scanning the
+# log and (re)writing the sidecar
+def get_spark_event_index(spark_full_log_path):
+    index_file_path = spark_full_log_path + index_file_suffix
+    source_info = _get_source_info(spark_full_log_path)
+    index = load_spark_event_index(index_file_path, spark_full_log_path, source_info)
+    if index is None:
+        index = build_spark_event_index(spark_full_log_path)
+        try:
+            save_spark_event_index(index, index_file_path, source_info)
+        except OSError:
+            # Read-only results folder or archived experiment, just do without the sidecar
+            pass
+    return index
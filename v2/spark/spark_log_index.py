@@ -0,0 +1,192 @@
+"""
+Indexes the spark driver log (spark.log) in one pass: first/last log times, stage start/end times, task start/end
+events per node and job start/end times, kept as compact arrays in a sidecar file next to the log so that later
+readers load the index instead of scanning the log again
+"""
+
+import os
+import re
+import json
+from datetime import datetime, timedelta
+import numpy as np
+from experiment_archive import result_file_exists, open_result_file, get_result_file_stat
+
+
+index_file_suffix = ".index.npz"
+index_version = 1
+spark_log_time_format = '%y/%m/%d %H:%M:%S'
+timestamp_regex = r'^([0-9]+\/[0-9]+\/[0-9]+ [0-9]+:[0-9]+:[0-9]+) '
+# Same as plot_one_experiment.spark_stage_and_task_log_regex_2
+default_task_regex = r'^([0-9]+\/[0-9]+\/[0-9]+ [0-9]+:[0-9]+:[0-9]+).+stage ([0-9]+\.[0-9]+).+(b09-[0-9]+).+executor ([0-9]+)'
+job_start_regex = r'Got job ([0-9]+)'
+job_end_regex = r'Job ([0-9]+) (?:finished|failed)'
+# Log times are kept as seconds since this (naive) epoch, so that they convert back to the same wall-clock times
+epoch = datetime(1970, 1, 1)
+
+
+def to_seconds(timestamp):
+    return (timestamp - epoch).total_seconds()
+
+
+def to_datetime(seconds):
+    return epoch + timedelta(seconds=float(seconds))
+
+
+class SparkLogIndex:
+    first_time = None       # Seconds of the first and last timestamped log lines, nan if none
+    last_time = None
+    stage_ids = None        # Stages in order of first appearance, along with their first and last task event times
+    stage_starts = None
+    stage_ends = None
+    node_names = None       # Node name by node code
+    task_times = None       # Task start/end events in log order: time, node code, +1 (start) or -1 (end), stage
+    task_node_codes = None
+    task_deltas = None
+    task_stages = None
+    job_ids = None          # Jobs in order of submission, with end times nan for jobs that did not end in the log
+    job_starts = None
+    job_ends = None
+
+    def get_first_last_times(self):
+        if np.isnan(self.first_time):
+            return None, None
+        return to_datetime(self.first_time), to_datetime(self.last_time)
+
+    # Returns {stage: [start, end]} in order of first appearance, the way the log scanning code built it
+    def get_stages_start_end_times(self):
+        return {float(stage): [to_datetime(start), to_datetime(end)]
+                for stage, start, end in zip(self.stage_ids, self.stage_starts, self.stage_ends)}
+
+    # Step function of the number of tasks running on a node, as (times, running task counts) at each task event
+    def get_running_tasks(self, node_name):
+        if node_name not in self.node_names:
+            return np.zeros(0), np.zeros(0, dtype=np.int64)
+        selected = self.task_node_codes == self.node_names.index(node_name)
+        return self.task_times[selected], np.cumsum(self.task_deltas[selected])
+
+    # Returns {job id: [start, end]}, end being None for jobs that did not end in the log
+    def get_jobs_start_end_times(self):
+        return {int(job_id): [to_datetime(start), None if np.isnan(end) else to_datetime(end)]
+                for job_id, start, end in zip(self.job_ids, self.job_starts, self.job_ends)}
+
+
+def build_spark_log_index(spark_log_file_path, task_regex=default_task_regex):
+    task_pattern = re.compile(task_regex)
+    timestamp_pattern = re.compile(timestamp_regex)
+    job_start_pattern = re.compile(job_start_regex)
+    job_end_pattern = re.compile(job_end_regex)
+
+    # Many lines share the same second, parse each time string once
+    seconds_by_time_string = {}
+    first_time = last_time = np.nan
+    stages = {}
+    node_codes = {}
+    task_times, task_node_codes, task_deltas, task_stages = [], [], [], []
+    jobs = {}
+    with open_result_file(spark_log_file_path) as lines:
+        for line in lines:
+            matches = timestamp_pattern.match(line)
+            if not matches:
+                continue
+            time_string = matches.group(1)
+            seconds = seconds_by_time_string.get(time_string)
+            if seconds is None:
+                seconds = to_seconds(datetime.strptime(time_string, spark_log_time_format))
+                seconds_by_time_string[time_string] = seconds
+            if np.isnan(first_time):
+                first_time = last_time = seconds
+            else:
+                first_time = min(first_time, seconds)
+                last_time = max(last_time, seconds)
+
+            matches = task_pattern.match(line)
+            if matches:
+                stage = float(matches.group(2))
+                if stage not in stages:
+                    stages[stage] = [seconds, seconds]
+                stages[stage][1] = seconds
+                node_code = node_codes.setdefault(matches.group(3), len(node_codes))
+                task_times.append(seconds)
+                task_node_codes.append(node_code)
+                task_deltas.append(1 if "Starting task" in line else -1)
+                task_stages.append(stage)
+                continue
+
+            matches = job_start_pattern.search(line)
+            if matches:
+                jobs.setdefault(int(matches.group(1)), [seconds, np.nan])
+                continue
+            matches = job_end_pattern.search(line)
+            if matches and int(matches.group(1)) in jobs:
+                jobs[int(matches.group(1))][1] = seconds
+
+    index = SparkLogIndex()
+    index.first_time = first_time
+    index.last_time = last_time
+    index.stage_ids = np.array(list(stages.keys()), dtype=np.float64)
+    index.stage_starts = np.array([start for start, _ in stages.values()], dtype=np.float64)
+    index.stage_ends = np.array([end for _, end in stages.values()], dtype=np.float64)
+    index.node_names = sorted(node_codes, key=node_codes.get)
+    index.task_times = np.array(task_times, dtype=np.float64)
+    index.task_node_codes = np.array(task_node_codes, dtype=np.int16)
+    index.task_deltas = np.array(task_deltas, dtype=np.int8)
+    index.task_stages = np.array(task_stages, dtype=np.float32)
+    index.job_ids = np.array(list(jobs.keys()), dtype=np.int64)
+    index.job_starts = np.array([start for start, _ in jobs.values()], dtype=np.float64)
+    index.job_ends = np.array([end for _, end in jobs.values()], dtype=np.float64)
+    return index
+
+
+_array_fields = ["stage_ids", "stage_starts", "stage_ends", "task_times", "task_node_codes", "task_deltas",
+                 "task_stages", "job_ids", "job_starts", "job_ends"]
+
+
+# What the sidecar was built from. A sidecar for a log that changed since, or built with another task regex, is stale.
+def _get_source_info(spark_log_file_path, task_regex):
+    size, mtime = get_result_file_stat(spark_log_file_path)
+    return {"version": index_version, "size": size, "mtime": mtime, "task_regex": task_regex}
+
+
+def save_spark_log_index(index, index_file_path, source_info):
+    header = dict(source_info, first_time=index.first_time, last_time=index.last_time, node_names=index.node_names)
+    temp_file_path = index_file_path + ".tmp"
+    with open(temp_file_path, "wb") as f:
+        np.savez(f, header=np.array(json.dumps(header)), **{name: getattr(index, name) for name in _array_fields})
+    os.replace(temp_file_path, index_file_path)
+
+
+# Loads the sidecar index, or returns None if it is missing or does not match source_info. The sidecar of an
+# archived experiment is read from the archive.
+def load_spark_log_index(index_file_path, source_info):
+    if not result_file_exists(index_file_path):
+        return None
+    try:
+        with open_result_file(index_file_path, "rb") as f, np.load(f) as data:
+            header = json.loads(str(data["header"]))
+            if any(header.get(key) != value for key, value in source_info.items()):
+                return None
+            index = SparkLogIndex()
+            for name in _array_fields:
+                setattr(index, name, data[name])
+    except (OSError, ValueError, KeyError):
+        return None
+    index.first_time = header["first_time"]
+    index.last_time = header["last_time"]
+    index.node_names = header["node_names"]
+    return index
+
+
+# Gets the index of a spark log, from its sidecar file if that is up to date, or else by scanning the log and
+# (re)writing the sidecar
+def get_spark_log_index(spark_log_file_path, task_regex=default_task_regex):
+    index_file_path = spark_log_file_path + index_file_suffix
+    source_info = _get_source_info(spark_log_file_path, task_regex)
+    index = load_spark_log_index(index_file_path, source_info)
+    if index is None:
+        index = build_spark_log_index(spark_log_file_path, task_regex)
+        try:
+            save_spark_log_index(index, index_file_path, source_info)
+        except OSError:
+            # Read-only results folder or archived experiment, just do without the sidecar
+            pass
+    return index
@@ -0,0 +1,543 @@
+"""
+Generates synthetic experiment results folders (SAR, power and spark logs along with the setup details) that look
+like the ones run_experiments copies back from the cluster, for testing and benchmarking the analysis scripts. Also
+lays out fake RAPL powercap trees for running the node-side RAPL sampler against.
+"""
+
+import argparse
+import os
+import json
+import time
+import random
+import tempfile
+from datetime import datetime
+from datetime import timedelta
+
+
+# Generator defaults
+default_num_nodes = 8
+default_num_cores = 40
+default_duration_secs = 600
+default_tasks_per_stage = 640
+default_num_stages = 2
+default_gc_task_fraction = 0.7
+net_interfaces = ["lo", "enp59s0"]
+# SAR writes the date in either of these formats in the first line, generated nodes alternate between them
+sar_date_formats = ["%m/%d/%Y", "%Y-%m-%d"]
+sar_time_format = "%I:%M:%S %p"
+spark_log_time_format = "%y/%m/%d %H:%M:%S"
+default_num_sockets = 2
+# What the counters of a typical Xeon package wrap around at (~262 kJ)
+default_max_energy_range_uj = 262143328850
+
+
+# Node names follow the b09-XX pattern that the spark log regexes look for
+def get_node_names(num_nodes):
+    return ["b09-{0:02d}".format(30 + 2 * i) for i in range(num_nodes)]
+
+
+# Epoch milliseconds of a naive local time, the way spark writes event times
+def to_epoch_millis(timestamp):
+    return int(time.mktime(timestamp.timetuple()) * 1000 + timestamp.microsecond / 1000)
+
+
+def sar_header_line(node_name, start_time, date_format, num_cores):
+    return "Linux 4.15.0-45-generic ({0}) \t{1} \t_x86_64_\t({2} CPU)\n\n".format(
+        node_name, start_time.strftime(date_format), num_cores)
+
+
+# Smooth-ish utilization between 0 and 1 that goes up while tasks run on the node
+def node_load(load_by_second, second, rng):
+    load = load_by_second[second] if second < len(load_by_second) else 0
+    return min(1.0, max(0.0, load + rng.uniform(-0.05, 0.05)))
+
+
+def write_cpu_sar(file_path, node_name, start_time, duration_secs, num_cores, date_format, load_by_second, rng):
+    with open(file_path, "w") as f:
+        f.write(sar_header_line(node_name, start_time, date_format, num_cores))
+        for second in range(duration_secs):
+            time_string = (start_time + timedelta(seconds=second)).strftime(sar_time_format)
+            load = node_load(load_by_second, second, rng)
+            f.write("{0}     CPU     %user     %nice   %system   %iowait    %steal     %idle\n".format(time_string))
+            rows = []
+            total_user = 0
+            total_system = 0
+            for core in range(num_cores):
+                user = min(99.0, load * rng.uniform(60, 95))
+                system = min(100.0 - user, load * rng.uniform(2, 8))
+                total_user += user
+                total_system += system
+                rows.append("{0}     {1:3d}    {2:6.2f}      0.00    {3:6.2f}      0.50      0.00    {4:6.2f}\n".format(
+                    time_string, core, user, system, max(0.0, 100.0 - user - system - 0.5)))
+            all_user = total_user / num_cores
+            all_system = total_system / num_cores
+            f.write("{0}     all    {1:6.2f}      0.00    {2:6.2f}      0.50      0.00    {3:6.2f}\n".format(
+                time_string, all_user, all_system, max(0.0, 100.0 - all_user - all_system - 0.5)))
+            f.writelines(rows)
+            f.write("\n")
+
+
+def write_network_sar(file_path, node_name, start_time, duration_secs, num_cores, date_format, load_by_second,
+                      link_bandwidth_mbps, rng):
+    max_kBps = link_bandwidth_mbps * 1000 / 8.0
+    with open(file_path, "w") as f:
+        f.write(sar_header_line(node_name, start_time, date_format, num_cores))
+        for second in range(duration_secs):
+            time_string = (start_time + timedelta(seconds=second)).strftime(sar_time_format)
+            load = node_load(load_by_second, second, rng)
+            f.write("{0}     IFACE   rxpck/s   txpck/s    rxkB/s    txkB/s   rxcmp/s   txcmp/s  rxmcst/s   %ifutil\n".format(
+                time_string))
+            for net_interface in net_interfaces:
+                rx_kBps = load * rng.uniform(0.3, 0.9) * max_kBps if net_interface != "lo" else rng.uniform(1, 20)
+                tx_kBps = load * rng.uniform(0.3, 0.9) * max_kBps if net_interface != "lo" else rx_kBps
+                f.write("{0}   {1:>7s}  {2:8.2f}  {3:8.2f}  {4:8.2f}  {5:8.2f}      0.00      0.00      0.00     {6:5.2f}\n".format(
+                    time_string, net_interface, rx_kBps / 8, tx_kBps / 8, rx_kBps, tx_kBps,
+                    100.0 * max(rx_kBps, tx_kBps) / max_kBps))
+            f.write("\n")
+
+
+def write_memory_sar(file_path, node_name, start_time, duration_secs, num_cores, date_format, load_by_second, rng):
+    total_kb = 196608000
+    with open(file_path, "w") as f:
+        f.write(sar_header_line(node_name, start_time, date_format, num_cores))
+        f.write("{0} kbmemfree   kbavail kbmemused  %memused kbbuffers  kbcached  kbcommit   %commit  kbactive   kbinact   kbdirty\n".format(
+            start_time.strftime(sar_time_format)))
+        for second in range(duration_secs):
+            time_string = (start_time + timedelta(seconds=second)).strftime(sar_time_format)
+            used_percent = 20.0 + 70.0 * node_load(load_by_second, second, rng)
+            used_kb = int(total_kb * used_percent / 100)
+            f.write("{0}  {1:9d} {2:9d} {3:9d}     {4:5.2f}    123456  45678901  98765432     25.10  87654321  12345678      1024\n".format(
+                time_string, total_kb - used_kb, total_kb - used_kb, used_kb, used_percent))
+
+
+def write_diskio_sar(file_path, node_name, start_time, duration_secs, num_cores, date_format, load_by_second, rng):
+    with open(file_path, "w") as f:
+        f.write(sar_header_line(node_name, start_time, date_format, num_cores))
+        f.write("{0}       tps      rtps      wtps   bread/s   bwrtn/s\n".format(start_time.strftime(sar_time_format)))
+        for second in range(duration_secs):
+            time_string = (start_time + timedelta(seconds=second)).strftime(sar_time_format)
+            load = node_load(load_by_second, second, rng)
+            reads = load * rng.uniform(10, 400)
+            writes = load * rng.uniform(10, 400)
+            f.write("{0}    {1:7.2f}   {2:7.2f}   {3:7.2f}  {4:9.2f}  {5:9.2f}\n".format(
+                time_string, reads + writes, reads, writes, reads * 256, writes * 256))
+
+
+# Power meter script writes one line per second with a column for each of the (up to four) metered nodes
+def write_power_readings(file_path, start_time, duration_secs, power_meter_nodes_in_order, load_by_node, rng):
+    with open(file_path, "w") as f:
+        for second in range(duration_secs):
+            timestamp = start_time + timedelta(seconds=second, milliseconds=rng.randint(0, 999))
+            values = []
+            for i in range(4):
+                if i < len(power_meter_nodes_in_order):
+                    load = node_load(load_by_node[power_meter_nodes_in_order[i]], second, rng)
+                    values.append(95.0 + 150.0 * load)
+                else:
+                    values.append(0.0)
+            f.write("{0:.4f},{1}\n".format(time.mktime(timestamp.timetuple()) + timestamp.microsecond / 1e6,
+                                           ",".join("{0:.3f}".format(v) for v in values)))
+
+
+# RAPL sampler writes the energy used by each package and DRAM zone since the previous reading, once per second here
+def write_rapl_readings(file_path, start_time, duration_secs, num_sockets, load_by_second, rng):
+    zone_names = ["package-{0}".format(i) for i in range(num_sockets)] + ["dram-{0}".format(i) for i in range(num_sockets)]
+    with open(file_path, "w") as f:
+        f.write("# zones: " + ",".join(zone_names) + "\n")
+        for second in range(1, duration_secs):
+            timestamp = start_time + timedelta(seconds=second, milliseconds=rng.randint(0, 999))
+            interval_secs = rng.uniform(0.995, 1.005)
+            load = node_load(load_by_second, second, rng)
+            package_watts = [(20.0 + 60.0 * load) * rng.uniform(0.95, 1.05) for _ in range(num_sockets)]
+            dram_watts = [(4.0 + 6.0 * load) * rng.uniform(0.95, 1.05) for _ in range(num_sockets)]
+            f.write("{0:.6f},{1:.6f},{2}\n".format(
+                time.mktime(timestamp.timetuple()) + timestamp.microsecond / 1e6, interval_secs,
+                ",".join(str(int(watts * interval_secs * 1e6)) for watts in package_watts + dram_watts)))
+
+
+# Lays out a fake /sys/class/powercap tree under root_path for the RAPL sampler to read, with a package zone and a DRAM
+# sub-zone per socket. energies_uj has a (package, DRAM) pair of energy counters per socket. They are written modulo
+# max_energy_range_uj, so calling this again with growing energies advances the counters like the real ones do,
+# wraparound included.
+def write_fake_powercap_tree(root_path, energies_uj, max_energy_range_uj=default_max_energy_range_uj):
+    powercap_path = os.path.join(root_path, "sys", "class", "powercap")
+    for socket, (package_energy_uj, dram_energy_uj) in enumerate(energies_uj):
+        package_path = os.path.join(powercap_path, "intel-rapl:{0}".format(socket))
+        for zone_path, name, energy_uj in [(package_path, "package-{0}".format(socket), package_energy_uj),
+                                           (os.path.join(package_path, "intel-rapl:{0}:0".format(socket)), "dram",
+                                            dram_energy_uj)]:
+            if not os.path.exists(zone_path):
+                os.makedirs(zone_path)
+            for file_name, value in [("name", name), ("max_energy_range_uj", max_energy_range_uj),
+                                     ("energy_uj", int(energy_uj) % max_energy_range_uj)]:
+                with open(os.path.join(zone_path, file_name), "w") as f:
+                    f.write("{0}\n".format(value))
+        # The kernel links each zone at the top level too, sub-zones included
+        dram_link_path = os.path.join(powercap_path, "intel-rapl:{0}:0".format(socket))
+        if not os.path.lexists(dram_link_path):
+            os.symlink(os.path.join("intel-rapl:{0}".format(socket), "intel-rapl:{0}:0".format(socket)),
+                       dram_link_path)
+
+
+# Lays out fake /proc/stat, /proc/net/dev, /proc/diskstats and /proc/meminfo files under root_path for the /proc
+# sampler to read. cpu_ticks has (user, system, idle) jiffies per core, the "cpu" line being their sum. net_bytes is
+# {interface: (rx bytes, tx bytes)}, disk_counters is {device: (reads, sectors read, writes, sectors written)} and
+# meminfo_kb is (MemTotal, MemAvailable). Files are rewritten in place, so calling this again with growing counters
+# advances them under a sampler that keeps the files open, like the kernel does.
+def write_fake_proc_tree(root_path, cpu_ticks, net_bytes, disk_counters, meminfo_kb):
+    proc_path = os.path.join(root_path, "proc")
+    if not os.path.exists(os.path.join(proc_path, "net")):
+        os.makedirs(os.path.join(proc_path, "net"))
+
+    # cpu  user nice system idle iowait irq softirq steal guest guest_nice
+    total_ticks = [sum(ticks[i] for ticks in cpu_ticks) for i in range(3)]
+    with open(os.path.join(proc_path, "stat"), "w") as f:
+        for name, (user, system, idle) in [("cpu ", total_ticks)] + [("cpu{0}".format(core), ticks)
+                                                                      for core, ticks in enumerate(cpu_ticks)]:
+            f.write("{0} {1} 0 {2} {3} 0 0 0 0 0 0\n".format(name, user, system, idle))
+        f.write("intr 0\nctxt 0\nbtime {0}\n".format(int(time.time())))
+
+    with open(os.path.join(proc_path, "net", "dev"), "w") as f:
+        f.write("Inter-|   Receive                                                |  Transmit\n")
+        f.write(" face |bytes    packets errs drop fifo frame compressed multicast|bytes    packets errs drop fifo "
+                "colls carrier compressed\n")
+        for interface, (rx_bytes, tx_bytes) in net_bytes.items():
+            f.write("{0:>6s}: {1} 0 0 0 0 0 0 0 {2} 0 0 0 0 0 0 0\n".format(interface, rx_bytes, tx_bytes))
+
+    # major minor name reads merged sectors ms writes merged sectors ms in-flight io-ms weighted-ms
+    with open(os.path.join(proc_path, "diskstats"), "w") as f:
+        for minor, (device, (reads, sectors_read, writes, sectors_written)) in enumerate(disk_counters.items()):
+            f.write("   8 {0:7d} {1} {2} 0 {3} 0 {4} 0 {5} 0 0 0 0\n".format(minor, device, reads, sectors_read, writes,
+                                                                           sectors_written))
+
+    total_kb, available_kb = meminfo_kb
+    with open(os.path.join(proc_path, "meminfo"), "w") as f:
+        f.write("MemTotal: {0:>14d} kB\nMemFree: {1:>15d} kB\nMemAvailable: {2:>10d} kB\n".format(
+            total_kb, available_kb // 2, available_kb))
+
+
+# Runs the /proc sampler over a fake /proc tree whose counters advance by known amounts between two samples, and
+# compares the rates it computes with the expected ones. Returns whether they all match.
+def check_proc_sampler(num_cores=4, seed=0):
+    # Imported here, as only the check needs the node-side sampler
+    from proc_samples import proc_sampler
+    rng = random.Random(seed)
+    root_path = tempfile.mkdtemp()
+    interfaces = ["lo", "enp59s0"]
+    # Partitions and loop devices are left out of the disk totals
+    devices = ["sda", "sda1", "nvme0n1", "nvme0n1p1", "loop0"]
+
+    cpu_ticks = [[rng.randint(1000, 100000) for _ in range(3)] for _ in range(num_cores)]
+    net_bytes = {interface: [rng.randint(0, 1 << 40) for _ in range(2)] for interface in interfaces}
+    disk_counters = {device: [rng.randint(0, 1 << 30) for _ in range(4)] for device in devices}
+    write_fake_proc_tree(root_path, cpu_ticks, net_bytes, disk_counters, (1 << 27, 1 << 26))
+    sampler = proc_sampler.ProcSampler(root_path)
+    try:
+        sampler.sample()
+        previous_monotonic_ns = sampler.previous_monotonic_ns
+
+        cpu_deltas = [[rng.randint(0, 50) for _ in range(3)] for _ in range(num_cores)]
+        net_deltas = {interface: [rng.randint(0, 1 << 30) for _ in range(2)] for interface in interfaces}
+        disk_deltas = {device: [rng.randint(0, 1 << 16) for _ in range(4)] for device in devices}
+        total_kb, available_kb = 1 << 27, rng.randint(0, 1 << 27)
+        write_fake_proc_tree(root_path, [[count + delta for count, delta in zip(ticks, deltas)]
+                                         for ticks, deltas in zip(cpu_ticks, cpu_deltas)],
+                             {interface: [count + delta for count, delta in zip(net_bytes[interface], deltas)]
+                              for interface, deltas in net_deltas.items()},
+                             {device: [count + delta for count, delta in zip(disk_counters[device], deltas)]
+                              for device, deltas in disk_deltas.items()},
+                             (total_kb, available_kb))
+        monotonic_ns, _, values = sampler.sample()
+        header = sampler.get_header()
+    finally:
+        sampler.close()
+
+    elapsed_secs = (monotonic_ns - previous_monotonic_ns) / 1e9
+    all_deltas = [sum(deltas[i] for deltas in cpu_deltas) for i in range(3)]
+    disks = ["sda", "nvme0n1"]
+    disk_totals = [sum(disk_deltas[device][i] for device in disks) for i in range(4)]
+    expected = {}
+    for label, (user, system, idle) in [("all", all_deltas)] + [(str(core), deltas)
+                                                                for core, deltas in enumerate(cpu_deltas)]:
+        total = user + system + idle
+        expected[(proc_sampler.cpu_user_column, label)] = 100.0 * user / total if total else 0.0
+        expected[(proc_sampler.cpu_system_column, label)] = 100.0 * system / total if total else 0.0
+    for interface, (rx_delta, tx_delta) in net_deltas.items():
+        expected[(proc_sampler.net_in_column, interface)] = rx_delta / 1024.0 / elapsed_secs
+        expected[(proc_sampler.net_out_column, interface)] = tx_delta / 1024.0 / elapsed_secs
+    expected[(proc_sampler.disk_reads_column, "all")] = disk_totals[0] / elapsed_secs
+    expected[(proc_sampler.disk_breads_column, "all")] = disk_totals[1] / elapsed_secs
+    expected[(proc_sampler.disk_writes_column, "all")] = disk_totals[2] / elapsed_secs
+    expected[(proc_sampler.disk_bwrites_column, "all")] = disk_totals[3] / elapsed_secs
+    expected[(proc_sampler.mem_usage_column, "all")] = 100.0 * (total_kb - available_kb) / total_kb
+
+    sampled = {}
+    idx = 0
+    for column in header["columns"]:
+        for label in column["labels"]:
+            sampled[(column["name"], label)] = values[idx]
+            idx += 1
+    matches = sampled.keys() == expected.keys()
+    print("{:<20s} {:>8s} {:>16s} {:>16s}".format("Column", "Label", "Expected", "Sampled"))
+    for key in sorted(expected.keys() | sampled.keys()):
+        expected_value, sampled_value = expected.get(key), sampled.get(key)
+        # Values are stored as float32
+        ok = expected_value is not None and sampled_value is not None and \
+            abs(sampled_value - expected_value) <= 1e-6 * max(1.0, abs(expected_value))
+        matches = matches and ok
+        print("{:<20s} {:>8s} {:>16s} {:>16s}{}".format(key[0], key[1], str(expected_value), str(sampled_value),
+                                                        "" if ok else "  MISMATCH"))
+    print("Sampler rates {0} the expected ones".format("match" if matches else "do NOT match"))
+    return matches
+
+
+# Lays out tasks of each stage on the nodes. Returns a list of task dicts sorted by launch time.
+def generate_tasks(node_names, spark_job_start_time, duration_secs, num_stages, tasks_per_stage, num_cores,
+                   gc_task_fraction, rng):
+    tasks = []
+    stage_duration_secs = max(1.0, duration_secs * 1.0 / num_stages)
+    task_id = 0
+    for stage_id in range(num_stages):
+        stage_start = spark_job_start_time + timedelta(seconds=stage_id * stage_duration_secs)
+        for index in range(tasks_per_stage):
+            node_name = node_names[(index + rng.randint(0, 1)) % len(node_names)]
+            launch_offset = rng.uniform(0, stage_duration_secs * 0.8)
+            run_time_secs = rng.uniform(0.5, max(1.0, stage_duration_secs * 0.2))
+            launch_time = stage_start + timedelta(seconds=launch_offset)
+            finish_time = launch_time + timedelta(seconds=run_time_secs)
+            gc_time_secs = rng.uniform(0.05, 0.5) * run_time_secs if rng.random() < gc_task_fraction else 0
+            fetch_wait_secs = rng.uniform(0, 0.2) * run_time_secs if stage_id > 0 else 0
+            tasks.append({
+                "stage_id": stage_id,
+                "task_id": task_id,
+                "index": index,
+                "node": node_name,
+                "executor_id": 1 + node_names.index(node_name),
+                "launch_time": launch_time,
+                "finish_time": finish_time,
+                "run_time_secs": run_time_secs,
+                "cpu_time_secs": run_time_secs * rng.uniform(0.4, 0.9),
+                "gc_time_secs": gc_time_secs,
+                "fetch_wait_secs": fetch_wait_secs,
+                "remote_bytes": rng.randint(50, 200) * 1024 * 1024 if stage_id > 0 else 0,
+                "local_bytes": rng.randint(5, 30) * 1024 * 1024 if stage_id > 0 else 0,
+            })
+            task_id += 1
+    return sorted(tasks, key=lambda t: t["launch_time"])
+
+
+# Fraction of the cores busy on each node in every second of the experiment, derived from the task layout
+def get_load_by_node(node_names, tasks, experiment_start_time, duration_secs, num_cores):
+    busy = {node_name: [0] * duration_secs for node_name in node_names}
+    for task in tasks:
+        first = int((task["launch_time"] - experiment_start_time).total_seconds())
+        last = int((task["finish_time"] - experiment_start_time).total_seconds())
+        for second in range(max(0, first), min(duration_secs, last + 1)):
+            busy[task["node"]][second] += 1
+    return {node_name: [min(1.0, count * 1.0 / num_cores) for count in busy[node_name]] for node_name in node_names}
+
+
+# Spark driver stdout, only the lines the analysis scripts look at
+def write_spark_log(file_path, application_id, tasks, tasks_per_stage, spark_job_start_time, spark_job_end_time):
+    events = [(spark_job_start_time, "INFO Client: Submitted application {0}".format(application_id))]
+    for task in tasks:
+        events.append((task["launch_time"], "INFO TaskSetManager: Starting task {0}.0 in stage {1}.0 (TID {2}, {3}, "
+                                            "executor {4}, partition {0}, NODE_LOCAL, 7870 bytes)".format(
+            task["index"], task["stage_id"], task["task_id"], task["node"], task["executor_id"])))
+        events.append((task["finish_time"], "INFO TaskSetManager: Finished task {0}.0 in stage {1}.0 (TID {2}) in {3} ms "
+                                            "on {4} (executor {5}) ({0}/{6})".format(
+            task["index"], task["stage_id"], task["task_id"], int(task["run_time_secs"] * 1000), task["node"],
+            task["executor_id"], tasks_per_stage)))
+    events.append((spark_job_end_time, "INFO SparkContext: Successfully stopped SparkContext"))
+
+    with open(file_path, "w") as f:
+        for timestamp, message in sorted(events, key=lambda e: e[0]):
+            f.write("{0} {1}\n".format(timestamp.strftime(spark_log_time_format), message))
+
+
+def get_task_info(task, finished):
+    return {
+        "Task ID": task["task_id"],
+        "Index": task["index"],
+        "Attempt": 0,
+        "Launch Time": to_epoch_millis(task["launch_time"]),
+        "Executor ID": str(task["executor_id"]),
+        "Host": "{0}.sysnet.ucsd.edu".format(task["node"]),
+        "Locality": "NODE_LOCAL",
+        "Speculative": False,
+        "Getting Result Time": 0,
+        "Finish Time": to_epoch_millis(task["finish_time"]) if finished else 0,
+        "Failed": False,
+        "Killed": False,
+    }
+
+
+# Spark event log (one JSON event per line) as copied from the spark history folder in HDFS
+def write_spark_detailed_log(file_path, application_id, tasks, num_stages, tasks_per_stage, spark_job_start_time,
+                             spark_job_end_time):
+    events = [
+        (spark_job_start_time, {"Event": "SparkListenerApplicationStart", "App Name": "TeraSort",
+                                "App ID": application_id, "Timestamp": to_epoch_millis(spark_job_start_time)}),
+        (spark_job_start_time, {"Event": "SparkListenerJobStart", "Job ID": 0,
+                                "Submission Time": to_epoch_millis(spark_job_start_time),
+                                "Stage IDs": list(range(num_stages))}),
+    ]
+    for stage_id in range(num_stages):
+        stage_tasks = [t for t in tasks if t["stage_id"] == stage_id]
+        if not stage_tasks:
+            continue
+        stage_start = min(t["launch_time"] for t in stage_tasks)
+        stage_end = max(t["finish_time"] for t in stage_tasks)
+        stage_info = {"Stage ID": stage_id, "Stage Attempt ID": 0, "Stage Name": "stage {0}".format(stage_id),
+                      "Number of Tasks": tasks_per_stage, "Submission Time": to_epoch_millis(stage_start)}
+        events.append((stage_start, {"Event": "SparkListenerStageSubmitted", "Stage Info": stage_info}))
+        completed_info = dict(stage_info)
+        completed_info["Completion Time"] = to_epoch_millis(stage_end)
+        events.append((stage_end, {"Event": "SparkListenerStageCompleted", "Stage Info": completed_info}))
+
+    for task in tasks:
+        events.append((task["launch_time"], {"Event": "SparkListenerTaskStart", "Stage ID": task["stage_id"],
+                                             "Stage Attempt ID": 0, "Task Info": get_task_info(task, False)}))
+        events.append((task["finish_time"], {
+            "Event": "SparkListenerTaskEnd", "Stage ID": task["stage_id"], "Stage Attempt ID": 0,
+            "Task Type": "ShuffleMapTask" if task["stage_id"] < num_stages - 1 else "ResultTask",
+            "Task End Reason": {"Reason": "Success"},
+            "Task Info": get_task_info(task, True),
+            "Task Metrics": {
+                "Executor Deserialize Time": 5,
+                "Executor Run Time": int(task["run_time_secs"] * 1000),
+                "Executor CPU Time": int(task["cpu_time_secs"] * 1e9),
+                "JVM GC Time": int(task["gc_time_secs"] * 1000),
+                "Shuffle Read Metrics": {
+                    "Remote Blocks Fetched": 0 if task["stage_id"] == 0 else len(tasks) // num_stages,
+                    "Fetch Wait Time": int(task["fetch_wait_secs"] * 1000),
+                    "Remote Bytes Read": task["remote_bytes"],
+                    "Local Bytes Read": task["local_bytes"],
+                },
+                "Shuffle Write Metrics": {"Shuffle Bytes Written": task["remote_bytes"] + task["local_bytes"]},
+            }}))
+
+    events.append((spark_job_end_time, {"Event": "SparkListenerJobEnd", "Job ID": 0,
+                                        "Completion Time": to_epoch_millis(spark_job_end_time),
+                                        "Job Result": {"Result": "JobSucceeded"}}))
+    events.append((spark_job_end_time, {"Event": "SparkListenerApplicationEnd",
+                                        "Timestamp": to_epoch_millis(spark_job_end_time)}))
+
+    with open(file_path, "w") as f:
+        for _, event in sorted(events, key=lambda e: e[0]):
+            f.write(json.dumps(event) + "\n")
+
+
+# Writes one synthetic Exp-* folder under results_base_dir and returns its experiment id. The experiment starts at
+# start_time (e.g., just before midnight to get SAR readings that roll over to the next day), SAR readings cover the
+# whole experiment with padding_secs on either side of the spark job, and nodes alternate between SAR date formats.
+def generate_experiment(results_base_dir, num_nodes=default_num_nodes, num_cores=default_num_cores,
+                        duration_secs=default_duration_secs, tasks_per_stage=default_tasks_per_stage,
+                        num_stages=default_num_stages, start_time=None, padding_secs=10, link_bandwidth_mbps=10000,
+                        input_size_gb=100, gc_task_fraction=default_gc_task_fraction, power_meter_nodes=4,
+                        rapl=False, experiment_id=None, seed=0):
+    rng = random.Random(seed)
+    start_time = (start_time or datetime(2019, 7, 10, 13, 56, 23)).replace(microsecond=0)
+    experiment_id = experiment_id or "Exp-" + start_time.strftime("%Y-%m-%d-%H-%M-%S")
+    experiment_dir_path = os.path.join(results_base_dir, experiment_id)
+    node_names = get_node_names(num_nodes)
+    driver_node_name = node_names[0]
+    power_meter_nodes_in_order = node_names[:min(power_meter_nodes, 4)]
+    total_secs = duration_secs + 2 * padding_secs
+    spark_job_start_time = start_time + timedelta(seconds=padding_secs)
+    spark_job_end_time = spark_job_start_time + timedelta(seconds=duration_secs)
+    application_id = "application_{0}_{1:04d}".format(to_epoch_millis(start_time), seed % 10000)
+
+    tasks = generate_tasks(node_names, spark_job_start_time, duration_secs, num_stages, tasks_per_stage, num_cores,
+                           gc_task_fraction, rng)
+    load_by_node = get_load_by_node(node_names, tasks, start_time, total_secs, num_cores)
+
+    for idx, node_name in enumerate(node_names):
+        node_results_dir = os.path.join(experiment_dir_path, node_name)
+        if not os.path.exists(node_results_dir):
+            os.makedirs(node_results_dir)
+        date_format = sar_date_formats[idx % len(sar_date_formats)]
+        load = load_by_node[node_name]
+        write_cpu_sar(os.path.join(node_results_dir, "cpu.sar"), node_name, start_time, total_secs, num_cores,
+                      date_format, load, rng)
+        write_network_sar(os.path.join(node_results_dir, "network.sar"), node_name, start_time, total_secs, num_cores,
+                          date_format, load, link_bandwidth_mbps, rng)
+        write_memory_sar(os.path.join(node_results_dir, "memory.sar"), node_name, start_time, total_secs, num_cores,
+                         date_format, load, rng)
+        write_diskio_sar(os.path.join(node_results_dir, "diskio.sar"), node_name, start_time, total_secs, num_cores,
+                         date_format, load, rng)
+        if rapl:
+            write_rapl_readings(os.path.join(node_results_dir, "rapl_readings.txt"), start_time, total_secs,
+                                default_num_sockets, load, rng)
+
+    driver_results_dir = os.path.join(experiment_dir_path, driver_node_name)
+    write_power_readings(os.path.join(driver_results_dir, "power_readings.txt"), start_time, total_secs,
+                         power_meter_nodes_in_order, load_by_node, rng)
+    write_spark_log(os.path.join(driver_results_dir, "spark.log"), application_id, tasks, tasks_per_stage,
+                    spark_job_start_time, spark_job_end_time)
+    write_spark_detailed_log(os.path.join(driver_results_dir, "spark-detailed.log"), application_id, tasks,
+                             num_stages, tasks_per_stage, spark_job_start_time, spark_job_end_time)
+
+    # Same fields run_experiments records for a real run
+    with open(os.path.join(experiment_dir_path, "setup_details.txt"), "w") as setup_file:
+        json.dump(
+            {
+                "ExperimentGroup": "Run-Synthetic",
+                "ExperimentGroupDesc": "Synthetic experiment",
+                "ScalaClassName": "TeraSort",
+                "InputHdfsCached": True,
+
+                "ExperimentId": experiment_id,
+                "ExperimentStartTime": start_time.strftime("%Y-%m-%d %H:%M:%S"),
+                "SparkJobStartTime": spark_job_start_time.strftime("%Y-%m-%d %H:%M:%S"),
+                "SparkJobEndTime": spark_job_end_time.strftime("%Y-%m-%d %H:%M:%S"),
+                "AllSparkNodes": node_names,
+                "PowerMeterNodesInOrder": power_meter_nodes_in_order,
+                "HdfsMasterNode": driver_node_name,
+                "SparkDriverNode": driver_node_name,
+                "InputSizeGb": input_size_gb,
+                "LinkBandwidthMbps": link_bandwidth_mbps,
+                "PaddingInSecs": padding_secs,
+                "PlotFriendlyName": "synthetic",
+                "RecordSizeByes": 100,
+                "FinalPartitionCount": tasks_per_stage,
+                "Comments": "Generated by synthetic_experiments.py",
+            }, setup_file, indent=4, sort_keys=True)
+
+    return experiment_id
+
+
+def main():
+    parser = argparse.ArgumentParser("Generates synthetic experiment results folders for testing the analysis scripts")
+    parser.add_argument('outdir', action='store', nargs='?', help='results folder to write the Exp-* folders to')
+    parser.add_argument('--count', action='store', type=int, default=1, help='number of experiments to generate')
+    parser.add_argument('--nodes', action='store', type=int, default=default_num_nodes, help='nodes per experiment')
+    parser.add_argument('--cores', action='store', type=int, default=default_num_cores, help='cores per node')
+    parser.add_argument('--duration', action='store', type=int, default=default_duration_secs, help='job duration in secs')
+    parser.add_argument('--tasks', action='store', type=int, default=default_tasks_per_stage, help='tasks per stage')
+    parser.add_argument('--stages', action='store', type=int, default=default_num_stages, help='stages per job')
+    parser.add_argument('--start', action='store', help='start time of the first experiment, e.g. "2019-07-10 23:55:00" '
+                                                         'to get readings that roll over midnight')
+    parser.add_argument('--rapl', action='store_true', help='add RAPL energy readings on each node')
+    parser.add_argument('--seed', action='store', type=int, default=0, help='random seed')
+    parser.add_argument('--checkprocsampler', action='store_true',
+                        help='check the /proc sampler against a fake /proc tree and exit')
+    args = parser.parse_args()
+
+    if args.checkprocsampler:
+        exit(0 if check_proc_sampler(args.cores, args.seed) else 1)
+    if not args.outdir:
+        parser.error("the outdir argument is required")
+
+    start_time = datetime.strptime(args.start, "%Y-%m-%d %H:%M:%S") if args.start else None
+    for i in range(args.count):
+        experiment_start_time = (start_time or datetime(2019, 7, 10, 13, 56, 23)) + timedelta(hours=i)
+        experiment_id = generate_experiment(args.outdir, num_nodes=args.nodes, num_cores=args.cores,
+                                            duration_secs=args.duration, tasks_per_stage=args.tasks,
+                                            num_stages=args.stages, start_time=experiment_start_time,
+                                            rapl=args.rapl, seed=args.seed + i)
+        print("Generated " + os.path.join(args.outdir, experiment_id))
+
+
+if __name__ == '__main__':
+    main()
@@ -7,31 +7,28 @@ import re
 from datetime import datetime
 from dateutil import tz
 from collections import Counter
+import sys
+import importlib.util
 import plot_one_experiment
 
+# The spark log indexer lives with the v2 spark scripts, load it from there. It imports experiment_archive from its
+# folder, which goes at the end of the path so that the scripts here still come first.
+_spark_scripts_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "spark")
+if _spark_scripts_dir not in sys.path:
+    sys.path.append(_spark_scripts_dir)
+_spark_log_index_path = os.path.join(_spark_scripts_dir, "spark_log_index.py")
+_spark_log_index_spec = importlib.util.spec_from_file_location("spark_log_index", _spark_log_index_path)
+spark_log_index = importlib.util.module_from_spec(_spark_log_index_spec)
+_spark_log_index_spec.loader.exec_module(spark_log_index)
+
 # Constants
 power_meter_nodes_in_order = ["ccied21", "ccied22", "ccied23", "ccied24"]
 
 
 def get_spark_run_times(spark_log_file_path):
-    # Read stages and other timestamps from spark log file
-    all_timestamp_list = []
-    stages_time_stamp_list = []
-    with open(spark_log_file_path, "r") as lines:
-        for line in lines:
-            matches = re.match(plot_one_experiment.spark_log_generic_log_regex, line)
-            if matches:
-                time_string = matches.group(1)
-                timestamp = datetime.strptime(time_string, '%y/%m/%d %H:%M:%S')
-                all_timestamp_list.append(timestamp)
-
-            matches = re.match(plot_one_experiment.spark_stage_and_task_log_regex, line)
-            if matches:
-                time_string = matches.group(1)
-                timestamp = datetime.strptime(time_string, '%y/%m/%d %H:%M:%S')
-                stage = float(matches.group(2))
-                stages_time_stamp_list.append([stage, timestamp])
-    return min(all_timestamp_list), max(all_timestamp_list)
+    # First and last timestamps of the spark log file, from its index
+    index = spark_log_index.get_spark_log_index(spark_log_file_path, plot_one_experiment.spark_stage_and_task_log_regex)
+    return index.get_first_last_times()
 
 
 def get_power_usage_wh(power_log_file_path, exp_start_time, exp_end_time):